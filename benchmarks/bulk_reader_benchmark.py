@@ -0,0 +1,63 @@
+"""
+Micro-benchmark for the index data readers that create bulk request bodies.
+
+It compares the line-based ``IndexDataReader`` (including the encoding that the Elasticsearch client applies to its bulk bodies) with
+the memory-mapped ``MmapIndexDataReader``. Run it from the project root, e.g.:
+
+    python3 benchmarks/bulk_reader_benchmark.py --docs=1000000
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+
+from esrally.track import params
+
+
+def create_data_file(path, docs):
+    rnd = random.Random(42)
+    with open(path, "wt") as f:
+        for i in range(docs):
+            f.write('{"geonameid": %d, "name": "place-%d", "latitude": %f, "longitude": %f, "country_code": "AT", "population": %d}\n' %
+                    (i, i, rnd.uniform(-90, 90), rnd.uniform(-180, 180), rnd.randint(0, 100000)))
+
+
+def line_based(path, docs, bulk_size, conflicting_ids):
+    with params.IndexDataReader(path, docs, conflicting_ids, "geonames", "type", bulk_size) as reader:
+        for bulk in reader:
+            # this is what the Elasticsearch client does with a bulk body
+            ("\n".join(bulk) + "\n").encode("utf-8")
+
+
+def mmap_based(path, docs, bulk_size, conflicting_ids):
+    with params.MmapIndexDataReader(path, docs, conflicting_ids, "geonames", "type", bulk_size) as reader:
+        for _ in reader:
+            pass
+
+
+def measure(name, docs, fn):
+    start = time.perf_counter()
+    fn()
+    duration = time.perf_counter() - start
+    print("%-40s %8.2f s %12d docs/s" % (name, duration, docs / duration))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks the creation of bulk request bodies")
+    parser.add_argument("--docs", type=int, default=1000000, help="number of documents (default: 1000000)")
+    parser.add_argument("--bulk-size", type=int, default=5000, help="number of documents per bulk (default: 5000)")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "documents.json")
+        create_data_file(path, args.docs)
+        ids = params.build_conflicting_ids(params.IndexIdConflict.SequentialConflicts, args.docs, 0)
+        measure("Line-based", args.docs, lambda: line_based(path, args.docs, args.bulk_size, None))
+        measure("Memory-mapped", args.docs, lambda: mmap_based(path, args.docs, args.bulk_size, None))
+        measure("Line-based (with ids)", args.docs, lambda: line_based(path, args.docs, args.bulk_size, ids))
+        measure("Memory-mapped (with ids)", args.docs, lambda: mmap_based(path, args.docs, args.bulk_size, ids))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""
+Micro-benchmark for the global throughput calculation of Rally's driver.
+
+It compares the pure Python and the vectorized (NumPy-based) implementation of ``calculate_global_throughput`` after the benchmark as
+well as the incremental calculation that is done while samples arrive. Run it from the project root, e.g.:
+
+    python3 benchmarks/throughput_benchmark.py --samples=10000000
+
+Note that the batch implementations need all samples in memory at once (roughly 3GB for ten million samples).
+"""
+import argparse
+import random
+import time
+
+from esrally import metrics, track
+from esrally.driver import driver
+
+
+def create_batches(samples, clients, batch_size):
+    operations = [track.Operation("index-append", track.OperationType.Index), track.Operation("search", track.OperationType.Search)]
+    rnd = random.Random(42)
+    samples_per_client = samples // clients
+    start = 1470838595
+    batch = driver.SampleBatch()
+    for client_id in range(clients):
+        t = start
+        for i in range(samples_per_client):
+            time_period = rnd.uniform(0.001, 0.01)
+            t += time_period
+            sample_type = metrics.SampleType.Warmup if i < samples_per_client // 10 else metrics.SampleType.Normal
+            batch.add(client_id, t, t - start, operations[i % 2], sample_type, 5, 4, 1000, "docs", time_period, i, samples_per_client)
+            if len(batch) == batch_size:
+                yield batch
+                batch = driver.SampleBatch()
+    if len(batch) > 0:
+        yield batch
+
+
+def measure(name, fn):
+    start = time.perf_counter()
+    result = fn()
+    print("%-40s %8.2f s" % (name, time.perf_counter() - start))
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks the global throughput calculation")
+    parser.add_argument("--samples", type=int, default=10000000, help="number of samples (default: 10000000)")
+    parser.add_argument("--clients", type=int, default=8, help="number of clients (default: 8)")
+    parser.add_argument("--batch-size", type=int, default=10000, help="number of samples per batch (default: 10000)")
+    parser.add_argument("--bucket-interval", type=float, default=1, help="bucket interval in seconds (default: 1)")
+    args = parser.parse_args()
+
+    if driver.numpy is None:
+        print("NumPy is not installed. Only the pure Python implementations are benchmarked.")
+
+    batches = measure("Creating samples", lambda: list(create_batches(args.samples, args.clients, args.batch_size)))
+
+    def incremental():
+        calculator = driver.ThroughputCalculator(args.bucket_interval)
+        for batch in batches:
+            calculator.add(batch)
+        return calculator.calculate()
+
+    measure("Incremental (all batches)", incremental)
+
+    samples = measure("Decoding samples", lambda: [s for batch in batches for s in batch])
+    del batches
+    python_result = measure("Batch (pure Python)", lambda: driver._calculate_global_throughput(samples, args.bucket_interval))
+    if driver.numpy is not None:
+        numpy_result = measure("Batch (NumPy)", lambda: driver._calculate_global_throughput_vectorized(samples, args.bucket_interval))
+        for op, throughput in python_result.items():
+            assert len(throughput) == len(numpy_result[op]), "Results differ for [%s]" % op
+
+
+if __name__ == "__main__":
+    main()
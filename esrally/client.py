@@ -1,21 +1,202 @@
+import collections
+import functools
 import gzip
+import itertools
+import json
+import re
+import threading
+import time
+import urllib.parse
 import urllib3
+import urllib3.connection
 import logging
 import elasticsearch
 import certifi
 
 logger = logging.getLogger("rally.client")
 
+# the phases of a request in the order in which they happen
+REQUEST_PHASES = ["connect", "send", "time_to_first_byte", "receive", "decode"]
+
+
+class RequestTimings:
+    """
+    The time in seconds that requests have spent in each phase (see ``REQUEST_PHASES``):
+
+    * ``connect``: Opening a new connection (including the TLS handshake). It is zero if a connection is reused.
+    * ``send``: Writing the request line, headers and body to the socket.
+    * ``time_to_first_byte``: Waiting for the status line and headers of the response, i.e. processing time in Elasticsearch and the
+      network round trip.
+    * ``receive``: Reading the response body.
+    * ``decode``: Parsing the response body as JSON.
+    """
+    __slots__ = ["requests", "connect", "send", "time_to_first_byte", "receive", "decode"]
+
+    def __init__(self):
+        self.requests = 0
+        self.connect = 0
+        self.send = 0
+        self.time_to_first_byte = 0
+        self.receive = 0
+        self.decode = 0
+
+    def as_tuple(self):
+        return self.connect, self.send, self.time_to_first_byte, self.receive, self.decode
+
+
+# request timings are recorded per thread as all requests of a runner invocation are issued on the same thread
+_recording = threading.local()
+
+
+def start_request_timings():
+    """
+    Starts to record the phase timings of all requests that the current thread issues from now on.
+    """
+    _recording.timings = RequestTimings()
+
+
+def stop_request_timings():
+    """
+    Stops recording request timings on the current thread.
+
+    :return: The ``RequestTimings`` of all requests that have been issued since ``start_request_timings`` or ``None`` if none have been
+             issued (or recording has not been started).
+    """
+    timings = getattr(_recording, "timings", None)
+    _recording.timings = None
+    return timings if timings is not None and timings.requests > 0 else None
+
+
+def _current_timings():
+    return getattr(_recording, "timings", None)
+
+
+class _TimedConnection:
+    """
+    Records the connect, send and time to first byte phases of requests on a connection if request timings are recorded.
+    """
+    def __init__(self, *args, on_connect=None, **kwargs):
+        """
+        :param on_connect: Invoked without arguments after each successful (re)connect. Optional.
+        """
+        super().__init__(*args, **kwargs)
+        self.on_connect = on_connect
+
+    def connect(self):
+        timings = _current_timings()
+        start = time.perf_counter()
+        try:
+            super().connect()
+        finally:
+            if timings is not None:
+                timings.connect += time.perf_counter() - start
+        if self.on_connect is not None:
+            self.on_connect()
+
+    def request(self, *args, **kwargs):
+        timings = _current_timings()
+        if timings is None:
+            return super().request(*args, **kwargs)
+        # the connection may be (re)opened lazily when the request is sent
+        connect_before = timings.connect
+        start = time.perf_counter()
+        try:
+            return super().request(*args, **kwargs)
+        finally:
+            timings.send += time.perf_counter() - start - (timings.connect - connect_before)
+
+    def getresponse(self, *args, **kwargs):
+        timings = _current_timings()
+        if timings is None:
+            return super().getresponse(*args, **kwargs)
+        start = time.perf_counter()
+        # only count successful calls: urllib3 tries to enable buffering first which fails immediately on Python 3
+        response = super().getresponse(*args, **kwargs)
+        timings.time_to_first_byte += time.perf_counter() - start
+        timings.requests += 1
+        return response
+
+
+class TimedHTTPConnection(_TimedConnection, urllib3.connection.HTTPConnection):
+    pass
+
+
+class TimedHTTPSConnection(_TimedConnection, urllib3.connection.HTTPSConnection):
+    pass
+
+
+class CompressedBody(bytes):
+    """
+    A gzip compressed request body. Transports send it as is instead of compressing it again.
+    """
+    def __new__(cls, compressed, uncompressed_size, compression_time):
+        body = super().__new__(cls, compressed)
+        body.uncompressed_size = uncompressed_size
+        body.compression_time = compression_time
+        return body
+
+    def decode(self, *args, **kwargs):
+        # the Elasticsearch client decodes request bodies for logging
+        return "<gzip compressed body with [%d] bytes>" % self.uncompressed_size
+
+    def __reduce__(self):
+        return CompressedBody, (bytes(self), self.uncompressed_size, self.compression_time)
+
+
+def compress(body):
+    """
+    :param body: An encoded request body.
+    :return: The gzip compressed body as ``CompressedBody``.
+    """
+    start = time.perf_counter()
+    compressed = gzip.compress(body)
+    return CompressedBody(compressed, len(body), time.perf_counter() - start)
+
 
 class PoolWrap(object):
     def __init__(self, pool, compressed=False, **kwargs):
         self.pool = pool
         self.compressed = compressed
+        # connections are created lazily so all connections of this pool record their request timings and count their connects
+        connection_class = TimedHTTPSConnection if isinstance(pool, urllib3.HTTPSConnectionPool) else TimedHTTPConnection
+        self.pool.ConnectionCls = functools.partial(connection_class, on_connect=self._connected)
+        # urllib3 reopens dropped connections without creating a new connection object so we count connects instead
+        self.connects = 0
+        # request bodies that have been sent so far
+        self.uncompressed_bytes = 0
+        self.compressed_bytes = 0
+        self.compression_time = 0
+
+    def _connected(self):
+        self.connects += 1
+
+    def compress(self, body):
+        """
+        Compresses a request body unless it is already compressed and accounts for it.
+
+        :param body: An encoded request body.
+        :return: The compressed body.
+        """
+        if not isinstance(body, CompressedBody):
+            body = compress(body)
+        self.uncompressed_bytes += body.uncompressed_size
+        self.compressed_bytes += len(body)
+        self.compression_time += body.compression_time
+        return body
 
     def urlopen(self, method, url, body, retries, headers, **kw):
         if body is not None and self.compressed:
-            body = gzip.compress(body)
-        return self.pool.urlopen(method, url, body=body, retries=retries, headers=headers, **kw)
+            body = self.compress(body)
+        timings = _current_timings()
+        if timings is None:
+            return self.pool.urlopen(method, url, body=body, retries=retries, headers=headers, **kw)
+        timed_before = timings.connect + timings.send + timings.time_to_first_byte
+        start = time.perf_counter()
+        try:
+            return self.pool.urlopen(method, url, body=body, retries=retries, headers=headers, **kw)
+        finally:
+            # urllib3 reads the response body before it returns
+            timings.receive += time.perf_counter() - start - (timings.connect + timings.send + timings.time_to_first_byte - timed_before)
 
     def __getattr__(self, attr_name):
         return getattr(self.pool, attr_name)
@@ -27,7 +208,27 @@ class ConfigurableHttpConnection(elasticsearch.Urllib3HttpConnection):
         if compressed:
             self.headers.update(urllib3.make_headers(accept_encoding=True))
             self.headers.update({"Content-Encoding": "gzip"})
-        self.pool = PoolWrap(self.pool, **kwargs)
+        self.pool = PoolWrap(self.pool, compressed=compressed, **kwargs)
+
+
+class PassThroughBytesSerializer(elasticsearch.JSONSerializer):
+    """
+    Serializes request bodies as JSON except for bodies that are already serialized (``bytes``), e.g. bulk bodies.
+    """
+    def dumps(self, data):
+        if isinstance(data, bytes):
+            return data
+        return super(PassThroughBytesSerializer, self).dumps(data)
+
+    def loads(self, s):
+        timings = _current_timings()
+        if timings is None:
+            return super(PassThroughBytesSerializer, self).loads(s)
+        start = time.perf_counter()
+        try:
+            return super(PassThroughBytesSerializer, self).loads(s)
+        finally:
+            timings.decode += time.perf_counter() - start
 
 
 class EsClientFactory:
@@ -42,7 +243,8 @@ class EsClientFactory:
         if self._is_set(client_options, "basic_auth_user") and self._is_set(client_options, "basic_auth_password"):
             # Maybe we should remove these keys from the dict?
             client_options["http_auth"] = (client_options["basic_auth_user"], client_options["basic_auth_password"])
-        self.client = elasticsearch.Elasticsearch(hosts=hosts, connection_class=ConfigurableHttpConnection, **client_options)
+        self.client = elasticsearch.Elasticsearch(hosts=hosts, connection_class=ConfigurableHttpConnection,
+                                                  serializer=PassThroughBytesSerializer(), **client_options)
 
     def _is_set(self, client_opts, k):
         try:
@@ -52,3 +254,328 @@ class EsClientFactory:
 
     def create(self):
         return self.client
+
+
+def connection_pools(es):
+    """
+    :param es: An Elasticsearch client.
+    :return: The (urllib3) connection pools of all hosts that this client is connected to.
+    """
+    return [_pool_of(connection) for connection in es.transport.connection_pool.connections]
+
+
+def _pool_of(connection):
+    # unwrap our own wrapper
+    return connection.pool.pool if isinstance(connection.pool, PoolWrap) else connection.pool
+
+
+def opened_connections(es):
+    """
+    :param es: An Elasticsearch client.
+    :return: The total number of connections that this client has opened so far. Connections that are reopened (e.g. because the server
+             has closed them) are counted each time.
+    """
+    opened = 0
+    for connection in es.transport.connection_pool.connections:
+        if isinstance(connection.pool, PoolWrap):
+            opened += connection.pool.connects
+        else:
+            opened += connection.pool.num_connections
+    return opened
+
+
+def compression_stats(es):
+    """
+    :param es: An Elasticsearch client.
+    :return: A ``Counter`` with the total number of request body bytes before (``uncompressed_bytes``) and after compression
+             (``compressed_bytes``) and the time in seconds spent compressing them (``compression_time``) so far. It is empty if the
+             client does not compress request bodies.
+    """
+    stats = collections.Counter()
+    for connection in es.transport.connection_pool.connections:
+        if isinstance(connection.pool, PoolWrap) and connection.pool.compressed:
+            stats["uncompressed_bytes"] += connection.pool.uncompressed_bytes
+            stats["compressed_bytes"] += connection.pool.compressed_bytes
+            stats["compression_time"] += connection.pool.compression_time
+    return stats
+
+
+def warmup_connections(es, connections_per_host):
+    """
+    Opens connections to all hosts ahead of time so requests do not need to pay for connection (and TLS) setup. Each connection is
+    checked with a ``HEAD`` request to the root path of its host (including the URL prefix) and only kept in the pool if the connection is healthy and will be kept alive.
+
+    :param es: An Elasticsearch client.
+    :param connections_per_host: The number of connections that should be open per host. It is capped at the size of each pool.
+    :return: The number of healthy connections across all hosts.
+    """
+    healthy = 0
+    for connection in es.transport.connection_pool.connections:
+        pool = _pool_of(connection)
+        # take all connections out of the pool so we get distinct ones
+        connections = [pool._get_conn() for _ in range(min(connections_per_host, pool.pool.maxsize))]
+        try:
+            for conn in connections:
+                if _check_connection(conn, connection, pool):
+                    healthy += 1
+        finally:
+            for conn in connections:
+                pool._put_conn(conn)
+    return healthy
+
+
+def _check_connection(conn, connection, pool):
+    try:
+        if conn.sock is None:
+            conn.connect()
+        conn.request("HEAD", connection.url_prefix + "/", headers=connection.headers)
+        response = conn.getresponse()
+        response.read()
+    except Exception as e:
+        logger.warning("Could not open connection to [%s:%s] (%s)." % (pool.host, pool.port, e))
+        conn.close()
+        return False
+    if response.status >= 400:
+        logger.warning("Connection health check to [%s:%s] has failed with HTTP status [%d]." % (pool.host, pool.port, response.status))
+        conn.close()
+        return False
+    if response.will_close:
+        logger.warning("[%s:%s] does not keep connections alive. Each request will open a new connection." % (pool.host, pool.port))
+        conn.close()
+        return False
+    return True
+
+
+class LeanResponse:
+    """
+    The body of a response of the lean transport. Fields that runners check after each request (whether a bulk request has errors and the
+    scroll id) are extracted from the start of the raw body. The body is only decoded completely when any other field is accessed.
+    """
+    # Elasticsearch renders these fields first
+    _FIELD_PATTERNS = {
+        "errors": re.compile(rb'\{"took":\d+,"errors":(true|false)'),
+        "_scroll_id": re.compile(rb'\{"_scroll_id":"([^"]+)"')
+    }
+
+    def __init__(self, raw):
+        """
+        :param raw: The raw response body as ``bytes``.
+        """
+        self.raw = raw
+        self._decoded = None
+
+    def decoded(self):
+        if self._decoded is None:
+            timings = _current_timings()
+            start = time.perf_counter()
+            self._decoded = json.loads(self.raw.decode("utf-8")) if self.raw else {}
+            if timings is not None:
+                timings.decode += time.perf_counter() - start
+        return self._decoded
+
+    def __getitem__(self, key):
+        if self._decoded is None and key in LeanResponse._FIELD_PATTERNS:
+            match = LeanResponse._FIELD_PATTERNS[key].match(self.raw)
+            if match:
+                value = match.group(1)
+                if key == "errors":
+                    return value == b"true"
+                return value.decode("utf-8")
+        return self.decoded()[key]
+
+    def __contains__(self, key):
+        return key in self.decoded()
+
+    def get(self, key, default=None):
+        return self.decoded().get(key, default)
+
+    def __len__(self):
+        return len(self.decoded())
+
+    def __iter__(self):
+        return iter(self.decoded())
+
+
+class LeanTransport:
+    """
+    Sends requests with pre-built headers directly on the persistent connections of the connection pools of an Elasticsearch client.
+    Request bodies that are ``bytes`` are sent as is and response bodies are returned as ``LeanResponse`` which are decoded lazily.
+    """
+
+    def __init__(self, es):
+        """
+        :param es: The Elasticsearch client whose connections are used.
+        """
+        self.connection_pool = es.transport.connection_pool
+        self.connections = list(self.connection_pool.connections)
+        self.headers = [LeanTransport._headers(connection) for connection in self.connections]
+        # the pool wrapper compresses request bodies (if enabled)
+        self.compressing_pools = [connection.pool if isinstance(connection.pool, PoolWrap) and connection.pool.compressed else None
+                                  for connection in self.connections]
+        self._next_connection = itertools.count()
+
+    @staticmethod
+    def _headers(connection):
+        headers = {"Content-Type": "application/json"}
+        for k, v in connection.headers.items():
+            # responses are read as is
+            if k.lower() != "accept-encoding":
+                headers[k] = v
+        return headers
+
+    def perform_request(self, method, url, params=None, body=None):
+        """
+        Sends a request to the next host (round-robin).
+
+        :param method: The HTTP method.
+        :param url: The path of the request.
+        :param params: A dict of URL parameters. Optional.
+        :param body: The request body as ``bytes``, ``str`` or as a JSON serializable object. Optional.
+        :return: A tuple of the HTTP status and the response body as ``LeanResponse``.
+        """
+        idx = next(self._next_connection) % len(self.connections)
+        connection = self.connections[idx]
+        pool = _pool_of(connection)
+        url = connection.url_prefix + url
+        if params:
+            url = "%s?%s" % (url, urllib.parse.urlencode(params))
+        body = _encoded_body(body)
+        if body is not None and self.compressing_pools[idx]:
+            body = self.compressing_pools[idx].compress(body)
+
+        conn = pool._get_conn()
+        try:
+            if conn.sock is None:
+                conn.connect()
+                conn.sock.settimeout(pool.timeout.read_timeout)
+            conn.request(method, url, body=body, headers=self.headers[idx])
+            response = conn.getresponse()
+            timings = _current_timings()
+            start = time.perf_counter()
+            raw = response.read()
+            if timings is not None:
+                timings.receive += time.perf_counter() - start
+            if response.will_close:
+                conn.close()
+        except Exception as e:
+            conn.close()
+            raise elasticsearch.ConnectionError("N/A", str(e), e)
+        finally:
+            pool._put_conn(conn)
+
+        if not (200 <= response.status < 300):
+            raw = raw.decode("utf-8", errors="replace")
+            try:
+                info = json.loads(raw)
+                error = info.get("error", raw)
+            except ValueError:
+                info = raw
+                error = raw
+            raise elasticsearch.exceptions.HTTP_EXCEPTIONS.get(response.status, elasticsearch.TransportError)(response.status, error, info)
+        return response.status, LeanResponse(raw)
+
+
+def _encoded_body(body):
+    if body is None or isinstance(body, bytes):
+        return body
+    elif isinstance(body, str):
+        return body.encode("utf-8")
+    elif isinstance(body, (list, tuple)):
+        # bulk bodies
+        return ("\n".join([line if isinstance(line, str) else json.dumps(line) for line in body]) + "\n").encode("utf-8")
+    else:
+        return json.dumps(body).encode("utf-8")
+
+
+def _path(*parts):
+    return "/" + "/".join([urllib.parse.quote(",".join(p) if isinstance(p, (list, tuple)) else str(p), ",*") for p in parts if p])
+
+
+def _url_params(params):
+    # Elasticsearch expects lower case booleans
+    return {k: str(v).lower() if isinstance(v, bool) else v for k, v in params.items()}
+
+
+class _LeanIndicesClient:
+    """
+    Implements the indices API that Rally's built-in runners use on top of ``LeanTransport``. All other calls are delegated to the indices
+    API of the regular Elasticsearch client.
+    """
+
+    def __init__(self, transport, indices):
+        self.transport = transport
+        self.indices = indices
+
+    def stats(self, index=None, metric=None):
+        _, response = self.transport.perform_request("GET", _path(index, "_stats", metric))
+        return response
+
+    def forcemerge(self, index=None):
+        _, response = self.transport.perform_request("POST", _path(index, "_forcemerge"))
+        return response
+
+    def optimize(self, index=None):
+        _, response = self.transport.perform_request("POST", _path(index, "_optimize"))
+        return response
+
+    def __getattr__(self, attr_name):
+        return getattr(self.indices, attr_name)
+
+
+class _LeanNodesClient:
+    """
+    Implements the nodes API that Rally's built-in runners use on top of ``LeanTransport``. All other calls are delegated to the nodes
+    API of the regular Elasticsearch client.
+    """
+
+    def __init__(self, transport, nodes):
+        self.transport = transport
+        self.nodes = nodes
+
+    def stats(self, node_id=None, metric=None):
+        _, response = self.transport.perform_request("GET", _path("_nodes", node_id, "stats", metric))
+        return response
+
+    def __getattr__(self, attr_name):
+        return getattr(self.nodes, attr_name)
+
+
+class LeanClient:
+    """
+    Implements the Elasticsearch API that Rally's built-in runners use on top of ``LeanTransport``. All other API calls are delegated to
+    the regular Elasticsearch client.
+    """
+
+    def __init__(self, es):
+        """
+        :param es: The Elasticsearch client whose connections are used and to which all other API calls are delegated.
+        """
+        self.es = es
+        self.transport = LeanTransport(es)
+        self.indices = _LeanIndicesClient(self.transport, es.indices)
+        self.nodes = _LeanNodesClient(self.transport, es.nodes)
+
+    def bulk(self, body, index=None, doc_type=None, params=None):
+        _, response = self.transport.perform_request("POST", _path(index, doc_type, "_bulk"), params=params, body=body)
+        return response
+
+    def search(self, index=None, doc_type=None, body=None, params=None, **kwargs):
+        url_params = _url_params(kwargs)
+        if params:
+            url_params.update(params)
+        _, response = self.transport.perform_request("POST", _path(index, doc_type, "_search"), params=url_params, body=body)
+        return response
+
+    def scroll(self, scroll_id, scroll=None):
+        body = {"scroll_id": scroll_id}
+        if scroll:
+            body["scroll"] = scroll
+        _, response = self.transport.perform_request("POST", "/_search/scroll", body=body)
+        return response
+
+    def clear_scroll(self, scroll_id):
+        _, response = self.transport.perform_request("DELETE", "/_search/scroll", body={"scroll_id": [scroll_id]})
+        return response
+
+    def __getattr__(self, attr_name):
+        return getattr(self.es, attr_name)
@@ -0,0 +1,335 @@
+import asyncio
+import concurrent.futures
+import copy
+import datetime
+import logging
+import time
+
+import thespian.actors
+from esrally import exceptions, track, client
+from esrally.driver import driver, runner, scheduler
+from esrally.utils import convert
+
+logger = logging.getLogger("rally.driver")
+
+
+class AsyncLoadGenerator(thespian.actors.Actor):
+    """
+    A load generator that runs multiple clients concurrently on a single asyncio event loop.
+
+    In contrast to `driver.LoadGenerator`, which drives exactly one client per process, this actor drives all clients that have been
+    assigned to it. Its coordination protocol with the master is identical but it reports join points once for all of its clients.
+    """
+
+    WAKEUP_INTERVAL_SECONDS = 5
+
+    @staticmethod
+    def actorSystemCapabilityCheck(capabilities, requirements):
+        return driver.runs_on_load_driver_host(capabilities, requirements)
+
+    def __init__(self):
+        super().__init__()
+        self.master = None
+        self.worker_id = None
+        self.es = None
+        self.config = None
+        self.track = None
+        self.client_allocations = None
+        self.current_task = 0
+        # index of the first task of the current step
+        self.step_start = 0
+        self.probe = None
+        self.start_timestamp = None
+        self.pool = concurrent.futures.ThreadPoolExecutor(max_workers=1)
+        self.executor_future = None
+        # shared by all samplers so all samples are sent in one batch
+        self.sample_buffer = None
+        self.next_join_point = None
+        self.start_driving = False
+        # parameter sources per client and task of the next step if parameters are preloaded
+        self.preloaded = {}
+        # number of connections that have been opened and request body compression stats per operation in the current step
+        self.new_connections = {}
+        self.compression = {}
+
+    def receiveMessage(self, msg, sender):
+        try:
+            if isinstance(msg, driver.StartAsyncLoadGenerator):
+                logger.debug("load generator [%d] is about to start with clients %s." % (msg.worker_id, sorted(msg.client_allocations)))
+                self.master = sender
+                self.worker_id = msg.worker_id
+                self.config = msg.config
+                self.track = msg.track
+                self.client_allocations = msg.client_allocations
+                self.sample_buffer = driver.create_sample_buffer(self.config)
+                self.es = self.create_client()
+                self.current_task = 0
+                self.start_timestamp = time.perf_counter()
+                track.load_track_plugins(self.config, runner.register_runner, scheduler.register_scheduler)
+                self.drive()
+            elif isinstance(msg, driver.Drive):
+                logger.debug("Load generator [%d] is continuing its work at task index [%d] on [%f]." %
+                             (self.worker_id, self.current_task, msg.client_start_timestamp))
+                self.master = sender
+                self.start_driving = True
+                self.step_start, self.current_task = driver.next_step_start(self.step_start, self.current_task, msg.repeat_step)
+                if msg.repeat_step:
+                    # parameters have been preloaded for the step after the repeated one
+                    self.preloaded = {}
+                self.probe = msg.probe
+                self.wakeupAfter(datetime.timedelta(seconds=max(msg.client_start_timestamp - time.perf_counter(), 0)))
+            elif isinstance(msg, thespian.actors.WakeupMessage):
+                if self.start_driving:
+                    self.start_driving = False
+                    self.drive()
+                else:
+                    self.send_samples()
+                    if self.executor_future is not None:
+                        if self.executor_future.done():
+                            e = self.executor_future.exception(timeout=0)
+                            if e:
+                                self.send(self.master, driver.BenchmarkFailure("Error in load generator [%d]" % self.worker_id, e))
+                            else:
+                                self.executor_future = None
+                                self.join()
+                        else:
+                            self.wakeupAfter(datetime.timedelta(seconds=AsyncLoadGenerator.WAKEUP_INTERVAL_SECONDS))
+            else:
+                logger.debug("load generator [%d] received unknown message [%s] (ignoring)." % (self.worker_id, str(msg)))
+        except Exception as e:
+            self.send(self.master, driver.BenchmarkFailure("Fatal error in load generator [%d]" % self.worker_id, e))
+
+    def create_client(self):
+        # all clients of this load generator share one connection pool so it needs to be large enough
+        return driver.create_client(self.config, sum([driver.max_concurrent_requests(tasks)
+                                                      for tasks in self.tasks_per_client().values()]))
+
+    def tasks_per_client(self):
+        return {client_id: [t for t in allocations if isinstance(t, track.Task)]
+                for client_id, allocations in self.client_allocations.items()}
+
+    def drive(self):
+        tasks_per_client, self.next_join_point, self.current_task = next_step(self.client_allocations, self.current_task)
+        if any(tasks_per_client.values()):
+            logger.info("Load generator [%d] is executing %s." % (self.worker_id, tasks_per_client))
+            self.executor_future = self.pool.submit(self.run_step, tasks_per_client)
+            self.wakeupAfter(datetime.timedelta(seconds=AsyncLoadGenerator.WAKEUP_INTERVAL_SECONDS))
+        else:
+            self.join()
+
+    def join(self):
+        logger.info("load generator [%d] reached join point [%s]." % (self.worker_id, self.next_join_point))
+        self.send_samples()
+        tasks_per_client, _, _ = next_step(self.client_allocations, self.current_task)
+        memory_budget_bytes = driver.preload_memory_budget(self.config)
+        if memory_budget_bytes > 0:
+            # preload before we report the join point so it does not count towards the next step
+            precompress = driver.precompress_bodies(self.config)
+            self.preloaded = {client_id: driver.preload_params(self.track, tasks, client_id, memory_budget_bytes, precompress)
+                              for client_id, tasks in tasks_per_client.items()}
+        if any(tasks_per_client.values()):
+            driver.warmup_connections(self.config, self.es, sum([driver.max_concurrent_requests(tasks)
+                                                                 for tasks in tasks_per_client.values()]))
+        self.send(self.master, driver.JoinPointReached(self.worker_id, self.next_join_point, self.new_connections, self.compression))
+        self.new_connections = {}
+        self.compression = {}
+
+    def run_step(self, tasks_per_client):
+        loop = asyncio.new_event_loop()
+        # synchronous runners are executed on this pool so they don't block the event loop
+        max_concurrent_requests = sum([driver.max_concurrent_requests(tasks) for tasks in tasks_per_client.values()])
+        loop.set_default_executor(concurrent.futures.ThreadPoolExecutor(max_workers=max_concurrent_requests))
+        connections_before = client.opened_connections(self.es)
+        compression_before = client.compression_stats(self.es)
+        try:
+            loop.run_until_complete(self.run_clients(loop, tasks_per_client))
+        finally:
+            loop.close()
+        # all clients share one connection pool so we cannot attribute new connections to a single operation
+        new_connections = client.opened_connections(self.es) - connections_before
+        self.new_connections = {task.operation: new_connections for tasks in tasks_per_client.values() for task in tasks}
+        compression = client.compression_stats(self.es)
+        operations = {task.operation for tasks in tasks_per_client.values() for task in tasks}
+        # compressed bytes would be counted multiple times if we attributed them to each operation
+        if compression and len(operations) == 1:
+            compression.subtract(compression_before)
+            self.compression = {operations.pop(): compression}
+
+    async def run_clients(self, loop, tasks_per_client):
+        await asyncio.gather(*[self.run_client(loop, client_id, tasks) for client_id, tasks in tasks_per_client.items()])
+
+    async def run_client(self, loop, client_id, tasks):
+        preloaded = self.preloaded.pop(client_id, {})
+        for task in tasks:
+            sampler = driver.Sampler(client_id, task.operation, self.start_timestamp, self.sample_buffer)
+            schedule = driver.schedule_for(self.track, task, client_id, self.probe, driver.param_prefetch_size(self.config),
+                                           preloaded.pop(task, None), driver.precompress_bodies(self.config))
+            if task.open_loop:
+                await execute_schedule_open_loop(loop, schedule, self.es, sampler, task.max_in_flight, driver.request_timings(self.config))
+            else:
+                await execute_schedule(loop, schedule, self.es, sampler, driver.request_timings(self.config))
+
+    def send_samples(self):
+        samples = self.sample_buffer.swap()
+        if not samples.empty:
+            self.send(self.master, driver.UpdateSamples(self.worker_id, samples))
+
+
+def next_step(client_allocations, current_task):
+    """
+    Determines the tasks that each client needs to run until it reaches the next join point.
+
+    :param client_allocations: A dict mapping client ids to their rows in the allocation matrix.
+    :param current_task: The index of the first entry to consider in each row.
+    :return: A triple of a dict mapping client ids to the list of tasks they need to execute, the next join point and the index of the
+             first entry after this join point.
+    """
+    tasks_per_client = {}
+    join_point = None
+    next_task = current_task
+    for client_id, allocation in client_allocations.items():
+        tasks = []
+        # the allocation matrix is rectangular and join points are at the same position for all clients
+        for idx in range(current_task, len(allocation)):
+            task = allocation[idx]
+            if isinstance(task, driver.JoinPoint):
+                join_point = task
+                next_task = idx + 1
+                break
+            elif isinstance(task, track.Task):
+                tasks.append(task)
+            elif task is not None:
+                raise exceptions.RallyAssertionError("Unknown task type [%s]" % type(task))
+        tasks_per_client[client_id] = tasks
+    return tasks_per_client, join_point, next_task
+
+
+async def execute_schedule(loop, schedule, es, sampler, request_timings=False):
+    """
+    Executes tasks according to the schedule for a given operation on the current event loop.
+
+    Asynchronous runners are awaited directly. Synchronous runners are executed on the event loop's default executor.
+
+    :param loop: The event loop on which this coroutine runs.
+    :param schedule: The schedule for this operation.
+    :param es: Elasticsearch client that will be used to execute the operation.
+    :param sampler: A container to store raw samples.
+    :param request_timings: ``True`` iff each sample should contain the time that its requests have spent in each phase. Request timings
+                            are only recorded for synchronous runners. Default: ``False``.
+    """
+    total_start = time.perf_counter()
+    curr_total_it = 1
+    # runners may hold state (e.g. a scroll id) so each client needs its own instance
+    client_runners = {}
+    # noinspection PyBroadException
+    try:
+        for param_wait_time, (expected_scheduled_time, sample_type_calculator, curr_iteration, total_it_for_task, shared_runner, params,
+                              meta_data) in driver.with_param_wait_time(schedule):
+            r = client_runners.get(id(shared_runner))
+            if r is None:
+                r = copy.copy(shared_runner)
+                client_runners[id(shared_runner)] = r
+            sample_type = sample_type_calculator(total_start)
+            absolute_expected_schedule_time = total_start + expected_scheduled_time
+            throughput_throttled = expected_scheduled_time > 0
+            if throughput_throttled:
+                rest = absolute_expected_schedule_time - time.perf_counter()
+                if rest > 0:
+                    await asyncio.sleep(rest)
+            start = time.perf_counter()
+            (total_ops, total_ops_unit), timings = await _run(loop, r, es, params, request_timings)
+            stop = time.perf_counter()
+
+            service_time = stop - start
+            # Do not calculate latency separately when we don't throttle throughput. This metric is just confusing then.
+            latency = stop - absolute_expected_schedule_time if throughput_throttled else service_time
+            sampler.add(sample_type, convert.seconds_to_ms(latency), convert.seconds_to_ms(service_time), total_ops, total_ops_unit,
+                        (stop - total_start), curr_total_it, total_it_for_task, meta_data, convert.seconds_to_ms(param_wait_time),
+                        timings)
+            curr_total_it += 1
+    except BaseException:
+        logger.exception("Could not execute schedule")
+        raise
+
+
+async def execute_schedule_open_loop(loop, schedule, es, sampler, max_in_flight, request_timings=False):
+    """
+    Executes tasks according to the schedule for a given operation without waiting for a response before the next request is issued
+    (open-loop). See `driver.execute_schedule_open_loop`.
+
+    :param loop: The event loop on which this coroutine runs.
+    :param schedule: The schedule for this operation.
+    :param es: Elasticsearch client that will be used to execute the operation.
+    :param sampler: A container to store raw samples.
+    :param max_in_flight: The maximum number of requests that may be outstanding at the same time.
+    :param request_timings: ``True`` iff each sample should contain the time that its requests have spent in each phase. Default:
+                            ``False``.
+    """
+    total_start = time.perf_counter()
+    curr_total_it = 1
+    in_flight = asyncio.Semaphore(max_in_flight)
+    requests = []
+
+    async def issue(r, params, sample_type, absolute_expected_schedule_time, throughput_throttled, curr_it, total_it, meta_data,
+                    param_wait_time):
+        try:
+            start = time.perf_counter()
+            (total_ops, total_ops_unit), timings = await _run(loop, r, es, params, request_timings)
+            stop = time.perf_counter()
+            service_time = stop - start
+            latency = stop - absolute_expected_schedule_time if throughput_throttled else service_time
+            sampler.add(sample_type, convert.seconds_to_ms(latency), convert.seconds_to_ms(service_time), total_ops, total_ops_unit,
+                        (stop - total_start), curr_it, total_it, meta_data, convert.seconds_to_ms(param_wait_time), timings)
+        finally:
+            in_flight.release()
+
+    # noinspection PyBroadException
+    try:
+        for param_wait_time, (expected_scheduled_time, sample_type_calculator, curr_iteration, total_it_for_task, shared_runner, params,
+                              meta_data) in driver.with_param_wait_time(schedule):
+            # fail early if a request has failed
+            for request in requests:
+                if request.done() and request.exception():
+                    raise request.exception()
+            requests = [request for request in requests if not request.done()]
+            sample_type = sample_type_calculator(total_start)
+            absolute_expected_schedule_time = total_start + expected_scheduled_time
+            throughput_throttled = expected_scheduled_time > 0
+            if throughput_throttled:
+                rest = absolute_expected_schedule_time - time.perf_counter()
+                if rest > 0:
+                    await asyncio.sleep(rest)
+            await in_flight.acquire()
+            # runners may hold request-specific state (e.g. a scroll id) so each outstanding request needs its own instance
+            requests.append(loop.create_task(issue(copy.copy(shared_runner), params, sample_type, absolute_expected_schedule_time,
+                                                   throughput_throttled, curr_total_it, total_it_for_task, meta_data,
+                                                   param_wait_time)))
+            curr_total_it += 1
+        if requests:
+            await asyncio.gather(*requests)
+    except BaseException:
+        logger.exception("Could not execute schedule")
+        for request in requests:
+            request.cancel()
+        raise
+
+
+async def _run(loop, r, es, params, request_timings=False):
+    """
+    :return: A pair of the result of the runner and the ``client.RequestTimings`` of its requests (``None`` if they are not recorded).
+    """
+    if runner.is_async(r):
+        # coroutines of all clients interleave on the event loop's thread so their requests cannot be told apart
+        with r:
+            return await r(es, params), None
+    else:
+        return await loop.run_in_executor(None, _run_sync, r, es, params, request_timings)
+
+
+def _run_sync(r, es, params, request_timings=False):
+    # requests are timed on the executor's thread which runs the runner
+    if request_timings:
+        client.start_request_timings()
+    with r:
+        result = r(es, params)
+    return result, client.stop_request_timings() if request_timings else None
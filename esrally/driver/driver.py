@@ -1,16 +1,28 @@
+import collections
 import concurrent.futures
+import copy
 import datetime
 import json
 import logging
-import queue
+import os
 import socket
+import struct
+import sys
+import threading
 import time
 
 import elasticsearch
 import thespian.actors
+
+try:
+    import numpy
+except ImportError:
+    # NumPy is optional. Throughput is calculated in pure Python without it.
+    numpy = None
+
 from esrally import exceptions, metrics, track, client, PROGRAM_NAME
-from esrally.driver import runner
-from esrally.utils import convert, console, versions
+from esrally.driver import runner, scheduler, saturation
+from esrally.utils import convert, console, versions, histogram
 
 logger = logging.getLogger("rally.driver")
 
@@ -36,6 +48,34 @@ class StartBenchmark:
         self.metrics_meta_info = metrics_meta_info
 
 
+class PrepareTrack:
+    """
+    Tells a load driver host to prepare the track data.
+    """
+
+    def __init__(self, host, config, track):
+        """
+        :param host: The load driver host (as "ip:admin port").
+        :param config: Rally internal configuration object.
+        :param track: The track to use.
+        """
+        self.host = host
+        self.config = config
+        self.track = track
+
+
+class TrackPrepared:
+    """
+    Tells the master that a load driver host has prepared the track data.
+    """
+
+    def __init__(self, host):
+        """
+        :param host: The load driver host that has prepared the track data.
+        """
+        self.host = host
+
+
 class StartLoadGenerator:
     """
     Starts a load generator.
@@ -54,13 +94,38 @@ class StartLoadGenerator:
         self.tasks = tasks
 
 
+class StartAsyncLoadGenerator:
+    """
+    Starts a load generator that runs multiple clients on an asyncio event loop.
+    """
+
+    def __init__(self, worker_id, config, track, client_allocations):
+        """
+        :param worker_id: Id of the load generator process.
+        :param config: Rally internal configuration object.
+        :param track: The track to use.
+        :param client_allocations: A dict mapping each client id to the tasks it needs to run.
+        """
+        self.worker_id = worker_id
+        self.config = config
+        self.track = track
+        self.client_allocations = client_allocations
+
+
 class Drive:
     """
     Tells a load generator to drive (either after a join point or initially).
     """
 
-    def __init__(self, client_start_timestamp):
+    def __init__(self, client_start_timestamp, repeat_step=False, probe=None):
+        """
+        :param client_start_timestamp: The time (according to the load generator's clock) when it should start to drive.
+        :param repeat_step: If ``True``, the load generator runs the tasks of its previous step again instead of going on.
+        :param probe: The current probe if the next step contains a task with a saturation search.
+        """
         self.client_start_timestamp = client_start_timestamp
+        self.repeat_step = repeat_step
+        self.probe = probe
 
 
 class UpdateSamples:
@@ -69,6 +134,10 @@ class UpdateSamples:
     """
 
     def __init__(self, client_id, samples):
+        """
+        :param client_id: Client id of the load generator (or worker id of an asyncio based load generator).
+        :param samples: A ``SampleBatch``.
+        """
         self.client_id = client_id
         self.samples = samples
 
@@ -78,10 +147,18 @@ class JoinPointReached:
     Tells the master that a load generator has reached a join point. Used for coordination across multiple load generators.
     """
 
-    def __init__(self, client_id, task):
+    def __init__(self, client_id, task, new_connections=None, compression=None):
+        """
+        :param client_id: The id of the load generator.
+        :param task: The join point that has been reached.
+        :param new_connections: A dict of operations to the number of connections that have been opened while they ran. Optional.
+        :param compression: A dict of operations to their request body compression stats (see ``client.compression_stats``). Optional.
+        """
         self.client_id = client_id
         self.client_local_timestamp = time.perf_counter()
         self.task = task
+        self.new_connections = new_connections if new_connections else {}
+        self.compression = compression if compression else {}
 
 
 class BenchmarkComplete:
@@ -112,18 +189,32 @@ class Driver(thespian.actors.Actor):
     def __init__(self):
         super().__init__()
         self.config = None
+        self.track = None
         # Elasticsearch client
         self.es = None
+        # remote hosts on which load generators run (empty if they run locally)
+        self.load_driver_hosts = []
+        self.prepared_load_driver_hosts = set()
         self.metrics_store = None
         self.raw_samples = []
+        # only used if samples are aggregated by load generators
+        self.aggregates = None
+        self.throughput_calculator = None
         self.currently_completed = 0
         self.clients_completed_current_step = {}
+        # number of connections that have been opened per operation in the current step
+        self.new_connections_current_step = collections.Counter()
+        # request body compression stats per operation in the current step
+        self.compression_current_step = {}
         self.current_step = -1
         self.number_of_steps = 0
         self.start_sender = None
         self.allocations = None
         self.join_points = None
         self.ops_per_join_point = None
+        self.tasks_per_join_point = None
+        # the saturation search of the current step (if any)
+        self.saturation_search = None
         self.drivers = []
         self.progress_reporter = console.progress()
         self.progress_counter = 0
@@ -134,6 +225,8 @@ class Driver(thespian.actors.Actor):
         try:
             if isinstance(msg, StartBenchmark):
                 self.start_benchmark(msg, sender)
+            elif isinstance(msg, TrackPrepared):
+                self.track_prepared(msg)
             elif isinstance(msg, JoinPointReached):
                 self.joinpoint_reached(msg)
             elif isinstance(msg, UpdateSamples):
@@ -160,14 +253,18 @@ class Driver(thespian.actors.Actor):
     def start_benchmark(self, msg, sender):
         self.start_sender = sender
         self.config = msg.config
+        self.track = msg.track
         current_track = msg.track
+        self.load_driver_hosts = self.config.opts("driver", "load.driver.hosts", mandatory=False, default_value=[])
 
-        logger.info("Preparing track")
-        # TODO #71: Reconsider this in case we distribute drivers. *For now* the driver will only be on a single machine, so we're safe.
-        track.prepare_track(current_track, self.config)
+        if not self.load_driver_hosts:
+            logger.info("Preparing track")
+            track.prepare_track(current_track, self.config)
 
         logger.info("Benchmark is about to start.")
         self.quiet = self.config.opts("system", "quiet.mode", mandatory=False, default_value=False)
+        # fail early if request bodies cannot be precompressed
+        precompress_bodies(self.config)
         self.es = client.EsClientFactory(self.config.opts("client", "hosts"), self.config.opts("client", "options")).create()
         self.metrics_store = metrics.InMemoryMetricsStore(config=self.config, meta_info=msg.metrics_meta_info)
         invocation = self.config.opts("meta", "time.start")
@@ -176,6 +273,11 @@ class Driver(thespian.actors.Actor):
         challenge_name = self.config.opts("benchmarks", "challenge")
         selected_car_name = self.config.opts("benchmarks", "car")
         self.metrics_store.open(invocation, track_name, challenge_name, selected_car_name)
+        bucket_interval_secs = self.config.opts("driver", "throughput.bucket.interval", mandatory=False, default_value=1)
+        self.throughput_calculator = ThroughputCalculator(bucket_interval_secs,
+                                                          self.config.opts("driver", "throughput.window", mandatory=False))
+        if self.config.opts("driver", "sample.aggregation", mandatory=False, default_value="raw") == "histogram":
+            self.aggregates = Aggregates(bucket_interval_secs)
 
         challenge = select_challenge(self.config, current_track)
         es_version = self.config.opts("source", "distribution.version")
@@ -184,21 +286,66 @@ class Driver(thespian.actors.Actor):
         self.allocations = allocator.allocations
         self.number_of_steps = len(allocator.join_points) - 1
         self.ops_per_join_point = allocator.operations_per_joinpoint
+        self.tasks_per_join_point = allocator.tasks_per_joinpoint
 
         logger.info("Benchmark consists of [%d] steps executed by (at most) [%d] clients as specified by the allocation matrix:\n%s" %
                     (self.number_of_steps, len(self.allocations), self.allocations))
 
-        for client_id in range(allocator.clients):
-            self.drivers.append(self.createActor(LoadGenerator))
-        for client_id, driver in enumerate(self.drivers):
-            self.send(driver, StartLoadGenerator(client_id, self.config, current_track, self.allocations[client_id]))
+        if self.load_driver_hosts:
+            # each load driver host prepares its own track data before any load generator starts
+            for host in self.load_driver_hosts:
+                logger.info("Preparing track on load driver host [%s]." % host)
+                preparator = self.createActor(TrackPreparator, targetActorRequirements=load_driver_requirements(host))
+                self.send(preparator, PrepareTrack(host, self.config, current_track))
+        else:
+            self.start_load_generators()
+
+    def track_prepared(self, msg):
+        self.prepared_load_driver_hosts.add(msg.host)
+        logger.info("[%d/%d] load driver hosts have prepared the track (most recent: [%s])." %
+                    (len(self.prepared_load_driver_hosts), len(self.load_driver_hosts), msg.host))
+        if len(self.prepared_load_driver_hosts) == len(self.load_driver_hosts):
+            self.start_load_generators()
+
+    def start_load_generators(self):
+        hosts = self.load_driver_hosts if self.load_driver_hosts else [None]
+        mode = self.config.opts("driver", "load.generator.mode", mandatory=False, default_value="process")
+        if mode == "async":
+            if sys.version_info < (3, 5):
+                raise exceptions.SystemSetupError("The load generator mode [async] requires Python 3.5 or later.")
+            # only import on demand as this module requires Python 3.5+
+            from esrally.driver import asyncdriver
+            max_workers = self.config.opts("driver", "load.generator.processes", mandatory=False, default_value=os.cpu_count())
+            allocations_per_worker = allocate_to_workers(self.allocations, max_workers * len(hosts))
+            logger.info("Running [%d] clients on [%d] asyncio based load generators." % (len(self.allocations), len(allocations_per_worker)))
+            for worker_id in range(len(allocations_per_worker)):
+                self.drivers.append(self.create_load_generator(asyncdriver.AsyncLoadGenerator, hosts, worker_id))
+            for worker_id, driver in enumerate(self.drivers):
+                self.send(driver, StartAsyncLoadGenerator(worker_id, self.config, self.track, allocations_per_worker[worker_id]))
+        elif mode == "process":
+            for client_id in range(len(self.allocations)):
+                self.drivers.append(self.create_load_generator(LoadGenerator, hosts, client_id))
+            for client_id, driver in enumerate(self.drivers):
+                self.send(driver, StartLoadGenerator(client_id, self.config, self.track, self.allocations[client_id]))
+        else:
+            raise exceptions.SystemSetupError("Unknown load generator mode [%s]" % mode)
 
         self.update_progress_message()
         self.wakeupAfter(datetime.timedelta(seconds=Driver.WAKEUP_INTERVAL_SECONDS))
 
+    def create_load_generator(self, load_generator_class, hosts, idx):
+        # distribute load generators round-robin across all hosts
+        host = hosts[idx % len(hosts)]
+        if host:
+            logger.info("Starting load generator [%d] on load driver host [%s]." % (idx, host))
+        return self.createActor(load_generator_class, targetActorRequirements=load_driver_requirements(host))
+
     def joinpoint_reached(self, msg):
         self.currently_completed += 1
         self.clients_completed_current_step[msg.client_id] = (msg.client_local_timestamp, time.perf_counter())
+        self.new_connections_current_step.update(msg.new_connections)
+        for op, stats in msg.compression.items():
+            self.compression_current_step.setdefault(op, collections.Counter()).update(stats)
         logger.debug("[%d/%d] drivers reached join point [%d/%d]." %
                      (self.currently_completed, len(self.drivers), self.current_step + 1, self.number_of_steps))
         if self.currently_completed == len(self.drivers):
@@ -210,9 +357,23 @@ class Driver(thespian.actors.Actor):
             clients_curr_step = self.clients_completed_current_step
             self.clients_completed_current_step = {}
             self.update_progress_message(task_finished=True)
+            self.store_new_connections()
+            self.store_compression_stats()
             # clear per step
             self.most_recent_sample_per_client = {}
-            self.current_step += 1
+            next_probe = self.saturation_search.next_probe(self.raw_samples, self.aggregates) if self.saturation_search else None
+            repeat_step = next_probe is not None
+            if repeat_step:
+                logger.info("Repeating step [%d/%d] with [%s]." % (self.current_step + 1, self.number_of_steps, next_probe))
+            else:
+                if self.saturation_search:
+                    self.store_saturation_search_result()
+                    self.saturation_search = None
+                self.current_step += 1
+                next_task = None if self.finished() else self.saturation_task(self.current_step)
+                if next_task:
+                    self.saturation_search = saturation.ThroughputSearch(next_task)
+                    next_probe = self.saturation_search.probe
             if self.finished():
                 logger.info("All steps completed. Shutting down")
                 # we're done here
@@ -233,30 +394,99 @@ class Driver(thespian.actors.Actor):
                     client_start_timestamp = client_ended_task_at + (start_next_task - master_received_msg_at)
                     logger.info("Scheduling next task for client id [%d] at their timestamp [%f] (master timestamp [%f])" %
                                 (client_id, client_start_timestamp, start_next_task))
-                    self.send(driver, Drive(client_start_timestamp))
+                    self.send(driver, Drive(client_start_timestamp, repeat_step, next_probe))
 
     def finished(self):
         return self.current_step == self.number_of_steps
 
+    def saturation_task(self, step):
+        for task in self.tasks_per_join_point[step]:
+            if task.saturation_search:
+                return task
+        return None
+
+    def store_saturation_search_result(self):
+        task = self.saturation_search.task
+        spec = task.saturation_search
+        max_throughput = self.saturation_search.max_sustainable_throughput
+        if max_throughput is None:
+            logger.warning("[%s] has not met its latency SLO in any of [%d] probes." % (task, len(self.saturation_search.results)))
+            console.println("\nNo sustainable throughput found for [%s]: The [%s]th percentile latency has been above [%s] ms in all "
+                            "probes." % (task.operation.name, spec.latency_percentile, spec.max_latency), logger=logger.info)
+        else:
+            logger.info("Maximum sustainable throughput of [%s] is [%s] ops/s." % (task, max_throughput))
+            self.metrics_store.put_value_cluster_level(name="max_sustainable_throughput", value=max_throughput, unit="ops/s",
+                                                       operation=task.operation.name, operation_type=task.operation.type,
+                                                       meta_data={
+                                                           "latency-percentile": spec.latency_percentile,
+                                                           "max-latency": spec.max_latency
+                                                       })
+
+    def store_new_connections(self):
+        for op, count in self.new_connections_current_step.items():
+            if count > 0:
+                logger.warning("Clients have opened [%d] new connections while executing [%s]." % (count, op))
+            self.metrics_store.put_count_cluster_level(name="new_connections", count=count, operation=op.name, operation_type=op.type)
+        self.new_connections_current_step = collections.Counter()
+
+    def store_compression_stats(self):
+        for op, stats in self.compression_current_step.items():
+            self.metrics_store.put_count_cluster_level(name="request_bytes_uncompressed", count=stats["uncompressed_bytes"], unit="byte",
+                                                       operation=op.name, operation_type=op.type)
+            self.metrics_store.put_count_cluster_level(name="request_bytes_compressed", count=stats["compressed_bytes"], unit="byte",
+                                                       operation=op.name, operation_type=op.type)
+            self.metrics_store.put_value_cluster_level(name="request_compression_time", value=stats["compression_time"], unit="s",
+                                                       operation=op.name, operation_type=op.type)
+        self.compression_current_step = {}
+
     def update_samples(self, msg):
-        self.raw_samples += msg.samples
-        if len(msg.samples) > 0:
-            most_recent = msg.samples[-1]
-            self.most_recent_sample_per_client[most_recent.client_id] = most_recent
+        samples = list(msg.samples)
+        self.raw_samples += samples
+        # a message may contain samples of multiple clients (if they run in the same load generator)
+        for sample in samples:
+            self.most_recent_sample_per_client[sample.client_id] = sample
+        if msg.samples.aggregates is not None:
+            # raw samples are only a subset of all samples in this case
+            self.throughput_calculator.merge(msg.samples.aggregates)
+            self.aggregates.merge(msg.samples.aggregates)
+            self.most_recent_sample_per_client.update(msg.samples.aggregates.most_recent_samples)
+        else:
+            self.throughput_calculator.add(msg.samples)
 
     def post_process_samples(self):
+        # param starvation is only interesting if parameters are prefetched; otherwise it is just the time needed to generate them
+        report_param_starvation = param_prefetch_size(self.config) > 0
         for sample in self.raw_samples:
             self.metrics_store.put_value_cluster_level(name="latency", value=sample.latency_ms, unit="ms", operation=sample.operation.name,
                                                        operation_type=sample.operation.type, sample_type=sample.sample_type,
-                                                       absolute_time=sample.absolute_time, relative_time=sample.relative_time)
+                                                       absolute_time=sample.absolute_time, relative_time=sample.relative_time,
+                                                       meta_data=sample.meta_data)
 
             self.metrics_store.put_value_cluster_level(name="service_time", value=sample.service_time_ms, unit="ms",
                                                        operation=sample.operation.name, operation_type=sample.operation.type,
                                                        sample_type=sample.sample_type, absolute_time=sample.absolute_time,
-                                                       relative_time=sample.relative_time)
-
-        aggregates = calculate_global_throughput(self.raw_samples)
-        for op, samples in aggregates.items():
+                                                       relative_time=sample.relative_time, meta_data=sample.meta_data)
+            if report_param_starvation:
+                self.metrics_store.put_value_cluster_level(name="param_starvation", value=sample.param_starvation_ms, unit="ms",
+                                                           operation=sample.operation.name, operation_type=sample.operation.type,
+                                                           sample_type=sample.sample_type, absolute_time=sample.absolute_time,
+                                                           relative_time=sample.relative_time, meta_data=sample.meta_data)
+            if sample.request_timings is not None:
+                for metric_name, value in zip(REQUEST_PHASE_METRICS, sample.request_timings):
+                    self.metrics_store.put_value_cluster_level(name=metric_name, value=value, unit="ms",
+                                                               operation=sample.operation.name, operation_type=sample.operation.type,
+                                                               sample_type=sample.sample_type, absolute_time=sample.absolute_time,
+                                                               relative_time=sample.relative_time, meta_data=sample.meta_data)
+
+        if self.aggregates is not None:
+            for (op_name, sample_type, metric_name, step), h in self.aggregates.histograms.items():
+                if metric_name == "param_starvation" and not report_param_starvation:
+                    continue
+                op = self.aggregates.operations[op_name]
+                self.metrics_store.put_histogram_cluster_level(name="%s_histogram" % metric_name, histogram=h, unit="ms",
+                                                               operation=op.name, operation_type=op.type, sample_type=sample_type,
+                                                               meta_data=dict(step))
+        for op, samples in self.throughput_calculator.calculate().items():
             for absolute_time, relative_time, sample_type, throughput, throughput_unit in samples:
                 self.metrics_store.put_value_cluster_level(name="throughput", value=throughput, unit=throughput_unit,
                                                            operation=op.name, operation_type=op.type, sample_type=sample_type,
@@ -265,6 +495,8 @@ class Driver(thespian.actors.Actor):
     def update_progress_message(self, task_finished=False):
         if not self.quiet and self.current_step >= 0:
             ops = ",".join([op.name for op in self.ops_per_join_point[self.current_step]])
+            if self.saturation_search:
+                ops = "%s (%s)" % (ops, self.saturation_search.probe)
 
             if task_finished:
                 total_progress = 1.0
@@ -276,6 +508,53 @@ class Driver(thespian.actors.Actor):
                 self.progress_reporter.finish()
 
 
+# Capability of an actor system that identifies it as a load driver host. Its value is "ip:admin port" of the actor system (see esrallyd).
+LOAD_DRIVER_HOST = "rally.load.driver.host"
+
+
+def load_driver_requirements(host):
+    """
+    :param host: A load driver host as "ip:admin port" or ``None`` for the local actor system.
+    :return: The actor requirements to create an actor on this host.
+    """
+    return {LOAD_DRIVER_HOST: host} if host else None
+
+
+def runs_on_load_driver_host(capabilities, requirements):
+    """
+    Capability check for actors that can run on load driver hosts.
+
+    :param capabilities: The capabilities of an actor system.
+    :param requirements: The actor requirements as created by ``load_driver_requirements``.
+    :return: ``True`` iff the actor system matches the requirements.
+    """
+    if not requirements or LOAD_DRIVER_HOST not in requirements:
+        return True
+    return capabilities.get(LOAD_DRIVER_HOST) == requirements[LOAD_DRIVER_HOST]
+
+
+class TrackPreparator(thespian.actors.Actor):
+    """
+    Prepares the track data on a load driver host.
+    """
+
+    @staticmethod
+    def actorSystemCapabilityCheck(capabilities, requirements):
+        return runs_on_load_driver_host(capabilities, requirements)
+
+    def receiveMessage(self, msg, sender):
+        if isinstance(msg, PrepareTrack):
+            try:
+                logger.info("Preparing track [%s] on load driver host [%s]." % (msg.track, msg.host))
+                track.prepare_track(msg.track, msg.config)
+                self.send(sender, TrackPrepared(msg.host))
+            except Exception as e:
+                logger.exception("Could not prepare track [%s] on load driver host [%s]." % (msg.track, msg.host))
+                self.send(sender, BenchmarkFailure("Could not prepare track on load driver host [%s]" % msg.host, e))
+            finally:
+                self.send(self.myAddress, thespian.actors.ActorExitRequest())
+
+
 class LoadGenerator(thespian.actors.Actor):
     """
     The actual driver that applies load against the cluster.
@@ -285,6 +564,10 @@ class LoadGenerator(thespian.actors.Actor):
 
     WAKEUP_INTERVAL_SECONDS = 5
 
+    @staticmethod
+    def actorSystemCapabilityCheck(capabilities, requirements):
+        return runs_on_load_driver_host(capabilities, requirements)
+
     def __init__(self):
         super().__init__()
         self.master = None
@@ -294,11 +577,25 @@ class LoadGenerator(thespian.actors.Actor):
         self.track = None
         self.tasks = None
         self.current_task = 0
+        # index of the first task of the current step
+        self.step_start = 0
+        self.probe = None
         self.start_timestamp = None
         self.pool = concurrent.futures.ThreadPoolExecutor(max_workers=1)
         self.executor_future = None
         self.sampler = None
+        self.sample_buffer = None
         self.start_driving = False
+        # parameter sources of the tasks in the next step if parameters are preloaded
+        self.preloaded = {}
+        # the operation that is currently executed and the number of connections that the client had opened (and the request bytes that
+        # it had compressed) before it has started
+        self.running_operation = None
+        self.connections_before_operation = 0
+        self.compression_before_operation = collections.Counter()
+        # number of connections that have been opened and request body compression stats per operation in the current step
+        self.new_connections = collections.Counter()
+        self.compression = {}
 
     def receiveMessage(self, msg, sender):
         try:
@@ -306,20 +603,26 @@ class LoadGenerator(thespian.actors.Actor):
                 logger.debug("client [%d] is about to start." % msg.client_id)
                 self.master = sender
                 self.client_id = msg.client_id
-                self.es = client.EsClientFactory(msg.config.opts("client", "hosts"), msg.config.opts("client", "options")).create()
                 self.config = msg.config
                 self.track = msg.track
                 self.tasks = msg.tasks
+                self.es = create_client(self.config, max_concurrent_requests([t for t in self.tasks if isinstance(t, track.Task)]))
+                self.sample_buffer = create_sample_buffer(self.config)
                 self.current_task = 0
                 self.start_timestamp = time.perf_counter()
-                track.load_track_plugins(self.config, runner.register_runner)
+                track.load_track_plugins(self.config, runner.register_runner, scheduler.register_scheduler)
                 self.drive()
             elif isinstance(msg, Drive):
                 logger.debug("Client [%d] is continuing its work at task index [%d] on [%f]." %
                              (self.client_id, self.current_task, msg.client_start_timestamp))
                 self.master = sender
                 self.start_driving = True
-                self.wakeupAfter(datetime.timedelta(seconds=time.perf_counter() - msg.client_start_timestamp))
+                self.step_start, self.current_task = next_step_start(self.step_start, self.current_task, msg.repeat_step)
+                if msg.repeat_step:
+                    # parameters have been preloaded for the step after the repeated one
+                    self.preloaded = {}
+                self.probe = msg.probe
+                self.wakeupAfter(datetime.timedelta(seconds=max(msg.client_start_timestamp - time.perf_counter(), 0)))
             elif isinstance(msg, thespian.actors.WakeupMessage):
                 logger.debug("client [%d] woke up." % self.client_id)
                 # it would be better if we could send ourselves a message at a specific time, simulate this with a boolean...
@@ -344,6 +647,13 @@ class LoadGenerator(thespian.actors.Actor):
             self.send(self.master, BenchmarkFailure("Fatal error in load generator [%d]" % self.client_id, e))
 
     def drive(self):
+        if self.running_operation:
+            self.new_connections[self.running_operation] += client.opened_connections(self.es) - self.connections_before_operation
+            compression = client.compression_stats(self.es)
+            if compression:
+                compression.subtract(self.compression_before_operation)
+                self.compression.setdefault(self.running_operation, collections.Counter()).update(compression)
+            self.running_operation = None
         task = None
         # skip non-tasks in the task list
         while task is None:
@@ -358,12 +668,33 @@ class LoadGenerator(thespian.actors.Actor):
             self.send_samples()
             self.executor_future = None
             self.sampler = None
-            self.send(self.master, JoinPointReached(self.client_id, task))
+            next_tasks = tasks_of_next_step(self.tasks, self.current_task)
+            memory_budget_bytes = preload_memory_budget(self.config)
+            if memory_budget_bytes > 0:
+                # preload before we report the join point so it does not count towards the next step
+                self.preloaded = preload_params(self.track, next_tasks, self.client_id, memory_budget_bytes,
+                                                precompress_bodies(self.config))
+            if next_tasks:
+                warmup_connections(self.config, self.es, max_concurrent_requests(next_tasks))
+            self.send(self.master, JoinPointReached(self.client_id, task, self.new_connections, self.compression))
+            self.new_connections = collections.Counter()
+            self.compression = {}
         elif isinstance(task, track.Task):
             logger.info("Client [%d] is executing [%s]." % (self.client_id, task))
-            self.sampler = Sampler(self.client_id, task.operation, self.start_timestamp)
-            schedule = schedule_for(self.track, task, self.client_id)
-            self.executor_future = self.pool.submit(execute_schedule, schedule, self.es, self.sampler)
+            if runner.is_async(runner.runner_for(task.operation.type)):
+                raise exceptions.SystemSetupError("The runner for operation type [%s] is a coroutine. Please run Rally with "
+                                                  "--load-generator-mode=async." % task.operation.type)
+            self.sampler = Sampler(self.client_id, task.operation, self.start_timestamp, self.sample_buffer)
+            schedule = schedule_for(self.track, task, self.client_id, self.probe, param_prefetch_size(self.config),
+                                    self.preloaded.pop(task, None), precompress_bodies(self.config))
+            self.running_operation = task.operation
+            self.connections_before_operation = client.opened_connections(self.es)
+            self.compression_before_operation = client.compression_stats(self.es)
+            if task.open_loop:
+                self.executor_future = self.pool.submit(execute_schedule_open_loop, schedule, self.es, self.sampler, task.max_in_flight,
+                                                        request_timings(self.config))
+            else:
+                self.executor_future = self.pool.submit(execute_schedule, schedule, self.es, self.sampler, request_timings(self.config))
             self.wakeupAfter(datetime.timedelta(seconds=LoadGenerator.WAKEUP_INTERVAL_SECONDS))
         else:
             raise exceptions.RallyAssertionError("Unknown task type [%s]" % type(task))
@@ -371,7 +702,7 @@ class LoadGenerator(thespian.actors.Actor):
     def send_samples(self):
         if self.sampler:
             samples = self.sampler.samples
-            if len(samples) > 0:
+            if not samples.empty:
                 self.send(self.master, UpdateSamples(self.client_id, samples))
 
 
@@ -380,34 +711,646 @@ class Sampler:
     Encapsulates management of gathered samples.
     """
 
-    def __init__(self, client_id, operation, start_timestamp):
+    def __init__(self, client_id, operation, start_timestamp, buffer=None):
+        """
+        :param client_id: The id of the client that gathers samples.
+        :param operation: The operation for which samples are gathered.
+        :param start_timestamp: The start timestamp of the load generator (used to calculate the relative time of samples).
+        :param buffer: A ``SampleBuffer``. It can be shared by multiple samplers. Optional, a sampler uses its own buffer by default.
+        """
         self.client_id = client_id
         self.operation = operation
         self.start_timestamp = start_timestamp
-        self.q = queue.Queue(maxsize=1024)
+        self.buffer = buffer if buffer is not None else SampleBuffer()
 
-    def add(self, sample_type, latency_ms, service_time_ms, total_ops, total_ops_unit, time_period, curr_iteration, total_iterations):
-        try:
-            self.q.put_nowait(Sample(self.client_id, time.time(), time.perf_counter() - self.start_timestamp, self.operation,
-                                     sample_type, latency_ms, service_time_ms, total_ops, total_ops_unit, time_period, curr_iteration,
-                                     total_iterations))
-        except queue.Full:
-            logger.warn("Dropping sample for [%s] due to a full sampling queue." % self.operation.name)
+    def add(self, sample_type, latency_ms, service_time_ms, total_ops, total_ops_unit, time_period, curr_iteration, total_iterations,
+            meta_data=None, param_starvation_ms=0, request_timings=None):
+        """
+        Adds a sample. See ``Sample`` for the parameters. ``request_timings`` are ``client.RequestTimings`` (in seconds) here. Optional.
+        """
+        if request_timings is not None:
+            request_timings = tuple(convert.seconds_to_ms(t) for t in request_timings.as_tuple())
+        self.buffer.add(self.client_id, time.time(), time.perf_counter() - self.start_timestamp, self.operation, sample_type, latency_ms,
+                        service_time_ms, total_ops, total_ops_unit, time_period, curr_iteration, total_iterations, meta_data,
+                        param_starvation_ms, request_timings)
 
     @property
     def samples(self):
-        samples = []
+        """
+        :return: A ``SampleBatch`` with all samples that have been gathered since the last call.
+        """
+        return self.buffer.swap()
+
+
+def create_sample_buffer(config):
+    """
+    :param config: Rally internal configuration object.
+    :return: A ``SampleBuffer`` according to the configured sample aggregation mode.
+    """
+    aggregation = config.opts("driver", "sample.aggregation", mandatory=False, default_value="raw")
+    if aggregation == "raw":
+        return SampleBuffer()
+    elif aggregation == "histogram":
+        return SampleBuffer(aggregate=True, raw_sample_ratio=config.opts("driver", "raw.sample.ratio", mandatory=False, default_value=0),
+                            bucket_interval_secs=config.opts("driver", "throughput.bucket.interval", mandatory=False, default_value=1))
+    else:
+        raise exceptions.SystemSetupError("Unknown sample aggregation mode [%s]" % aggregation)
+
+
+def param_prefetch_size(config):
+    """
+    :param config: Rally internal configuration object.
+    :return: The number of parameters that each client generates ahead of time (0 if parameters are not prefetched).
+    """
+    return config.opts("driver", "param.prefetch.size", mandatory=False, default_value=0)
+
+
+def request_timings(config):
+    """
+    :param config: The current config.
+    :return: ``True`` iff samples should contain the time that their requests have spent in each phase.
+    """
+    return config.opts("driver", "request.timings", mandatory=False, default_value=False)
+
+
+def preload_memory_budget(config):
+    """
+    :param config: Rally internal configuration object.
+    :return: The number of bytes that each client may use to preload its parameters for a task (0 if parameters are not preloaded).
+    """
+    if config.opts("driver", "preload.params", mandatory=False, default_value=False):
+        return config.opts("driver", "preload.memory.budget", mandatory=False, default_value=1024) * 1024 * 1024
+    else:
+        return 0
+
+
+def precompress_bodies(config):
+    """
+    :param config: The current config.
+    :return: ``True`` iff parameter sources should compress request bodies before requests are issued.
+    """
+    if not config.opts("driver", "precompress.bodies", mandatory=False, default_value=False):
+        return False
+    if not config.opts("client", "options").get("compressed", False):
+        raise exceptions.SystemSetupError("Request bodies can only be precompressed with the client option 'compressed:true'.")
+    return True
+
+
+def preload_params(current_track, tasks, client_index, memory_budget_bytes, precompress=False):
+    """
+    Generates all parameters of a client for the given tasks in advance (i.e. before the client reaches the join point that starts these
+    tasks) so the client does not need to read data files while it executes the tasks.
+
+    :param current_track: The current track.
+    :param tasks: The tasks that the client will execute in the next step.
+    :param client_index: The current client index.
+    :param memory_budget_bytes: The maximum number of bytes that the parameters of all these tasks may use.
+    :param precompress: ``True`` iff request bodies should be compressed while they are preloaded. Default: ``False``.
+    :return: A dict mapping tasks to ``PreloadedParamSource`` instances. Tasks whose parameters exceed the (remaining) memory budget or
+             which cannot be preloaded are missing. The client generates their parameters while it executes the task instead.
+    """
+    preloaded = {}
+    remaining_budget_bytes = memory_budget_bytes
+    for task in tasks:
+        start = time.perf_counter()
+        param_source = track.operation_parameters(current_track, task.operation).partition(client_index, task.clients)
+        if precompress:
+            param_source = track.CompressingParamSource(param_source)
+        preloaded_param_source = track.preload_params(param_source, remaining_budget_bytes)
+        end = time.perf_counter()
+        if preloaded_param_source:
+            logger.info("Client [%d] has preloaded [%d] parameters ([%d] bytes) for [%s] in [%f] seconds." %
+                        (client_index, preloaded_param_source.size(), preloaded_param_source.size_in_bytes, task, end - start))
+            remaining_budget_bytes -= preloaded_param_source.size_in_bytes
+            preloaded[task] = preloaded_param_source
+        else:
+            logger.warning("Client [%d] streams parameters for [%s]. They either exceed the remaining memory budget of [%d] bytes or "
+                           "cannot be preloaded." % (client_index, task, remaining_budget_bytes))
+    return preloaded
+
+
+def max_concurrent_requests(tasks):
+    """
+    :param tasks: Tasks of a client.
+    :return: The maximum number of requests that the client issues concurrently in any of these tasks.
+    """
+    return max([t.max_in_flight if t.open_loop else 1 for t in tasks], default=1)
+
+
+def create_client(config, connections_per_host):
+    """
+    Creates an Elasticsearch client for load generators. With the lean transport, requests of the built-in runners bypass the
+    Elasticsearch client.
+
+    :param config: The current config.
+    :param connections_per_host: The number of connections per host that the client needs. It is ignored if the user has specified the
+                                 client option ``maxsize``.
+    :return: An Elasticsearch client.
+    """
+    client_options = dict(config.opts("client", "options"))
+    if "maxsize" not in client_options:
+        client_options["maxsize"] = connections_per_host
+    es = client.EsClientFactory(config.opts("client", "hosts"), client_options).create()
+    if config.opts("driver", "transport", mandatory=False, default_value="default") == "lean":
+        return client.LeanClient(es)
+    return es
+
+
+def warmup_connections(config, es, connections_per_host):
+    """
+    Opens the connections that a load generator needs for its next tasks so they are established before the tasks start.
+
+    :param config: The current config.
+    :param es: The Elasticsearch client of the load generator.
+    :param connections_per_host: The number of connections per host that the next tasks need.
+    """
+    if not config.opts("driver", "connection.warmup", mandatory=False, default_value=True):
+        return
+    start = time.perf_counter()
+    opened_before = client.opened_connections(es)
+    healthy = client.warmup_connections(es, connections_per_host)
+    end = time.perf_counter()
+    logger.info("Opened [%d] connections (of which [%d] are healthy) in [%f] seconds." %
+                (client.opened_connections(es) - opened_before, healthy, end - start))
+
+
+def tasks_of_next_step(tasks, current_task):
+    """
+    :param tasks: All tasks (and join points) of a client.
+    :param current_task: The index of the first task after a join point.
+    :return: All tasks of the client until the next join point.
+    """
+    next_tasks = []
+    for task in tasks[current_task:]:
+        if isinstance(task, JoinPoint):
+            break
+        elif task is not None:
+            next_tasks.append(task)
+    return next_tasks
+
+
+class SampleBuffer:
+    """
+    Collects samples in a ``SampleBatch``. It is safe to add samples from multiple threads. Samples are never dropped; instead, the
+    buffer grows until its current batch is swapped for an empty one.
+    """
+
+    def __init__(self, aggregate=False, raw_sample_ratio=1.0, bucket_interval_secs=1):
+        """
+        :param aggregate: If ``True``, all samples are aggregated in mergeable histograms and throughput buckets (see ``Aggregates``).
+        :param raw_sample_ratio: The ratio of samples that is additionally retained as raw samples if ``aggregate`` is ``True``. For
+                                 example, 0.01 retains every 100th sample and 0 retains none. Raw samples are always retained otherwise.
+        :param bucket_interval_secs: The width of a throughput bucket in seconds if ``aggregate`` is ``True``. Default: 1.
+        """
+        self.lock = threading.Lock()
+        self.aggregate = aggregate
+        self.bucket_interval_secs = bucket_interval_secs
+        if aggregate:
+            self.raw_sample_interval = int(round(1 / raw_sample_ratio)) if raw_sample_ratio > 0 else None
+        else:
+            self.raw_sample_interval = 1
+        self.samples_added = 0
+        self.batch = self._new_batch()
+
+    def _new_batch(self):
+        return SampleBatch(Aggregates(self.bucket_interval_secs) if self.aggregate else None)
+
+    def add(self, *args):
+        with self.lock:
+            if self.batch.aggregates is not None:
+                self.batch.aggregates.add(*args)
+            if self.raw_sample_interval and self.samples_added % self.raw_sample_interval == 0:
+                self.batch.add(*args)
+            self.samples_added += 1
+
+    def swap(self):
+        """
+        :return: All samples that have been added since the last call. They are removed from this buffer.
+        """
+        with self.lock:
+            batch = self.batch
+            self.batch = self._new_batch()
+        return batch
+
+
+class SampleBatch:
+    """
+    Stores samples compactly in a single binary buffer with a fixed record layout. Operations, units and meta data are stored only once
+    per batch and records reference them by index. Iterating over a batch yields ``Sample`` objects.
+    """
+    # client id, absolute time, relative time, sample type, latency, service time, total ops, time period, current iteration, total
+    # iterations, operation index, unit index, meta data index (-1 if there is no meta data), param starvation, request timings index (-1
+    # if there are no request timings)
+    RECORD = struct.Struct("<IddBddddQQHHidi")
+    # the same record layout for NumPy
+    RECORD_FIELDS = [("client_id", "<u4"), ("absolute_time", "<f8"), ("relative_time", "<f8"), ("sample_type", "u1"),
+                     ("latency_ms", "<f8"), ("service_time_ms", "<f8"), ("total_ops", "<f8"), ("time_period", "<f8"),
+                     ("curr_iteration", "<u8"), ("total_iterations", "<u8"), ("operation", "<u2"), ("unit", "<u2"),
+                     ("meta_data", "<i4"), ("param_starvation_ms", "<f8"), ("request_timings", "<i4")]
+    # request timings (in ms) are optional so they are stored separately, one value per phase (see ``client.REQUEST_PHASES``)
+    REQUEST_TIMINGS = struct.Struct("<ddddd")
+
+    def __init__(self, aggregates=None):
+        """
+        :param aggregates: Aggregates of all samples of this batch (see ``SampleBuffer``). Optional.
+        """
+        self.aggregates = aggregates
+        self.data = bytearray()
+        self.request_timings = bytearray()
+        self.operations = []
+        self.units = []
+        self.meta_data = []
+        self._operation_indices = {}
+        self._unit_indices = {}
+        self._meta_data_indices = {}
+
+    def add(self, client_id, absolute_time, relative_time, operation, sample_type, latency_ms, service_time_ms, total_ops,
+            total_ops_unit, time_period, curr_iteration, total_iterations, meta_data=None, param_starvation_ms=0, request_timings=None):
+        if request_timings is None:
+            request_timings_idx = -1
+        else:
+            request_timings_idx = len(self.request_timings) // SampleBatch.REQUEST_TIMINGS.size
+            self.request_timings += SampleBatch.REQUEST_TIMINGS.pack(*request_timings)
+        self.data += SampleBatch.RECORD.pack(client_id, absolute_time, relative_time, sample_type, latency_ms, service_time_ms,
+                                             total_ops, time_period, curr_iteration, total_iterations,
+                                             self._intern(operation.name, operation, self.operations, self._operation_indices),
+                                             self._intern(total_ops_unit, total_ops_unit, self.units, self._unit_indices),
+                                             self._intern_meta_data(meta_data), param_starvation_ms, request_timings_idx)
+
+    @staticmethod
+    def _intern(key, value, values, indices):
+        idx = indices.get(key)
+        if idx is None:
+            idx = len(values)
+            values.append(value)
+            indices[key] = idx
+        return idx
+
+    def _intern_meta_data(self, meta_data):
+        if meta_data is None:
+            return -1
         try:
-            while True:
-                samples.append(self.q.get_nowait())
-        except queue.Empty:
-            pass
-        return samples
+            key = tuple(sorted(meta_data.items()))
+            hash(key)
+        except TypeError:
+            # not hashable, just store it
+            self.meta_data.append(meta_data)
+            return len(self.meta_data) - 1
+        return self._intern(key, meta_data, self.meta_data, self._meta_data_indices)
+
+    def __len__(self):
+        """
+        :return: The number of raw samples in this batch.
+        """
+        return len(self.data) // SampleBatch.RECORD.size
+
+    @property
+    def empty(self):
+        return len(self) == 0 and (self.aggregates is None or len(self.aggregates) == 0)
+
+    def records(self):
+        """
+        :return: All raw samples of this batch as a NumPy structured array (with the fields in ``RECORD_FIELDS``). Requires NumPy.
+        """
+        return numpy.frombuffer(bytes(self.data), dtype=numpy.dtype(SampleBatch.RECORD_FIELDS))
+
+    def __iter__(self):
+        for client_id, absolute_time, relative_time, sample_type, latency_ms, service_time_ms, total_ops, time_period, curr_iteration, \
+                total_iterations, op_idx, unit_idx, meta_data_idx, param_starvation_ms, request_timings_idx in \
+                SampleBatch.RECORD.iter_unpack(self.data):
+            if request_timings_idx >= 0:
+                request_timings = SampleBatch.REQUEST_TIMINGS.unpack_from(self.request_timings,
+                                                                          request_timings_idx * SampleBatch.REQUEST_TIMINGS.size)
+            else:
+                request_timings = None
+            yield Sample(client_id, absolute_time, relative_time, self.operations[op_idx], metrics.SampleType(sample_type), latency_ms,
+                         service_time_ms, _as_number(total_ops), self.units[unit_idx], time_period, curr_iteration, total_iterations,
+                         self.meta_data[meta_data_idx] if meta_data_idx >= 0 else None, param_starvation_ms, request_timings)
+
+    def __getstate__(self):
+        # the lookup tables are only needed while adding samples
+        return {"data": bytes(self.data), "request_timings": bytes(self.request_timings), "operations": self.operations,
+                "units": self.units, "meta_data": self.meta_data, "aggregates": self.aggregates}
+
+    def __setstate__(self, state):
+        self.__init__(state["aggregates"])
+        self.data = bytearray(state["data"])
+        self.request_timings = bytearray(state["request_timings"])
+        self.operations = state["operations"]
+        self.units = state["units"]
+        self.meta_data = state["meta_data"]
+
+
+def _as_number(v):
+    return int(v) if v == int(v) else v
+
+
+# metric names of the request phases (see ``client.REQUEST_PHASES``)
+REQUEST_PHASE_METRICS = ["request_%s" % phase for phase in client.REQUEST_PHASES]
+
+# samples are aggregated separately per value of these meta data keys (they identify parts of a task, e.g. a step of a throughput profile)
+STEP_META_DATA_KEYS = ["profile-step", "probe"]
+
+
+def step_of(meta_data):
+    """
+    :param meta_data: The meta data of a sample. May be ``None``.
+    :return: A hashable representation of all meta data that identify the part of a task to which a sample belongs.
+    """
+    if not meta_data:
+        return ()
+    return tuple((k, meta_data[k]) for k in STEP_META_DATA_KEYS if k in meta_data)
+
+
+class Aggregates:
+    """
+    Mergeable aggregates of samples: Latency, service time, param starvation and request phase histograms per operation, sample type and
+    step as well as throughput buckets per operation. In contrast to raw samples, their memory usage does not grow with the number of
+    samples.
+    """
+
+    def __init__(self, bucket_interval_secs=1):
+        """
+        :param bucket_interval_secs: The width of a throughput bucket in seconds. Default: 1.
+        """
+        self.bucket_interval_secs = bucket_interval_secs
+        self.operations = {}
+        # (operation name, sample type, metric name, step) -> histogram
+        self.histograms = {}
+        # (operation name, sample type, step) -> [absolute time of the first sample, absolute time of the last sample]
+        self.time_ranges = {}
+        # operation name -> ThroughputBuckets
+        self.throughput = {}
+        # client id -> parameters of the most recent sample of this client (needed for progress reporting)
+        self._most_recent_samples = {}
+        self.count = 0
+
+    def add(self, client_id, absolute_time, relative_time, operation, sample_type, latency_ms, service_time_ms, total_ops,
+            total_ops_unit, time_period, curr_iteration, total_iterations, meta_data=None, param_starvation_ms=0, request_timings=None):
+        step = step_of(meta_data)
+        self.operations[operation.name] = operation
+        self._histogram(operation.name, sample_type, "latency", step).record(latency_ms)
+        self._histogram(operation.name, sample_type, "service_time", step).record(service_time_ms)
+        self._histogram(operation.name, sample_type, "param_starvation", step).record(param_starvation_ms)
+        if request_timings is not None:
+            for metric_name, value in zip(REQUEST_PHASE_METRICS, request_timings):
+                self._histogram(operation.name, sample_type, metric_name, step).record(value)
+        self._update_time_range((operation.name, sample_type, step), absolute_time, absolute_time)
+        if operation.name not in self.throughput:
+            self.throughput[operation.name] = ThroughputBuckets(total_ops_unit, self.bucket_interval_secs)
+        self.throughput[operation.name].add(absolute_time, relative_time, sample_type, total_ops, time_period)
+        self._most_recent_samples[client_id] = (client_id, absolute_time, relative_time, operation, sample_type, latency_ms,
+                                                service_time_ms, total_ops, total_ops_unit, time_period, curr_iteration,
+                                                total_iterations, meta_data, param_starvation_ms, request_timings)
+        self.count += 1
+
+    def merge(self, other):
+        """
+        Adds all aggregates of another instance to this one.
+
+        :param other: Another ``Aggregates`` instance.
+        """
+        self.operations.update(other.operations)
+        for key, h in other.histograms.items():
+            if key in self.histograms:
+                self.histograms[key].merge(h)
+            else:
+                self.histograms[key] = h
+        for key, (first, last) in other.time_ranges.items():
+            self._update_time_range(key, first, last)
+        for op_name, buckets in other.throughput.items():
+            if op_name in self.throughput:
+                self.throughput[op_name].merge(buckets)
+            else:
+                self.throughput[op_name] = buckets
+        self._most_recent_samples.update(other._most_recent_samples)
+        self.count += other.count
+
+    @property
+    def most_recent_samples(self):
+        """
+        :return: A dict mapping each client id to its most recent sample.
+        """
+        return {client_id: Sample(*args) for client_id, args in self._most_recent_samples.items()}
+
+    def _histogram(self, operation_name, sample_type, metric_name, step):
+        key = (operation_name, sample_type, metric_name, step)
+        h = self.histograms.get(key)
+        if h is None:
+            h = histogram.Histogram()
+            self.histograms[key] = h
+        return h
+
+    def _update_time_range(self, key, first, last):
+        time_range = self.time_ranges.get(key)
+        if time_range is None:
+            self.time_ranges[key] = [first, last]
+        else:
+            time_range[0] = min(time_range[0], first)
+            time_range[1] = max(time_range[1], last)
+
+    def histogram_for(self, operation_name, sample_type, metric_name, meta_data=None):
+        """
+        :param operation_name: The name of an operation.
+        :param sample_type: A sample type.
+        :param metric_name: One of "latency", "service_time", "param_starvation" or a request phase (see ``REQUEST_PHASE_METRICS``).
+        :param meta_data: A dict of meta data that a step needs to match (e.g. ``{"probe": 3}``). Optional.
+        :return: A histogram of all matching samples or ``None`` if there are none.
+        """
+        result = None
+        for (op_name, st, name, step), h in self.histograms.items():
+            if op_name == operation_name and st == sample_type and name == metric_name and _matches(step, meta_data):
+                if result is None:
+                    result = histogram.Histogram(h.significant_digits, h.lowest_discernible_value)
+                result.merge(h)
+        return result
+
+    def time_range_for(self, operation_name, sample_type, meta_data=None):
+        """
+        :return: A pair of the absolute time of the first and the last matching sample or ``None`` if there are none. See
+                 ``histogram_for`` for the parameters.
+        """
+        result = None
+        for (op_name, st, step), (first, last) in self.time_ranges.items():
+            if op_name == operation_name and st == sample_type and _matches(step, meta_data):
+                result = (first, last) if result is None else (min(result[0], first), max(result[1], last))
+        return result
+
+    def __len__(self):
+        return self.count
+
+
+def _matches(step, meta_data):
+    if not meta_data:
+        return True
+    step = dict(step)
+    return all(k in step and step[k] == v for k, v in meta_data.items())
+
+
+class ThroughputBuckets:
+    """
+    Sums up the number of operations per time bucket so global throughput can be calculated without retaining raw samples.
+
+    Buckets are aligned to a fixed grid of absolute time so buckets of different load generators can be merged before the start of the
+    operation is known. Throughput is reported at the last sample of each bucket.
+    """
+
+    def __init__(self, unit, bucket_interval_secs=1):
+        self.unit = unit
+        self.bucket_interval_secs = bucket_interval_secs
+        self.start_time = None
+        # bucket -> [total ops, highest sample type, absolute time of the last sample, relative time of the last sample]
+        self.buckets = {}
+
+    def add(self, absolute_time, relative_time, sample_type, total_ops, time_period):
+        self._update_start_time(absolute_time - time_period)
+        self._add_to_bucket(absolute_time, total_ops, sample_type, absolute_time, relative_time)
+
+    def add_all(self, absolute_times, relative_times, sample_types, total_ops, time_periods):
+        """
+        Adds many samples at once. All parameters are NumPy arrays of equal length that contain one element per sample.
+        """
+        if len(absolute_times) == 0:
+            return
+        self._update_start_time(float((absolute_times - time_periods).min()))
+        order = numpy.argsort(absolute_times, kind="mergesort")
+        absolute_times = absolute_times[order]
+        buckets = numpy.floor(absolute_times / self.bucket_interval_secs)
+        # each bucket is a contiguous range of samples now
+        firsts = numpy.flatnonzero(numpy.r_[True, buckets[1:] != buckets[:-1]])
+        lasts = numpy.r_[firsts[1:], len(absolute_times)] - 1
+        ops_per_bucket = numpy.add.reduceat(total_ops[order], firsts)
+        sample_type_per_bucket = numpy.maximum.reduceat(sample_types[order], firsts)
+        for ops, sample_type, absolute_time, relative_time in zip(ops_per_bucket.tolist(), sample_type_per_bucket.tolist(),
+                                                                    absolute_times[lasts].tolist(), relative_times[order][lasts].tolist()):
+            self._add_to_bucket(absolute_time, _as_number(ops), metrics.SampleType(sample_type), absolute_time, relative_time)
+
+    def _update_start_time(self, start_time):
+        self.start_time = start_time if self.start_time is None else min(self.start_time, start_time)
+
+    def _add_to_bucket(self, time, total_ops, sample_type, absolute_time, relative_time):
+        bucket = int(time // self.bucket_interval_secs)
+        b = self.buckets.get(bucket)
+        if b is None:
+            self.buckets[bucket] = [total_ops, sample_type, absolute_time, relative_time]
+        else:
+            b[0] += total_ops
+            b[1] = max(b[1], sample_type)
+            # on ties, keep the sample that has been added last (like ``add_all``)
+            if absolute_time >= b[2]:
+                b[2] = absolute_time
+                b[3] = relative_time
+
+    def merge(self, other):
+        """
+        Adds the buckets of another instance to this one. If the bucket intervals differ, the other buckets are assigned to the bucket
+        of this instance that contains their last sample.
+        """
+        if other.start_time is not None:
+            self._update_start_time(other.start_time)
+        for total_ops, sample_type, absolute_time, relative_time in other.buckets.values():
+            self._add_to_bucket(absolute_time, total_ops, sample_type, absolute_time, relative_time)
+
+    def throughput(self, window_secs=None):
+        """
+        :param window_secs: If set, throughput is calculated over a sliding window of this many seconds instead of since the start of
+                            the task. It should be a multiple of the bucket interval.
+        :return: A list of throughput samples in the same format as ``calculate_global_throughput``.
+        """
+        result = []
+        total_count = 0
+        current_sample_type = None
+        buckets = sorted(self.buckets)
+        # index of the oldest bucket within the sliding window and the number of operations in the window
+        window_start = 0
+        window_count = 0
+        for bucket in buckets:
+            total_ops, sample_type, absolute_time, relative_time = self.buckets[bucket]
+            # once we have seen a new sample type, we stick to it.
+            if current_sample_type is None or current_sample_type < sample_type:
+                current_sample_type = sample_type
+            total_count += total_ops
+            interval = absolute_time - self.start_time
+            if window_secs:
+                window_count += total_ops
+                while buckets[window_start] <= bucket - window_secs / self.bucket_interval_secs:
+                    window_count -= self.buckets[buckets[window_start]][0]
+                    window_start += 1
+                count = window_count
+                interval = min(interval, window_secs)
+            else:
+                count = total_count
+            if interval > 0:
+                result.append((absolute_time, relative_time, current_sample_type, count / interval, "%s/s" % self.unit))
+        return result
+
+
+class ThroughputCalculator:
+    """
+    Calculates global throughput per operation incrementally while samples arrive instead of after the benchmark has finished.
+    """
+
+    def __init__(self, bucket_interval_secs=1, window_secs=None):
+        """
+        :param bucket_interval_secs: The width of a throughput bucket in seconds. Default: 1.
+        :param window_secs: If set, throughput is calculated over a sliding window of this many seconds. Otherwise, throughput is
+                            calculated since the start of each operation. Default: ``None``.
+        """
+        if window_secs is not None and window_secs < bucket_interval_secs:
+            raise exceptions.SystemSetupError("The throughput window [%s s] must not be smaller than the throughput bucket interval "
+                                              "[%s s]." % (window_secs, bucket_interval_secs))
+        self.bucket_interval_secs = bucket_interval_secs
+        self.window_secs = window_secs
+        self.operations = {}
+        # operation name -> ThroughputBuckets
+        self.buckets = {}
+
+    def _buckets(self, operation, unit):
+        b = self.buckets.get(operation.name)
+        if b is None:
+            self.operations[operation.name] = operation
+            b = ThroughputBuckets(unit, self.bucket_interval_secs)
+            self.buckets[operation.name] = b
+        return b
+
+    def add(self, batch):
+        """
+        :param batch: A ``SampleBatch``. Its raw samples are added to the throughput buckets of the respective operation.
+        """
+        if len(batch) == 0:
+            return
+        if numpy is not None:
+            records = batch.records()
+            op_indices = records["operation"]
+            for op_idx in numpy.unique(op_indices).tolist():
+                r = records[op_indices == op_idx]
+                self._buckets(batch.operations[op_idx], batch.units[int(r["unit"][0])]).add_all(
+                    r["absolute_time"], r["relative_time"], r["sample_type"], r["total_ops"], r["time_period"])
+        else:
+            for client_id, absolute_time, relative_time, sample_type, latency_ms, service_time_ms, total_ops, time_period, \
+                    curr_iteration, total_iterations, op_idx, unit_idx, meta_data_idx, _, _ in SampleBatch.RECORD.iter_unpack(batch.data):
+                self._buckets(batch.operations[op_idx], batch.units[unit_idx]).add(absolute_time, relative_time,
+                                                                                    metrics.SampleType(sample_type),
+                                                                                    _as_number(total_ops), time_period)
+
+    def merge(self, aggregates):
+        """
+        :param aggregates: ``Aggregates`` of a load generator. Their throughput buckets are merged.
+        """
+        for op_name, other in aggregates.throughput.items():
+            self._buckets(aggregates.operations[op_name], other.unit).merge(other)
+
+    def calculate(self):
+        """
+        :return: A dict mapping each operation to a list of throughput samples in the same format as ``calculate_global_throughput``.
+        """
+        return {self.operations[op_name]: buckets.throughput(self.window_secs) for op_name, buckets in self.buckets.items()}
 
 
 class Sample:
     def __init__(self, client_id, absolute_time, relative_time, operation, sample_type, latency_ms, service_time_ms, total_ops,
-                 total_ops_unit, time_period, curr_iteration, total_iterations):
+                 total_ops_unit, time_period, curr_iteration, total_iterations, meta_data=None, param_starvation_ms=0,
+                 request_timings=None):
         self.client_id = client_id
         self.absolute_time = absolute_time
         self.relative_time = relative_time
@@ -420,10 +1363,16 @@ class Sample:
         self.time_period = time_period
         self.curr_iteration = curr_iteration
         self.total_iterations = total_iterations
+        # additional meta data for this sample, e.g. the target throughput at the time the request has been issued
+        self.meta_data = meta_data
+        # time that the client has waited for the parameters of this request
+        self.param_starvation_ms = param_starvation_ms
+        # time in ms that all requests of this sample have spent in each phase (see ``client.REQUEST_PHASES``) or None if not recorded
+        self.request_timings = request_timings
 
     @property
     def percent_completed(self):
-        return self.curr_iteration / self.total_iterations
+        return min(self.curr_iteration / self.total_iterations, 1.0)
 
 
 def select_challenge(config, t):
@@ -516,72 +1465,96 @@ def _do_wait(es, es_version, expected_cluster_status):
     raise exceptions.RallyAssertionError(msg)
 
 
-def calculate_global_throughput(samples, bucket_interval_secs=1):
+def calculate_global_throughput(samples, bucket_interval_secs=1, window_secs=None):
     """
     Calculates global throughput based on samples gathered from multiple load generators.
 
+    The result is the same as if the samples had been added incrementally with a ``ThroughputCalculator``: Buckets are aligned to a fixed
+    grid of absolute time and for each operation, one throughput sample is emitted per bucket, namely for the last sample within this
+    bucket.
+
     :param samples: A list containing all samples from all load generators.
     :param bucket_interval_secs: The bucket interval for aggregations.
+    :param window_secs: If set, throughput is calculated over a sliding window of this many seconds instead of since the start of each
+                        operation. Default: ``None``.
     :return: A global view of throughput samples.
     """
-    samples_per_op = {}
-    # first we group all warmup / measurement samples by operation.
+    if numpy is not None:
+        return _calculate_global_throughput_vectorized(samples, bucket_interval_secs, window_secs)
+    else:
+        return _calculate_global_throughput(samples, bucket_interval_secs, window_secs)
+
+
+def _calculate_global_throughput(samples, bucket_interval_secs=1, window_secs=None):
+    buckets_per_op = {}
     for sample in samples:
-        k = sample.operation
-        if k not in samples_per_op:
-            samples_per_op[k] = []
-        samples_per_op[k].append(sample)
+        buckets = buckets_per_op.get(sample.operation)
+        if buckets is None:
+            buckets = ThroughputBuckets(sample.total_ops_unit, bucket_interval_secs)
+            buckets_per_op[sample.operation] = buckets
+        buckets.add(sample.absolute_time, sample.relative_time, sample.sample_type, sample.total_ops, sample.time_period)
+    return {op: buckets.throughput(window_secs) for op, buckets in buckets_per_op.items()}
+
+
+def _calculate_global_throughput_vectorized(samples, bucket_interval_secs=1, window_secs=None):
+    # same as _calculate_global_throughput but it adds all samples of an operation at once
+    n = len(samples)
+    # operations are compared by name but hashing them is slow so we group samples by object identity first
+    op_ids = numpy.fromiter((id(s.operation) for s in samples), numpy.uint64, count=n)
+    _, first_sample_per_id, id_per_sample = numpy.unique(op_ids, return_index=True, return_inverse=True)
+    op_indices = {}
+    op_per_id = [op_indices.setdefault(samples[i].operation, len(op_indices)) for i in first_sample_per_id.tolist()]
+    op_per_sample = numpy.array(op_per_id, dtype=numpy.int64)[id_per_sample.reshape(-1)]
+    absolute_times = numpy.fromiter((s.absolute_time for s in samples), numpy.float64, count=n)
+    relative_times = numpy.fromiter((s.relative_time for s in samples), numpy.float64, count=n)
+    sample_types = numpy.fromiter((s.sample_type for s in samples), numpy.int64, count=n)
+    total_ops = numpy.fromiter((s.total_ops for s in samples), numpy.float64, count=n)
+    time_periods = numpy.fromiter((s.time_period for s in samples), numpy.float64, count=n)
 
     global_throughput = {}
-    # with open("raw_samples.csv", "w") as sample_log:
-    #    print("client_id,absolute_time,relative_time,operation,sample_type,total_ops,time_period", file=sample_log)
-    for k, v in samples_per_op.items():
-        op = k
-        if op not in global_throughput:
-            global_throughput[op] = []
-        # sort all samples by time
-        current_samples = sorted(v, key=lambda s: s.absolute_time)
+    for op_idx, op in enumerate(op_indices):
+        selected = numpy.flatnonzero(op_per_sample == op_idx)
+        buckets = ThroughputBuckets(samples[int(selected[0])].total_ops_unit, bucket_interval_secs)
+        buckets.add_all(absolute_times[selected], relative_times[selected], sample_types[selected], total_ops[selected],
+                        time_periods[selected])
+        global_throughput[op] = buckets.throughput(window_secs)
+    return global_throughput
 
-        total_count = 0
-        interval = 0
-        current_bucket = 0
-        current_sample_type = current_samples[0].sample_type
-        start_time = current_samples[0].absolute_time - current_samples[0].time_period
-        for sample in current_samples:
-            # print("%d,%f,%f,%s,%s,%d,%f" %
-            # (sample.client_id, sample.absolute_time, sample.relative_time, sample.operation, sample.sample_type,
-            #  sample.total_ops, sample.time_period), file=sample_log)
 
-            # once we have seen a new sample type, we stick to it.
-            if current_sample_type < sample.sample_type:
-                current_sample_type = sample.sample_type
-
-            total_count += sample.total_ops
-            interval = max(sample.absolute_time - start_time, interval)
-
-            # avoid division by zero
-            if interval > 0 and interval >= current_bucket:
-                current_bucket = int(interval) + bucket_interval_secs
-                throughput = (total_count / interval)
-                # we calculate throughput per second
-                global_throughput[op].append(
-                    (sample.absolute_time, sample.relative_time, current_sample_type, throughput, "%s/s" % sample.total_ops_unit))
-    return global_throughput
+def with_param_wait_time(schedule):
+    """
+    Measures how long a client waits for each element of a schedule. This is mostly the time that is needed to generate (or, if
+    parameters are prefetched, to wait for) the parameters of the next request.
 
+    :param schedule: The schedule for an operation.
+    :return: A generator of pairs of the wait time in seconds and the respective schedule element.
+    """
+    it = iter(schedule)
+    while True:
+        start = time.perf_counter()
+        try:
+            element = next(it)
+        except StopIteration:
+            return
+        yield time.perf_counter() - start, element
 
-def execute_schedule(schedule, es, sampler):
+
+def execute_schedule(schedule, es, sampler, request_timings=False):
     """
     Executes tasks according to the schedule for a given operation.
 
     :param schedule: The schedule for this operation.
     :param es: Elasticsearch client that will be used to execute the operation.
     :param sampler: A container to store raw samples.
+    :param request_timings: ``True`` iff each sample should contain the time that its requests have spent in each phase. Default:
+                            ``False``.
     """
     total_start = time.perf_counter()
     curr_total_it = 1
     # noinspection PyBroadException
     try:
-        for expected_scheduled_time, sample_type_calculator, curr_iteration, total_it_for_task, runner, params in schedule:
+        for param_wait_time, (expected_scheduled_time, sample_type_calculator, curr_iteration, total_it_for_task, runner, params,
+                              meta_data) in with_param_wait_time(schedule):
             sample_type = sample_type_calculator(total_start)
             absolute_expected_schedule_time = total_start + expected_scheduled_time
             throughput_throttled = expected_scheduled_time > 0
@@ -589,6 +1562,8 @@ def execute_schedule(schedule, es, sampler):
                 rest = absolute_expected_schedule_time - time.perf_counter()
                 if rest > 0:
                     time.sleep(rest)
+            if request_timings:
+                client.start_request_timings()
             start = time.perf_counter()
             with runner:
                 total_ops, total_ops_unit = runner(es, params)
@@ -598,13 +1573,107 @@ def execute_schedule(schedule, es, sampler):
             # Do not calculate latency separately when we don't throttle throughput. This metric is just confusing then.
             latency = stop - absolute_expected_schedule_time if throughput_throttled else service_time
             sampler.add(sample_type, convert.seconds_to_ms(latency), convert.seconds_to_ms(service_time), total_ops, total_ops_unit,
-                        (stop - total_start), curr_total_it, total_it_for_task)
+                        (stop - total_start), curr_total_it, total_it_for_task, meta_data, convert.seconds_to_ms(param_wait_time),
+                        client.stop_request_timings() if request_timings else None)
             curr_total_it += 1
     except BaseException:
         logger.exception("Could not execute schedule")
         raise
 
 
+def next_step_start(step_start, current_task, repeat_step):
+    """
+    Determines where a load generator continues after it has been told to drive again.
+
+    :param step_start: The index of the first task of the previous step.
+    :param current_task: The index of the first task after the join point that the load generator has reached last.
+    :param repeat_step: Whether the previous step should be repeated.
+    :return: A pair of the index of the first task of the next step and the index of the task to continue with.
+    """
+    if repeat_step:
+        return step_start, step_start
+    else:
+        return current_task, current_task
+
+
+def allocate_to_workers(allocations, max_workers):
+    """
+    Distributes the clients of an allocation matrix round-robin across (at most) ``max_workers`` load generator processes.
+
+    :param allocations: An allocation matrix as calculated by `Allocator`.
+    :param max_workers: The maximum number of load generator processes.
+    :return: A list with one entry per load generator. Each entry is a dict mapping client ids to their allocated tasks.
+    """
+    if max_workers < 1:
+        raise exceptions.SystemSetupError("At least one load generator process is required but got [%s]." % str(max_workers))
+    num_workers = min(max_workers, len(allocations))
+    workers = [{} for _ in range(num_workers)]
+    for client_id, tasks in enumerate(allocations):
+        workers[client_id % num_workers][client_id] = tasks
+    return workers
+
+
+def execute_schedule_open_loop(schedule, es, sampler, max_in_flight, request_timings=False):
+    """
+    Executes tasks according to the schedule for a given operation but in contrast to `execute_schedule` it does not wait for a response
+    before the next request is issued (open-loop). Thus, a slow response does not delay subsequent requests. Latency is always measured
+    relative to the scheduled time of a request so any delay caused by a saturated target system is reflected in latency.
+
+    :param schedule: The schedule for this operation.
+    :param es: Elasticsearch client that will be used to execute the operation.
+    :param sampler: A container to store raw samples.
+    :param max_in_flight: The maximum number of requests that may be outstanding at the same time. If this limit is reached, the next
+                          request is issued as soon as one of the outstanding requests finishes.
+    :param request_timings: ``True`` iff each sample should contain the time that its requests have spent in each phase. Default:
+                            ``False``.
+    """
+    total_start = time.perf_counter()
+    curr_total_it = 1
+    in_flight = threading.BoundedSemaphore(max_in_flight)
+    errors = []
+
+    def issue(r, params, sample_type, absolute_expected_schedule_time, throughput_throttled, curr_it, total_it, meta_data,
+              param_wait_time):
+        # noinspection PyBroadException
+        try:
+            if request_timings:
+                client.start_request_timings()
+            start = time.perf_counter()
+            with r:
+                total_ops, total_ops_unit = r(es, params)
+            stop = time.perf_counter()
+            service_time = stop - start
+            latency = stop - absolute_expected_schedule_time if throughput_throttled else service_time
+            sampler.add(sample_type, convert.seconds_to_ms(latency), convert.seconds_to_ms(service_time), total_ops, total_ops_unit,
+                        (stop - total_start), curr_it, total_it, meta_data, convert.seconds_to_ms(param_wait_time),
+                        client.stop_request_timings() if request_timings else None)
+        except BaseException as e:
+            logger.exception("Could not execute request")
+            errors.append(e)
+        finally:
+            in_flight.release()
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max_in_flight) as pool:
+        for param_wait_time, (expected_scheduled_time, sample_type_calculator, curr_iteration, total_it_for_task, runner, params,
+                              meta_data) in with_param_wait_time(schedule):
+            if errors:
+                break
+            sample_type = sample_type_calculator(total_start)
+            absolute_expected_schedule_time = total_start + expected_scheduled_time
+            throughput_throttled = expected_scheduled_time > 0
+            if throughput_throttled:
+                rest = absolute_expected_schedule_time - time.perf_counter()
+                if rest > 0:
+                    time.sleep(rest)
+            in_flight.acquire()
+            # runners may hold request-specific state (e.g. a scroll id) so each outstanding request needs its own instance
+            pool.submit(issue, copy.copy(runner), params, sample_type, absolute_expected_schedule_time, throughput_throttled,
+                        curr_total_it, total_it_for_task, meta_data, param_wait_time)
+            curr_total_it += 1
+    if errors:
+        raise errors[0]
+
+
 class JoinPoint:
     def __init__(self, id):
         self.id = id
@@ -711,6 +1780,29 @@ class Allocator:
 
         return ops
 
+    @property
+    def tasks_per_joinpoint(self):
+        """
+        Calculates a flat list of all unique tasks that are run in between join points. See `operations_per_joinpoint`.
+
+        :return: A list of lists containing all tasks.
+        """
+        tasks = []
+        current_tasks = []
+
+        allocs = self.allocations
+        for idx in range(0, len(allocs[0])):
+            for client in range(0, self.clients):
+                task = allocs[client][idx]
+                if isinstance(task, track.Task):
+                    if task not in current_tasks:
+                        current_tasks.append(task)
+                elif isinstance(task, JoinPoint) and len(current_tasks) > 0:
+                    tasks.append(current_tasks)
+                    current_tasks = []
+
+        return tasks
+
     @property
     def clients(self):
         """
@@ -731,66 +1823,165 @@ class Allocator:
 
 # Runs a concrete schedule on one worker client
 # Needs to determine the runners and concrete iterations per client.
-def schedule_for(current_track, task, client_index):
+def schedule_for(current_track, task, client_index, probe=None, param_prefetch_size=0, param_source=None, precompress=False):
     """
     Calculates a client's schedule for a given task.
 
     :param current_track: The current track.
     :param task: The task that should be executed.
     :param client_index: The current client index.  Must be in the range [0, `task.clients').
+    :param probe: The current probe. Only needed for tasks with a saturation search.
+    :param param_prefetch_size: The number of parameters that are generated ahead of time in a background thread. Default: 0 (parameters
+                                are generated just before each request).
+    :param param_source: The parameter source of this client for this task (e.g. with preloaded parameters). Optional. By default, the
+                         parameter source of the task's operation is partitioned.
+    :param precompress: ``True`` iff request bodies should be compressed (ahead of time if parameters are prefetched) so clients can
+                        send them as is. Default: ``False``.
     :return: A generator for the operations the given client needs to perform for this task.
     """
     op = task.operation
     num_clients = task.clients
     target_throughput = task.target_throughput / num_clients if task.target_throughput else None
     runner_for_op = runner.runner_for(op.type)
-    params_for_op = track.operation_parameters(current_track, op).partition(client_index, num_clients)
+    if param_source is not None:
+        params_for_op = param_source
+    else:
+        params_for_op = track.operation_parameters(current_track, op).partition(client_index, num_clients)
+        if precompress:
+            params_for_op = track.CompressingParamSource(params_for_op)
+        if param_prefetch_size > 0:
+            params_for_op = track.PrefetchingParamSource(params_for_op, param_prefetch_size)
+    if task.saturation_search:
+        if probe is None:
+            raise exceptions.RallyAssertionError("No probe has been specified for the saturation search of [%s]." % op)
+        # a probe is a profile with a single step
+        profile = track.StepProfile([(probe.target_throughput, task.saturation_search.probe_duration)])
+        scheduler_params = dict(op.params)
+        scheduler_params["client-index"] = client_index
+        scheduler_params["target-throughput"] = 1
+        sched = scheduler.scheduler_for(task.schedule, scheduler_params)
+        logger.info("Creating schedule for [%s] of [%s] with scheduler [%s]." % (probe, op, task.schedule))
+        warmup_time_period = task.warmup_time_period if task.warmup_time_period is not None else 0
+        return profile_based(sched, profile, num_clients, warmup_time_period, runner_for_op, params_for_op,
+                             meta_data={"probe": probe.index})
+    elif task.throughput_profile:
+        # the scheduler determines the distribution of inter-arrival times, the profile their (changing) mean
+        scheduler_params = dict(op.params)
+        scheduler_params["client-index"] = client_index
+        scheduler_params["target-throughput"] = 1
+        sched = scheduler.scheduler_for(task.schedule, scheduler_params)
+        logger.info("Creating throughput profile based schedule for [%s] with scheduler [%s] and [%s]." %
+                    (op, task.schedule, task.throughput_profile))
+        warmup_time_period = task.warmup_time_period if task.warmup_time_period is not None else 0
+        return profile_based(sched, task.throughput_profile, num_clients, warmup_time_period, runner_for_op, params_for_op)
+    elif target_throughput:
+        scheduler_params = dict(op.params)
+        scheduler_params["client-index"] = client_index
+        scheduler_params["target-throughput"] = target_throughput
+        sched = scheduler.scheduler_for(task.schedule, scheduler_params)
+        logger.info("Using scheduler [%s] for [%s] with a target throughput of [%s] ops/s per client." %
+                    (task.schedule, op, str(target_throughput)))
+    else:
+        sched = scheduler.UnthrottledScheduler()
 
     if task.warmup_time_period is not None:
         logger.info("Creating time period based schedule for [%s] with a warmup period of [%d] seconds." % (op, task.warmup_time_period))
-        return time_period_based(target_throughput, task.warmup_time_period, runner_for_op, params_for_op)
+        return time_period_based(sched, task.warmup_time_period, runner_for_op, params_for_op)
     else:
         logger.info("Creating iteration-count based schedule for [%s] with [%d] warmup iterations and [%d] iterations." %
                     (op, task.warmup_iterations, task.iterations))
-        return iteration_count_based(target_throughput, task.warmup_iterations // num_clients, task.iterations // num_clients,
+        return iteration_count_based(sched, task.warmup_iterations // num_clients, task.iterations // num_clients,
                                      runner_for_op, params_for_op)
 
 
-def time_period_based(target_throughput, warmup_time_period, runner, params):
+def time_period_based(sched, warmup_time_period, runner, params):
     """
     Calculates the necessary schedule for time period based operations.
 
-    :param target_throughput: The desired target throughput in operations / second or None if throughput should not be limited.
+    :param sched: The scheduler that determines when each operation should be issued.
     :param warmup_time_period: The time period in seconds that is considered for warmup.
     :param runner: The runner for a given operation.
     :param params: The parameter source for a given operation.
     :return: A generator for the corresponding parameters.
     """
-    wait_time = 1 / target_throughput if target_throughput else 0
+    next_scheduled = 0
     iterations = params.size()
-    for it in range(0, iterations):
-        yield (wait_time * it,
+    estimated_size = track.has_estimated_size(params)
+    it = 0
+    while estimated_size or it < iterations:
+        try:
+            current_params = params.params()
+        except StopIteration:
+            return
+        yield (next_scheduled,
+               lambda start: metrics.SampleType.Warmup if time.perf_counter() - start < warmup_time_period else metrics.SampleType.Normal,
+               it, max(iterations, it + 1), runner, current_params, None)
+        it += 1
+        next_scheduled = sched.next(next_scheduled)
+
+
+def profile_based(sched, profile, num_clients, warmup_time_period, runner, params, meta_data=None):
+    """
+    Calculates the necessary schedule for operations with a throughput profile. The schedule ends when the profile ends or the parameter
+    source is exhausted, whatever happens first.
+
+    :param sched: The scheduler that determines the distribution of inter-arrival times. It is created for a target throughput of one
+                  operation per second and its inter-arrival times are scaled according to the profile.
+    :param profile: The throughput profile of the task.
+    :param num_clients: The number of clients that execute this task.
+    :param warmup_time_period: The time period in seconds that is considered for warmup.
+    :param runner: The runner for a given operation.
+    :param params: The parameter source for a given operation.
+    :param meta_data: Additional meta data for all samples of this schedule. Optional.
+    :return: A generator for the corresponding parameters.
+    """
+    # a size of one indicates that the parameter source is never exhausted (see ParamSource#size())
+    max_iterations = params.size() if params.size() > 1 else None
+    expected_iterations = max(int(profile.expected_operations / num_clients), 1)
+    total_iterations = min(expected_iterations, max_iterations) if max_iterations else expected_iterations
+    if track.has_estimated_size(params):
+        # run until the parameter source is exhausted
+        max_iterations = None
+    next_scheduled = 0
+    it = 0
+    while next_scheduled < profile.duration and (max_iterations is None or it < max_iterations):
+        target_throughput = profile.target_throughput_at(next_scheduled)
+        sample_meta_data = {
+            "target-throughput": target_throughput,
+            "profile-step": profile.step_at(next_scheduled)
+        }
+        if meta_data:
+            sample_meta_data.update(meta_data)
+        try:
+            current_params = params.params()
+        except StopIteration:
+            return
+        yield (next_scheduled,
                lambda start: metrics.SampleType.Warmup if time.perf_counter() - start < warmup_time_period else metrics.SampleType.Normal,
-               it, iterations, runner, params.params())
+               it, total_iterations, runner, current_params, sample_meta_data)
+        it += 1
+        next_scheduled += sched.next(0) * num_clients / target_throughput
 
 
-def iteration_count_based(target_throughput, warmup_iterations, iterations, runner, params):
+def iteration_count_based(sched, warmup_iterations, iterations, runner, params):
     """
     Calculates the necessary schedule based on a given number of iterations.
 
-    :param target_throughput: The desired target throughput in operations / second or None if throughput should not be limited.
+    :param sched: The scheduler that determines when each operation should be issued.
     :param warmup_iterations: The number of warmup iterations to run. 0 if no warmup should be performed.
     :param iterations: The number of measurement iterations to run.
     :param runner: The runner for a given operation.
     :param params: The parameter source for a given operation.
     :return: A generator for the corresponding parameters.
     """
-    wait_time = 1 / target_throughput if target_throughput else 0
+    next_scheduled = 0
     total_iterations = warmup_iterations + iterations
     if total_iterations == 0:
         raise exceptions.RallyAssertionError("Operation must run at least for one iteration.")
     for i in range(0, warmup_iterations):
-        yield (wait_time * i, lambda start: metrics.SampleType.Warmup, i, total_iterations, runner, params.params())
+        yield (next_scheduled, lambda start: metrics.SampleType.Warmup, i, total_iterations, runner, params.params(), None)
+        next_scheduled = sched.next(next_scheduled)
 
     for i in range(0, iterations):
-        yield (wait_time * (warmup_iterations + i), lambda start: metrics.SampleType.Normal, i, total_iterations, runner, params.params())
+        yield (next_scheduled, lambda start: metrics.SampleType.Normal, i, total_iterations, runner, params.params(), None)
+        next_scheduled = sched.next(next_scheduled)
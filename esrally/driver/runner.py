@@ -1,5 +1,7 @@
+import asyncio
 import types
 import logging
+import time
 
 import elasticsearch
 
@@ -20,7 +22,10 @@ def runner_for(operation_type):
 
 def register_runner(operation_type, runner):
     # we'd rather use callable() but this will erroneously also classify a class as callable...
-    if isinstance(runner, types.FunctionType):
+    if asyncio.iscoroutinefunction(runner):
+        logger.debug("Registering coroutine function [%s] for [%s]." % (str(runner), str(operation_type)))
+        __RUNNERS[operation_type] = DelegatingAsyncRunner(runner)
+    elif isinstance(runner, types.FunctionType):
         logger.debug("Registering function [%s] for [%s]." % (str(runner), str(operation_type)))
         __RUNNERS[operation_type] = DelegatingRunner(runner)
     else:
@@ -60,11 +65,41 @@ class DelegatingRunner(Runner):
         return self.runnable(*args)
 
 
+class AsyncRunner(Runner):
+    """
+    Base class for operations against Elasticsearch that are executed on an asyncio event loop.
+
+    Subclasses must implement ``__call__`` as a coroutine function (i.e. ``async def __call__(self, es, params)``) and return the same
+    pair as `Runner`. They are only invoked by the asyncio based load generator. When Rally runs with one process per client, all
+    runners must be synchronous.
+    """
+    pass
+
+
+class DelegatingAsyncRunner(AsyncRunner):
+    def __init__(self, runnable):
+        self.runnable = runnable
+
+    def __call__(self, *args):
+        # returns the coroutine object so the caller can await it
+        return self.runnable(*args)
+
+
+def is_async(runner):
+    """
+    :param runner: A runner.
+    :return: True iff the runner needs to be awaited on an asyncio event loop.
+    """
+    return isinstance(runner, AsyncRunner)
+
+
 class BulkIndex(Runner):
     """
     Bulk indexes the given documents.
 
-    It expects the parameter hash to contain a key "body" containing all documents for the current bulk request.
+    It expects the parameter hash to contain a key "body" containing all documents for the current bulk request. The body is either a
+    list of meta-data lines and documents or the complete request body as ``bytes``. The latter is sent as is. If the body is compressed,
+    the key "bulk-size" needs to contain the number of documents in the body.
 
     """
     def __init__(self):
@@ -75,7 +110,20 @@ class BulkIndex(Runner):
         if "pipeline" in params:
             bulk_params["pipeline"] = params["pipeline"]
 
-        response = es.bulk(body=params["body"], params=bulk_params)
+        body = params["body"]
+        start = time.perf_counter()
+        if isinstance(body, bytes):
+            # bypass the client's bulk API which would join and encode the body again
+            _, response = es.transport.perform_request("POST", "/_bulk", params=bulk_params, body=body)
+            # each document is preceded by a meta data line (unless the body is compressed)
+            docs = params["bulk-size"] if "bulk-size" in params else body.count(b"\n") // 2
+        else:
+            response = es.bulk(body=body, params=bulk_params)
+            # at this point, the bulk will always contain a separate meta data line
+            docs = len(body) // 2
+        if "bulk-sizer" in params:
+            # adapts the size of the next bulk requests of this client
+            params["bulk-sizer"].record(docs, time.perf_counter() - start)
         if response["errors"]:
             for idx, item in enumerate(response["items"]):
                 if item["index"]["status"] != 201:
@@ -84,8 +132,7 @@ class BulkIndex(Runner):
                     msg += "Bulk item: [%s]\n" % item
                     msg += "Buffer size is [%d]\n" % idx
                     raise exceptions.DataError(msg)
-        # at this point, the bulk will always contain a separate meta data line
-        return len(params["body"]) // 2, "docs"
+        return docs, "docs"
 
 
 class ForceMerge(Runner):
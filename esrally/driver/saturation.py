@@ -0,0 +1,148 @@
+import logging
+
+from esrally import metrics
+
+logger = logging.getLogger("rally.driver")
+
+
+class Probe:
+    """
+    A probe runs a task for a short time period with a fixed target throughput to check whether the latency SLO is met.
+    """
+
+    def __init__(self, index, target_throughput):
+        """
+        :param index: The (zero-based) index of this probe within its saturation search.
+        :param target_throughput: The target throughput in operations per second (summed over all clients).
+        """
+        self.index = index
+        self.target_throughput = target_throughput
+
+    def __repr__(self, *args, **kwargs):
+        return "probe [%d] at [%s] ops/s" % (self.index, self.target_throughput)
+
+
+class ProbeResult:
+    def __init__(self, probe, latency, achieved_throughput, sustainable):
+        self.probe = probe
+        # latency in ms at the percentile of interest
+        self.latency = latency
+        self.achieved_throughput = achieved_throughput
+        self.sustainable = sustainable
+
+
+class ThroughputSearch:
+    """
+    Searches for the maximum target throughput of a task at which a latency percentile stays below a threshold.
+
+    Starting with the initial throughput, the target throughput is multiplied by `growth_factor` after each sustainable probe (or divided
+    by it after each unsustainable one) until the first probe with a different outcome. Afterwards, the search bisects the interval
+    between the highest sustainable and the lowest unsustainable target throughput until it is narrow enough or the maximum number of
+    probes is reached.
+    """
+
+    # A probe is only sustainable if the clients have achieved (nearly) the target throughput
+    MIN_THROUGHPUT_RATIO = 0.9
+
+    def __init__(self, task, growth_factor=2):
+        """
+        :param task: A task with a saturation search.
+        :param growth_factor: The factor by which the target throughput changes until the boundary has been bracketed. Default: 2.
+        """
+        self.task = task
+        self.spec = task.saturation_search
+        self.growth_factor = growth_factor
+        self.probe = Probe(0, self.spec.initial_throughput)
+        self.results = []
+        # highest target throughput that has met the SLO
+        self.lower = None
+        # lowest target throughput that has violated the SLO
+        self.upper = None
+
+    @property
+    def max_sustainable_throughput(self):
+        """
+        :return: The highest target throughput in operations per second that has met the SLO or ``None`` if no probe has met it.
+        """
+        return self.lower
+
+    def next_probe(self, samples, aggregates=None):
+        """
+        Evaluates the current probe and determines the next one.
+
+        :param samples: A list of samples. Only samples of the current probe are considered.
+        :param aggregates: Aggregated samples (see ``driver.Aggregates``). If present, they are used instead of ``samples``.
+        :return: The next probe or ``None`` if the search is finished.
+        """
+        result = self.evaluate(samples, aggregates)
+        self.results.append(result)
+        current = self.probe.target_throughput
+        if result.sustainable:
+            self.lower = current if self.lower is None else max(self.lower, current)
+        else:
+            self.upper = current if self.upper is None else min(self.upper, current)
+        logger.info("[%s] of [%s]: [%s]th percentile latency is [%s] ms, throughput is [%s] ops/s (sustainable: [%s])." %
+                    (self.probe, self.task, self.spec.latency_percentile, result.latency, result.achieved_throughput, result.sustainable))
+
+        if len(self.results) >= self.spec.max_probes:
+            logger.info("Finishing saturation search for [%s] after the maximum number of [%d] probes." % (self.task, len(self.results)))
+            return None
+        if self.upper is None:
+            next_throughput = current * self.growth_factor
+        elif self.lower is None:
+            next_throughput = current / self.growth_factor
+        elif (self.upper - self.lower) / self.upper <= self.spec.precision:
+            logger.info("Finishing saturation search for [%s] with a precision of [%s]." % (self.task, self.spec.precision))
+            return None
+        else:
+            next_throughput = (self.lower + self.upper) / 2
+        self.probe = Probe(self.probe.index + 1, next_throughput)
+        return self.probe
+
+    def evaluate(self, samples, aggregates=None):
+        """
+        :param samples: A list of samples. Only samples of the current probe are considered.
+        :param aggregates: Aggregated samples (see ``driver.Aggregates``). If present, they are used instead of ``samples``.
+        :return: A ``ProbeResult`` for the current probe.
+        """
+        if aggregates is not None:
+            latency, achieved_throughput = self._evaluate_aggregates(aggregates)
+        else:
+            latency, achieved_throughput = self._evaluate_samples(samples)
+        if latency is None:
+            logger.warning("No measurement samples for [%s] of [%s]. Considering it as unsustainable." % (self.probe, self.task))
+            return ProbeResult(self.probe, None, 0, False)
+        sustainable = latency <= self.spec.max_latency and \
+                      (achieved_throughput is None or
+                       achieved_throughput >= ThroughputSearch.MIN_THROUGHPUT_RATIO * self.probe.target_throughput)
+        return ProbeResult(self.probe, latency, achieved_throughput, sustainable)
+
+    def _evaluate_samples(self, samples):
+        probe_samples = [s for s in samples if s.operation == self.task.operation and s.sample_type == metrics.SampleType.Normal and
+                         s.meta_data is not None and s.meta_data.get("probe") == self.probe.index]
+        if len(probe_samples) == 0:
+            return None, None
+        latency = metrics.percentile_value(sorted([s.latency_ms for s in probe_samples]), self.spec.latency_percentile)
+        return latency, throughput_of(probe_samples)
+
+    def _evaluate_aggregates(self, aggregates):
+        op_name = self.task.operation.name
+        meta_data = {"probe": self.probe.index}
+        histogram = aggregates.histogram_for(op_name, metrics.SampleType.Normal, "latency", meta_data)
+        if histogram is None or histogram.count == 0:
+            return None, None
+        first, last = aggregates.time_range_for(op_name, metrics.SampleType.Normal, meta_data)
+        achieved_throughput = (histogram.count - 1) / (last - first) if histogram.count > 1 and last > first else None
+        return histogram.value_at_percentile(self.spec.latency_percentile), achieved_throughput
+
+
+def throughput_of(samples):
+    """
+    :param samples: A non-empty list of samples.
+    :return: The number of requests per second between the first and the last sample or ``None`` if it cannot be determined.
+    """
+    timestamps = [s.absolute_time for s in samples]
+    duration = max(timestamps) - min(timestamps)
+    if len(samples) < 2 or duration <= 0:
+        return None
+    return (len(samples) - 1) / duration
@@ -0,0 +1,120 @@
+import logging
+import random
+import types
+
+from esrally import exceptions
+
+logger = logging.getLogger("rally.driver")
+
+# Mapping from scheduler name to scheduler class
+__SCHEDULERS = {}
+
+
+def scheduler_for(name, params):
+    """
+    Creates a scheduler instance.
+
+    :param name: The name under which the scheduler has been registered.
+    :param params: A hash of parameters for the scheduler. It contains at least the keys "target-throughput" (in operations per second
+                   for the current client) and "client-index" as well as all parameters of the corresponding operation.
+    :return: A new scheduler instance.
+    """
+    try:
+        s = __SCHEDULERS[name]
+    except KeyError:
+        raise exceptions.RallyError("No scheduler available for name [%s]" % name)
+    # we'd rather use callable() but this will erroneously also classify a class as callable...
+    if isinstance(s, types.FunctionType):
+        return DelegatingScheduler(params, s)
+    else:
+        return s(params)
+
+
+def register_scheduler(name, scheduler):
+    """
+    Registers a new scheduler.
+
+    :param name: The name of the scheduler. It can be referenced with this name in the "schedule" property of a task.
+    :param scheduler: Either a class that is a subclass of `Scheduler` or a function that is invoked with the time in seconds when the
+                      previous operation has been scheduled (relative to the start of the task) and a hash of scheduler parameters and
+                      that returns when the next operation should be scheduled (also relative to the start of the task).
+    """
+    logger.debug("Registering scheduler [%s] for [%s]." % (str(scheduler), str(name)))
+    __SCHEDULERS[name] = scheduler
+
+
+class Scheduler:
+    """
+    A scheduler determines when the next operation should be issued (i.e. it defines the inter-arrival time of operations). Rally will
+    create one scheduler per client and task.
+    """
+
+    def __init__(self, params):
+        """
+        :param params: A hash of parameters for this scheduler. See `scheduler_for`.
+        """
+        self.params = params
+
+    def next(self, current):
+        """
+        :param current: The time in seconds when the previous operation has been scheduled (relative to the start of the task).
+        :return: The time in seconds when the next operation should be scheduled (relative to the start of the task).
+        """
+        raise NotImplementedError("abstract method")
+
+
+class DelegatingScheduler(Scheduler):
+    def __init__(self, params, delegate):
+        super().__init__(params)
+        self.delegate = delegate
+
+    def next(self, current):
+        return self.delegate(current, self.params)
+
+
+class UnthrottledScheduler(Scheduler):
+    """
+    Schedules all operations immediately. Rally uses it when no target throughput is specified.
+    """
+
+    def __init__(self, params=None):
+        super().__init__(params)
+
+    def next(self, current):
+        return 0
+
+
+class DeterministicScheduler(Scheduler):
+    """
+    Schedules operations at a fixed interval of 1 / target-throughput seconds.
+    """
+
+    def __init__(self, params):
+        super().__init__(params)
+        self.wait_time = 1 / params["target-throughput"]
+
+    def next(self, current):
+        return current + self.wait_time
+
+
+class PoissonScheduler(Scheduler):
+    """
+    Schedules operations so they arrive according to a Poisson process, i.e. inter-arrival times are exponentially distributed with a
+    mean of 1 / target-throughput seconds. This models independent (and therefore bursty) arrivals of requests.
+
+    If the operation defines a "seed", the schedule is reproducible. Each client derives its own seed from it so clients do not issue
+    requests in lockstep.
+    """
+
+    def __init__(self, params):
+        super().__init__(params)
+        self.rate = params["target-throughput"]
+        seed = params.get("seed")
+        self.rand = random.Random(seed + params.get("client-index", 0) if seed is not None else None)
+
+    def next(self, current):
+        return current + self.rand.expovariate(self.rate)
+
+
+register_scheduler("deterministic", DeterministicScheduler)
+register_scheduler("poisson", PoissonScheduler)
@@ -10,7 +10,7 @@ import jinja2
 import psutil
 
 from esrally import config, time, exceptions, client
-from esrally.mechanic import telemetry, cluster
+from esrally.mechanic import telemetry, cluster, stub
 from esrally.utils import versions, console, process, io, convert
 
 logger = logging.getLogger("rally.launcher")
@@ -208,6 +208,40 @@ the index size).
         pass
 
 
+class StubLauncher:
+    """
+    Starts a stub of Elasticsearch on the load driver machine (see ``stub.StubServer``) to measure the overhead of Rally itself.
+    """
+
+    def __init__(self, cfg, metrics_store):
+        self.cfg = cfg
+        self.metrics_store = metrics_store
+        self.server = None
+
+    def start(self, car=None):
+        if self.cfg.opts("driver", "load.driver.hosts", mandatory=False, default_value=[]):
+            raise exceptions.SystemSetupError("The Elasticsearch stub only runs on the coordinating machine. Run this pipeline on each "
+                                              "load driver host instead of specifying load driver hosts.")
+        latency_ms = self.cfg.opts("launcher", "stub.latency", mandatory=False, default_value=0)
+        self.server = stub.StubServer(latency_ms).start()
+        # unified client config
+        self.cfg.add(config.Scope.benchmark, "client", "hosts", self.server.hosts)
+        self.cfg.add(config.Scope.benchmark, "client", "options", self.cfg.opts("launcher", "client.options"))
+        self.cfg.add(config.Scope.benchmark, "source", "distribution.version", stub.VERSION)
+        console.info("Running against an Elasticsearch stub with a latency of [%s] ms. Results only show the overhead of Rally." %
+                     str(latency_ms), logger=logger)
+        # the stub provides no meaningful stats
+        t = telemetry.Telemetry(self.cfg, devices=[])
+        c = cluster.Cluster([], t)
+        t.attach_to_cluster(c)
+        return c
+
+    def stop(self, cluster):
+        if self.server:
+            self.server.stop()
+            self.server = None
+
+
 class InProcessLauncher:
     """
     Launcher is responsible for starting and stopping the benchmark candidate.
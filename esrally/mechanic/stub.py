@@ -0,0 +1,187 @@
+import gzip
+import http.server
+import json
+import logging
+import multiprocessing
+import socketserver
+import time
+import urllib.parse
+
+logger = logging.getLogger("rally.stub")
+
+# the stub pretends to be this version of Elasticsearch
+VERSION = "5.0.0"
+
+
+def _json(data):
+    return json.dumps(data).encode("utf-8")
+
+
+INFO = _json({
+    "name": "rally-stub",
+    "cluster_name": "rally-stub",
+    "version": {"number": VERSION, "build_hash": "stub", "lucene_version": "6.2.0"},
+    "tagline": "You Know, for Search"
+})
+ACKNOWLEDGED = _json({"acknowledged": True})
+STATS = _json({"_shards": {"total": 0, "successful": 0, "failed": 0}, "_all": {"primaries": {}, "total": {}}, "indices": {}})
+NODES_STATS = _json({"cluster_name": "rally-stub", "nodes": {}})
+CLEAR_SCROLL = _json({"succeeded": True, "num_freed": 1})
+BULK_ITEM = b'{"index":{"_index":"stub","_type":"stub","_id":"1","_version":1,"status":201}}'
+HIT = b'{"_index":"stub","_type":"stub","_id":"1","_score":1.0,"_source":{}}'
+GZIP_MAGIC = b"\x1f\x8b"
+
+
+class StubRequestHandler(http.server.BaseHTTPRequestHandler):
+    """
+    Answers requests with canned responses after a configurable latency. It understands just enough of the Elasticsearch API for Rally's
+    built-in runners and for setting up indices.
+    """
+    # keep connections alive
+    protocol_version = "HTTP/1.1"
+    # headers and body are written separately; don't let them wait for the client's delayed ACK
+    disable_nagle_algorithm = True
+
+    def do_HEAD(self):
+        path, _ = self._parse()
+        # no index exists
+        self._respond(200 if path == "/" else 404, b"")
+
+    def do_GET(self):
+        self._handle()
+
+    def do_POST(self):
+        self._handle()
+
+    def do_PUT(self):
+        self._handle()
+
+    def do_DELETE(self):
+        self._handle()
+
+    def _handle(self):
+        path, query = self._parse()
+        body = self._read_body()
+        if path == "/":
+            response = INFO
+        elif path.endswith("/_bulk"):
+            response = self._bulk(body)
+        elif path == "/_search/scroll":
+            response = CLEAR_SCROLL if self.command == "DELETE" else self._scroll(body)
+        elif path.endswith("/_search"):
+            response = self._search(query)
+        elif path.startswith("/_cluster/health"):
+            response = _json({"cluster_name": "rally-stub", "status": query.get("wait_for_status", "green"), "timed_out": False,
+                              "number_of_nodes": 1, "relocating_shards": 0, "initializing_shards": 0, "unassigned_shards": 0})
+        elif path.startswith("/_cat/"):
+            response = b""
+        elif path.startswith("/_nodes"):
+            response = NODES_STATS
+        elif "_stats" in path:
+            response = STATS
+        else:
+            # creating or deleting indices and mappings, force merges, refreshes
+            response = ACKNOWLEDGED
+        self._respond(200, response)
+
+    def _parse(self):
+        url = urllib.parse.urlsplit(self.path)
+        return url.path, dict(urllib.parse.parse_qsl(url.query))
+
+    def _read_body(self):
+        length = int(self.headers.get("Content-Length", 0))
+        body = self.rfile.read(length) if length > 0 else b""
+        # be lenient: not every client that announces a compressed body actually compresses it
+        if body.startswith(GZIP_MAGIC) and self.headers.get("Content-Encoding") == "gzip":
+            body = gzip.decompress(body)
+        return body
+
+    def _bulk(self, body):
+        # each document is preceded by a meta-data line
+        docs = body.count(b"\n") // 2
+        return b'{"took":1,"errors":false,"items":[' + b",".join([BULK_ITEM] * docs) + b"]}"
+
+    def _search(self, query):
+        hits = int(query.get("size", 10))
+        if "scroll" in query:
+            return self._page("stub-%d" % hits, hits)
+        return self._page(None, hits)
+
+    def _scroll(self, body):
+        try:
+            scroll_id = json.loads(body.decode("utf-8"))["scroll_id"]
+        except (ValueError, KeyError):
+            # older clients send the scroll id as is
+            scroll_id = body.decode("utf-8")
+        try:
+            hits = int(scroll_id.rsplit("-", 1)[1])
+        except (IndexError, ValueError):
+            hits = 10
+        return self._page(scroll_id, hits)
+
+    def _page(self, scroll_id, hits):
+        # bytes can't be %-formatted on Python 3.4
+        response = '{"_scroll_id":%s,' % json.dumps(scroll_id) if scroll_id else "{"
+        response += '"took":1,"timed_out":false,"hits":{"total":%d,"max_score":1.0,"hits":[' % hits
+        return response.encode("utf-8") + b",".join([HIT] * hits) + b"]}}"
+
+    def _respond(self, status, body):
+        if self.server.latency:
+            time.sleep(self.server.latency)
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        if self.command != "HEAD":
+            self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class _ThreadingHTTPServer(socketserver.ThreadingMixIn, http.server.HTTPServer):
+    # http.server.ThreadingHTTPServer requires Python 3.7
+    daemon_threads = True
+
+
+def _serve(latency, port_pipe):
+    httpd = _ThreadingHTTPServer(("127.0.0.1", 0), StubRequestHandler)
+    httpd.latency = latency
+    port_pipe.send(httpd.server_address[1])
+    port_pipe.close()
+    httpd.serve_forever()
+
+
+class StubServer:
+    """
+    A stand-in for Elasticsearch that runs in a separate process on the load driver machine. It is used to measure the overhead of Rally
+    itself, i.e. the maximum throughput and the latency that Rally adds on top of the canned latency of the stub.
+    """
+
+    def __init__(self, latency_ms=0):
+        """
+        :param latency_ms: The time in milliseconds that the stub waits before it responds to a request.
+        """
+        self.latency = latency_ms / 1000
+        self.process = None
+        self.port = None
+
+    def start(self):
+        receiver, sender = multiprocessing.Pipe(duplex=False)
+        self.process = multiprocessing.Process(target=_serve, args=(self.latency, sender), name="rally-stub", daemon=True)
+        self.process.start()
+        sender.close()
+        self.port = receiver.recv()
+        receiver.close()
+        logger.info("Elasticsearch stub is listening on port [%d] with a latency of [%f] seconds." % (self.port, self.latency))
+        return self
+
+    @property
+    def hosts(self):
+        return [{"host": "127.0.0.1", "port": self.port}]
+
+    def stop(self):
+        if self.process:
+            self.process.terminate()
+            self.process.join()
+            self.process = None
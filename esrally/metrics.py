@@ -11,7 +11,7 @@ import elasticsearch.helpers
 import tabulate
 
 from esrally import time, exceptions
-from esrally.utils import console
+from esrally.utils import console, histogram as hist
 
 logger = logging.getLogger("rally.metrics")
 
@@ -276,7 +276,7 @@ class MetricsStore:
 
     # should be a float
     def put_value_cluster_level(self, name, value, unit, operation=None, operation_type=None, sample_type=SampleType.Normal,
-                                absolute_time=None, relative_time=None):
+                                absolute_time=None, relative_time=None, meta_data=None):
         """
         Adds a new cluster level value metric.
 
@@ -290,8 +290,31 @@ class MetricsStore:
                store will derive the timestamp automatically.
         :param relative_time The relative timestamp in seconds since the start of the benchmark when this metric record is stored.
                Defaults to None. The metrics store will derive the timestamp automatically.
+        :param meta_data A dict of additional meta data for this specific metric record. It is merged with the meta info of the metrics
+               store. Optional. Defaults to None.
+        """
+        self._put(MetaInfoScope.cluster, None, name, value, unit, operation, operation_type, sample_type, absolute_time, relative_time,
+                  meta_data)
+
+    def put_histogram_cluster_level(self, name, histogram, unit, operation=None, operation_type=None, sample_type=SampleType.Normal,
+                                    absolute_time=None, relative_time=None, meta_data=None):
+        """
+        Adds a new cluster level histogram metric. The value of the metric record is the number of values in the histogram.
+
+        :param name: The name of the metric.
+        :param histogram: A ``histogram.Histogram``.
+        :param unit: The unit of the values in the histogram (e.g. ms).
+        :param operation The operation name to which this histogram applies. Optional. Defaults to None.
+        :param operation_type The operation type to which this histogram applies. Optional. Defaults to None.
+        :param sample_type Whether this histogram contains warmup or normal measurement samples. Defaults to SampleType.Normal.
+        :param absolute_time The absolute timestamp in seconds since epoch when this metric record is stored. Defaults to None. The metrics
+               store will derive the timestamp automatically.
+        :param relative_time The relative timestamp in seconds since the start of the benchmark when this metric record is stored.
+               Defaults to None. The metrics store will derive the timestamp automatically.
+        :param meta_data A dict of additional meta data for this specific metric record. Optional. Defaults to None.
         """
-        self._put(MetaInfoScope.cluster, None, name, value, unit, operation, operation_type, sample_type, absolute_time, relative_time)
+        self._put(MetaInfoScope.cluster, None, name, histogram.count, unit, operation, operation_type, sample_type, absolute_time,
+                  relative_time, meta_data, encoded_histogram=hist.encode(histogram))
 
     def put_value_node_level(self, node_name, name, value, unit, operation=None, operation_type=None, sample_type=SampleType.Normal,
                              absolute_time=None, relative_time=None):
@@ -312,7 +335,8 @@ class MetricsStore:
         """
         self._put(MetaInfoScope.node, node_name, name, value, unit, operation, operation_type, sample_type, absolute_time, relative_time)
 
-    def _put(self, level, level_key, name, value, unit, operation, operation_type, sample_type, absolute_time=None, relative_time=None):
+    def _put(self, level, level_key, name, value, unit, operation, operation_type, sample_type, absolute_time=None, relative_time=None,
+             meta_data=None, encoded_histogram=None):
         if level == MetaInfoScope.cluster:
             meta = self._meta_info[MetaInfoScope.cluster]
         elif level == MetaInfoScope.node:
@@ -320,6 +344,9 @@ class MetricsStore:
             meta.update(self._meta_info[MetaInfoScope.node][level_key])
         else:
             raise exceptions.SystemSetupError("Unknown meta info level [%s] for metric [%s]" % (level, name))
+        if meta_data:
+            meta = meta.copy()
+            meta.update(meta_data)
         if absolute_time is None:
             absolute_time = self._clock.now()
         if relative_time is None:
@@ -343,6 +370,8 @@ class MetricsStore:
             doc["operation"] = operation
         if operation_type:
             doc["operation-type"] = operation_type
+        if encoded_histogram:
+            doc["histogram"] = encoded_histogram
 
         self._add(doc)
 
@@ -380,7 +409,7 @@ class MetricsStore:
     def _first_or_none(self, values):
         return values[0] if values else None
 
-    def get(self, name, operation=None, operation_type=None, sample_type=None):
+    def get(self, name, operation=None, operation_type=None, sample_type=None, meta_data=None):
         """
         Gets all raw values for the given metric name.
 
@@ -388,9 +417,23 @@ class MetricsStore:
         :param operation The operation name to query. Optional.
         :param operation_type The operation type to query. Optional.
         :param sample_type The sample type to query. Optional. By default, all samples are considered.
+        :param meta_data A dict of meta data key-value pairs that a metric record needs to match. Optional.
         :return: A list of all values for the given metric.
         """
-        return self._get(name, operation, operation_type, sample_type, lambda doc: doc["value"])
+        return self._get(name, operation, operation_type, sample_type, lambda doc: doc["value"], meta_data)
+
+    def get_histogram(self, name, operation=None, operation_type=None, sample_type=None, meta_data=None):
+        """
+        Gets all histograms for the given metric name merged into one.
+
+        :param name: The metric name to query.
+        :param operation The operation name to query. Optional.
+        :param operation_type The operation type to query. Optional.
+        :param sample_type The sample type to query. Optional. By default, all samples are considered.
+        :param meta_data A dict of meta data key-value pairs that a metric record needs to match. Optional.
+        :return: A ``histogram.Histogram`` or None if there is no histogram.
+        """
+        return merge_histograms(self._get(name, operation, operation_type, sample_type, lambda doc: doc.get("histogram"), meta_data))
 
     def get_unit(self, name, operation=None, operation_type=None):
         """
@@ -404,25 +447,26 @@ class MetricsStore:
         # does not make too much sense to ask for a sample type here
         return self._first_or_none(self._get(name, operation, operation_type, None, lambda doc: doc["unit"]))
 
-    def _get(self, name, operation, operation_type, sample_type, mapper):
+    def _get(self, name, operation, operation_type, sample_type, mapper, meta_data=None):
         raise NotImplementedError("abstract method")
 
-    def get_count(self, name, operation=None, operation_type=None, sample_type=None):
+    def get_count(self, name, operation=None, operation_type=None, sample_type=None, meta_data=None):
         """
 
         :param name: The metric name to query.
         :param operation The operation name to query. Optional.
         :param operation_type The operation type to query. Optional.
         :param sample_type The sample type to query. Optional. By default, all samples are considered.
+        :param meta_data A dict of meta data key-value pairs that a metric record needs to match. Optional.
         :return: The number of samples for this metric.
         """
-        stats = self.get_stats(name, operation, operation_type, sample_type)
+        stats = self.get_stats(name, operation, operation_type, sample_type, meta_data)
         if stats:
             return stats["count"]
         else:
             return 0
 
-    def get_stats(self, name, operation=None, operation_type=None, sample_type=None):
+    def get_stats(self, name, operation=None, operation_type=None, sample_type=None, meta_data=None):
         """
         Gets standard statistics for the given metric.
 
@@ -430,11 +474,12 @@ class MetricsStore:
         :param operation The operation name to query. Optional.
         :param operation_type The operation type to query. Optional.
         :param sample_type The sample type to query. Optional. By default, all samples are considered.
+        :param meta_data A dict of meta data key-value pairs that a metric record needs to match. Optional.
         :return: A metric_stats structure.
         """
         raise NotImplementedError("abstract method")
 
-    def get_percentiles(self, name, operation=None, operation_type=None, sample_type=None, percentiles=None):
+    def get_percentiles(self, name, operation=None, operation_type=None, sample_type=None, percentiles=None, meta_data=None):
         """
         Retrieves percentile metrics for the given metric.
 
@@ -442,6 +487,7 @@ class MetricsStore:
         :param operation The operation name to query. Optional.
         :param operation_type The operation type to query. Optional.
         :param sample_type The sample type to query. Optional. By default, all samples are considered.
+        :param meta_data A dict of meta data key-value pairs that a metric record needs to match. Optional.
         :param percentiles: An optional list of percentiles to show. If None is provided, by default the 99th, 99.9th and 100th percentile
         are determined. Ensure that there are enough data points in the metrics store (e.g. it makes no sense to retrieve a 99.9999
         percentile when there are only 10 values).
@@ -451,6 +497,22 @@ class MetricsStore:
         raise NotImplementedError("abstract method")
 
 
+def merge_histograms(encoded_histograms):
+    """
+    :param encoded_histograms: A list of encoded histograms. ``None`` entries are ignored.
+    :return: One histogram containing the values of all histograms or ``None`` if there are none.
+    """
+    result = None
+    for encoded in encoded_histograms:
+        if encoded:
+            h = hist.decode(encoded)
+            if result is None:
+                result = h
+            else:
+                result.merge(h)
+    return result
+
+
 def index_name(ts):
     return "rally-%04d" % ts.year
 
@@ -460,6 +522,7 @@ class EsMetricsStore(MetricsStore):
     A metrics store backed by Elasticsearch.
     """
     METRICS_DOC_TYPE = "metrics"
+    MAX_HISTOGRAMS = 10000
 
     def __init__(self,
                  config,
@@ -510,16 +573,27 @@ class EsMetricsStore(MetricsStore):
     def _add(self, doc):
         self._docs.append(doc)
 
-    def _get(self, name, operation, operation_type, sample_type, mapper):
+    def _get(self, name, operation, operation_type, sample_type, mapper, meta_data=None):
         query = {
-            "query": self._query_by_name(name, operation, operation_type)
+            "query": self._query_by_name(name, operation, operation_type, meta_data=meta_data)
         }
         logger.debug("Issuing get against index=[%s], doc_type=[%s], query=[%s]" % (self._index, EsMetricsStore.METRICS_DOC_TYPE, query))
         result = self._client.search(index=self._index, doc_type=EsMetricsStore.METRICS_DOC_TYPE, body=query)
         logger.debug("Metrics query produced %s results." % result["hits"]["total"])
         return [mapper(v["_source"]) for v in result["hits"]["hits"]]
 
-    def get_stats(self, name, operation=None, operation_type=None, sample_type=None):
+    def get_histogram(self, name, operation=None, operation_type=None, sample_type=None, meta_data=None):
+        query = {
+            "query": self._query_by_name(name, operation, operation_type, sample_type, meta_data),
+            # there is one histogram per step of a task so we need more than the default number of hits
+            "size": EsMetricsStore.MAX_HISTOGRAMS
+        }
+        logger.debug("Issuing get_histogram against index=[%s], doc_type=[%s], query=[%s]" %
+                     (self._index, EsMetricsStore.METRICS_DOC_TYPE, query))
+        result = self._client.search(index=self._index, doc_type=EsMetricsStore.METRICS_DOC_TYPE, body=query)
+        return merge_histograms([v["_source"].get("histogram") for v in result["hits"]["hits"]])
+
+    def get_stats(self, name, operation=None, operation_type=None, sample_type=None, meta_data=None):
         """
         Gets standard statistics for the given metric name.
 
@@ -527,7 +601,7 @@ class EsMetricsStore(MetricsStore):
         https://www.elastic.co/guide/en/elasticsearch/reference/current/search-aggregations-metrics-stats-aggregation.html
         """
         query = {
-            "query": self._query_by_name(name, operation, operation_type, sample_type),
+            "query": self._query_by_name(name, operation, operation_type, sample_type, meta_data),
             "aggs": {
                 "metric_stats": {
                     "stats": {
@@ -541,11 +615,11 @@ class EsMetricsStore(MetricsStore):
         result = self._client.search(index=self._index, doc_type=EsMetricsStore.METRICS_DOC_TYPE, body=query)
         return result["aggregations"]["metric_stats"]
 
-    def get_percentiles(self, name, operation=None, operation_type=None, sample_type=None, percentiles=None):
+    def get_percentiles(self, name, operation=None, operation_type=None, sample_type=None, percentiles=None, meta_data=None):
         if percentiles is None:
             percentiles = [99, 99.9, 100]
         query = {
-            "query": self._query_by_name(name, operation, operation_type, sample_type),
+            "query": self._query_by_name(name, operation, operation_type, sample_type, meta_data),
             "aggs": {
                 "percentile_stats": {
                     "percentiles": {
@@ -566,7 +640,7 @@ class EsMetricsStore(MetricsStore):
         else:
             return None
 
-    def _query_by_name(self, name, operation, operation_type, sample_type=None):
+    def _query_by_name(self, name, operation, operation_type, sample_type=None, meta_data=None):
         q = {
             "bool": {
                 "filter": [
@@ -621,9 +695,38 @@ class EsMetricsStore(MetricsStore):
                     "sample-type": sample_type.name.lower()
                 }
             })
+        if meta_data:
+            for k, v in meta_data.items():
+                q["bool"]["filter"].append({
+                    "term": {
+                        "meta.%s" % k: v
+                    }
+                })
         return q
 
 
+def percentile_value(sorted_values, percentile):
+    """
+    Calculates a percentile value for a given list of values and a percentile.
+
+    The implementation is based on http://onlinestatbook.com/2/introduction/percentiles.html
+
+    :param sorted_values: A sorted list of raw values for which a percentile should be calculated.
+    :param percentile: A percentile between [0, 100]
+    :return: the corresponding percentile value.
+    """
+    rank = float(percentile) / 100.0 * (len(sorted_values) - 1)
+    if rank == int(rank):
+        return sorted_values[int(rank)]
+    else:
+        lr = math.floor(rank)
+        lr_next = math.ceil(rank)
+        fr = rank - lr
+        lower_score = sorted_values[lr]
+        higher_score = sorted_values[lr_next]
+        return lower_score + (higher_score - lower_score) * fr
+
+
 class InMemoryMetricsStore(MetricsStore):
     # global per process
     DOCS = []
@@ -658,11 +761,11 @@ class InMemoryMetricsStore(MetricsStore):
             for doc in docs:
                 self._add(doc)
 
-    def get_percentiles(self, name, operation=None, operation_type=None, sample_type=None, percentiles=None):
+    def get_percentiles(self, name, operation=None, operation_type=None, sample_type=None, percentiles=None, meta_data=None):
         if percentiles is None:
             percentiles = [99, 99.9, 100]
         result = collections.OrderedDict()
-        values = self.get(name, operation, operation_type, sample_type)
+        values = self.get(name, operation, operation_type, sample_type, meta_data)
         if len(values) > 0:
             sorted_values = sorted(values)
             for percentile in percentiles:
@@ -670,28 +773,10 @@ class InMemoryMetricsStore(MetricsStore):
         return result
 
     def percentile_value(self, sorted_values, percentile):
-        """
-        Calculates a percentile value for a given list of values and a percentile.
-
-        The implementation is based on http://onlinestatbook.com/2/introduction/percentiles.html
+        return percentile_value(sorted_values, percentile)
 
-        :param sorted_values: A sorted list of raw values for which a percentile should be calculated.
-        :param percentile: A percentile between [0, 100]
-        :return: the corresponding percentile value.
-        """
-        rank = float(percentile) / 100.0 * (len(sorted_values) - 1)
-        if rank == int(rank):
-            return sorted_values[int(rank)]
-        else:
-            lr = math.floor(rank)
-            lr_next = math.ceil(rank)
-            fr = rank - lr
-            lower_score = sorted_values[lr]
-            higher_score = sorted_values[lr_next]
-            return lower_score + (higher_score - lower_score) * fr
-
-    def get_stats(self, name, operation=None, operation_type=None, sample_type=SampleType.Normal):
-        values = self.get(name, operation, operation_type, sample_type)
+    def get_stats(self, name, operation=None, operation_type=None, sample_type=SampleType.Normal, meta_data=None):
+        values = self.get(name, operation, operation_type, sample_type, meta_data)
         sorted_values = sorted(values)
         if len(sorted_values) > 0:
             return {
@@ -704,13 +789,14 @@ class InMemoryMetricsStore(MetricsStore):
         else:
             return None
 
-    def _get(self, name, operation, operation_type, sample_type, mapper):
+    def _get(self, name, operation, operation_type, sample_type, mapper, meta_data=None):
         return [mapper(doc)
                 for doc in InMemoryMetricsStore.DOCS
                 if doc["name"] == name and
                 (operation is None or doc["operation"] == operation) and
                 (operation_type is None or doc["operation-type"] == operation_type.name) and
-                (sample_type is None or doc["sample-type"] == sample_type.name.lower())
+                (sample_type is None or doc["sample-type"] == sample_type.name.lower()) and
+                (meta_data is None or all(doc["meta"].get(k) == v for k, v in meta_data.items()))
                 ]
 
 
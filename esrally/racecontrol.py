@@ -166,6 +166,13 @@ def benchmark_only(cfg):
     return race(Benchmark(cfg, mechanic.create(cfg, metrics_store, external=True), metrics_store), cfg)
 
 
+def calibration(cfg):
+    # We'll use a special car name for benchmarks against the stub.
+    cfg.add(config.Scope.benchmark, "benchmarks", "car", "stub")
+    metrics_store = metrics.metrics_store(cfg, read_only=False)
+    return race(Benchmark(cfg, mechanic.create(cfg, metrics_store, stub=True), metrics_store), cfg)
+
+
 def docker(cfg):
     metrics_store = metrics.metrics_store(cfg, read_only=False)
     return race(Benchmark(cfg, mechanic.create(cfg, metrics_store, docker=True), metrics_store), cfg)
@@ -183,6 +190,10 @@ Pipeline("from-distribution",
 Pipeline("benchmark-only",
          "Assumes an already running Elasticsearch instance, runs a benchmark and reports results", benchmark_only)
 
+Pipeline("calibration",
+         "Runs a benchmark against a built-in stub of Elasticsearch to measure the overhead of the load driver and reports results",
+         calibration)
+
 # Very experimental Docker pipeline. Should only be used with great care and is also not supported on all platforms.
 Pipeline("docker",
          "Runs a benchmark against the official Elasticsearch Docker container and reports results", docker, stable=False)
@@ -182,6 +182,18 @@ def parse_args():
             raise argparse.ArgumentTypeError("must be positive but was %s" % value)
         return value
 
+    def non_negative_number(v):
+        value = int(v)
+        if value < 0:
+            raise argparse.ArgumentTypeError("must be non-negative but was %s" % value)
+        return value
+
+    def ratio(v):
+        value = float(v)
+        if value < 0 or value > 1:
+            raise argparse.ArgumentTypeError("must be in the range [0, 1] but was %s" % value)
+        return value
+
     # try to preload configurable defaults, but this does not work together with `--configuration-name` (which is undocumented anyway)
     cfg = config.Config()
     if cfg.config_present():
@@ -239,6 +251,25 @@ def parse_args():
         help="Race timestamp of the contender (see %s list races)" % PROGRAM_NAME,
         default="")
 
+    convert_parser = subparsers.add_parser("convert-corpus", help="Build the bulk requests of a track's documents ahead of time")
+    convert_parser.add_argument(
+        "--track",
+        help="define the track whose documents should be converted (default: geonames).",
+        default="geonames")
+    convert_parser.add_argument(
+        "--index",
+        help="convert only the documents of this index (default: all indices of the track).",
+        default=None)
+    convert_parser.add_argument(
+        "--type",
+        help="convert only the documents of this type (default: all types of the track).",
+        default=None)
+    convert_parser.add_argument(
+        "--bulk-size",
+        help="number of documents per bulk request. It needs to match the bulk size of the track's bulk operations.",
+        type=positive_number,
+        required=True)
+
     config_parser = subparsers.add_parser("configure", help="Write the configuration file or reconfigure Rally")
     for p in [parser, config_parser]:
         p.add_argument(
@@ -293,6 +324,12 @@ def parse_args():
             help="define a comma-separated list of host:port pairs which should be targeted iff using the pipeline 'benchmark-only' "
                  "(default: localhost:9200).",
             default="localhost:9200")
+        p.add_argument(
+            "--stub-latency",
+            type=non_negative_number,
+            help="define the time in milliseconds that the Elasticsearch stub waits before it responds iff using the pipeline "
+                 "'calibration' (default: 0).",
+            default=0)
         p.add_argument(
             "--client-options",
             help="define a comma-separated list of client options to use. The options will be passed to the Elasticsearch Python client "
@@ -322,6 +359,106 @@ def parse_args():
             type=positive_number,
             help="number of laps that the benchmark should run (default: 1).",
             default=1)
+        p.add_argument(
+            "--load-generator-mode",
+            help="define how clients are mapped to load generator processes. 'process' runs one process per client, 'async' runs many "
+                 "clients per process on an asyncio event loop (default: process).",
+            choices=["process", "async"],
+            default="process")
+        p.add_argument(
+            "--load-generator-processes",
+            type=positive_number,
+            help="maximum number of load generator processes in 'async' mode (default: number of CPU cores).",
+            default=os.cpu_count())
+        p.add_argument(
+            "--offset-table-stride",
+            type=positive_number,
+            help="number of lines per entry in the file offset table of each data file. Use 1 to let clients seek directly to their first "
+                 "document (default: %d)." % io.DEFAULT_OFFSET_TABLE_STRIDE,
+            default=io.DEFAULT_OFFSET_TABLE_STRIDE)
+        p.add_argument(
+            "--verify-corpus",
+            help="verify the contents of all decompressed track data files against their fingerprint before the race instead of just "
+                 "checking their size and modification time (default: false).",
+            default=False,
+            action="store_true")
+        p.add_argument(
+            "--index-from-archive",
+            help="read documents directly from the compressed track data instead of decompressing them first (default: false).",
+            default=False,
+            action="store_true")
+        p.add_argument(
+            "--track-preparation-concurrency",
+            help="maximum number of track data files that are downloaded and prepared concurrently (default: %d)." %
+                 track.DEFAULT_TRACK_PREPARATION_CONCURRENCY,
+            type=positive_number,
+            default=track.DEFAULT_TRACK_PREPARATION_CONCURRENCY)
+        p.add_argument(
+            "--param-prefetch-size",
+            type=non_negative_number,
+            help="number of request parameters that each client generates ahead of time in a background thread. 0 generates them just "
+                 "before each request (default: 0).",
+            default=0)
+        p.add_argument(
+            "--preload-params",
+            help="generate all request parameters of each client (e.g. bulk bodies) in memory before a task starts (default: false).",
+            default=False,
+            action="store_true")
+        p.add_argument(
+            "--preload-memory-budget",
+            type=positive_number,
+            help="maximum memory in MB that each client may use for preloaded request parameters. Clients that exceed it generate "
+                 "parameters while they run a task (default: 1024).",
+            default=1024)
+        p.add_argument(
+            "--precompress-bodies",
+            help="compress request bodies when request parameters are generated instead of while the request is issued. Requires the "
+                 "client option 'compressed:true' (default: false).",
+            default=False,
+            action="store_true")
+        p.add_argument(
+            "--client-transport",
+            help="define how load generators send requests. 'default' uses the Elasticsearch client, 'lean' sends pre-encoded request "
+                 "bodies directly on persistent connections and decodes only the response fields that runners need (default: default).",
+            choices=["default", "lean"],
+            default="default")
+        p.add_argument(
+            "--skip-connection-warmup",
+            help="do not open and health-check connections to the benchmark candidate before each task starts (default: false).",
+            default=False,
+            action="store_true")
+        p.add_argument(
+            "--request-timings",
+            help="record how long requests spend connecting, sending, waiting for the first byte of the response, receiving and decoding "
+                 "it and report percentiles for each phase (default: false).",
+            default=False,
+            action="store_true")
+        p.add_argument(
+            "--sample-aggregation",
+            help="define how latency and service time samples are gathered. 'raw' keeps all samples, 'histogram' aggregates them in "
+                 "histograms on the load generators (default: raw).",
+            choices=["raw", "histogram"],
+            default="raw")
+        p.add_argument(
+            "--raw-sample-ratio",
+            type=ratio,
+            help="ratio of samples that are additionally kept as raw samples with '--sample-aggregation=histogram' (default: 0).",
+            default=0)
+        p.add_argument(
+            "--throughput-bucket-interval",
+            type=positive_number,
+            help="width in seconds of the time buckets in which throughput is calculated (default: 1).",
+            default=1)
+        p.add_argument(
+            "--throughput-window",
+            type=positive_number,
+            help="if set, calculate throughput over a sliding window of this many seconds instead of since the start of each operation.",
+            default=None)
+        p.add_argument(
+            "--load-driver-hosts",
+            help="define a comma-separated list of remote hosts (ip:port of their actor system, see esrallyd) on which load generators "
+                 "run (default: run them locally).",
+            default="")
 
     for p in [parser, list_parser, race_parser]:
         p.add_argument(
@@ -451,6 +588,8 @@ def dispatch_sub_command(cfg, sub_command):
             list(cfg)
         elif sub_command == "race":
             racecontrol.run(cfg)
+        elif sub_command == "convert-corpus":
+            track.convert_corpus(cfg)
         else:
             raise exceptions.SystemSetupError("Unknown subcommand [%s]" % sub_command)
         return True
@@ -570,10 +709,29 @@ def main():
     cfg.add(config.Scope.applicationOverride, "benchmarks", "car", args.car)
     cfg.add(config.Scope.applicationOverride, "benchmarks", "cluster.health", args.cluster_health)
     cfg.add(config.Scope.applicationOverride, "benchmarks", "laps", args.laps)
+    cfg.add(config.Scope.applicationOverride, "benchmarks", "offset.table.stride", args.offset_table_stride)
+    cfg.add(config.Scope.applicationOverride, "benchmarks", "corpus.verify", args.verify_corpus)
+    cfg.add(config.Scope.applicationOverride, "benchmarks", "index.from.archive", args.index_from_archive)
+    cfg.add(config.Scope.applicationOverride, "benchmarks", "track.preparation.concurrency", args.track_preparation_concurrency)
+    cfg.add(config.Scope.applicationOverride, "driver", "load.generator.mode", args.load_generator_mode)
+    cfg.add(config.Scope.applicationOverride, "driver", "load.generator.processes", args.load_generator_processes)
+    cfg.add(config.Scope.applicationOverride, "driver", "param.prefetch.size", args.param_prefetch_size)
+    cfg.add(config.Scope.applicationOverride, "driver", "preload.params", args.preload_params)
+    cfg.add(config.Scope.applicationOverride, "driver", "preload.memory.budget", args.preload_memory_budget)
+    cfg.add(config.Scope.applicationOverride, "driver", "precompress.bodies", args.precompress_bodies)
+    cfg.add(config.Scope.applicationOverride, "driver", "transport", args.client_transport)
+    cfg.add(config.Scope.applicationOverride, "driver", "connection.warmup", not args.skip_connection_warmup)
+    cfg.add(config.Scope.applicationOverride, "driver", "request.timings", args.request_timings)
+    cfg.add(config.Scope.applicationOverride, "driver", "sample.aggregation", args.sample_aggregation)
+    cfg.add(config.Scope.applicationOverride, "driver", "raw.sample.ratio", args.raw_sample_ratio)
+    cfg.add(config.Scope.applicationOverride, "driver", "throughput.bucket.interval", args.throughput_bucket_interval)
+    cfg.add(config.Scope.applicationOverride, "driver", "throughput.window", args.throughput_window)
+    cfg.add(config.Scope.applicationOverride, "driver", "load.driver.hosts", csv_to_list(args.load_driver_hosts))
     cfg.add(config.Scope.applicationOverride, "provisioning", "datapaths", csv_to_list(args.data_paths))
     cfg.add(config.Scope.applicationOverride, "provisioning", "install.preserve", convert.to_bool(args.preserve_install))
     cfg.add(config.Scope.applicationOverride, "launcher", "external.target.hosts", convert_hosts(csv_to_list(args.target_hosts)))
     cfg.add(config.Scope.applicationOverride, "launcher", "client.options", kv_to_map(csv_to_list(args.client_options)))
+    cfg.add(config.Scope.applicationOverride, "launcher", "stub.latency", args.stub_latency)
     cfg.add(config.Scope.applicationOverride, "report", "reportformat", args.report_format)
     cfg.add(config.Scope.applicationOverride, "report", "reportfile", args.report_file)
     if args.override_src_dir is not None:
@@ -585,6 +743,10 @@ def main():
     if sub_command == "compare":
         cfg.add(config.Scope.applicationOverride, "report", "comparison.baseline.timestamp", args.baseline)
         cfg.add(config.Scope.applicationOverride, "report", "comparison.contender.timestamp", args.contender)
+    if sub_command == "convert-corpus":
+        cfg.add(config.Scope.applicationOverride, "convert", "index", args.index)
+        cfg.add(config.Scope.applicationOverride, "convert", "type", args.type)
+        cfg.add(config.Scope.applicationOverride, "convert", "bulk.size", args.bulk_size)
 
     configure_logging(cfg)
     logger.info("Rally version [%s]" % version())
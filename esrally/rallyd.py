@@ -0,0 +1,124 @@
+import argparse
+import logging
+import sys
+
+import thespian.actors
+from esrally import exceptions, PROGRAM_NAME
+from esrally.driver import driver
+from esrally.utils import io, console
+
+logger = logging.getLogger("rally.daemon")
+
+# default admin port of Rally's actor system on the coordinating machine
+DEFAULT_COORDINATOR_PORT = 1900
+
+
+def capabilities(node_ip, admin_port, coordinator_ip, coordinator_port):
+    """
+    :param node_ip: The IP address of this load driver host as it is reachable from the coordinating machine.
+    :param admin_port: The port of the actor system on this host.
+    :param coordinator_ip: The IP address of the coordinating machine.
+    :param coordinator_port: The port of the actor system on the coordinating machine.
+    :return: The capabilities of the actor system on this load driver host.
+    """
+    return {
+        "Admin Port": admin_port,
+        "Convention Address.IPv4": "%s:%d" % (coordinator_ip, coordinator_port),
+        "coordinator": False,
+        driver.LOAD_DRIVER_HOST: "%s:%d" % (node_ip, admin_port)
+    }
+
+
+def actor_logging(admin_port):
+    log_dir = io.normalize_path("~/.rally/logs")
+    io.ensure_dir(log_dir)
+    return {
+        "version": 1,
+        "formatters": {
+            "normal": {
+                "format": "%(asctime)s,%(msecs)d %(name)s %(levelname)s %(message)s"
+            }
+        },
+        "handlers": {
+            "h1": {
+                "class": "logging.FileHandler",
+                "filename": "%s/rallyd-%d.log" % (log_dir, admin_port),
+                "formatter": "normal",
+                "level": logging.INFO
+            }
+        },
+        "loggers": {
+            "": {
+                "handlers": ["h1"], "level": logging.INFO
+            }
+        }
+    }
+
+
+def start(args):
+    caps = capabilities(args.node_ip, args.admin_port, args.coordinator_ip, args.coordinator_port)
+    try:
+        # the actor system keeps running in the background after this process has terminated
+        thespian.actors.ActorSystem("multiprocTCPBase", capabilities=caps, logDefs=actor_logging(args.admin_port))
+    except thespian.actors.ActorSystemException as e:
+        raise exceptions.SystemSetupError("Could not start actor system on port [%d]: %s" % (args.admin_port, str(e)))
+    console.info("Started load driver host [%s] (coordinator: [%s:%d])." %
+                 (caps[driver.LOAD_DRIVER_HOST], args.coordinator_ip, args.coordinator_port))
+
+
+def stop(args):
+    try:
+        thespian.actors.ActorSystem("multiprocTCPBase", capabilities={"Admin Port": args.admin_port}).shutdown()
+    except thespian.actors.ActorSystemException as e:
+        raise exceptions.SystemSetupError("Could not stop actor system on port [%d]: %s" % (args.admin_port, str(e)))
+    console.info("Stopped load driver host on port [%d]." % args.admin_port)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(prog="%sd" % PROGRAM_NAME,
+                                     description="Runs Rally load generators on this machine on behalf of a coordinating machine.")
+    subparsers = parser.add_subparsers(title="subcommands", dest="subcommand")
+    start_parser = subparsers.add_parser("start", help="Starts the actor system on this machine and joins the coordinating machine.")
+    start_parser.add_argument(
+        "--node-ip",
+        help="IP address of this machine as it is reachable by the coordinating machine.",
+        required=True)
+    start_parser.add_argument(
+        "--coordinator-ip",
+        help="IP address of the coordinating machine.",
+        required=True)
+    start_parser.add_argument(
+        "--coordinator-port",
+        type=int,
+        help="port of the actor system on the coordinating machine (default: %d)." % DEFAULT_COORDINATOR_PORT,
+        default=DEFAULT_COORDINATOR_PORT)
+    stop_parser = subparsers.add_parser("stop", help="Stops the actor system on this machine.")
+    for p in [start_parser, stop_parser]:
+        p.add_argument(
+            "--admin-port",
+            type=int,
+            help="port of the actor system on this machine. Use different ports to run multiple load driver hosts on the same "
+                 "machine (default: %d)." % DEFAULT_COORDINATOR_PORT,
+            default=DEFAULT_COORDINATOR_PORT)
+    args = parser.parse_args()
+    if args.subcommand is None:
+        parser.error("Please specify a subcommand.")
+    return args
+
+
+def main():
+    console.init(quiet=False)
+    logging.basicConfig(level=logging.INFO)
+    args = parse_args()
+    try:
+        if args.subcommand == "start":
+            start(args)
+        else:
+            stop(args)
+    except exceptions.SystemSetupError as e:
+        console.error(str(e))
+        sys.exit(64)
+
+
+if __name__ == "__main__":
+    main()
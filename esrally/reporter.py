@@ -12,6 +12,15 @@ logger = logging.getLogger("rally.reporting")
 
 MEDIAN = "50.0"
 
+# metric names of the request phases and how they are reported
+REQUEST_PHASES = [
+    ("request_connect", "connect time"),
+    ("request_send", "send time"),
+    ("request_time_to_first_byte", "time to first byte"),
+    ("request_receive", "receive time"),
+    ("request_decode", "decode time")
+]
+
 
 def summarize(cfg, track):
     SummaryReporter(cfg).report(track)
@@ -47,6 +56,19 @@ class Stats:
                 self.op_metrics[op]["throughput"] = self.summary_stats(store, "throughput", op)
                 self.op_metrics[op]["latency"] = self.single_latency(store, op)
                 self.op_metrics[op]["service_time"] = self.single_latency(store, op, metric_name="service_time")
+                self.op_metrics[op]["request_phases"] = [(metric_name, self.single_latency(store, op, metric_name=metric_name))
+                                                         for metric_name, _ in REQUEST_PHASES]
+                self.op_metrics[op]["new_connections"] = self.sum(store, "new_connections", op)
+                self.op_metrics[op]["request_bytes_uncompressed"] = self.sum(store, "request_bytes_uncompressed", op)
+                self.op_metrics[op]["request_bytes_compressed"] = self.sum(store, "request_bytes_compressed", op)
+                self.op_metrics[op]["request_compression_time"] = self.sum(store, "request_compression_time", op)
+                if task.throughput_profile:
+                    profile = task.throughput_profile
+                    self.op_metrics[op]["latency_per_step"] = [
+                        (profile.describe_step(step), self.single_latency(store, op, meta_data={"profile-step": step}))
+                        for step in range(profile.number_of_steps)]
+                if task.saturation_search:
+                    self.op_metrics[op]["max_sustainable_throughput"] = store.get_one("max_sustainable_throughput", operation=op)
 
         self.total_time = self.sum(store, "indexing_total_time")
         self.merge_time = self.sum(store, "merges_total_time")
@@ -78,8 +100,8 @@ class Stats:
 
         self.segment_count = store.get_one("segments_count")
 
-    def sum(self, store, metric_name):
-        values = store.get(metric_name)
+    def sum(self, store, metric_name, operation_name=None):
+        values = store.get(metric_name, operation=operation_name)
         if values:
             return sum(values)
         else:
@@ -127,14 +149,20 @@ class Stats:
         else:
             return None
 
-    def single_latency(self, store, operation, metric_name="latency"):
+    def single_latency(self, store, operation, metric_name="latency", meta_data=None):
         sample_type = metrics.SampleType.Normal
-        sample_size = store.get_count(metric_name, operation=operation, sample_type=sample_type)
+        # load generators have aggregated samples in histograms; any raw samples are just a subset
+        histogram = store.get_histogram("%s_histogram" % metric_name, operation=operation, sample_type=sample_type, meta_data=meta_data)
+        if histogram and histogram.count > 0:
+            return collections.OrderedDict([(percentile, histogram.value_at_percentile(float(percentile)))
+                                            for percentile in self.percentiles_for_sample_size(histogram.count)])
+        sample_size = store.get_count(metric_name, operation=operation, sample_type=sample_type, meta_data=meta_data)
         if sample_size > 0:
             return store.get_percentiles(metric_name,
                                          operation=operation,
                                          sample_type=sample_type,
-                                         percentiles=self.percentiles_for_sample_size(sample_size))
+                                         percentiles=self.percentiles_for_sample_size(sample_size),
+                                         meta_data=meta_data)
         else:
             return {}
 
@@ -194,6 +222,11 @@ class SummaryReporter:
                         metrics_table += self.report_throughput(stats, task.operation)
                         metrics_table += self.report_latency(stats, task.operation)
                         metrics_table += self.report_service_time(stats, task.operation)
+                        metrics_table += self.report_request_phases(stats, task.operation)
+                        metrics_table += self.report_latency_per_step(stats, task.operation)
+                        metrics_table += self.report_max_sustainable_throughput(stats, task.operation)
+                        metrics_table += self.report_new_connections(stats, task.operation)
+                        metrics_table += self.report_compression(stats, task.operation)
 
                 meta_info_table += self.report_meta_info()
 
@@ -260,6 +293,45 @@ class SummaryReporter:
             lines.append(["%sth percentile service time" % percentile, operation.name, value, "ms"])
         return lines
 
+    def report_request_phases(self, stats, operation):
+        lines = []
+        labels = dict(REQUEST_PHASES)
+        for metric_name, phase_time in stats.op_metrics[operation.name].get("request_phases", []):
+            for percentile, value in phase_time.items():
+                lines.append(["%sth percentile %s" % (percentile, labels[metric_name]), operation.name, value, "ms"])
+        return lines
+
+    def report_latency_per_step(self, stats, operation):
+        lines = []
+        for step_description, latency in stats.op_metrics[operation.name].get("latency_per_step", []):
+            for percentile, value in latency.items():
+                lines.append(["%sth percentile latency at %s" % (percentile, step_description), operation.name, value, "ms"])
+        return lines
+
+    def report_max_sustainable_throughput(self, stats, operation):
+        lines = []
+        self.append_if_present(lines, "Max sustainable throughput", operation.name,
+                               stats.op_metrics[operation.name].get("max_sustainable_throughput"), "ops/s")
+        return lines
+
+    def report_new_connections(self, stats, operation):
+        new_connections = stats.op_metrics[operation.name].get("new_connections")
+        # zero is the expected value if connections are kept alive
+        return [["New connections", operation.name, new_connections, ""]] if new_connections is not None else []
+
+    def report_compression(self, stats, operation):
+        op_metrics = stats.op_metrics[operation.name]
+        uncompressed = op_metrics.get("request_bytes_uncompressed")
+        compressed = op_metrics.get("request_bytes_compressed")
+        if not uncompressed or not compressed:
+            return []
+        return [
+            ["Request bytes (uncompressed)", operation.name, convert.bytes_to_mb(uncompressed), "MB"],
+            ["Request bytes (compressed)", operation.name, convert.bytes_to_mb(compressed), "MB"],
+            ["Compression ratio", operation.name, uncompressed / compressed, ""],
+            ["Compression time", operation.name, op_metrics.get("request_compression_time"), "s"]
+        ]
+
     def report_total_times(self, stats):
         total_times = []
         unit = "min"
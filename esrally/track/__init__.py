@@ -1,4 +1,6 @@
-from .loader import list_tracks, load_track, load_track_plugins, prepare_track, operation_parameters
+from .loader import list_tracks, load_track, load_track_plugins, prepare_track, operation_parameters, convert_corpus, \
+    DEFAULT_TRACK_PREPARATION_CONCURRENCY
+from .params import PrefetchingParamSource, PreloadedParamSource, CompressingParamSource, preload_params, has_estimated_size
 
 # expose the complete track API
 from .track import *
@@ -1,7 +1,10 @@
+import concurrent.futures
+import contextlib
 import json
 import logging
 import os
 import sys
+import threading
 import urllib.error
 import importlib.machinery
 import types
@@ -10,12 +13,16 @@ import jinja2
 import jinja2.exceptions
 import jsonschema
 import tabulate
+import urllib3
 from esrally import exceptions, time, PROGRAM_NAME
 from esrally.track import params, track
-from esrally.utils import io, convert, net, git, versions, console
+from esrally.utils import io, convert, net, git, versions, console, fingerprint, archive
 
 logger = logging.getLogger("rally.track")
 
+# maximum number of types whose data are downloaded (and prepared) concurrently
+DEFAULT_TRACK_PREPARATION_CONCURRENCY = 4
+
 
 class TrackSyntaxError(exceptions.InvalidSyntax):
     """
@@ -74,12 +81,12 @@ def load_track(cfg):
                                           (track_name, PROGRAM_NAME))
 
 
-def load_track_plugins(cfg, register_runner):
+def load_track_plugins(cfg, register_runner, register_scheduler):
     track_name = cfg.opts("benchmarks", "track")
     distribution_version = cfg.opts("source", "distribution.version", mandatory=False)
 
     repo = TrackRepository(cfg, fetch=False)
-    plugin_reader = TrackPluginReader(register_runner)
+    plugin_reader = TrackPluginReader(register_runner, register_scheduler)
 
     track_plugin_file = repo.plugin_file(distribution_version, track_name)
     if os.path.exists(track_plugin_file):
@@ -98,9 +105,53 @@ def operation_parameters(t, op):
         return params.param_source_for_operation(op.type, t.indices, op.params)
 
 
+class PreparationProgress:
+    """
+    Shows the aggregated progress of preparing the data of all types of a track on a single line.
+    """
+    STAGES = ["downloading", "decompressing", "indexing"]
+
+    def __init__(self, total, progress_reporter=None):
+        self.total = total
+        self.done = 0
+        self.active = {stage: 0 for stage in PreparationProgress.STAGES}
+        self.lock = threading.Lock()
+        self.progress_reporter = progress_reporter if progress_reporter else console.progress()
+
+    @contextlib.contextmanager
+    def stage(self, name):
+        self._update(name, 1)
+        try:
+            yield
+        finally:
+            self._update(name, -1)
+
+    def _update(self, stage, delta):
+        with self.lock:
+            self.active[stage] += delta
+            self._print()
+
+    def finish_one(self):
+        with self.lock:
+            self.done += 1
+            self._print()
+
+    def finish(self):
+        if not console.QUIET:
+            self.progress_reporter.finish()
+
+    def _print(self):
+        if console.QUIET:
+            return
+        active = ", ".join("%s: %d" % (stage, self.active[stage]) for stage in PreparationProgress.STAGES if self.active[stage] > 0)
+        self.progress_reporter.print("Preparing track data%s" % (" (%s)" % active if active else ""), "[%d/%d done]" % (self.done, self.total))
+
+
 def prepare_track(track, cfg):
     """
-    Ensures that all track data are available for running the benchmark.
+    Ensures that all track data are available for running the benchmark. The data of all types are prepared concurrently in a pipeline:
+    As soon as the archive of a type has been downloaded, it is decompressed and its file offset table is created while other archives
+    are still being downloaded.
 
     :param track: A track that is about to be run.
     :param cfg: The config object.
@@ -119,12 +170,11 @@ def prepare_track(track, cfg):
             try:
                 io.ensure_dir(os.path.dirname(local_path))
                 size_in_mb = round(convert.bytes_to_mb(size_in_bytes))
-                # ensure output appears immediately
-                console.info("Downloading data from [%s] (%s MB) to [%s] ... " % (url, size_in_mb, local_path),
-                             end='', flush=True, logger=logger)
-                net.download(url, local_path, size_in_bytes)
-                console.println("[OK]")
-            except urllib.error.URLError:
+                logger.info("Downloading data from [%s] (%s MB) to [%s]." % (url, size_in_mb, local_path))
+                with progress.stage("downloading"):
+                    net.download(url, local_path, size_in_bytes)
+            except (urllib.error.URLError, urllib3.exceptions.HTTPError):
+                # the partially downloaded file is kept so the next attempt resumes the download
                 logger.exception("Could not download [%s] to [%s]." % (url, local_path))
 
         # file must exist at this point -> verify
@@ -147,27 +197,117 @@ def prepare_track(track, cfg):
     def decompress(data_set_path, expected_size_in_bytes):
         # we assume that track data are always compressed and try to decompress them before running the benchmark
         basename, extension = io.splitext(data_set_path)
+        if fingerprint.is_unchanged(basename, data_set_path, expected_size_in_bytes):
+            if not verify_corpus:
+                logger.info("[%s] is unchanged since it has been decompressed. Skipping decompression." % basename)
+                return basename, False
+            logger.info("Verifying [%s]." % basename)
+            if fingerprint.verify(basename):
+                return basename, False
+            console.warn("[%s] has been modified. Decompressing it again." % basename, logger=logger)
+            os.remove(basename)
         decompressed = False
         if not os.path.isfile(basename) or os.path.getsize(basename) != expected_size_in_bytes:
             decompressed = True
-            console.info("Decompressing track data from [%s] to [%s] (resulting size: %.2f GB) ... " %
-                         (data_set_path, basename, convert.bytes_to_gb(type.uncompressed_size_in_bytes)), end='', flush=True, logger=logger)
+            logger.info("Decompressing track data from [%s] to [%s] (resulting size: %.2f GB)." %
+                        (data_set_path, basename, convert.bytes_to_gb(expected_size_in_bytes)))
             io.decompress(data_set_path, io.dirname(data_set_path))
-            console.println("[OK]")
             extracted_bytes = os.path.getsize(basename)
             if extracted_bytes != expected_size_in_bytes:
                 raise exceptions.DataError("[%s] is corrupt. Extracted [%d] bytes but [%d] bytes are expected." %
                                            (basename, extracted_bytes, expected_size_in_bytes))
+        logger.info("Creating fingerprint for [%s]." % basename)
+        fingerprint.create(basename, data_set_path)
         return basename, decompressed
 
+    def prepare_block_index(data_set_path):
+        logger.info("Creating block index for [%s]." % data_set_path)
+        blocks = archive.prepare_block_index(data_set_path)
+        if blocks == 1:
+            console.warn("[%s] consists of only one compressed stream. Every client needs to decompress it from the beginning. Recompress "
+                         "it with a tool that creates independent streams (e.g. pbzip2) to let clients start at their own offset." %
+                         data_set_path, logger=logger)
+
+    def prepare(type):
+        if index_from_archive and not os.path.isfile(type.document_file):
+            if archive.is_supported(type.document_archive):
+                with progress.stage("indexing"):
+                    prepare_block_index(type.document_archive)
+                progress.finish_one()
+                return
+            console.warn("Cannot index directly from [%s]. Decompressing it instead." % type.document_archive, logger=logger)
+        with progress.stage("decompressing"):
+            decompressed_file_path, was_decompressed = decompress(type.document_archive, type.uncompressed_size_in_bytes)
+        with progress.stage("indexing"):
+            # the offset table is only rebuilt if the data file has changed since it has been created
+            io.prepare_file_offset_table(decompressed_file_path, offset_table_stride)
+        progress.finish_one()
+
+    offset_table_stride = cfg.opts("benchmarks", "offset.table.stride", mandatory=False, default_value=io.DEFAULT_OFFSET_TABLE_STRIDE)
+    verify_corpus = cfg.opts("benchmarks", "corpus.verify", mandatory=False, default_value=False)
+    index_from_archive = cfg.opts("benchmarks", "index.from.archive", mandatory=False, default_value=False)
+    concurrency = cfg.opts("benchmarks", "track.preparation.concurrency", mandatory=False,
+                           default_value=DEFAULT_TRACK_PREPARATION_CONCURRENCY)
+    # types may share an archive but we must prepare each archive only once
+    types = {}
     for index in track.indices:
         for type in index.types:
-            if type.document_archive:
-                data_url = "%s/%s" % (track.source_root_url, os.path.basename(type.document_archive))
-                download(cfg, data_url, type.document_archive, type.compressed_size_in_bytes)
-                decompressed_file_path, was_decompressed = decompress(type.document_archive, type.uncompressed_size_in_bytes)
-                # just rebuild the file every time for the time being. Later on, we might check the data file fingerprint to avoid it
-                io.prepare_file_offset_table(decompressed_file_path)
+            if type.document_archive and type.document_archive not in types:
+                types[type.document_archive] = type
+    if not types:
+        return
+    progress = PreparationProgress(len(types))
+    try:
+        with concurrent.futures.ThreadPoolExecutor(max_workers=concurrency) as download_pool, \
+                concurrent.futures.ThreadPoolExecutor(max_workers=concurrency) as preparation_pool:
+            downloads = {}
+            for type in types.values():
+                url = "%s/%s" % (track.source_root_url, os.path.basename(type.document_archive))
+                downloads[download_pool.submit(download, cfg, url, type.document_archive, type.compressed_size_in_bytes)] = type
+            futures = list(downloads)
+            pending = set(futures)
+            try:
+                while pending:
+                    done, pending = concurrent.futures.wait(pending, return_when=concurrent.futures.FIRST_COMPLETED)
+                    for f in done:
+                        f.result()
+                        if f in downloads:
+                            # prepare the data as soon as they are available
+                            preparation = preparation_pool.submit(prepare, downloads[f])
+                            futures.append(preparation)
+                            pending.add(preparation)
+            except BaseException:
+                # don't start to prepare any other types (running tasks finish before the pools shut down)
+                for f in futures:
+                    f.cancel()
+                raise
+    finally:
+        progress.finish()
+
+
+def convert_corpus(cfg):
+    """
+    Builds the bulk requests for the documents of a track ahead of time and stores them in bulk files (one per type) that bulk operations
+    with the reader ``bulk-file`` send as is.
+
+    :param cfg: The config object. It contains the name of the track, the bulk size and optionally the index and type to convert.
+    """
+    t = load_track(cfg)
+    index_name = cfg.opts("convert", "index", mandatory=False)
+    type_name = cfg.opts("convert", "type", mandatory=False)
+    bulk_size = cfg.opts("convert", "bulk.size")
+    types = [(index, type) for index in t.indices for type in index.types
+             if (not index_name or index.name == index_name) and (not type_name or type.name == type_name)]
+    if not types:
+        raise exceptions.SystemSetupError("Track [%s] does not contain type [%s] in index [%s]." %
+                                          (t, type_name if type_name else "*", index_name if index_name else "*"))
+    prepare_track(t, cfg)
+    for index, type in types:
+        console.info("Converting documents of [%s/%s] to bulk requests with [%d] documents ... " % (index, type, bulk_size),
+                     end="", flush=True, logger=logger)
+        path, bulks, docs = params.convert_to_bulk_file(index, type, bulk_size)
+        console.println("[OK]")
+        logger.info("Wrote [%d] bulk requests with [%d] documents to [%s]." % (bulks, docs, path))
 
 
 class TrackRepository:
@@ -301,8 +441,9 @@ class TrackPluginReader:
     """
     Loads track plugins
     """
-    def __init__(self, runner_registry):
+    def __init__(self, runner_registry, scheduler_registry):
         self.runner_registry = runner_registry
+        self.scheduler_registry = scheduler_registry
 
     def __call__(self, track_plugin_file):
         loader = importlib.machinery.SourceFileLoader("track", track_plugin_file)
@@ -317,6 +458,9 @@ class TrackPluginReader:
     def register_runner(self, name, runner):
         self.runner_registry(name, runner)
 
+    def register_scheduler(self, name, scheduler):
+        self.scheduler_registry(name, scheduler)
+
 
 class TrackSpecificationReader:
     """
@@ -422,7 +566,11 @@ class TrackSpecificationReader:
         # now descent to each operation
         tasks = []
         for task in self._r(ops_spec, "tasks", error_ctx="parallel"):
-            tasks.append(self.parse_task(task, ops, challenge_name, default_warmup_iterations, default_iterations))
+            parsed_task = self.parse_task(task, ops, challenge_name, default_warmup_iterations, default_iterations)
+            if parsed_task.saturation_search:
+                self._error("Task '%s' in challenge '%s' defines a saturation search which is not supported for parallel tasks." %
+                            (parsed_task.operation.name, challenge_name))
+            tasks.append(parsed_task)
         return track.Parallel(tasks, clients)
 
     def parse_task(self, task_spec, ops, challenge_name, default_warmup_iterations=0, default_iterations=1):
@@ -436,7 +584,59 @@ class TrackSpecificationReader:
                           warmup_time_period=self._r(task_spec, "warmup-time-period", error_ctx=op_name, mandatory=False),
                           iterations=self._r(task_spec, "iterations", error_ctx=op_name, mandatory=False, default_value=default_iterations),
                           clients=self._r(task_spec, "clients", error_ctx=op_name, mandatory=False, default_value=1),
-                          target_throughput=self._r(task_spec, "target-throughput", error_ctx=op_name, mandatory=False))
+                          target_throughput=self._r(task_spec, "target-throughput", error_ctx=op_name, mandatory=False),
+                          schedule=self._r(task_spec, "schedule", error_ctx=op_name, mandatory=False, default_value="deterministic"),
+                          open_loop=self._r(task_spec, "open-loop", error_ctx=op_name, mandatory=False, default_value=False),
+                          max_in_flight=self._r(task_spec, "max-in-flight", error_ctx=op_name, mandatory=False,
+                                                default_value=track.Task.DEFAULT_MAX_IN_FLIGHT),
+                          throughput_profile=self.parse_throughput_profile(task_spec, op_name),
+                          saturation_search=self.parse_saturation_search(task_spec, op_name))
+
+    def parse_saturation_search(self, task_spec, op_name):
+        search_spec = self._r(task_spec, "saturation-search", error_ctx=op_name, mandatory=False)
+        if search_spec is None:
+            return None
+        if "target-throughput" in task_spec or "throughput-profile" in task_spec:
+            self._error("Task '%s' specifies 'saturation-search' which cannot be combined with 'target-throughput' or "
+                        "'throughput-profile'." % op_name)
+        ctx = "%s.saturation-search" % op_name
+        return track.SaturationSearch(latency_percentile=self._r(search_spec, "latency-percentile", error_ctx=ctx, mandatory=False,
+                                                                 default_value=99),
+                                      max_latency=self._r(search_spec, "max-latency", error_ctx=ctx),
+                                      initial_throughput=self._r(search_spec, "initial-throughput", error_ctx=ctx),
+                                      probe_duration=self._r(search_spec, "probe-duration", error_ctx=ctx),
+                                      max_probes=self._r(search_spec, "max-probes", error_ctx=ctx, mandatory=False, default_value=10),
+                                      precision=self._r(search_spec, "precision", error_ctx=ctx, mandatory=False, default_value=0.05))
+
+    def parse_throughput_profile(self, task_spec, op_name):
+        profile_spec = self._r(task_spec, "throughput-profile", error_ctx=op_name, mandatory=False)
+        if profile_spec is None:
+            return None
+        if "target-throughput" in task_spec:
+            self._error("Task '%s' specifies 'target-throughput' and 'throughput-profile' but only one of them is allowed." % op_name)
+        if "ramp" in profile_spec:
+            ramp_spec = profile_spec["ramp"]
+            ctx = "%s.throughput-profile.ramp" % op_name
+            start = self._r(ramp_spec, "start", error_ctx=ctx)
+            end = self._r(ramp_spec, "end", error_ctx=ctx)
+            duration = self._r(ramp_spec, "duration", error_ctx=ctx)
+            if start <= 0 or end <= 0 or duration <= 0:
+                self._error("'start', 'end' and 'duration' of the throughput profile of task '%s' must be positive." % op_name)
+            return track.RampProfile(start, end, duration, self._r(ramp_spec, "interval", error_ctx=ctx, mandatory=False))
+        elif "steps" in profile_spec:
+            steps = []
+            ctx = "%s.throughput-profile.steps" % op_name
+            for step_spec in profile_spec["steps"]:
+                target_throughput = self._r(step_spec, "target-throughput", error_ctx=ctx)
+                duration = self._r(step_spec, "duration", error_ctx=ctx)
+                if target_throughput <= 0 or duration <= 0:
+                    self._error("'target-throughput' and 'duration' of each step of task '%s' must be positive." % op_name)
+                steps.append((target_throughput, duration))
+            if len(steps) == 0:
+                self._error("The throughput profile of task '%s' must contain at least one step." % op_name)
+            return track.StepProfile(steps)
+        else:
+            self._error("The throughput profile of task '%s' must either define 'ramp' or 'steps'." % op_name)
 
     def parse_operations(self, ops_specs):
         # key = name, value = operation
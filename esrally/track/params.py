@@ -1,12 +1,21 @@
+import collections
+import json
 import logging
+import math
+import mmap
+import os
+import queue
 import random
+import re
+import threading
 import time
 import types
+import weakref
 from enum import Enum
 
-from esrally import exceptions
+from esrally import exceptions, client, PROGRAM_NAME
 from esrally.track import track
-from esrally.utils import io
+from esrally.utils import io, archive, bulkfile
 
 logger = logging.getLogger("rally.track")
 
@@ -94,6 +103,15 @@ class ParamSource:
         """
         return 1
 
+    def size_is_estimate(self):
+        """
+        Override this method if `#size()` can only be estimated. Rally will then invoke `#params()` until it raises ``StopIteration``
+        instead of exactly `#size()` times.
+
+        :return: ``True`` iff the size of this parameter source is an estimate.
+        """
+        return False
+
     def params(self):
         """
         :return: A hash containing the parameters that will be provided to the corresponding operation runner (key: parameter name,
@@ -111,6 +129,233 @@ class DelegatingParamSource(ParamSource):
         return self.delegate(self.indices, self._params)
 
 
+class PrefetchingParamSource(ParamSource):
+    """
+    Wraps a (partitioned) parameter source and generates its parameters ahead of time in a background thread so expensive parameter
+    generation (e.g. reading bulk bodies from a data file) does not happen on the client's hot path. At most `buffer_size` parameters are
+    generated in advance.
+    """
+
+    # marks that the delegate is exhausted
+    _EXHAUSTED = object()
+    # how often the prefetching thread checks whether it should stop while the buffer is full
+    _POLL_INTERVAL_SECONDS = 0.1
+
+    def __init__(self, delegate, buffer_size):
+        """
+        :param delegate: The parameter source whose parameters should be prefetched.
+        :param buffer_size: The maximum number of parameters that are generated ahead of time. Must be positive.
+        """
+        # custom parameter sources do not necessarily inherit from ParamSource
+        super().__init__(getattr(delegate, "indices", None), {})
+        if buffer_size < 1:
+            raise exceptions.RallyAssertionError("The buffer size of a prefetching parameter source must be positive but is [%s]."
+                                                 % str(buffer_size))
+        self.delegate = delegate
+        self.buffer_size = buffer_size
+        self.exhausted = False
+        self._buffer = queue.Queue(maxsize=buffer_size)
+        self._stopped = threading.Event()
+        # Only pass the buffer and stop flag to the thread (not self) so this object can be garbage-collected when its client is done
+        # with it. This stops the thread even if the delegate is not exhausted (e.g. when a task runs for a fixed time period).
+        self._thread = threading.Thread(target=PrefetchingParamSource._prefetch, args=(delegate, self._buffer, self._stopped),
+                                        name="param-prefetcher", daemon=True)
+        weakref.finalize(self, self._stopped.set)
+        self._thread.start()
+
+    @staticmethod
+    def _prefetch(delegate, buffer, stopped):
+        while not stopped.is_set():
+            try:
+                element = (delegate.params(), None)
+            except StopIteration:
+                element = (PrefetchingParamSource._EXHAUSTED, None)
+            except BaseException as e:
+                # raise it in the client that consumes the parameters
+                element = (None, e)
+            while not stopped.is_set():
+                try:
+                    buffer.put(element, timeout=PrefetchingParamSource._POLL_INTERVAL_SECONDS)
+                    break
+                except queue.Full:
+                    pass
+            if element[0] is PrefetchingParamSource._EXHAUSTED or element[1] is not None:
+                return
+
+    def partition(self, partition_index, total_partitions):
+        raise exceptions.RallyError("Cannot partition a PrefetchingParamSource")
+
+    def size(self):
+        return self.delegate.size()
+
+    def size_is_estimate(self):
+        return has_estimated_size(self.delegate)
+
+    def params(self):
+        if self.exhausted:
+            raise StopIteration()
+        params, error = self._buffer.get()
+        if params is PrefetchingParamSource._EXHAUSTED or error is not None:
+            self.exhausted = True
+        if params is PrefetchingParamSource._EXHAUSTED:
+            raise StopIteration()
+        if error is not None:
+            raise error
+        return params
+
+    def close(self):
+        """
+        Stops prefetching. Parameters that have already been prefetched are discarded.
+        """
+        self._stopped.set()
+
+
+class PreloadedParamSource(ParamSource):
+    """
+    Provides parameters that have been generated in advance and are held in memory (see ``preload_params``).
+    """
+
+    def __init__(self, delegate, preloaded_params, size_in_bytes=0):
+        """
+        :param delegate: The parameter source that has generated the parameters.
+        :param preloaded_params: A list of parameters.
+        :param size_in_bytes: The (estimated) memory usage of all parameters.
+        """
+        # custom parameter sources do not necessarily inherit from ParamSource
+        super().__init__(getattr(delegate, "indices", None), {})
+        self.preloaded_params = collections.deque(preloaded_params)
+        self.size_in_bytes = size_in_bytes
+        self._size = len(preloaded_params)
+
+    def partition(self, partition_index, total_partitions):
+        raise exceptions.RallyError("Cannot partition a PreloadedParamSource")
+
+    def size(self):
+        return self._size
+
+    def params(self):
+        try:
+            return self.preloaded_params.popleft()
+        except IndexError:
+            raise StopIteration()
+
+
+class CompressingParamSource(ParamSource):
+    """
+    Wraps a (partitioned) parameter source and compresses the request bodies of its parameters with gzip so clients that use the client
+    option ``compressed`` send them as is. Wrap it in a ``PrefetchingParamSource`` or preload it so bodies are compressed before the
+    request is issued. Bodies other than bulk bodies (e.g. queries) usually repeat and each distinct body is compressed only once.
+    """
+
+    # upper bound for the number of distinct compressed bodies that are cached
+    MAX_CACHED_BODIES = 1024
+
+    def __init__(self, delegate):
+        """
+        :param delegate: The parameter source whose request bodies should be compressed.
+        """
+        # custom parameter sources do not necessarily inherit from ParamSource
+        super().__init__(getattr(delegate, "indices", None), {})
+        self.delegate = delegate
+        self._compressed_bodies = {}
+
+    def partition(self, partition_index, total_partitions):
+        raise exceptions.RallyError("Cannot partition a CompressingParamSource")
+
+    def size(self):
+        return self.delegate.size()
+
+    def size_is_estimate(self):
+        return has_estimated_size(self.delegate)
+
+    def params(self):
+        return self.compressed(self.delegate.params())
+
+    def compressed(self, params):
+        body = params.get("body") if isinstance(params, dict) else None
+        if body is None or isinstance(body, client.CompressedBody):
+            return params
+        params = dict(params)
+        if isinstance(body, list) and all(isinstance(line, str) for line in body):
+            # the runner cannot count the documents of a compressed bulk body
+            params["bulk-size"] = len(body) // 2
+            params["body"] = client.compress(_encoded(params)["body"])
+        elif isinstance(body, bytes):
+            # each document is preceded by a meta-data line
+            params["bulk-size"] = body.count(b"\n") // 2
+            params["body"] = client.compress(body)
+        else:
+            encoded_body = body.encode("utf-8") if isinstance(body, str) else json.dumps(body).encode("utf-8")
+            compressed_body = self._compressed_bodies.get(encoded_body)
+            if compressed_body is None:
+                compressed_body = client.compress(encoded_body)
+                if len(self._compressed_bodies) < CompressingParamSource.MAX_CACHED_BODIES:
+                    # only the first request with this body accounts for the time needed to compress it
+                    self._compressed_bodies[encoded_body] = client.CompressedBody(compressed_body, len(encoded_body), 0)
+            params["body"] = compressed_body
+        return params
+
+
+def has_estimated_size(param_source):
+    """
+    :param param_source: A parameter source.
+    :return: ``True`` iff the size of the parameter source is an estimate and it needs to be invoked until it is exhausted.
+    """
+    # custom parameter sources do not necessarily inherit from ParamSource
+    size_is_estimate = getattr(param_source, "size_is_estimate", None)
+    return size_is_estimate is not None and size_is_estimate()
+
+
+def preload_params(param_source, memory_budget_bytes):
+    """
+    Generates all parameters of a (partitioned) parameter source in advance. Bulk bodies that consist of lines are encoded as a single
+    ``bytes`` object that can be sent as is. Only parameter sources that are exhausted after ``size()`` calls (i.e. with a size greater
+    than one) or whose size is an estimate are preloaded. Bulks whose size adapts to the service time cannot be created in advance.
+
+    :param param_source: A parameter source.
+    :param memory_budget_bytes: The maximum (estimated) number of bytes that the parameters may use.
+    :return: A ``PreloadedParamSource`` or ``None`` if the parameter source cannot be preloaded or exceeds the memory budget.
+    """
+    size = param_source.size()
+    if size <= 1:
+        return None
+    estimated_size = has_estimated_size(param_source)
+    preloaded = []
+    size_in_bytes = 0
+    while estimated_size or len(preloaded) < size:
+        try:
+            params = _encoded(param_source.params())
+        except StopIteration:
+            break
+        if "bulk-sizer" in params:
+            # the bulk size adapts to the service time of previous bulk requests
+            return None
+        size_in_bytes += _estimated_size(params)
+        if size_in_bytes > memory_budget_bytes:
+            return None
+        preloaded.append(params)
+    return PreloadedParamSource(param_source, preloaded, size_in_bytes)
+
+
+def _encoded(params):
+    body = params.get("body") if isinstance(params, dict) else None
+    if isinstance(body, list) and all(isinstance(line, str) for line in body):
+        params = dict(params)
+        params["body"] = ("\n".join(body) + "\n").encode("utf-8")
+    return params
+
+
+def _estimated_size(params):
+    # we only account for the payload (which dominates memory usage for bulk requests)
+    size = 0
+    for v in params.values() if isinstance(params, dict) else []:
+        if isinstance(v, (bytes, str)):
+            size += len(v)
+        elif isinstance(v, list):
+            size += sum(len(e) for e in v if isinstance(e, (bytes, str)))
+    return size
+
+
 class SearchParamSource(ParamSource):
     def __init__(self, indices, params):
         super().__init__(indices, params)
@@ -176,18 +421,44 @@ class BulkIndexParamSource(ParamSource):
         else:
             raise exceptions.InvalidSyntax("Unknown index id conflict type [%s]." % id_conflicts)
         self.pipeline = params.get("pipeline", None)
-        try:
-            self.bulk_size = int(params["bulk-size"])
-            if self.bulk_size <= 0:
-                raise exceptions.InvalidSyntax("'bulk-size' must be positive but was %d" % self.bulk_size)
-        except KeyError:
-            raise exceptions.InvalidSyntax("Mandatory parameter 'bulk-size' is missing")
-        except ValueError:
-            raise exceptions.InvalidSyntax("'bulk-size' must be numeric")
+        self.reader = params.get("reader", "lines")
+        if self.reader == "lines":
+            self.create_reader = create_default_reader
+        elif self.reader == "mmap":
+            self.create_reader = create_mmap_reader
+        elif self.reader == "bulk-file":
+            self.create_reader = None
+            if self.id_conflicts != IndexIdConflict.NoConflicts:
+                raise exceptions.InvalidSyntax("The reader 'bulk-file' does not support id conflicts.")
+        else:
+            raise exceptions.InvalidSyntax("Unknown reader [%s]. Use either 'lines', 'mmap' or 'bulk-file'." % self.reader)
+        self.bulk_size = _positive_number(params, "bulk-size")
+        self.bulk_size_bytes = _positive_number(params, "bulk-size-bytes")
+        if self.bulk_size is None and self.bulk_size_bytes is None:
+            raise exceptions.InvalidSyntax("Mandatory parameter 'bulk-size' or 'bulk-size-bytes' is missing")
+        target_service_time = _positive_number(params, "target-bulk-service-time")
+        self.target_service_time = target_service_time / 1000 if target_service_time else None
+        self.min_bulk_size = _positive_number(params, "min-bulk-size", 1)
+        self.max_bulk_size = _positive_number(params, "max-bulk-size")
+        if self.target_service_time and self.bulk_size is None:
+            raise exceptions.InvalidSyntax("'target-bulk-service-time' requires 'bulk-size' as the initial bulk size")
+        if self.reader == "bulk-file" and (self.bulk_size_bytes or self.target_service_time):
+            raise exceptions.InvalidSyntax("The reader 'bulk-file' requires a fixed 'bulk-size'.")
+
+    def create_bulk_sizer(self):
+        """
+        :return: A new ``BulkSizer`` (each client adapts its bulk size independently).
+        """
+        if self.target_service_time:
+            return AdaptiveBulkSizer(self.bulk_size, self.target_service_time, self.min_bulk_size, self.max_bulk_size, self.bulk_size_bytes)
+        else:
+            return BulkSizer(self.bulk_size, self.bulk_size_bytes)
 
     def partition(self, partition_index, total_partitions):
-        return PartitionBulkIndexParamSource(self.indices, partition_index, total_partitions, self.bulk_size, self.id_conflicts,
-                                             self.pipeline)
+        if self.reader == "bulk-file":
+            return BulkFileParamSource(self.indices, partition_index, total_partitions, self.bulk_size, self.pipeline)
+        return PartitionBulkIndexParamSource(self.indices, partition_index, total_partitions, self.create_bulk_sizer(), self.id_conflicts,
+                                             self.pipeline, self.create_reader)
 
     def params(self):
         raise exceptions.RallyError("Do not use a BulkIndexParamSource without partitioning")
@@ -196,49 +467,254 @@ class BulkIndexParamSource(ParamSource):
         raise exceptions.RallyError("Do not use a BulkIndexParamSource without partitioning")
 
 
+def _positive_number(params, key, default_value=None):
+    try:
+        value = int(params[key])
+    except KeyError:
+        return default_value
+    except ValueError:
+        raise exceptions.InvalidSyntax("'%s' must be numeric" % key)
+    if value <= 0:
+        raise exceptions.InvalidSyntax("'%s' must be positive but was %d" % (key, value))
+    return value
+
+
+class BulkSizer:
+    """
+    Determines where bulk requests are cut: after a maximum number of documents, before a bulk request would exceed a maximum number of
+    bytes or whatever happens first. A bulk request contains at least one document.
+    """
+
+    def __init__(self, docs=None, size_in_bytes=None):
+        """
+        :param docs: The maximum number of documents per bulk request. ``None`` if unlimited.
+        :param size_in_bytes: The maximum size of a bulk request body in bytes. ``None`` if unlimited.
+        """
+        self.docs = docs
+        self.size_in_bytes = size_in_bytes
+
+    def max_docs(self):
+        return self.docs
+
+    def max_bytes(self):
+        return self.size_in_bytes
+
+    def estimated_bulks(self, num_docs, bytes_per_doc=None):
+        """
+        :param num_docs: The number of documents to index.
+        :param bytes_per_doc: The average size of a document (including its meta-data line) in bytes if known.
+        :return: The (estimated) number of bulk requests that are needed to index these documents.
+        """
+        docs_per_bulk = self.max_docs()
+        if self.max_bytes() and bytes_per_doc:
+            docs_per_bulk = min(docs_per_bulk or num_docs, max(self.max_bytes() // bytes_per_doc, 1))
+        if not docs_per_bulk:
+            # we cannot estimate it without knowing the document size
+            docs_per_bulk = num_docs
+        return math.ceil(num_docs / docs_per_bulk) if num_docs > 0 else 0
+
+    def record(self, docs, service_time):
+        """
+        Called after each bulk request has been sent.
+
+        :param docs: The number of documents in the bulk request.
+        :param service_time: The service time of the bulk request in seconds.
+        """
+        pass
+
+
+class AdaptiveBulkSizer(BulkSizer):
+    """
+    Grows or shrinks the number of documents per bulk request between requests so bulk requests take a target service time. The bulk size
+    is derived from a moving average of the service time per document and changes at most by a factor of two per request.
+    """
+    # weight of the most recent bulk request in the moving average
+    SMOOTHING = 0.3
+
+    def __init__(self, initial_docs, target_service_time, min_docs=1, max_docs=None, size_in_bytes=None):
+        """
+        :param initial_docs: The number of documents in the first bulk request.
+        :param target_service_time: The target service time of a bulk request in seconds.
+        :param min_docs: The minimum number of documents per bulk request. Default: 1.
+        :param max_docs: The maximum number of documents per bulk request. ``None`` if unlimited.
+        :param size_in_bytes: The maximum size of a bulk request body in bytes. ``None`` if unlimited.
+        """
+        super().__init__(initial_docs, size_in_bytes)
+        self.target_service_time = target_service_time
+        self.min_docs = min_docs
+        self.max_docs_limit = max_docs
+        self.service_time_per_doc = None
+        self.lock = threading.Lock()
+
+    def record(self, docs, service_time):
+        if docs <= 0 or service_time <= 0:
+            return
+        # requests may be issued concurrently (open-loop)
+        with self.lock:
+            current = service_time / docs
+            if self.service_time_per_doc is None:
+                self.service_time_per_doc = current
+            else:
+                self.service_time_per_doc = AdaptiveBulkSizer.SMOOTHING * current + \
+                                            (1 - AdaptiveBulkSizer.SMOOTHING) * self.service_time_per_doc
+            target_docs = self.target_service_time / self.service_time_per_doc
+            target_docs = min(max(target_docs, self.docs / 2), self.docs * 2)
+            if self.max_docs_limit:
+                target_docs = min(target_docs, self.max_docs_limit)
+            self.docs = max(int(target_docs), self.min_docs)
+
+
 class PartitionBulkIndexParamSource(ParamSource):
-    def __init__(self, indices, partition_index, total_partitions, bulk_size, id_conflicts=None, pipeline=None):
+    def __init__(self, indices, partition_index, total_partitions, bulk_size, id_conflicts=None, pipeline=None,
+                 create_reader=None):
         """
 
         :param indices: Specification of affected indices.
         :param partition_index: The current partition index.  Must be in the range [0, `total_partitions`).
         :param total_partitions: The total number of partitions (i.e. clietns) for bulk index operations.
-        :param bulk_size: The size of bulk index operations (number of documents per bulk).
+        :param bulk_size: The size of bulk index operations, either the number of documents per bulk or a ``BulkSizer``.
         :param id_conflicts: The type of id conflicts.
         :param pipeline: The name of the ingest pipeline to run.
+        :param create_reader: A function to create the index reader. Default: ``create_default_reader``.
         """
         super().__init__(indices, {})
         self.partition_index = partition_index
         self.total_partitions = total_partitions
-        self.bulk_size = bulk_size
+        self.bulk_sizer = bulk_size if isinstance(bulk_size, BulkSizer) else BulkSizer(bulk_size)
         self.id_conflicts = id_conflicts
         self.pipeline = pipeline
-        self.internal_params = bulk_data_based(total_partitions, partition_index, indices, bulk_size, id_conflicts, pipeline)
+        self.internal_params = bulk_data_based(total_partitions, partition_index, indices, self.bulk_sizer, id_conflicts, pipeline,
+                                               create_reader if create_reader else create_default_reader)
 
     def partition(self, partition_index, total_partitions):
         raise exceptions.RallyError("Cannot partition a PartitionBulkIndexParamSource further")
 
     def params(self):
-        return next(self.internal_params)
+        params = next(self.internal_params)
+        if isinstance(self.bulk_sizer, AdaptiveBulkSizer):
+            # the runner reports the service time of each bulk request so the bulk size can adapt
+            params["bulk-sizer"] = self.bulk_sizer
+        return params
 
     def size(self):
         return self.number_of_bulks()
 
+    def size_is_estimate(self):
+        return self.bulk_sizer.max_bytes() is not None or isinstance(self.bulk_sizer, AdaptiveBulkSizer)
+
     def number_of_bulks(self):
         """
-        :return: The number of bulk operations that the given client will issue.
+        :return: The number of bulk operations that the given client will issue. If bulk requests are cut by size or their size adapts
+                 to the service time, this is an estimate.
         """
         bulks = 0
         for index in self.indices:
             for type in index.types:
                 offset, num_docs = bounds(type.number_of_documents, self.partition_index, self.total_partitions)
-                complete_bulks, rest = (num_docs // self.bulk_size, num_docs % self.bulk_size)
-                bulks += complete_bulks
-                if rest > 0:
-                    bulks += 1
+                doc_size = bytes_per_doc(index, type) if self.bulk_sizer.max_bytes() else None
+                bulks += self.bulk_sizer.estimated_bulks(num_docs, doc_size)
         return bulks
 
 
+def bytes_per_doc(index, type):
+    """
+    :return: The average size in bytes of a document of this type in a bulk request (including its meta-data line) or ``None`` if unknown.
+    """
+    if type.uncompressed_size_in_bytes:
+        data_size = type.uncompressed_size_in_bytes
+    elif type.document_file and os.path.isfile(type.document_file):
+        data_size = os.path.getsize(type.document_file)
+    else:
+        return None
+    if not type.number_of_documents:
+        return None
+    return data_size // type.number_of_documents + len(_action_line(index.name, type.name)) + 1
+
+
+def _action_line(index_name, type_name):
+    return '{"index": {"_index": "%s", "_type": "%s"}}' % (index_name, type_name)
+
+
+class BulkFileParamSource(ParamSource):
+    """
+    Provides bulk requests that have been built ahead of time with ``esrally convert-corpus`` (see ``convert_to_bulk_file``). Bodies are
+    read from the bulk file as is, so the client neither reads documents line by line nor builds the request body.
+    """
+
+    def __init__(self, indices, partition_index, total_partitions, bulk_size, pipeline=None):
+        """
+        :param indices: Specification of affected indices.
+        :param partition_index: The current partition index.  Must be in the range [0, `total_partitions`).
+        :param total_partitions: The total number of partitions (i.e. clients) for bulk index operations.
+        :param bulk_size: The size of bulk index operations (number of documents per bulk).
+        :param pipeline: The name of the ingest pipeline to run.
+        """
+        super().__init__(indices, {})
+        self.partition_index = partition_index
+        self.total_partitions = total_partitions
+        self.bulk_size = bulk_size
+        self.pipeline = pipeline
+        self.bulks = 0
+        readers = []
+        for index in indices:
+            for type in index.types:
+                path = bulkfile.bulk_file_path(type.document_file, index.name, type.name, bulk_size)
+                if not bulkfile.exists(path):
+                    raise exceptions.DataError("There are no pre-built bulk requests for [%s/%s] with a bulk size of [%d]. Please create "
+                                               "them with %s convert-corpus --index=%s --type=%s --bulk-size=%d." %
+                                               (index, type, bulk_size, PROGRAM_NAME, index, type, bulk_size))
+                _, _, offsets = bulkfile.load_offset_index(path)
+                # bodies cannot be split so we distribute whole bodies evenly across clients
+                start = len(offsets) * partition_index // total_partitions
+                end = len(offsets) * (partition_index + 1) // total_partitions
+                if end > start:
+                    logger.info("Client [%d] will send bulk requests [%d] to [%d] from [%s]." % (partition_index, start, end - 1, path))
+                    readers.append(bulkfile.BulkFileReader(path, offsets[start], end - start))
+                    self.bulks += end - start
+                else:
+                    logger.info("Client [%d] skips [%s/%s] (no bulk requests to send)." % (partition_index, index, type))
+        self.internal_params = self._bulks(chain(*readers))
+
+    def _bulks(self, reader):
+        for body in reader:
+            params = {"body": body}
+            if self.pipeline:
+                params["pipeline"] = self.pipeline
+            yield params
+
+    def partition(self, partition_index, total_partitions):
+        raise exceptions.RallyError("Cannot partition a BulkFileParamSource further")
+
+    def params(self):
+        return next(self.internal_params)
+
+    def size(self):
+        return self.bulks
+
+
+def convert_to_bulk_file(index, type, bulk_size):
+    """
+    Builds all bulk requests for the documents of a type ahead of time and stores them in a bulk file next to its data file.
+
+    :param index: The index that the documents are indexed into.
+    :param type: The type whose documents should be converted.
+    :param bulk_size: The number of documents per bulk request.
+    :return: A tuple of the path to the bulk file, the number of bulk requests and the number of documents.
+    """
+    path = bulkfile.bulk_file_path(type.document_file, index.name, type.name, bulk_size)
+    with bulkfile.BulkFileWriter(path, bulk_size) as writer, \
+            create_mmap_reader(index, type, 0, type.number_of_documents, bulk_size, None) as reader:
+        for body in reader:
+            if isinstance(body, list):
+                # the line-based reader (used for archives) provides meta-data lines and documents separately
+                docs = len(body) // 2
+                body = ("\n".join(body) + "\n").encode("utf-8")
+            else:
+                docs = body.count(b"\n") // 2
+            writer.add(body, docs)
+    return path, len(writer.offsets), writer.docs
+
+
 def build_conflicting_ids(conflicts, docs_to_index, offset):
     if conflicts is None or conflicts == IndexIdConflict.NoConflicts:
         return None
@@ -268,10 +744,36 @@ def chain(*iterables):
 
 
 def create_default_reader(index, type, offset, num_docs, bulk_size, id_conflicts):
+    if reads_from_archive(type):
+        return create_archive_reader(index, type, offset, num_docs, bulk_size, id_conflicts)
     return IndexDataReader(type.document_file, num_docs,
                            build_conflicting_ids(id_conflicts, num_docs, offset), index.name, type.name, bulk_size, offset)
 
 
+def create_mmap_reader(index, type, offset, num_docs, bulk_size, id_conflicts):
+    if reads_from_archive(type):
+        logger.warning("[%s] has not been decompressed. Reading documents line by line from [%s] instead of memory-mapping it." %
+                       (type.document_file, type.document_archive))
+        return create_archive_reader(index, type, offset, num_docs, bulk_size, id_conflicts)
+    return MmapIndexDataReader(type.document_file, num_docs,
+                               build_conflicting_ids(id_conflicts, num_docs, offset), index.name, type.name, bulk_size, offset)
+
+
+def create_archive_reader(index, type, offset, num_docs, bulk_size, id_conflicts):
+    return ArchiveIndexDataReader(type.document_archive, num_docs,
+                                  build_conflicting_ids(id_conflicts, num_docs, offset), index.name, type.name, bulk_size, offset)
+
+
+def reads_from_archive(type):
+    """
+    :param type: A type of a track.
+    :return: ``True`` iff documents for this type are read directly from its compressed archive (i.e. the archive has been prepared
+             with a block index instead of being decompressed).
+    """
+    return type.document_archive is not None and not os.path.isfile(type.document_file) and \
+        archive.has_block_index(type.document_archive)
+
+
 def bounds(total_docs, client_index, num_clients):
     """
 
@@ -300,11 +802,11 @@ def bulk_data_based(num_clients, client_index, indices, bulk_size, id_conflicts,
     :param num_clients: The total number of clients that will run the bulk operation.
     :param client_index: The current client for which we calculated the schedule. Must be in the range [0, `num_clients').
     :param indices: Specification of affected indices.
-    :param bulk_size: The size of bulk index operations (number of documents per bulk).
+    :param bulk_size: The size of bulk index operations, either the number of documents per bulk or a ``BulkSizer``.
     :param id_conflicts: The type of id conflicts to simulate.
     :param pipeline: Name of the ingest pipeline to use. May be None.
-    :param create_reader: A function to create the index reader. By default a file based index reader will be created. This parameter is
-                          intended for testing only.
+    :param create_reader: A function to create the index reader. By default a file based index reader will be created that reads
+                          documents line by line.
     :return: A generator for the bulk operations of the given client.
     """
 
@@ -351,17 +853,26 @@ class IndexDataReader:
     """
 
     def __init__(self, data_file, docs_to_index, conflicting_ids, index_name, type_name, bulk_size, offset=0, file_source=FileSource):
+        """
+        :param bulk_size: Either the number of documents per bulk or a ``BulkSizer``.
+        """
         self.data_file = data_file
         self.docs_to_index = docs_to_index
         self.conflicting_ids = conflicting_ids
         self.index_name = index_name
         self.type_name = type_name
-        self.bulk_size = bulk_size
+        self.bulk_sizer = bulk_size if isinstance(bulk_size, BulkSizer) else BulkSizer(bulk_size)
         self.id_up_to = 0
         self.current_bulk = 0
+        self.docs_read = 0
         self.offset = offset
         self.file_source = file_source
         self.f = None
+        self.end_of_file = False
+        # a document that did not fit into the previous bulk anymore
+        self.pending_line = None
+        # ids have a width of (at least) 10 characters
+        self.meta_data_size = len(_action_line(index_name, type_name)) + 1 + (len(', "_id": ""') + 10 if conflicting_ids else 0)
 
     def __enter__(self):
         self.f = self.file_source.open(self.data_file, 'rt')
@@ -383,16 +894,31 @@ class IndexDataReader:
         buffer = []
         try:
             docs_indexed = 0
-            docs_left = self.docs_to_index - (self.current_bulk * self.bulk_size)
-            if self.f is None or docs_left <= 0:
+            docs_left = self.docs_to_index - self.docs_read
+            if self.f is None or docs_left <= 0 or self.end_of_file:
                 raise StopIteration()
 
-            this_bulk_size = min(self.bulk_size, docs_left)
+            max_docs = self.bulk_sizer.max_docs()
+            max_bytes = self.bulk_sizer.max_bytes()
+            this_bulk_size = min(max_docs, docs_left) if max_docs else docs_left
+            bulk_bytes = 0
             while docs_indexed < this_bulk_size:
-                line = self.f.readline()
+                if self.pending_line is not None:
+                    line, self.pending_line = self.pending_line, None
+                else:
+                    line = self.f.readline()
                 if len(line) == 0:
+                    self.end_of_file = True
                     break
+                raw_line = line
                 line = line.strip()
+                if max_bytes:
+                    # corpora are mostly ASCII so we count characters instead of encoding each document
+                    doc_bytes = self.meta_data_size + len(line) + 1
+                    if docs_indexed > 0 and bulk_bytes + doc_bytes > max_bytes:
+                        self.pending_line = raw_line
+                        break
+                    bulk_bytes += doc_bytes
                 if self.conflicting_ids is not None:
                     # 25% of the time we replace a doc:
                     if self.id_up_to > 0 and random.randint(0, 3) == 3:
@@ -409,6 +935,9 @@ class IndexDataReader:
 
                 docs_indexed += 1
 
+            if docs_indexed == 0:
+                raise StopIteration()
+            self.docs_read += docs_indexed
             self.current_bulk += 1
             return buffer
         except IOError:
@@ -421,5 +950,150 @@ class IndexDataReader:
         return False
 
 
+class ArchiveIndexDataReader(IndexDataReader):
+    """
+    Reads documents like ``IndexDataReader`` but directly from a bz2 or gzip archive. The archive's block index is used to start
+    decompressing close to the first document that should be read.
+    """
+
+    def __enter__(self):
+        self.f = archive.ArchiveReader(self.data_file)
+        start = time.perf_counter()
+        self.f.skip_lines(self.offset)
+        end = time.perf_counter()
+        logger.info("Skipping %d lines in [%s] took %f s." % (self.offset, self.data_file, end - start))
+        return self
+
+
+class MmapIndexDataReader:
+    """
+    Reads an index file in bulks like ``IndexDataReader`` but memory-maps the file and creates each bulk as a single ``bytes`` object
+    that is ready to be sent to Elasticsearch (i.e. documents are neither decoded nor stripped and meta-data lines are interleaved).
+    """
+
+    def __init__(self, data_file, docs_to_index, conflicting_ids, index_name, type_name, bulk_size, offset=0):
+        """
+        :param bulk_size: Either the number of documents per bulk or a ``BulkSizer``.
+        """
+        self.data_file = data_file
+        self.docs_to_index = docs_to_index
+        self.conflicting_ids = conflicting_ids
+        self.index_name = index_name
+        self.type_name = type_name
+        self.bulk_sizer = bulk_size if isinstance(bulk_size, BulkSizer) else BulkSizer(bulk_size)
+        self.id_up_to = 0
+        self.current_bulk = 0
+        self.docs_read = 0
+        self.offset = offset
+        self.action = _action_line(index_name, type_name).encode("utf-8")
+        # bytes can't be %-formatted on Python 3.4 so we format the id into a str template
+        self.action_with_id = '{"index": {"_index": "%s", "_type": "%s", "_id": "%%s"}}' % (index_name, type_name)
+        # ids have a width of (at least) 10 characters
+        self.meta_data_size = len(self.action) + 1 + (len(', "_id": ""') + 10 if conflicting_ids else 0)
+        self.f = None
+        self.mm = None
+        # current position in the file
+        self.position = 0
+
+    def __enter__(self):
+        self.f = open(self.data_file, "rb")
+        self.mm = mmap.mmap(self.f.fileno(), 0, access=mmap.ACCESS_READ)
+        start = time.perf_counter()
+        self.position, remaining_lines = io.line_offset(self.data_file, self.offset)
+        if remaining_lines > 0:
+            self.position = self._end_of_lines(remaining_lines)
+        end = time.perf_counter()
+        logger.info("Skipping %d lines in [%s] took %f s." % (self.offset, self.data_file, end - start))
+        return self
+
+    def _end_of_lines(self, count):
+        """
+        :return: The position after the line break of at most ``count`` lines from the current position on.
+        """
+        # the regex engine finds line breaks much faster than we could in a loop
+        match = re.compile(("(?:[^\n]*\n){1,%d}" % count).encode("utf-8")).match(self.mm, self.position)
+        return match.end() if match else self.position
+
+    def _end_of_bytes(self, count, max_bytes):
+        """
+        :return: The position after the line break of at most ``count`` lines from the current position on so that the bulk request body
+                 with these lines does not exceed ``max_bytes`` (unless a single line exceeds it already).
+        """
+        size = len(self.mm)
+        end = self.position
+        bulk_bytes = 0
+        docs = 0
+        while docs < count and end < size:
+            line_end = self.mm.find(b"\n", end)
+            line_end = size if line_end == -1 else line_end + 1
+            doc_bytes = self.meta_data_size + line_end - end
+            if docs > 0 and bulk_bytes + doc_bytes > max_bytes:
+                break
+            bulk_bytes += doc_bytes
+            end = line_end
+            docs += 1
+        return end
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        """
+        Returns the body of one bulk request.
+        """
+        docs_left = self.docs_to_index - self.docs_read
+        size = len(self.mm) if self.mm is not None else 0
+        if docs_left <= 0 or self.position >= size:
+            raise StopIteration()
+        max_docs = self.bulk_sizer.max_docs()
+        max_bytes = self.bulk_sizer.max_bytes()
+        this_bulk_size = min(max_docs, docs_left) if max_docs else docs_left
+        if max_bytes:
+            end = self._end_of_bytes(this_bulk_size, max_bytes)
+        else:
+            end = self._end_of_lines(this_bulk_size)
+        lines = self.mm[self.position:end]
+        docs = lines.count(b"\n")
+        if not max_bytes and docs < this_bulk_size and end < size:
+            # the rest of the file is its last line
+            lines += self.mm[end:size]
+            end = size
+        if not lines.endswith(b"\n"):
+            # the last line of the file has no line break
+            lines += b"\n"
+            docs += 1
+        self.position = end
+        self.docs_read += docs
+
+        if self.conflicting_ids is None:
+            # all meta-data lines are identical so we can insert them in one go
+            body = self.action + b"\n" + lines.replace(b"\n", b"\n" + self.action + b"\n", docs - 1)
+        else:
+            parts = [None] * (2 * docs)
+            parts[0::2] = [(self.action_with_id % self._next_id()).encode("utf-8") for _ in range(docs)]
+            parts[1::2] = lines.split(b"\n", docs - 1)
+            body = b"\n".join(parts)
+        self.current_bulk += 1
+        return body
+
+    def _next_id(self):
+        # 25% of the time we replace a doc:
+        if self.id_up_to > 0 and random.randint(0, 3) == 3:
+            return self.conflicting_ids[random.randint(0, self.id_up_to - 1)]
+        else:
+            doc_id = self.conflicting_ids[self.id_up_to]
+            self.id_up_to += 1
+            return doc_id
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        if self.mm:
+            self.mm.close()
+            self.mm = None
+        if self.f:
+            self.f.close()
+            self.f = None
+        return False
+
+
 register_param_source_for_operation(track.OperationType.Index, BulkIndexParamSource)
 register_param_source_for_operation(track.OperationType.Search, SearchParamSource)
@@ -1,4 +1,5 @@
 import logging
+import math
 from enum import Enum
 
 logger = logging.getLogger("rally.track")
@@ -178,13 +179,27 @@ class Parallel:
 
 
 class Task:
-    def __init__(self, operation, warmup_iterations=0, warmup_time_period=None, iterations=1, clients=1, target_throughput=None):
+    # Default upper bound of concurrently outstanding requests per client for open-loop tasks
+    DEFAULT_MAX_IN_FLIGHT = 64
+
+    def __init__(self, operation, warmup_iterations=0, warmup_time_period=None, iterations=1, clients=1, target_throughput=None,
+                 schedule="deterministic", open_loop=False, max_in_flight=DEFAULT_MAX_IN_FLIGHT, throughput_profile=None,
+                 saturation_search=None):
         self.operation = operation
         self.warmup_iterations = warmup_iterations
         self.warmup_time_period = warmup_time_period
         self.iterations = iterations
         self.clients = clients
         self.target_throughput = target_throughput
+        # name of the scheduler that determines the inter-arrival time of operations if a target throughput is specified
+        self.schedule = schedule
+        # if True, clients issue requests at their scheduled time regardless whether previous requests have already finished
+        self.open_loop = open_loop
+        self.max_in_flight = max_in_flight
+        # if set, the target throughput changes over time according to this profile (and `target_throughput` is ignored)
+        self.throughput_profile = throughput_profile
+        # if set, Rally searches for the maximum sustainable throughput of this task in multiple probes
+        self.saturation_search = saturation_search
 
     def __iter__(self):
         return iter([self])
@@ -193,6 +208,171 @@ class Task:
         return "Task for [%s]" % self.operation.name
 
 
+class ThroughputProfile:
+    """
+    A throughput profile defines how the target throughput of a task (summed over all of its clients) changes over time. The task runs
+    for the duration of the profile. For reporting purposes, a profile is divided into a number of consecutive steps.
+    """
+
+    @property
+    def duration(self):
+        """
+        :return: The duration of this profile in seconds.
+        """
+        raise NotImplementedError("abstract method")
+
+    @property
+    def number_of_steps(self):
+        """
+        :return: The number of steps of this profile.
+        """
+        raise NotImplementedError("abstract method")
+
+    def target_throughput_at(self, elapsed):
+        """
+        :param elapsed: Time in seconds since the start of the task.
+        :return: The target throughput in operations per second at this point in time.
+        """
+        raise NotImplementedError("abstract method")
+
+    def step_at(self, elapsed):
+        """
+        :param elapsed: Time in seconds since the start of the task.
+        :return: The index of the step at this point in time in the range [0, `number_of_steps`).
+        """
+        raise NotImplementedError("abstract method")
+
+    def describe_step(self, step):
+        """
+        :param step: A step index.
+        :return: A human-readable description of the target throughput during this step.
+        """
+        raise NotImplementedError("abstract method")
+
+    @property
+    def expected_operations(self):
+        """
+        :return: The total number of operations that are expected to be issued over the duration of this profile.
+        """
+        raise NotImplementedError("abstract method")
+
+
+class RampProfile(ThroughputProfile):
+    """
+    Changes the target throughput linearly from a start to an end value.
+    """
+
+    def __init__(self, start, end, duration, interval=None):
+        """
+        :param start: The target throughput at the beginning of the task in operations per second.
+        :param end: The target throughput at the end of the task in operations per second.
+        :param duration: The duration of the ramp in seconds.
+        :param interval: The length of a step in seconds. It is only relevant for reporting. Defaults to a tenth of the duration.
+        """
+        self.start = start
+        self.end = end
+        self._duration = duration
+        self.interval = interval if interval else duration / 10
+
+    @property
+    def duration(self):
+        return self._duration
+
+    @property
+    def number_of_steps(self):
+        return max(int(math.ceil(self._duration / self.interval)), 1)
+
+    def target_throughput_at(self, elapsed):
+        return self.start + (self.end - self.start) * min(elapsed / self._duration, 1)
+
+    def step_at(self, elapsed):
+        return min(int(elapsed // self.interval), self.number_of_steps - 1)
+
+    def describe_step(self, step):
+        step_start = step * self.interval
+        step_end = min((step + 1) * self.interval, self._duration)
+        return "%s-%s ops/s" % (_format_throughput(self.target_throughput_at(step_start)),
+                                _format_throughput(self.target_throughput_at(step_end)))
+
+    @property
+    def expected_operations(self):
+        return (self.start + self.end) / 2 * self._duration
+
+    def __repr__(self, *args, **kwargs):
+        return "ramp from [%s] to [%s] ops/s over [%s] seconds" % (self.start, self.end, self._duration)
+
+
+class StepProfile(ThroughputProfile):
+    """
+    Runs with a constant target throughput for a given time period before it switches to the next step.
+    """
+
+    def __init__(self, steps):
+        """
+        :param steps: A list of pairs of (target throughput in operations per second, duration in seconds).
+        """
+        self.steps = steps
+
+    @property
+    def duration(self):
+        return sum([duration for _, duration in self.steps])
+
+    @property
+    def number_of_steps(self):
+        return len(self.steps)
+
+    def target_throughput_at(self, elapsed):
+        return self.steps[self.step_at(elapsed)][0]
+
+    def step_at(self, elapsed):
+        step_end = 0
+        for idx, (_, duration) in enumerate(self.steps):
+            step_end += duration
+            if elapsed < step_end:
+                return idx
+        return len(self.steps) - 1
+
+    def describe_step(self, step):
+        return "%s ops/s" % _format_throughput(self.steps[step][0])
+
+    @property
+    def expected_operations(self):
+        return sum([target_throughput * duration for target_throughput, duration in self.steps])
+
+    def __repr__(self, *args, **kwargs):
+        return "%d steps" % len(self.steps)
+
+
+class SaturationSearch:
+    """
+    Defines the parameters of a search for the maximum throughput at which a latency percentile stays below a threshold.
+    """
+
+    def __init__(self, latency_percentile, max_latency, initial_throughput, probe_duration, max_probes=10, precision=0.05):
+        """
+        :param latency_percentile: The latency percentile (e.g. 99) that needs to stay below `max_latency`.
+        :param max_latency: The latency threshold in milliseconds.
+        :param initial_throughput: The target throughput in operations per second of the first probe (summed over all clients).
+        :param probe_duration: The duration of each probe in seconds.
+        :param max_probes: The maximum number of probes. Default: 10.
+        :param precision: The search stops once the relative difference between the highest sustainable and the lowest unsustainable
+                          target throughput is at most this value. Default: 0.05.
+        """
+        self.latency_percentile = latency_percentile
+        self.max_latency = max_latency
+        self.initial_throughput = initial_throughput
+        self.probe_duration = probe_duration
+        self.max_probes = max_probes
+        self.precision = precision
+
+    def __repr__(self, *args, **kwargs):
+        return "saturation search for [%s]th percentile latency below [%s] ms" % (self.latency_percentile, self.max_latency)
+
+
+def _format_throughput(v):
+    return "%d" % v if v == int(v) else "%.2f" % v
+
+
 class Operation:
     def __init__(self, name, operation_type, params=None, param_source=None):
         if params is None:
@@ -0,0 +1,421 @@
+import bisect
+import bz2
+import collections
+import concurrent.futures
+import logging
+import os
+import re
+import struct
+import zlib
+
+logger = logging.getLogger("rally.utils.archive")
+
+# A block index starts with a header (magic bytes, number of entries) followed by one entry per independently compressed stream of an
+# archive that contains the start of a line: the offset of the stream in the archive, the number of the first line that starts in this
+# stream and the number of (uncompressed) bytes in the stream before that line. All numbers are unsigned 64 bit integers (little-endian).
+BLOCK_INDEX_MAGIC = b"RLYBLKS1"
+BLOCK_INDEX_HEADER = struct.Struct("<8sQ")
+BLOCK_INDEX_ENTRY = struct.Struct("<QQQ")
+# Start of a bz2 stream: stream header ("BZh" and block size) followed by the magic number of the first block.
+_BZ2_STREAM_START = re.compile(b"BZh[1-9]\x31\x41\x59\x26\x53\x59")
+# bz2 archives are scanned in parallel in groups of streams of roughly this (compressed) size
+_SCAN_GROUP_SIZE = 64 * 1024 * 1024
+_READ_SIZE = 1024 * 1024
+
+# bz2 blocks and the end of a stream are marked by these 48 bit magic numbers which are not byte-aligned
+_BZ2_BLOCK_MAGIC = 0x314159265359
+_BZ2_END_OF_STREAM_MAGIC = 0x177245385090
+# "BZh9"
+_BZ2_STREAM_HEADER = 0x425a6839
+# archives are split into pieces of this size to find bz2 blocks in parallel
+_BLOCK_SCAN_PIECE_SIZE = 32 * 1024 * 1024
+# bz2 blocks are decompressed in groups of roughly this (compressed) size
+_BLOCK_GROUP_SIZE = 2 * 1024 * 1024
+# smaller archives are not worth the overhead of decompressing them in parallel
+_MIN_PARALLEL_SIZE = 16 * 1024 * 1024
+
+
+def block_index_path(archive_path):
+    """
+    :param archive_path: The path to a compressed archive.
+    :return: The path to its block index.
+    """
+    return "%s.blocks" % archive_path
+
+
+def is_supported(archive_path):
+    """
+    :param archive_path: The path to a compressed archive.
+    :return: ``True`` iff documents can be read directly from this archive (i.e. it is a bz2 or gzip archive).
+    """
+    return _format(archive_path) is not None
+
+
+def _format(archive_path):
+    if archive_path.endswith(".bz2") and not archive_path.endswith(".tar.bz2"):
+        return "bz2"
+    elif archive_path.endswith(".gz") and not archive_path.endswith(".tar.gz"):
+        return "gz"
+    else:
+        return None
+
+
+def _decompressor(fmt):
+    if fmt == "bz2":
+        return bz2.BZ2Decompressor()
+    else:
+        # expect a gzip header and trailer
+        return zlib.decompressobj(wbits=16 + zlib.MAX_WBITS)
+
+
+def has_block_index(archive_path):
+    """
+    :param archive_path: The path to a compressed archive.
+    :return: ``True`` iff there is a block index for this archive that is at least as recent as the archive.
+    """
+    index_path = block_index_path(archive_path)
+    return os.path.isfile(index_path) and os.path.isfile(archive_path) and \
+        os.path.getmtime(index_path) >= os.path.getmtime(archive_path)
+
+
+def prepare_block_index(archive_path, max_workers=None):
+    """
+    Creates the block index for a bz2 or gzip archive unless there is a valid one already. Readers can only start to decompress at the
+    beginning of an independently compressed stream so archives should consist of many of them (e.g. compressed with pbzip2 or bgzip).
+
+    :param archive_path: The path to a compressed archive.
+    :param max_workers: The maximum number of processes that scan a bz2 archive in parallel. Default: the number of CPU cores.
+    :return: The number of entries in the block index.
+    """
+    fmt = _format(archive_path)
+    if fmt is None:
+        raise ValueError("Cannot create a block index for [%s]. Only bz2 and gzip archives are supported." % archive_path)
+    if has_block_index(archive_path):
+        logger.info("Skipping creation of block index for [%s] as it is still valid." % archive_path)
+        return len(load_block_index(archive_path))
+    size = os.path.getsize(archive_path)
+    streams = None
+    # gzip member headers are too short to be detected reliably so we can only scan bz2 archives in parallel
+    if fmt == "bz2":
+        ranges = _scan_ranges(archive_path, size)
+        if len(ranges) > 1:
+            try:
+                with concurrent.futures.ProcessPoolExecutor(max_workers=max_workers) as pool:
+                    streams = [stream for streams_in_range in pool.map(_scan_streams, [archive_path] * len(ranges), [fmt] * len(ranges), ranges)
+                               for stream in streams_in_range]
+            except (OSError, EOFError, ValueError):
+                logger.exception("Could not scan [%s] in parallel. Scanning it sequentially." % archive_path)
+    if streams is None:
+        streams = _scan_streams(archive_path, fmt, (0, size))
+    entries = _entries(streams)
+    _write_block_index(archive_path, entries)
+    logger.info("Created block index for [%s] with [%d] entries ([%d] compressed streams)." % (archive_path, len(entries), len(streams)))
+    return len(entries)
+
+
+def _scan_ranges(archive_path, size):
+    """
+    :return: A list of (start, end) ranges in a bz2 archive that are roughly ``_SCAN_GROUP_SIZE`` bytes long and start with what looks
+             like the beginning of a stream.
+    """
+    boundaries = [0]
+    # let pieces overlap so we find stream starts that span two pieces
+    overlap = 9
+    with open(archive_path, "rb") as f:
+        for position in range(0, size, _SCAN_GROUP_SIZE):
+            f.seek(position)
+            piece = f.read(_SCAN_GROUP_SIZE + overlap)
+            for match in _BZ2_STREAM_START.finditer(piece):
+                candidate = position + match.start()
+                if candidate - boundaries[-1] >= _SCAN_GROUP_SIZE:
+                    boundaries.append(candidate)
+    boundaries.append(size)
+    return list(zip(boundaries, boundaries[1:]))
+
+
+def _scan_streams(archive_path, fmt, byte_range):
+    """
+    Decompresses all streams in the given range of an archive.
+
+    :param archive_path: The path to a compressed archive.
+    :param fmt: The format of the archive.
+    :param byte_range: A tuple (start, end). ``start`` has to be the beginning of a stream and ``end`` the end of a stream.
+    :return: A list with one entry per stream: a tuple of its offset in the archive, the number of line breaks in it, the (uncompressed)
+             position of its first line break (-1 if there is none) and whether it ends with a line break.
+    """
+    start, end = byte_range
+    streams = []
+    pending = b""
+    stream_start = start
+    with open(archive_path, "rb") as f:
+        f.seek(start)
+        while stream_start < end:
+            decompressor = _decompressor(fmt)
+            consumed = 0
+            uncompressed_size = 0
+            line_breaks = 0
+            first_line_break = -1
+            last_byte = b"\n"
+            while not decompressor.eof:
+                data = pending if pending else f.read(_READ_SIZE)
+                pending = b""
+                if not data:
+                    raise EOFError("[%s] ends within a compressed stream." % archive_path)
+                consumed += len(data)
+                out = decompressor.decompress(data)
+                if out:
+                    if first_line_break == -1:
+                        first_line_break = out.find(b"\n")
+                        if first_line_break != -1:
+                            first_line_break += uncompressed_size
+                    uncompressed_size += len(out)
+                    line_breaks += out.count(b"\n")
+                    last_byte = out[-1:]
+            pending = decompressor.unused_data
+            streams.append((stream_start, line_breaks, first_line_break, uncompressed_size == 0 or last_byte == b"\n"))
+            stream_start += consumed - len(pending)
+    if stream_start != end:
+        raise ValueError("Last stream in range [%d, %d) of [%s] ends at [%d]." % (start, end, archive_path, stream_start))
+    return streams
+
+
+def _entries(streams):
+    entries = []
+    lines = 0
+    at_line_start = True
+    for offset, line_breaks, first_line_break, ends_with_line_break in streams:
+        if at_line_start:
+            entries.append((offset, lines, 0))
+        elif first_line_break != -1:
+            # the next line starts after the first line break in this stream
+            entries.append((offset, lines + 1, first_line_break + 1))
+        lines += line_breaks
+        # a stream without line breaks continues the line of its predecessor
+        if line_breaks > 0 or not ends_with_line_break:
+            at_line_start = ends_with_line_break
+    return entries
+
+
+def _write_block_index(archive_path, entries):
+    index_path = block_index_path(archive_path)
+    tmp_path = "%s.tmp" % index_path
+    with open(tmp_path, "wb") as f:
+        f.write(BLOCK_INDEX_HEADER.pack(BLOCK_INDEX_MAGIC, len(entries)))
+        for entry in entries:
+            f.write(BLOCK_INDEX_ENTRY.pack(*entry))
+    os.replace(tmp_path, index_path)
+
+
+def load_block_index(archive_path):
+    """
+    :param archive_path: The path to a compressed archive.
+    :return: A list of entries (see ``BLOCK_INDEX_ENTRY``). It is empty if there is no valid block index.
+    """
+    try:
+        with open(block_index_path(archive_path), "rb") as f:
+            magic, number_of_entries = BLOCK_INDEX_HEADER.unpack(f.read(BLOCK_INDEX_HEADER.size))
+            if magic != BLOCK_INDEX_MAGIC:
+                logger.warning("Ignoring invalid block index for [%s]." % archive_path)
+                return []
+            return list(BLOCK_INDEX_ENTRY.iter_unpack(f.read(number_of_entries * BLOCK_INDEX_ENTRY.size)))
+    except (FileNotFoundError, struct.error):
+        return []
+
+
+class ArchiveReader:
+    """
+    Reads lines from a bz2 or gzip archive. It uses the archive's block index to start decompressing as close as possible to the first
+    line that should be read.
+    """
+
+    def __init__(self, archive_path):
+        self.archive_path = archive_path
+        self.fmt = _format(archive_path)
+        self.f = open(archive_path, "rb")
+        self.decompressor = _decompressor(self.fmt)
+        self.buffer = b""
+        self.position = 0
+
+    def skip_lines(self, number_of_lines):
+        """
+        Positions the reader at the beginning of a line.
+
+        :param number_of_lines: The number of lines to skip from the beginning of the (uncompressed) data.
+        """
+        entries = load_block_index(self.archive_path)
+        i = bisect.bisect_right([first_line for _, first_line, _ in entries], number_of_lines) - 1
+        offset, first_line, bytes_to_skip = entries[i] if i >= 0 else (0, 0, 0)
+        self.f.seek(offset)
+        self.decompressor = _decompressor(self.fmt)
+        self.buffer = b""
+        self.position = 0
+        while bytes_to_skip > 0:
+            available = len(self.buffer) - self.position
+            if available == 0 and not self._fill():
+                return
+            skipped = min(bytes_to_skip, len(self.buffer) - self.position)
+            self.position += skipped
+            bytes_to_skip -= skipped
+        for _ in range(number_of_lines - first_line):
+            self._readline()
+
+    def readline(self):
+        """
+        :return: The next line including the line break or an empty string at the end of the archive.
+        """
+        return self._readline().decode("utf-8")
+
+    def _readline(self):
+        while True:
+            line_break = self.buffer.find(b"\n", self.position)
+            if line_break != -1:
+                line = self.buffer[self.position:line_break + 1]
+                self.position = line_break + 1
+                return line
+            if not self._fill():
+                line = self.buffer[self.position:]
+                self.position = len(self.buffer)
+                return line
+
+    def _fill(self):
+        """
+        Decompresses more data and appends it to the buffer (starting a new decompressor for every new stream).
+
+        :return: ``False`` iff the end of the archive has been reached.
+        """
+        while True:
+            if self.decompressor.eof:
+                data = self.decompressor.unused_data or self.f.read(_READ_SIZE)
+                if not data:
+                    return False
+                self.decompressor = _decompressor(self.fmt)
+            else:
+                data = self.f.read(_READ_SIZE)
+                if not data:
+                    return False
+            out = self.decompressor.decompress(data)
+            if out:
+                self.buffer = self.buffer[self.position:] + out
+                self.position = 0
+                return True
+
+    def close(self):
+        self.f.close()
+
+
+def decompress_bz2_in_parallel(archive_path, target_path, max_workers=None):
+    """
+    Decompresses a (single- or multi-stream) bz2 archive with multiple processes. The archive is split at the boundaries of bz2 blocks
+    (which are independent of each other). Groups of consecutive blocks are turned into standalone bz2 streams, decompressed in
+    parallel and written in order to the target file.
+
+    :param archive_path: The path to a bz2 archive.
+    :param target_path: The path to the decompressed file.
+    :param max_workers: The maximum number of processes that decompress in parallel. Default: the number of CPU cores.
+    :return: ``True`` iff the archive has been decompressed. If ``False`` is returned, the archive should be decompressed sequentially
+             (because it is too small, there is only one CPU core or its blocks could not be found).
+    """
+    size = os.path.getsize(archive_path)
+    workers = max_workers if max_workers else os.cpu_count()
+    if size < _MIN_PARALLEL_SIZE or workers < 2:
+        return False
+    try:
+        with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as pool:
+            pieces = [(start, min(start + _BLOCK_SCAN_PIECE_SIZE, size)) for start in range(0, size, _BLOCK_SCAN_PIECE_SIZE)]
+            markers = sorted(marker for markers_in_piece in pool.map(_find_bz2_markers, [archive_path] * len(pieces), pieces)
+                             for marker in markers_in_piece)
+            groups = _bz2_block_groups(markers)
+            with open(target_path, "wb") as target:
+                # bound memory usage by limiting the number of decompressed groups that are waiting to be written
+                pending = collections.deque()
+                for group in groups:
+                    pending.append(pool.submit(_decompress_bz2_blocks, archive_path, group))
+                    if len(pending) > workers:
+                        target.write(pending.popleft().result())
+                while pending:
+                    target.write(pending.popleft().result())
+        logger.info("Decompressed [%d] bz2 blocks of [%s] in parallel." % (sum(len(group) for group in groups), archive_path))
+        return True
+    except (OSError, EOFError, ValueError):
+        logger.exception("Could not decompress [%s] in parallel." % archive_path)
+        if os.path.isfile(target_path):
+            os.remove(target_path)
+        return False
+
+
+def _find_bz2_markers(archive_path, piece):
+    """
+    :return: A list of (bit position, is end of stream) tuples for all block and end of stream markers that start in the given piece of
+             a bz2 archive.
+    """
+    start, end = piece
+    with open(archive_path, "rb") as f:
+        f.seek(start)
+        # a marker that starts in the last byte of the piece spans seven bytes
+        data = f.read(end - start + 6)
+    markers = []
+    for magic, is_end_of_stream in [(_BZ2_BLOCK_MAGIC, False), (_BZ2_END_OF_STREAM_MAGIC, True)]:
+        for shift in range(8):
+            # a marker that starts at bit ``shift`` of a byte fully covers the next five bytes; we search them and verify the rest
+            pattern = (magic << (8 - shift)).to_bytes(7, "big")[1:6]
+            position = data.find(pattern, 1)
+            while position != -1:
+                first_byte = position - 1
+                candidate = data[first_byte:first_byte + 7].ljust(7, b"\x00")
+                if first_byte < end - start and (int.from_bytes(candidate, "big") >> (8 - shift)) & 0xffffffffffff == magic:
+                    markers.append(((start + first_byte) * 8 + shift, is_end_of_stream))
+                position = data.find(pattern, position + 1)
+    return markers
+
+
+def _bz2_block_groups(markers):
+    """
+    :param markers: A sorted list of markers (see ``_find_bz2_markers``).
+    :return: A list of groups of consecutive blocks within the same stream. A block is a tuple of its start and end bit position.
+    """
+    if not markers or markers[0][1] or not markers[-1][1]:
+        raise ValueError("Could not find bz2 blocks.")
+    groups = []
+    group = []
+    for (position, is_end_of_stream), (next_position, _) in zip(markers, markers[1:]):
+        if is_end_of_stream:
+            if group:
+                groups.append(group)
+            group = []
+        else:
+            group.append((position, next_position))
+            if next_position - group[0][0] >= _BLOCK_GROUP_SIZE * 8:
+                groups.append(group)
+                group = []
+    if group:
+        groups.append(group)
+    return groups
+
+
+def _decompress_bz2_blocks(archive_path, blocks):
+    """
+    Decompresses consecutive blocks of a bz2 archive by turning them into a standalone bz2 stream.
+
+    :param archive_path: The path to a bz2 archive.
+    :param blocks: A list of (start, end) bit positions of consecutive blocks.
+    :return: The decompressed data.
+    """
+    start, end = blocks[0][0], blocks[-1][1]
+    with open(archive_path, "rb") as f:
+        f.seek(start // 8)
+        raw = f.read((end + 7) // 8 - start // 8)
+    length = end - start
+    bits = (int.from_bytes(raw, "big") >> (len(raw) * 8 - start % 8 - length)) & ((1 << length) - 1)
+    # the stream CRC is combined from the CRCs of all blocks (which follow each block magic)
+    stream_crc = 0
+    for block_start, _ in blocks:
+        block_crc = (bits >> (length - (block_start - start) - 80)) & 0xffffffff
+        stream_crc = (((stream_crc << 1) | (stream_crc >> 31)) & 0xffffffff) ^ block_crc
+    stream_length = 32 + length + 48 + 32
+    padding = -stream_length % 8
+    stream = (((((_BZ2_STREAM_HEADER << length) | bits) << 48 | _BZ2_END_OF_STREAM_MAGIC) << 32 | stream_crc) << padding)
+    decompressor = bz2.BZ2Decompressor()
+    data = decompressor.decompress(stream.to_bytes((stream_length + padding) // 8, "big"))
+    if not decompressor.eof:
+        raise EOFError("Blocks [%d, %d) of [%s] do not form a complete bz2 stream." % (start, end, archive_path))
+    return data
@@ -0,0 +1,151 @@
+import logging
+import os
+import struct
+
+from esrally import exceptions
+
+logger = logging.getLogger("rally.utils.bulkfile")
+
+# A bulk file starts with magic bytes followed by one record per bulk request: the length of the request body (unsigned 32 bit integer,
+# little-endian) and the body itself, ready to be sent to Elasticsearch.
+BULK_FILE_MAGIC = b"RLYBULK1"
+BODY_LENGTH = struct.Struct("<I")
+# The offset index of a bulk file starts with a header (magic bytes, bulk size, number of documents, number of bodies) followed by the
+# offset of each record in the bulk file. All numbers are unsigned 64 bit integers (little-endian).
+OFFSET_INDEX_MAGIC = b"RLYBOFS1"
+OFFSET_INDEX_HEADER = struct.Struct("<8sQQQ")
+OFFSET_INDEX_ENTRY = struct.Struct("<Q")
+_READ_SIZE = 1024 * 1024
+
+
+def bulk_file_path(data_file_path, index_name, type_name, bulk_size):
+    """
+    :param data_file_path: The path to the (decompressed) data file of a type.
+    :param index_name: The name of the index that the documents are indexed into.
+    :param type_name: The name of the type that the documents are indexed into.
+    :param bulk_size: The number of documents per bulk request.
+    :return: The path to the bulk file with the pre-built bulk requests for this data file.
+    """
+    basename, _ = os.path.splitext(data_file_path)
+    return "%s-%s-%s-%d.bulk" % (basename, index_name, type_name, bulk_size)
+
+
+def offset_index_path(bulk_file_path):
+    """
+    :param bulk_file_path: The path to a bulk file.
+    :return: The path to its offset index.
+    """
+    return "%s.offsets" % bulk_file_path
+
+
+def exists(bulk_file_path):
+    return os.path.isfile(bulk_file_path) and os.path.isfile(offset_index_path(bulk_file_path))
+
+
+class BulkFileWriter:
+    """
+    Writes a bulk file and its offset index. Both are written to temporary files first and only become visible when all bodies have been
+    written successfully.
+    """
+
+    def __init__(self, path, bulk_size):
+        self.path = path
+        self.bulk_size = bulk_size
+        self.offsets = []
+        self.docs = 0
+        self.f = None
+
+    def __enter__(self):
+        self.f = open("%s.tmp" % self.path, "wb")
+        self.f.write(BULK_FILE_MAGIC)
+        return self
+
+    def add(self, body, docs):
+        """
+        :param body: The complete body of a bulk request as ``bytes``.
+        :param docs: The number of documents in this bulk request.
+        """
+        self.offsets.append(self.f.tell())
+        self.f.write(BODY_LENGTH.pack(len(body)))
+        self.f.write(body)
+        self.docs += docs
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.f.close()
+        self.f = None
+        if exc_type is not None:
+            os.remove("%s.tmp" % self.path)
+            return False
+        index_path = offset_index_path(self.path)
+        with open("%s.tmp" % index_path, "wb") as f:
+            f.write(OFFSET_INDEX_HEADER.pack(OFFSET_INDEX_MAGIC, self.bulk_size, self.docs, len(self.offsets)))
+            for offset in self.offsets:
+                f.write(OFFSET_INDEX_ENTRY.pack(offset))
+        os.replace("%s.tmp" % self.path, self.path)
+        os.replace("%s.tmp" % index_path, index_path)
+        return False
+
+
+def load_offset_index(bulk_file_path):
+    """
+    :param bulk_file_path: The path to a bulk file.
+    :return: A tuple of the bulk size, the number of documents and the list of record offsets of this bulk file.
+    """
+    with open(offset_index_path(bulk_file_path), "rb") as f:
+        magic, bulk_size, docs, bodies = OFFSET_INDEX_HEADER.unpack(f.read(OFFSET_INDEX_HEADER.size))
+        if magic != OFFSET_INDEX_MAGIC:
+            raise exceptions.DataError("[%s] is not an offset index of a bulk file." % offset_index_path(bulk_file_path))
+        data = f.read(bodies * OFFSET_INDEX_ENTRY.size)
+    if len(data) != bodies * OFFSET_INDEX_ENTRY.size:
+        raise exceptions.DataError("The offset index of [%s] is truncated. Please convert the corpus again." % bulk_file_path)
+    return bulk_size, docs, [offset for offset, in OFFSET_INDEX_ENTRY.iter_unpack(data)]
+
+
+class BulkFileReader:
+    """
+    Reads a contiguous range of bulk request bodies from a bulk file.
+    """
+
+    def __init__(self, bulk_file_path, offset, bodies):
+        """
+        :param bulk_file_path: The path to a bulk file.
+        :param offset: The offset of the first record to read (see ``load_offset_index``).
+        :param bodies: The number of bodies to read.
+        """
+        self.bulk_file_path = bulk_file_path
+        self.offset = offset
+        self.bodies = bodies
+        self.bodies_read = 0
+        self.f = None
+
+    def __enter__(self):
+        self.f = open(self.bulk_file_path, "rb", buffering=_READ_SIZE)
+        if self.f.read(len(BULK_FILE_MAGIC)) != BULK_FILE_MAGIC:
+            raise exceptions.DataError("[%s] is not a bulk file." % self.bulk_file_path)
+        self.f.seek(self.offset)
+        return self
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        """
+        Returns the body of one bulk request.
+        """
+        if self.f is None or self.bodies_read >= self.bodies:
+            raise StopIteration()
+        header = self.f.read(BODY_LENGTH.size)
+        if len(header) < BODY_LENGTH.size:
+            raise exceptions.DataError("[%s] is truncated. Please convert the corpus again." % self.bulk_file_path)
+        length, = BODY_LENGTH.unpack(header)
+        body = self.f.read(length)
+        if len(body) < length:
+            raise exceptions.DataError("[%s] is truncated. Please convert the corpus again." % self.bulk_file_path)
+        self.bodies_read += 1
+        return body
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        if self.f:
+            self.f.close()
+            self.f = None
+        return False
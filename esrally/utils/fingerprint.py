@@ -0,0 +1,136 @@
+import concurrent.futures
+import hashlib
+import json
+import logging
+import os
+
+logger = logging.getLogger("rally.utils.fingerprint")
+
+# Files are hashed in chunks of this size (in parallel if there are multiple chunks).
+DEFAULT_CHUNK_SIZE = 256 * 1024 * 1024
+# a chunk is read in pieces of this size to bound memory usage
+_READ_SIZE = 16 * 1024 * 1024
+
+
+def fingerprint_path(data_file_path):
+    """
+    :param data_file_path: The path to a data file.
+    :return: The path to its fingerprint file.
+    """
+    return "%s.fingerprint" % data_file_path
+
+
+def content_hash(data_file_path, chunk_size=DEFAULT_CHUNK_SIZE, max_workers=None):
+    """
+    Calculates a hash of the contents of a file. The file is split into chunks which are hashed in parallel. The result is the hash of
+    all chunk hashes.
+
+    :param data_file_path: The path to a file.
+    :param chunk_size: The size of a chunk in bytes. Default: 256MB.
+    :param max_workers: The maximum number of threads that hash chunks in parallel. Default: the number of CPU cores.
+    :return: The hash as a hex string.
+    """
+    size = os.path.getsize(data_file_path)
+    chunks = [(start, min(start + chunk_size, size)) for start in range(0, size, chunk_size)]
+    # hashlib releases the GIL while hashing so threads are sufficient
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers if max_workers else os.cpu_count()) as pool:
+        chunk_hashes = pool.map(_chunk_hash, [data_file_path] * len(chunks), chunks)
+        h = hashlib.sha256()
+        for chunk_hash in chunk_hashes:
+            h.update(chunk_hash)
+    return h.hexdigest()
+
+
+def _chunk_hash(data_file_path, chunk):
+    start, end = chunk
+    h = hashlib.sha256()
+    with open(data_file_path, "rb") as f:
+        f.seek(start)
+        remaining = end - start
+        while remaining > 0:
+            data = f.read(min(_READ_SIZE, remaining))
+            if len(data) == 0:
+                break
+            h.update(data)
+            remaining -= len(data)
+    return h.digest()
+
+
+def _file_stats(path):
+    stat = os.stat(path)
+    return {"size": stat.st_size, "mtime": stat.st_mtime}
+
+
+def create(data_file_path, source_file_path=None, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Calculates the fingerprint of a data file and stores it next to the data file.
+
+    :param data_file_path: The path to a data file.
+    :param source_file_path: The path to the file from which the data file has been created (e.g. a compressed archive). Optional.
+    :param chunk_size: The size of a chunk in bytes when hashing the file. Default: 256MB.
+    :return: The fingerprint as a dict.
+    """
+    fingerprint = _file_stats(data_file_path)
+    fingerprint["chunk-size"] = chunk_size
+    fingerprint["sha256"] = content_hash(data_file_path, chunk_size)
+    if source_file_path:
+        fingerprint["source"] = _file_stats(source_file_path)
+    tmp_path = "%s.tmp" % fingerprint_path(data_file_path)
+    with open(tmp_path, "wt") as f:
+        json.dump(fingerprint, f, indent=2)
+    os.replace(tmp_path, fingerprint_path(data_file_path))
+    return fingerprint
+
+
+def load(data_file_path):
+    """
+    :param data_file_path: The path to a data file.
+    :return: The stored fingerprint of the data file as a dict or ``None`` if there is none.
+    """
+    try:
+        with open(fingerprint_path(data_file_path), "rt") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+    except ValueError:
+        logger.warning("Ignoring invalid fingerprint file [%s]." % fingerprint_path(data_file_path))
+        return None
+
+
+def is_unchanged(data_file_path, source_file_path=None, expected_size=None):
+    """
+    Checks cheaply (based on size and modification time) whether a data file (and the file from which it has been created) has changed
+    since its fingerprint has been created.
+
+    :param data_file_path: The path to a data file.
+    :param source_file_path: The path to the file from which the data file has been created. Optional.
+    :param expected_size: The expected size of the data file in bytes. Optional.
+    :return: ``True`` iff the data file has a fingerprint and neither file has changed since.
+    """
+    fingerprint = load(data_file_path)
+    if fingerprint is None or not os.path.isfile(data_file_path):
+        return False
+    stats = _file_stats(data_file_path)
+    if stats["size"] != fingerprint["size"] or stats["mtime"] != fingerprint["mtime"]:
+        return False
+    if expected_size is not None and stats["size"] != expected_size:
+        return False
+    if source_file_path:
+        if "source" not in fingerprint or not os.path.isfile(source_file_path):
+            return False
+        if _file_stats(source_file_path) != fingerprint["source"]:
+            return False
+    return True
+
+
+def verify(data_file_path):
+    """
+    Verifies the contents of a data file against its fingerprint.
+
+    :param data_file_path: The path to a data file.
+    :return: ``True`` iff the data file has a fingerprint and the hash of its contents matches it.
+    """
+    fingerprint = load(data_file_path)
+    if fingerprint is None or not os.path.isfile(data_file_path):
+        return False
+    return content_hash(data_file_path, fingerprint["chunk-size"]) == fingerprint["sha256"]
@@ -0,0 +1,141 @@
+import base64
+import json
+import math
+import zlib
+
+
+class Histogram:
+    """
+    A histogram with log-linear buckets, similar to an HdrHistogram. It records non-negative values with a bounded relative error in
+    constant memory (regardless of the number of recorded values) and it can be merged with other histograms with the same precision.
+    """
+
+    def __init__(self, significant_digits=3, lowest_discernible_value=0.001):
+        """
+        :param significant_digits: The number of significant decimal digits to which values are kept. Default: 3.
+        :param lowest_discernible_value: The smallest value that can be distinguished from zero. Smaller differences between values are
+                                         lost. Default: 0.001 (i.e. one microsecond if values are recorded in milliseconds).
+        """
+        self.significant_digits = significant_digits
+        self.lowest_discernible_value = lowest_discernible_value
+        # within each bucket, values are linearly distributed to sub-buckets
+        self.sub_bucket_bits = int(math.ceil(math.log2(2 * 10 ** significant_digits)))
+        self.sub_bucket_count = 2 ** self.sub_bucket_bits
+        self.sub_bucket_half_count = self.sub_bucket_count // 2
+        # sparse mapping from bucket index to count
+        self.counts = {}
+        self.count = 0
+        self.total = 0
+        self.min = None
+        self.max = None
+
+    def record(self, value, count=1):
+        """
+        Records a value.
+
+        :param value: A non-negative number. Negative values are recorded as zero.
+        :param count: How often this value should be recorded. Default: 1.
+        """
+        value = max(value, 0)
+        idx = self._index(int(value / self.lowest_discernible_value))
+        self.counts[idx] = self.counts.get(idx, 0) + count
+        self.count += count
+        self.total += value * count
+        self.min = value if self.min is None else min(self.min, value)
+        self.max = value if self.max is None else max(self.max, value)
+
+    def merge(self, other):
+        """
+        Adds all values of another histogram to this one.
+
+        :param other: A histogram with the same precision.
+        """
+        if other.significant_digits != self.significant_digits or other.lowest_discernible_value != self.lowest_discernible_value:
+            raise ValueError("Cannot merge histograms with different precision.")
+        for idx, count in other.counts.items():
+            self.counts[idx] = self.counts.get(idx, 0) + count
+        self.count += other.count
+        self.total += other.total
+        if other.min is not None:
+            self.min = other.min if self.min is None else min(self.min, other.min)
+        if other.max is not None:
+            self.max = other.max if self.max is None else max(self.max, other.max)
+
+    @property
+    def mean(self):
+        return self.total / self.count if self.count > 0 else None
+
+    def value_at_percentile(self, percentile):
+        """
+        :param percentile: A percentile between [0, 100].
+        :return: The highest value that is equivalent (within the precision of this histogram) to the value at the given percentile or
+                 ``None`` if no values have been recorded.
+        """
+        if self.count == 0:
+            return None
+        if percentile <= 0:
+            return self.min
+        if percentile >= 100:
+            return self.max
+        rank = max(int(math.ceil(percentile * self.count / 100)), 1)
+        seen = 0
+        for idx in sorted(self.counts):
+            seen += self.counts[idx]
+            if seen >= rank:
+                return min(max(self._highest_equivalent_value(idx), self.min), self.max)
+        return self.max
+
+    def _index(self, normalized_value):
+        if normalized_value < self.sub_bucket_count:
+            return normalized_value
+        shift = normalized_value.bit_length() - self.sub_bucket_bits
+        sub_bucket = normalized_value >> shift
+        return self.sub_bucket_count + (shift - 1) * self.sub_bucket_half_count + (sub_bucket - self.sub_bucket_half_count)
+
+    def _lowest_normalized_value(self, idx):
+        if idx < self.sub_bucket_count:
+            return idx
+        shift = (idx - self.sub_bucket_count) // self.sub_bucket_half_count + 1
+        sub_bucket = (idx - self.sub_bucket_count) % self.sub_bucket_half_count + self.sub_bucket_half_count
+        return sub_bucket << shift
+
+    def _highest_equivalent_value(self, idx):
+        # values are truncated when they are normalized so a bucket covers all values below the next bucket's lowest value
+        return (self._lowest_normalized_value(idx + 1) - 1) * self.lowest_discernible_value
+
+    def __len__(self):
+        return self.count
+
+    def __repr__(self, *args, **kwargs):
+        return "Histogram(count=%d, min=%s, max=%s)" % (self.count, self.min, self.max)
+
+
+def encode(histogram):
+    """
+    :param histogram: A histogram.
+    :return: A compact string representation of the histogram.
+    """
+    state = {
+        "significant-digits": histogram.significant_digits,
+        "lowest-discernible-value": histogram.lowest_discernible_value,
+        "counts": sorted(histogram.counts.items()),
+        "total": histogram.total,
+        "min": histogram.min,
+        "max": histogram.max
+    }
+    return base64.b64encode(zlib.compress(json.dumps(state, separators=(",", ":")).encode("utf-8"))).decode("ascii")
+
+
+def decode(encoded):
+    """
+    :param encoded: A string representation of a histogram as created by ``encode``.
+    :return: The corresponding histogram.
+    """
+    state = json.loads(zlib.decompress(base64.b64decode(encoded)).decode("utf-8"))
+    histogram = Histogram(state["significant-digits"], state["lowest-discernible-value"])
+    histogram.counts = {idx: count for idx, count in state["counts"]}
+    histogram.count = sum(histogram.counts.values())
+    histogram.total = state["total"]
+    histogram.min = state["min"]
+    histogram.max = state["max"]
+    return histogram
@@ -1,14 +1,27 @@
 import os
 import errno
 import re
+import shutil
 import subprocess
 import bz2
 import gzip
 import zipfile
 import tarfile
 import logging
+import array
+import concurrent.futures
+import mmap
+import struct
+import sys
+import time
 
-from esrally.utils import console
+from esrally.utils import console, archive
+
+try:
+    import numpy
+except ImportError:
+    # NumPy is optional. Without it, line breaks are found with regular expressions.
+    numpy = None
 
 logger = logging.getLogger("rally.utils.io")
 
@@ -59,7 +72,8 @@ def decompress(zip_name, target_directory):
     * tgz
     * tar.bz2
 
-    The decompression method is chosen based on the file extension.
+    The decompression method is chosen based on the file extension. bz2 and gzip compressed files are decompressed with ``pbzip2`` or
+    ``pigz`` (which use multiple CPU cores) if they are installed. Otherwise, bz2 files are decompressed in parallel by Rally itself.
 
     :param zip_name: The full path name to the file that should be decompressed.
     :param target_directory: The directory to which files should be decompressed. May or may not exist prior to calling
@@ -69,17 +83,70 @@ def decompress(zip_name, target_directory):
     if extension == ".zip":
         _do_decompress(target_directory, zipfile.ZipFile(zip_name))
     elif extension == ".bz2":
-        with open(filename, 'wb') as new_file, bz2.BZ2File(zip_name, 'rb') as file:
-            for data in iter(lambda: file.read(100 * 1024), b''):
-                new_file.write(data)
+        if not _decompress_with_tool("pbzip2", zip_name, filename) and not archive.decompress_bz2_in_parallel(zip_name, filename):
+            with open(filename, 'wb') as new_file, bz2.BZ2File(zip_name, 'rb') as file:
+                for data in iter(lambda: file.read(100 * 1024), b''):
+                    new_file.write(data)
     elif extension == ".gz":
-        _do_decompress(target_directory, gzip.open(zip_name))
-    elif extension in [".tar", ".tar.gz", ".tgz", ".tar.bz2"]:
+        if not _decompress_with_tool("pigz", zip_name, filename):
+            with open(filename, 'wb') as new_file, gzip.open(zip_name, 'rb') as file:
+                for data in iter(lambda: file.read(100 * 1024), b''):
+                    new_file.write(data)
+    elif extension in [".tar.gz", ".tgz", ".tar.bz2"]:
+        if not _extract_with_tool("pbzip2" if extension == ".tar.bz2" else "pigz", zip_name, target_directory):
+            _do_decompress(target_directory, tarfile.open(zip_name))
+    elif extension == ".tar":
         _do_decompress(target_directory, tarfile.open(zip_name))
     else:
         raise RuntimeError("Unsupported file extension [%s]. Cannot decompress [%s]" % (extension, zip_name))
 
 
+def _decompress_with_tool(tool, zip_name, target_file):
+    """
+    Decompresses a file with an external tool that supports ``-d -c`` (like gzip and bzip2 do).
+
+    :return: ``True`` iff the tool is installed and has decompressed the file successfully.
+    """
+    executable = shutil.which(tool)
+    if not executable:
+        return False
+    logger.info("Decompressing [%s] with [%s]." % (zip_name, executable))
+    with open(target_file, "wb") as new_file:
+        process = subprocess.Popen([executable, "-d", "-c", zip_name], stdout=new_file, stderr=subprocess.PIPE)
+        _, stderr = process.communicate()
+    if process.returncode != 0:
+        logger.warning("[%s] could not decompress [%s] (exit code [%d]): %s" %
+                       (tool, zip_name, process.returncode, stderr.decode("utf-8", errors="replace")))
+        return False
+    return True
+
+
+def _extract_with_tool(tool, zip_name, target_directory):
+    """
+    Extracts a compressed tar archive. The archive is decompressed with an external tool and the tar stream is extracted on the fly.
+
+    :return: ``True`` iff the tool is installed and the archive has been extracted successfully.
+    """
+    executable = shutil.which(tool)
+    if not executable:
+        return False
+    logger.info("Decompressing [%s] with [%s]." % (zip_name, executable))
+    process = subprocess.Popen([executable, "-d", "-c", zip_name], stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+    try:
+        with tarfile.open(fileobj=process.stdout, mode="r|") as tar:
+            tar.extractall(path=target_directory)
+    except tarfile.TarError:
+        logger.exception("Could not extract [%s] with [%s]." % (zip_name, tool))
+        return False
+    finally:
+        process.stdout.close()
+        process.wait()
+    if process.returncode != 0:
+        logger.warning("[%s] could not decompress [%s] (exit code [%d])." % (tool, zip_name, process.returncode))
+        return False
+    return True
+
+
 def _do_decompress(target_directory, compressed_file):
     try:
         compressed_file.extractall(path=target_directory)
@@ -116,30 +183,170 @@ def splitext(file_name):
         return os.path.splitext(file_name)
 
 
-def prepare_file_offset_table(data_file_path):
+# A file offset table starts with a header (magic bytes, stride and number of lines of the data file) followed by one entry (an unsigned
+# 64 bit integer, little-endian) per `stride` lines. Entry i is the file offset of line i * stride. It can be memory-mapped as is.
+OFFSET_TABLE_MAGIC = b"RLYOFFS1"
+OFFSET_TABLE_HEADER = struct.Struct("<8sQQ")
+OFFSET_TABLE_ENTRY = struct.Struct("<Q")
+DEFAULT_OFFSET_TABLE_STRIDE = 1000
+# Data files are scanned for line breaks in chunks of this size. Multiple chunks are scanned in parallel.
+OFFSET_TABLE_CHUNK_SIZE = 256 * 1024 * 1024
+# a chunk is read in pieces of this size to bound memory usage
+_READ_SIZE = 16 * 1024 * 1024
+
+
+def offset_table_path(data_file_path):
+    """
+    :param data_file_path: The path to a data file.
+    :return: The path to its file offset table.
+    """
+    return "%s.offsets" % data_file_path
+
+
+def prepare_file_offset_table(data_file_path, stride=DEFAULT_OFFSET_TABLE_STRIDE, max_workers=None):
     """
     Creates a file that contains a mapping from line numbers to file offsets for the provided path. This file is used internally by
-    #skip_lines(data_file_path, data_file) to speed up line skipping.
+    #skip_lines(data_file_path, data_file) and #line_offset(data_file_path, number_of_lines_to_skip) to speed up line skipping.
 
     :param data_file_path: The path to a text file that is readable by this process.
+    :param stride: The number of lines per entry, i.e. a stride of 1 stores the offset of every line. Default: 1000.
+    :param max_workers: The maximum number of processes that scan large files in parallel. Default: the number of CPU cores.
     """
-    offset_file_path = "%s.offset" % data_file_path
+    offset_file_path = offset_table_path(data_file_path)
     # recreate only if necessary as this can be time-consuming
-    if not os.path.exists(offset_file_path) or os.path.getmtime(offset_file_path) < os.path.getmtime(data_file_path):
-        console.info("Preparing file offset table for [%s] ... " % data_file_path, end="", flush=True, logger=logger)
-        line_number = 0
-        with open(offset_file_path, mode="w") as offset_file:
-            with open(data_file_path, mode="rt") as data_file:
-                while True:
-                    line = data_file.readline()
-                    if len(line) == 0:
-                        break
-                    line_number += 1
-                    if line_number % 50000 == 0:
-                        print("%d;%d" % (line_number, data_file.tell()), file=offset_file)
-        console.println("[OK]")
-    else:
+    if _offset_table_stride(offset_file_path) == stride and os.path.getmtime(offset_file_path) >= os.path.getmtime(data_file_path):
         logger.info("Skipping creation of file offset table at [%s] as it is still valid." % offset_file_path)
+        return
+    console.info("Preparing file offset table for [%s] ... " % data_file_path, end="", flush=True, logger=logger)
+    start = time.perf_counter()
+    size = os.path.getsize(data_file_path)
+    chunks = [(chunk_start, min(chunk_start + OFFSET_TABLE_CHUNK_SIZE, size)) for chunk_start in range(0, size, OFFSET_TABLE_CHUNK_SIZE)]
+    if len(chunks) > 1:
+        with concurrent.futures.ProcessPoolExecutor(max_workers=max_workers) as pool:
+            # line numbers depend on all previous chunks so we need to count line breaks first
+            line_breaks = list(pool.map(_count_line_breaks, [data_file_path] * len(chunks), chunks))
+            first_lines = [sum(line_breaks[:i]) for i in range(len(chunks))]
+            offsets = list(pool.map(_line_offsets, [data_file_path] * len(chunks), chunks, first_lines, [stride] * len(chunks),
+                                    [size] * len(chunks)))
+    else:
+        offsets = [_line_offsets(data_file_path, chunk, 0, stride, size) for chunk in chunks]
+    _write_offset_table(offset_file_path, stride, _number_of_lines(data_file_path, size, offsets), offsets)
+    console.println("[OK]")
+    logger.info("Creating file offset table for [%s] took [%f] s." % (data_file_path, time.perf_counter() - start))
+
+
+def _offset_table_stride(offset_file_path):
+    """
+    :return: The stride of an existing file offset table or ``None`` if there is no valid one.
+    """
+    try:
+        with open(offset_file_path, "rb") as f:
+            magic, stride, _ = OFFSET_TABLE_HEADER.unpack(f.read(OFFSET_TABLE_HEADER.size))
+            return stride if magic == OFFSET_TABLE_MAGIC else None
+    except (OSError, struct.error):
+        return None
+
+
+def _count_line_breaks(data_file_path, chunk):
+    start, end = chunk
+    line_breaks = 0
+    with open(data_file_path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        for piece_start in range(start, end, _READ_SIZE):
+            line_breaks += mm[piece_start:min(piece_start + _READ_SIZE, end)].count(b"\n")
+    return line_breaks
+
+
+def _line_offsets(data_file_path, chunk, first_line, stride, size):
+    """
+    :param chunk: A pair of the start and end position of the chunk that should be scanned.
+    :param first_line: The number of line breaks before the start of the chunk.
+    :param stride: Only offsets of lines whose number is a multiple of stride are considered.
+    :param size: The size of the data file in bytes.
+    :return: A pair of an ``array`` with the offsets of all considered lines that start within the chunk and the number of line breaks
+             within the chunk.
+    """
+    start, end = chunk
+    offsets = array.array("Q")
+    if start == 0:
+        offsets.append(0)
+    # the number of the line that starts after the next line break
+    next_line = first_line + 1
+    # bytes patterns can't be %-formatted on Python 3.4
+    stride_pattern = re.compile(("(?:[^\n]*\n){%d}" % stride).encode("utf-8"))
+    with open(data_file_path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        for piece_start in range(start, end, _READ_SIZE):
+            piece = mm[piece_start:min(piece_start + _READ_SIZE, end)]
+            if numpy is not None:
+                line_breaks = numpy.flatnonzero(numpy.frombuffer(piece, dtype=numpy.uint8) == ord("\n"))
+                selected = line_breaks[(next_line + numpy.arange(len(line_breaks))) % stride == 0] + (piece_start + 1)
+                offsets.frombytes(selected[selected < size].astype(numpy.uint64).tobytes())
+                next_line += len(line_breaks)
+            else:
+                # skip to the first line break that is followed by a line that we consider ...
+                pos = 0
+                for _ in range((-next_line) % stride + 1):
+                    pos = piece.find(b"\n", pos) + 1
+                    if pos == 0:
+                        break
+                # ... and then from stride to stride
+                while pos > 0:
+                    if piece_start + pos < size:
+                        offsets.append(piece_start + pos)
+                    match = stride_pattern.match(piece, pos)
+                    pos = match.end() if match else 0
+                next_line += piece.count(b"\n")
+    return offsets, next_line - first_line - 1
+
+
+def _number_of_lines(data_file_path, size, offsets):
+    """
+    :return: The number of lines in the data file (including a last line without a line break).
+    """
+    if size == 0:
+        return 0
+    with open(data_file_path, "rb") as f:
+        f.seek(size - 1)
+        last_line_terminated = f.read(1) == b"\n"
+    line_breaks = sum(chunk_line_breaks for _, chunk_line_breaks in offsets)
+    return line_breaks if last_line_terminated else line_breaks + 1
+
+
+def _write_offset_table(offset_file_path, stride, number_of_lines, offsets):
+    # write to a temporary file first so readers never see a partially written table
+    tmp_path = "%s.tmp" % offset_file_path
+    with open(tmp_path, "wb") as f:
+        f.write(OFFSET_TABLE_HEADER.pack(OFFSET_TABLE_MAGIC, stride, number_of_lines))
+        for chunk_offsets, _ in offsets:
+            if sys.byteorder != "little":
+                chunk_offsets.byteswap()
+            chunk_offsets.tofile(f)
+    os.replace(tmp_path, offset_file_path)
+
+
+def line_offset(data_file_path, number_of_lines_to_skip):
+    """
+    Determines the closest known file offset before the given line with the file offset table (see #prepare_file_offset_table()).
+
+    :param data_file_path: The full path to the data file.
+    :param number_of_lines_to_skip: A non-negative number of lines that should be skipped.
+    :return: A tuple of the file offset in bytes and the number of lines that still need to be skipped from there.
+    """
+    offset_file_path = offset_table_path(data_file_path)
+    try:
+        with open(offset_file_path, "rb") as f:
+            magic, stride, number_of_lines = OFFSET_TABLE_HEADER.unpack(f.read(OFFSET_TABLE_HEADER.size))
+            if magic != OFFSET_TABLE_MAGIC:
+                logger.warning("Ignoring invalid file offset table [%s]." % offset_file_path)
+                return 0, number_of_lines_to_skip
+            entries = (number_of_lines + stride - 1) // stride
+            if entries == 0:
+                return 0, number_of_lines_to_skip
+            entry = min(number_of_lines_to_skip // stride, entries - 1)
+            f.seek(OFFSET_TABLE_HEADER.size + entry * OFFSET_TABLE_ENTRY.size)
+            offset, = OFFSET_TABLE_ENTRY.unpack(f.read(OFFSET_TABLE_ENTRY.size))
+            return offset, number_of_lines_to_skip - entry * stride
+    except FileNotFoundError:
+        return 0, number_of_lines_to_skip
 
 
 def skip_lines(data_file_path, data_file, number_of_lines_to_skip):
@@ -150,25 +357,12 @@ def skip_lines(data_file_path, data_file, number_of_lines_to_skip):
     :param data_file: The data file. It is assumed that this file is already open for reading and its file pointer is at position zero.
     :param number_of_lines_to_skip: A non-negative number of lines that should be skipped.
     """
-    offset_file_path = "%s.offset" % data_file_path
-    offset = 0
-    remaining_lines = number_of_lines_to_skip
-    # can we fast forward?
-    if os.path.exists(offset_file_path):
-        with open(offset_file_path) as offsets:
-            for line in offsets:
-                line_number, offset_in_bytes = [int(i) for i in line.strip().split(";")]
-                if line_number <= number_of_lines_to_skip:
-                    offset = offset_in_bytes
-                    remaining_lines = number_of_lines_to_skip - line_number
-                else:
-                    break
+    offset, remaining_lines = line_offset(data_file_path, number_of_lines_to_skip)
     # fast forward to the last known file offset
     data_file.seek(offset)
     # forward the last remaining lines if needed
-    if remaining_lines > 0:
-        for line in range(remaining_lines):
-            data_file.readline()
+    for _ in range(remaining_lines):
+        data_file.readline()
 
 
 def get_size(start_path="."):
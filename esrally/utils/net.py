@@ -1,6 +1,6 @@
+import concurrent.futures
 import os
 import logging
-import shutil
 import socket
 
 import urllib3
@@ -12,43 +12,179 @@ HTTP = None
 
 logger = logging.getLogger("rally.net")
 
+# Files are downloaded in chunks of this size with HTTP range requests (if the server supports them).
+DOWNLOAD_CHUNK_SIZE = 64 * 1024 * 1024
+# maximum number of parallel connections per downloaded file
+DOWNLOAD_CONNECTIONS = 8
+# how often we retry a chunk (resuming from the last byte we have received) before we give up
+_RETRIES_PER_CHUNK = 10
+_READ_SIZE = 1024 * 1024
+
 
 def init():
     global HTTP
     proxy_url = os.getenv("http_proxy")
     if proxy_url and len(proxy_url) > 0:
         logger.info("Rally connects via proxy URL [%s] to the Internet (picked up from the environment variable [http_proxy])." % proxy_url)
-        HTTP = urllib3.ProxyManager(proxy_url, cert_reqs='CERT_REQUIRED', ca_certs=certifi.where())
+        HTTP = urllib3.ProxyManager(proxy_url, maxsize=DOWNLOAD_CONNECTIONS, cert_reqs='CERT_REQUIRED', ca_certs=certifi.where())
     else:
         logger.info("Rally connects directly to the Internet (no proxy support).")
-        HTTP = urllib3.PoolManager(cert_reqs='CERT_REQUIRED', ca_certs=certifi.where())
+        HTTP = urllib3.PoolManager(maxsize=DOWNLOAD_CONNECTIONS, cert_reqs='CERT_REQUIRED', ca_certs=certifi.where())
 
 
-def download(url, local_path, expected_size_in_bytes=None):
+def download(url, local_path, expected_size_in_bytes=None, chunk_size=DOWNLOAD_CHUNK_SIZE, max_connections=DOWNLOAD_CONNECTIONS):
     """
-    Downloads a single file from a URL to the provided local path.
+    Downloads a single file from a URL to the provided local path. If the server supports HTTP range requests, the file is downloaded in
+    chunks over multiple connections in parallel. Data are downloaded to ``local_path`` with the suffix ``.tmp`` first. If a download
+    fails, this file is kept and the next download of the same file resumes from it.
 
     :param url: The remote URL specifying one file that should be downloaded. May be either a HTTP or HTTPS URL.
     :param local_path: The local file name of the file that should be downloaded.
     :param expected_size_in_bytes: The expected file size in bytes if known. It will be used to verify that all data have been downloaded.
+    :param chunk_size: The size of a chunk in bytes for range requests. Default: 64MB.
+    :param max_connections: The maximum number of parallel connections. Default: 8.
     """
     tmp_data_set_path = local_path + ".tmp"
-    try:
-        with HTTP.request("GET", url, preload_content=False, retries=10,
-                          timeout=urllib3.Timeout(connect=45, read=240)) as r, open(tmp_data_set_path, "wb") as out_file:
-            shutil.copyfileobj(r, out_file)
-    except:
-        if os.path.isfile(tmp_data_set_path):
-            os.remove(tmp_data_set_path)
-        raise
+    size = _size_if_ranges_are_supported(url)
+    if size is not None:
+        _download_in_chunks(url, tmp_data_set_path, size, chunk_size, max_connections)
     else:
-        download_size = os.path.getsize(tmp_data_set_path)
-        if expected_size_in_bytes is not None and download_size != expected_size_in_bytes:
-            if os.path.isfile(tmp_data_set_path):
-                os.remove(tmp_data_set_path)
-            raise exceptions.DataError("Download of [%s] is corrupt. Downloaded [%d] bytes but [%d] bytes are expected. Please retry." %
-                                       (local_path, download_size, expected_size_in_bytes))
-        os.rename(tmp_data_set_path, local_path)
+        _download_sequentially(url, tmp_data_set_path)
+    download_size = os.path.getsize(tmp_data_set_path)
+    if expected_size_in_bytes is not None and download_size != expected_size_in_bytes:
+        _remove(tmp_data_set_path, _progress_path(tmp_data_set_path))
+        raise exceptions.DataError("Download of [%s] is corrupt. Downloaded [%d] bytes but [%d] bytes are expected. Please retry." %
+                                   (local_path, download_size, expected_size_in_bytes))
+    os.rename(tmp_data_set_path, local_path)
+    _remove(_progress_path(tmp_data_set_path))
+
+
+def _remove(*paths):
+    for path in paths:
+        if os.path.isfile(path):
+            os.remove(path)
+
+
+def _progress_path(tmp_data_set_path):
+    return "%s.progress" % tmp_data_set_path
+
+
+def _size_if_ranges_are_supported(url):
+    """
+    :return: The size of the remote file if the server supports range requests for it, ``None`` otherwise.
+    """
+    with HTTP.request("GET", url, headers={"Range": "bytes=0-0"}, preload_content=False, retries=10,
+                      timeout=urllib3.Timeout(connect=45, read=240)) as r:
+        if r.status == 206:
+            # e.g. "bytes 0-0/1234"
+            total = r.headers.get("Content-Range", "").rpartition("/")[2]
+            if total.isdigit():
+                return int(total)
+        logger.info("Server does not support range requests for [%s] (status [%d]). Downloading it with a single connection." %
+                    (url, r.status))
+        return None
+
+
+def _download_sequentially(url, tmp_data_set_path):
+    # we can only resume from a file that has been written sequentially (i.e. not from a chunked download)
+    if os.path.isfile(_progress_path(tmp_data_set_path)):
+        _remove(tmp_data_set_path, _progress_path(tmp_data_set_path))
+    position = os.path.getsize(tmp_data_set_path) if os.path.isfile(tmp_data_set_path) else 0
+    headers = {"Range": "bytes=%d-" % position} if position > 0 else {}
+    with HTTP.request("GET", url, headers=headers, preload_content=False, retries=10,
+                      timeout=urllib3.Timeout(connect=45, read=240)) as r:
+        if r.status == 416:
+            # nothing left to download
+            return
+        if r.status == 206:
+            logger.info("Resuming download of [%s] from byte [%d]." % (url, position))
+            mode = "ab"
+        else:
+            mode = "wb"
+        with open(tmp_data_set_path, mode) as out_file:
+            for data in r.stream(_READ_SIZE):
+                out_file.write(data)
+
+
+def _download_in_chunks(url, tmp_data_set_path, size, chunk_size, max_connections):
+    chunks = [(start, min(start + chunk_size, size) - 1) for start in range(0, size, chunk_size)]
+    progress_path = _progress_path(tmp_data_set_path)
+    completed = _completed_chunks(tmp_data_set_path, size, chunk_size, chunks)
+    if completed:
+        logger.info("Resuming download of [%s] ([%d] of [%d] chunks have already been downloaded)." % (url, len(completed), len(chunks)))
+    else:
+        _remove(progress_path)
+    with open(tmp_data_set_path, "ab") as f:
+        # reserve space for the whole file so all chunks can be written at their offset
+        f.truncate(size)
+    pending = [i for i in range(len(chunks)) if i not in completed]
+    with open(progress_path, "at") as progress, \
+            concurrent.futures.ThreadPoolExecutor(max_workers=max(1, min(max_connections, len(pending)))) as pool:
+        if progress.tell() == 0:
+            progress.write("%d %d\n" % (size, chunk_size))
+            progress.flush()
+        futures = {pool.submit(_download_range, url, tmp_data_set_path, *chunks[i]): i for i in pending}
+        failure = None
+        for future in concurrent.futures.as_completed(futures):
+            if future.cancelled():
+                continue
+            if future.exception() is None:
+                # record all completed chunks (also after a failure) so we can resume from there
+                progress.write("%d\n" % futures[future])
+                progress.flush()
+            elif failure is None:
+                failure = future.exception()
+                for f in futures:
+                    f.cancel()
+        if failure:
+            raise failure
+
+
+def _completed_chunks(tmp_data_set_path, size, chunk_size, chunks):
+    """
+    :return: The set of indices of chunks that have already been downloaded completely to the temporary file.
+    """
+    if not os.path.isfile(tmp_data_set_path):
+        return set()
+    progress_path = _progress_path(tmp_data_set_path)
+    if not os.path.isfile(progress_path):
+        # a previous sequential download writes a prefix of the file
+        downloaded_bytes = os.path.getsize(tmp_data_set_path)
+        return {i for i, (start, end) in enumerate(chunks) if end < downloaded_bytes}
+    with open(progress_path, "rt") as f:
+        lines = f.read().splitlines()
+    if not lines or lines[0] != "%d %d" % (size, chunk_size) or os.path.getsize(tmp_data_set_path) != size:
+        logger.info("Discarding download progress of [%s] as the file or chunk size has changed." % tmp_data_set_path)
+        return set()
+    return {int(line) for line in lines[1:] if line.isdigit()}
+
+
+def _download_range(url, tmp_data_set_path, start, end):
+    """
+    Downloads the bytes in the (inclusive) range [start, end] of a file. Interrupted requests are resumed from the last received byte.
+    """
+    position = start
+    attempt = 0
+    while position <= end:
+        try:
+            with HTTP.request("GET", url, headers={"Range": "bytes=%d-%d" % (position, end)}, preload_content=False, retries=10,
+                              timeout=urllib3.Timeout(connect=45, read=240)) as r:
+                if r.status != 206:
+                    raise exceptions.DataError("Could not download bytes [%d-%d] of [%s] (status [%d])." % (position, end, url, r.status))
+                with open(tmp_data_set_path, "r+b") as out_file:
+                    out_file.seek(position)
+                    for data in r.stream(_READ_SIZE):
+                        # never write beyond the chunk even if the server sends more
+                        data = data[:end + 1 - position]
+                        out_file.write(data)
+                        position += len(data)
+            if position <= end:
+                raise urllib3.exceptions.ProtocolError("Connection closed after [%d] of [%d] bytes." % (position - start, end + 1 - start))
+        except (urllib3.exceptions.HTTPError, OSError) as e:
+            attempt += 1
+            if attempt > _RETRIES_PER_CHUNK:
+                raise
+            logger.warning("Could not download bytes [%d-%d] of [%s] (%s). Retrying (attempt [%d])." % (position, end, url, e, attempt))
 
 
 def retrieve_content_as_string(url):
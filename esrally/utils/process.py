@@ -66,6 +66,9 @@ def kill_running_es_instances(node_prefix):
 
 def kill_running_rally_instances():
     def rally_process(p):
+        # load driver hosts (esrallyd) outlive a single race, even on the coordinating machine
+        if p.name() == "esrallyd" or any(e.endswith("esrallyd") for e in p.cmdline()):
+            return False
         return p.name() == "esrally" or \
                p.name() == "rally" or \
                (p.name().lower().startswith("python") and any("esrally" in e for e in p.cmdline()))
@@ -0,0 +1,264 @@
+import gzip
+import http.server
+import json
+import socketserver
+import threading
+from unittest import TestCase
+
+import elasticsearch
+
+from esrally import client
+
+
+class ThreadingHTTPServer(socketserver.ThreadingMixIn, http.server.HTTPServer):
+    daemon_threads = True
+
+
+class RecordingHandler(http.server.BaseHTTPRequestHandler):
+    """
+    Records all requests and responds with the server's next canned response.
+    """
+    protocol_version = "HTTP/1.1"
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        self.server.requests.append((self.command, self.path, body))
+        status, payload = self.server.responses.pop(0)
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        if getattr(self.server, "close_connections", False):
+            self.send_header("Connection", "close")
+        self.end_headers()
+        self.wfile.write(payload)
+
+    do_GET = do_POST
+    do_DELETE = do_POST
+
+    def do_HEAD(self):
+        self.server.requests.append((self.command, self.path, b""))
+        self.send_response(200)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def log_message(self, format, *args):
+        pass
+
+
+class ConnectionWarmupTests(TestCase):
+    def setUp(self):
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), RecordingHandler)
+        self.httpd.requests = []
+        self.httpd.responses = []
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+        self.es = client.EsClientFactory(hosts=[{"host": "127.0.0.1", "port": self.httpd.server_address[1]}],
+                                         client_options={"maxsize": 3}).create()
+
+    def tearDown(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def test_warms_up_connections(self):
+        self.assertEqual(0, client.opened_connections(self.es))
+
+        self.assertEqual(2, client.warmup_connections(self.es, connections_per_host=2))
+
+        self.assertEqual(2, client.opened_connections(self.es))
+        self.assertEqual([("HEAD", "/", b""), ("HEAD", "/", b"")], self.httpd.requests)
+        self.httpd.responses.append((200, b'{"version":{"number":"5.0.0"}}'))
+        self.es.info()
+        # the request has used a warmed up connection
+        self.assertEqual(2, client.opened_connections(self.es))
+
+    def test_counts_reopened_connections(self):
+        self.httpd.close_connections = True
+        for _ in range(3):
+            self.httpd.responses.append((200, b'{"version":{"number":"5.0.0"}}'))
+            self.es.info()
+        for _ in range(2):
+            self.httpd.responses.append((200, b'{"took":3,"errors":false,"items":[]}'))
+            client.LeanClient(self.es).bulk(body=["{}", "{}"])
+
+        # urllib3 reopens the same connection object each time
+        self.assertEqual(1, client.connection_pools(self.es)[0].num_connections)
+        self.assertEqual(5, client.opened_connections(self.es))
+
+    def test_checks_connections_with_url_prefix(self):
+        es = client.EsClientFactory(hosts=[{"host": "127.0.0.1", "port": self.httpd.server_address[1], "url_prefix": "es"}],
+                                    client_options={}).create()
+
+        self.assertEqual(1, client.warmup_connections(es, connections_per_host=1))
+        self.assertEqual([("HEAD", "/es/", b"")], self.httpd.requests)
+
+    def test_caps_warmup_at_pool_size(self):
+        self.assertEqual(3, client.warmup_connections(self.es, connections_per_host=8))
+        self.assertEqual(3, client.opened_connections(self.es))
+
+
+class LeanClientTests(TestCase):
+    def setUp(self):
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), RecordingHandler)
+        self.httpd.requests = []
+        self.httpd.responses = []
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+        es = client.EsClientFactory(hosts=[{"host": "127.0.0.1", "port": self.httpd.server_address[1]}], client_options={}).create()
+        self.es = client.LeanClient(es)
+
+    def tearDown(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def respond_with(self, status, payload):
+        self.httpd.responses.append((status, payload))
+
+    def test_sends_bulk_body_as_is(self):
+        self.respond_with(200, b'{"took":3,"errors":false,"items":[{"index":{"status":201}}]}')
+        body = b'{"index": {"_index": "test", "_type": "docs"}}\n{"key": "value"}\n'
+
+        status, response = self.es.transport.perform_request("POST", "/_bulk", params={"pipeline": "p"}, body=body)
+
+        self.assertEqual(200, status)
+        self.assertFalse(response["errors"])
+        self.assertEqual([("POST", "/_bulk?pipeline=p", body)], self.httpd.requests)
+
+    def test_reuses_connection(self):
+        self.respond_with(200, b'{"took":3,"errors":false,"items":[]}')
+        self.respond_with(200, b'{"took":3,"errors":false,"items":[]}')
+
+        self.es.bulk(body=["{}", "{}"])
+        self.es.bulk(body=["{}", "{}"])
+
+        self.assertEqual(1, client.opened_connections(self.es))
+        self.assertEqual(("POST", "/_bulk", b"{}\n{}\n"), self.httpd.requests[0])
+
+    def test_warms_up_connections(self):
+        self.assertEqual(2, client.warmup_connections(self.es, connections_per_host=2))
+        self.assertEqual(2, client.opened_connections(self.es))
+        self.respond_with(200, b'{"took":3,"errors":false,"items":[]}')
+
+        self.es.bulk(body=["{}", "{}"])
+
+        self.assertEqual(2, client.opened_connections(self.es))
+
+    def test_search_and_scroll(self):
+        self.respond_with(200, b'{"_scroll_id":"abc","took":1,"hits":{"hits":[{"_id":"1"}]}}')
+        self.respond_with(200, b'{"_scroll_id":"abc","took":1,"hits":{"hits":[]}}')
+
+        r = self.es.search(index="test", doc_type="docs", body={"query": {"match_all": {}}}, sort="_doc", scroll="10s", size=100,
+                           request_cache=False)
+        self.assertEqual("abc", r["_scroll_id"])
+        self.assertEqual(1, len(r["hits"]["hits"]))
+        r = self.es.scroll(scroll_id="abc", scroll="10s")
+        self.assertEqual(0, len(r["hits"]["hits"]))
+
+        method, path, body = self.httpd.requests[0]
+        self.assertTrue(path.startswith("/test/docs/_search?"))
+        self.assertIn("request_cache=false", path)
+        self.assertEqual({"query": {"match_all": {}}}, json.loads(body.decode("utf-8")))
+        self.assertEqual({"scroll_id": "abc", "scroll": "10s"}, json.loads(self.httpd.requests[1][2].decode("utf-8")))
+
+    def test_records_request_timings(self):
+        self.respond_with(200, b'{"_scroll_id":"abc","took":1,"hits":{"hits":[]}}')
+
+        client.start_request_timings()
+        r = self.es.search(index="test", body={"query": {"match_all": {}}})
+        # the response is decoded lazily
+        self.assertEqual([], r["hits"]["hits"])
+        timings = client.stop_request_timings()
+
+        self.assertEqual(1, timings.requests)
+        self.assertGreater(timings.connect, 0)
+        self.assertGreater(timings.time_to_first_byte, 0)
+        self.assertGreater(timings.decode, 0)
+        self.assertIsNone(client.stop_request_timings())
+
+    def test_delegates_other_api_calls(self):
+        self.respond_with(200, b'{"_shards":{"total":1,"successful":1,"failed":0}}')
+        self.respond_with(200, b'{"cluster_name":"test","nodes":{}}')
+
+        self.assertEqual(1, self.es.indices.refresh(index="test")["_shards"]["successful"])
+        self.assertEqual("test", self.es.nodes.info()["cluster_name"])
+
+        self.assertEqual("/test/_refresh", self.httpd.requests[0][1])
+        self.assertEqual("/_nodes", self.httpd.requests[1][1])
+
+    def test_raises_transport_error(self):
+        self.respond_with(404, b'{"error":"index_not_found_exception","status":404}')
+
+        with self.assertRaises(elasticsearch.NotFoundError) as ctx:
+            self.es.indices.stats(metric="_all")
+        self.assertEqual(404, ctx.exception.status_code)
+        self.assertEqual("index_not_found_exception", ctx.exception.error)
+
+
+class CompressionTests(TestCase):
+    def setUp(self):
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), RecordingHandler)
+        self.httpd.requests = []
+        self.httpd.responses = []
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+        self.es = client.EsClientFactory(hosts=[{"host": "127.0.0.1", "port": self.httpd.server_address[1]}],
+                                         client_options={"compressed": True}).create()
+
+    def tearDown(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def test_compresses_request_bodies(self):
+        self.httpd.responses.append((200, b'{"took":3,"errors":false,"items":[]}'))
+        body = b'{"index": {}}\n{"key": "value"}\n'
+
+        self.es.transport.perform_request("POST", "/_bulk", body=body)
+
+        self.assertEqual(body, gzip.decompress(self.httpd.requests[0][2]))
+        stats = client.compression_stats(self.es)
+        self.assertEqual(len(body), stats["uncompressed_bytes"])
+        self.assertEqual(len(self.httpd.requests[0][2]), stats["compressed_bytes"])
+
+    def test_sends_compressed_bodies_as_is(self):
+        self.httpd.responses.append((200, b'{"took":3,"errors":false,"items":[]}'))
+        self.httpd.responses.append((200, b'{"took":3,"errors":false,"items":[]}'))
+        body = client.compress(b'{"index": {}}\n{"key": "value"}\n')
+
+        self.es.transport.perform_request("POST", "/_bulk", body=body)
+        client.LeanClient(self.es).transport.perform_request("POST", "/_bulk", body=body)
+
+        self.assertEqual(bytes(body), self.httpd.requests[0][2])
+        self.assertEqual(bytes(body), self.httpd.requests[1][2])
+        stats = client.compression_stats(self.es)
+        self.assertEqual(2 * body.uncompressed_size, stats["uncompressed_bytes"])
+        self.assertEqual(2 * len(body), stats["compressed_bytes"])
+
+    def test_records_request_timings_of_compressed_requests(self):
+        self.httpd.responses.append((200, b'{"took":3,"errors":false,"items":[]}'))
+        self.httpd.responses.append((200, b'{"took":3,"errors":false,"items":[]}'))
+
+        client.start_request_timings()
+        self.es.bulk(body=["{}", "{}"])
+        self.es.bulk(body=["{}", "{}"])
+        timings = client.stop_request_timings()
+
+        self.assertEqual(2, timings.requests)
+        for phase in client.REQUEST_PHASES:
+            self.assertGreater(getattr(timings, phase), 0, phase)
+
+    def test_no_stats_without_compression(self):
+        es = client.EsClientFactory(hosts=[{"host": "127.0.0.1", "port": self.httpd.server_address[1]}], client_options={}).create()
+        self.assertEqual(0, len(client.compression_stats(es)))
+
+
+class LeanResponseTests(TestCase):
+    def test_extracts_fields_without_decoding(self):
+        response = client.LeanResponse(b'{"took":30,"errors":true,"items":[not decodable]}')
+        self.assertTrue(response["errors"])
+
+        response = client.LeanResponse(b'{"_scroll_id":"c2Nhbjs2OzM0NDg1ODpzRlBLc0FXNlNyNm5JWUc1","took":1,[not decodable]}')
+        self.assertEqual("c2Nhbjs2OzM0NDg1ODpzRlBLc0FXNlNyNm5JWUc1", response["_scroll_id"])
+
+    def test_decodes_body_for_other_fields(self):
+        response = client.LeanResponse(b'{"errors": false, "items": [{"index": {"status": 201}}]}')
+
+        self.assertFalse(response["errors"])
+        self.assertEqual(201, response["items"][0]["index"]["status"])
+        self.assertIn("items", response)
+        self.assertIsNone(response.get("took"))
@@ -0,0 +1,117 @@
+import asyncio
+from unittest import TestCase
+
+from esrally import metrics, track
+from esrally.driver import asyncdriver, driver, runner
+
+
+class CountingRunner(runner.Runner):
+    def __init__(self):
+        self.calls = 0
+
+    def __call__(self, es, params):
+        self.calls += 1
+        return 1, "ops"
+
+
+class AsyncCountingRunner(runner.AsyncRunner):
+    def __init__(self):
+        self.calls = 0
+
+    async def __call__(self, es, params):
+        self.calls += 1
+        await asyncio.sleep(0)
+        return params["size"], "docs"
+
+
+class NextStepTests(TestCase):
+    def test_determines_tasks_until_next_join_point(self):
+        op1 = track.Operation("index-a", track.OperationType.Index)
+        op2 = track.Operation("index-b", track.OperationType.Index)
+        op3 = track.Operation("index-c", track.OperationType.Index)
+        index_a = track.Task(op1)
+        index_b = track.Task(op2)
+        index_c = track.Task(op3)
+        allocations = driver.Allocator([track.Parallel(tasks=[index_a, index_b, index_c], clients=2)]).allocations
+        client_allocations = {0: allocations[0], 1: allocations[1]}
+
+        tasks_per_client, join_point, next_task = asyncdriver.next_step(client_allocations, 0)
+        self.assertEqual({0: [], 1: []}, tasks_per_client)
+        self.assertEqual(driver.JoinPoint(0), join_point)
+        self.assertEqual(1, next_task)
+
+        tasks_per_client, join_point, next_task = asyncdriver.next_step(client_allocations, next_task)
+        self.assertEqual({0: [index_a, index_c], 1: [index_b]}, tasks_per_client)
+        self.assertEqual(driver.JoinPoint(1), join_point)
+        self.assertEqual(len(allocations[0]), next_task)
+
+
+class ExecuteScheduleTests(TestCase):
+    @staticmethod
+    def schedule(r, iterations):
+        for i in range(iterations):
+            yield (0, lambda start: metrics.SampleType.Normal, i, iterations, r, {"size": 5}, None)
+
+    @staticmethod
+    async def gather(coroutines):
+        await asyncio.gather(*coroutines)
+
+    def run_schedules(self, schedules):
+        samplers = []
+        loop = asyncio.new_event_loop()
+        try:
+            coroutines = []
+            for client_id, schedule in enumerate(schedules):
+                sampler = driver.Sampler(client_id, track.Operation("test-op", track.OperationType.Index), 0)
+                samplers.append(sampler)
+                coroutines.append(asyncdriver.execute_schedule(loop, schedule, None, sampler))
+            loop.run_until_complete(self.gather(coroutines))
+        finally:
+            loop.close()
+        return [sampler.samples for sampler in samplers]
+
+    def test_executes_async_and_sync_runners_concurrently(self):
+        async_runner = AsyncCountingRunner()
+        sync_runner = CountingRunner()
+
+        async_samples, sync_samples = self.run_schedules([self.schedule(async_runner, 3), self.schedule(sync_runner, 2)])
+
+        self.assertEqual(3, len(async_samples))
+        self.assertEqual({0}, {s.client_id for s in async_samples})
+        self.assertEqual({5}, {s.total_ops for s in async_samples})
+        self.assertEqual({"docs"}, {s.total_ops_unit for s in async_samples})
+        self.assertEqual(2, len(sync_samples))
+        self.assertEqual({1}, {s.client_id for s in sync_samples})
+        self.assertEqual({"ops"}, {s.total_ops_unit for s in sync_samples})
+
+    def test_each_client_uses_its_own_runner_instance(self):
+        shared_runner = AsyncCountingRunner()
+
+        self.run_schedules([self.schedule(shared_runner, 2), self.schedule(shared_runner, 2)])
+
+        # runners are copied per client so the registered instance is never called
+        self.assertEqual(0, shared_runner.calls)
+
+
+class RegisterAsyncRunnerTests(TestCase):
+    def test_registers_coroutine_function_as_async_runner(self):
+        async def search(es, params):
+            return 1, "ops"
+
+        runner.register_runner("async-test-search", search)
+
+        r = runner.runner_for("async-test-search")
+        self.assertTrue(runner.is_async(r))
+        loop = asyncio.new_event_loop()
+        try:
+            self.assertEqual((1, "ops"), loop.run_until_complete(r(None, {})))
+        finally:
+            loop.close()
+
+    def test_registers_plain_function_as_sync_runner(self):
+        def search(es, params):
+            return 1, "ops"
+
+        runner.register_runner("sync-test-search", search)
+
+        self.assertFalse(runner.is_async(runner.runner_for("sync-test-search")))
@@ -0,0 +1,4 @@
+import sys
+
+# the asyncio based load generator is implemented with "async def" which requires Python 3.5
+collect_ignore = ["asyncdriver_test.py"] if sys.version_info < (3, 5) else []
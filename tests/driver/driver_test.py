@@ -1,7 +1,13 @@
-from unittest import TestCase
-
-from esrally import metrics, track
-from esrally.driver import driver
+import pickle
+import random
+import socket
+import time
+import unittest.mock as mock
+from unittest import TestCase, skipIf
+
+import thespian.actors
+from esrally import client, config, exceptions, metrics, rallyd, track
+from esrally.driver import driver, saturation
 from esrally.track import params
 
 
@@ -25,7 +31,7 @@ class DriverTestParamSource:
 class ScheduleTestCase(TestCase):
     def assert_schedule(self, expected_schedule, schedule):
         idx = 0
-        for invocation_time, sample_type_calculator, current_it, total_it, runner, params in schedule:
+        for invocation_time, sample_type_calculator, current_it, total_it, runner, params, meta_data in schedule:
             exp_invocation_time, exp_sample_type, exp_current_it, exp_total_it, exp_runner, exp_params = expected_schedule[idx]
             self.assertAlmostEqual(exp_invocation_time, invocation_time, msg="Expected invocation time does not match")
             self.assertEqual(exp_sample_type, sample_type_calculator(0), "Sample type does not match")
@@ -158,6 +164,34 @@ class AllocatorTests(TestCase):
 
         self.assertEqual([{op1, op2, op3}], allocator.operations_per_joinpoint)
 
+    def test_calculates_tasks_per_joinpoint(self):
+        op1 = track.Operation("index-a", track.OperationType.Index, param_source="driver-test-param-source")
+        op2 = track.Operation("index-b", track.OperationType.Index, param_source="driver-test-param-source")
+        task1 = track.Task(op1, clients=2)
+        task2 = track.Task(op2)
+
+        allocator = driver.Allocator([task1, track.Parallel([task1, task2])])
+
+        self.assertEqual([[task1], [task1, task2]], allocator.tasks_per_joinpoint)
+
+    def test_allocates_clients_round_robin_to_workers(self):
+        op = track.Operation("index", track.OperationType.Index, param_source="driver-test-param-source")
+        allocations = driver.Allocator([track.Task(op, clients=5)]).allocations
+
+        workers = driver.allocate_to_workers(allocations, max_workers=2)
+
+        self.assertEqual(2, len(workers))
+        self.assertEqual({0: allocations[0], 2: allocations[2], 4: allocations[4]}, workers[0])
+        self.assertEqual({1: allocations[1], 3: allocations[3]}, workers[1])
+
+    def test_allocates_at_most_one_worker_per_client(self):
+        op = track.Operation("index", track.OperationType.Index, param_source="driver-test-param-source")
+        allocations = driver.Allocator([track.Task(op, clients=2)]).allocations
+
+        workers = driver.allocate_to_workers(allocations, max_workers=8)
+
+        self.assertEqual([{0: allocations[0]}, {1: allocations[1]}], workers)
+
 
 class MetricsAggregationTests(TestCase):
     def setUp(self):
@@ -188,10 +222,361 @@ class MetricsAggregationTests(TestCase):
         self.assertEqual((1470838595, 21, metrics.SampleType.Normal, 5000, "docs/s"), throughput[0])
         self.assertEqual((1470838596, 22, metrics.SampleType.Normal, 5000, "docs/s"), throughput[1])
         self.assertEqual((1470838597, 23, metrics.SampleType.Normal, 5000, "docs/s"), throughput[2])
-        self.assertEqual((1470838598, 24, metrics.SampleType.Normal, 5000, "docs/s"), throughput[3])
-        self.assertEqual((1470838599, 25, metrics.SampleType.Normal, 6000, "docs/s"), throughput[4])
-        self.assertEqual((1470838600, 26, metrics.SampleType.Normal, 6666.666666666667, "docs/s"), throughput[5])
-        # self.assertEqual((1470838600.5, 26.5, metrics.SampleType.Normal, 10000), throughput[6])
+        # throughput is reported at the last sample of each bucket
+        self.assertEqual((1470838598.5, 24.5, metrics.SampleType.Normal, 25000 / 4.5, "docs/s"), throughput[3])
+        self.assertEqual((1470838599.5, 25.5, metrics.SampleType.Normal, 35000 / 5.5, "docs/s"), throughput[4])
+        self.assertEqual((1470838600.5, 26.5, metrics.SampleType.Normal, 45000 / 6.5, "docs/s"), throughput[5])
+
+    def test_metrics_aggregation_with_sliding_window(self):
+        op = track.Operation("index", track.OperationType.Index, param_source="driver-test-param-source")
+
+        samples = [driver.Sample(0, 100 + i, i, op, metrics.SampleType.Normal, -1, -1, 1000 * (i + 1), "docs", 1, i, 10)
+                   for i in range(6)]
+
+        throughput = driver._calculate_global_throughput(samples, bucket_interval_secs=2, window_secs=2)[op]
+
+        # the operation starts at 99 (the first sample took one second) and the buckets are [100, 102), [102, 104) and [104, 106)
+        self.assertEqual([(101, 1, metrics.SampleType.Normal, 1500, "docs/s"),
+                          (103, 3, metrics.SampleType.Normal, 3500, "docs/s"),
+                          (105, 5, metrics.SampleType.Normal, 5500, "docs/s")], throughput)
+
+    @skipIf(driver.numpy is None, "NumPy is not available")
+    def test_vectorized_metrics_aggregation_matches_pure_python(self):
+        ops = [track.Operation("index", track.OperationType.Index), track.Operation("search", track.OperationType.Search)]
+        rnd = random.Random(17)
+        samples = []
+        for client_id in range(4):
+            t = 1470838595
+            for i in range(500):
+                t += rnd.uniform(0, 0.2)
+                sample_type = metrics.SampleType.Warmup if i < 100 else metrics.SampleType.Normal
+                samples.append(driver.Sample(client_id, t, t - 1470838590, ops[i % 2], sample_type, -1, -1, rnd.randint(1, 5000), "docs",
+                                             rnd.uniform(0, 0.2), i, 500))
+        rnd.shuffle(samples)
+
+        for bucket_interval_secs, window_secs in [(1, None), (0.5, None), (5, None), (1, 3)]:
+            expected = driver._calculate_global_throughput(samples, bucket_interval_secs, window_secs)
+            actual = driver._calculate_global_throughput_vectorized(samples, bucket_interval_secs, window_secs)
+            self.assertEqual(expected.keys(), actual.keys())
+            for op in ops:
+                self.assertEqual(len(expected[op]), len(actual[op]))
+                for e, a in zip(expected[op], actual[op]):
+                    self.assertEqual(e[:3], a[:3])
+                    self.assertAlmostEqual(e[3], a[3])
+                    self.assertEqual(e[4], a[4])
+
+
+class SamplerTests(TestCase):
+    def setUp(self):
+        self.op = track.Operation("index", track.OperationType.Index)
+
+    def test_does_not_drop_samples(self):
+        sampler = driver.Sampler(3, self.op, time.perf_counter())
+        for i in range(5000):
+            sampler.add(metrics.SampleType.Normal, 10, 8, 5000, "docs", i / 100, i + 1, 5000)
+
+        samples = list(sampler.samples)
+
+        self.assertEqual(5000, len(samples))
+        self.assertEqual(list(range(1, 5001)), [s.curr_iteration for s in samples])
+        # samples are removed on retrieval
+        self.assertEqual(0, len(sampler.samples))
+
+    def test_batch_preserves_samples(self):
+        op2 = track.Operation("search", track.OperationType.Search)
+        batch = driver.SampleBatch()
+        batch.add(0, 1470838595.25, 21.5, self.op, metrics.SampleType.Warmup, 12.5, 10.25, 5000, "docs", 1.5, 1, 9)
+        batch.add(7, 1470838596.5, 22.5, op2, metrics.SampleType.Normal, 3.5, 3.5, 1, "ops", 2.5, 2, 9, {"probe": 1}, 0.75)
+
+        first, second = pickle.loads(pickle.dumps(batch))
+
+        self.assertEqual(0, first.client_id)
+        self.assertEqual(1470838595.25, first.absolute_time)
+        self.assertEqual(21.5, first.relative_time)
+        self.assertEqual(self.op, first.operation)
+        self.assertEqual(metrics.SampleType.Warmup, first.sample_type)
+        self.assertEqual(12.5, first.latency_ms)
+        self.assertEqual(10.25, first.service_time_ms)
+        self.assertEqual(5000, first.total_ops)
+        self.assertEqual("docs", first.total_ops_unit)
+        self.assertEqual(1.5, first.time_period)
+        self.assertEqual(1, first.curr_iteration)
+        self.assertEqual(9, first.total_iterations)
+        self.assertIsNone(first.meta_data)
+        self.assertEqual(0, first.param_starvation_ms)
+
+        self.assertEqual(7, second.client_id)
+        self.assertEqual(op2, second.operation)
+        self.assertEqual("ops", second.total_ops_unit)
+        self.assertEqual({"probe": 1}, second.meta_data)
+        self.assertEqual(0.75, second.param_starvation_ms)
+
+    def test_batch_preserves_request_timings(self):
+        buffer = driver.SampleBuffer()
+        sampler = driver.Sampler(0, self.op, 0, buffer)
+        timings = client.RequestTimings()
+        timings.requests = 1
+        timings.send = 0.0005
+        timings.time_to_first_byte = 0.012
+        timings.receive = 0.001
+        timings.decode = 0.002
+        sampler.add(metrics.SampleType.Normal, 16, 15.5, 1, "ops", 1, 1, 2)
+        sampler.add(metrics.SampleType.Normal, 16, 15.5, 1, "ops", 1, 2, 2, request_timings=timings)
+
+        first, second = pickle.loads(pickle.dumps(buffer.swap()))
+
+        self.assertIsNone(first.request_timings)
+        self.assertEqual((0, 0.5, 12, 1, 2), second.request_timings)
+
+    def test_stores_repeated_values_once(self):
+        batch = driver.SampleBatch()
+        for i in range(100):
+            batch.add(0, i, i, self.op, metrics.SampleType.Normal, 1, 1, 1, "docs", i, i, 100, {"profile-step": i // 50})
+
+        self.assertEqual(100, len(batch))
+        self.assertEqual([self.op], batch.operations)
+        self.assertEqual(["docs"], batch.units)
+        self.assertEqual([{"profile-step": 0}, {"profile-step": 1}], batch.meta_data)
+
+    def test_samplers_share_a_buffer(self):
+        buffer = driver.SampleBuffer()
+        driver.Sampler(0, self.op, 0, buffer).add(metrics.SampleType.Normal, 10, 8, 1, "docs", 1, 1, 1)
+        driver.Sampler(1, self.op, 0, buffer).add(metrics.SampleType.Normal, 10, 8, 1, "docs", 1, 1, 1)
+
+        self.assertEqual([0, 1], [s.client_id for s in buffer.swap()])
+        self.assertEqual(0, len(buffer.swap()))
+
+
+class AggregatesTests(TestCase):
+    def setUp(self):
+        self.op = track.Operation("index", track.OperationType.Index)
+
+    def test_aggregates_samples_and_retains_a_subset(self):
+        buffer = driver.SampleBuffer(aggregate=True, raw_sample_ratio=0.1)
+        sampler = driver.Sampler(0, self.op, 0, buffer)
+        for i in range(100):
+            sampler.add(metrics.SampleType.Warmup if i < 10 else metrics.SampleType.Normal, i + 1, 1, 1000, "docs", i / 10, i + 1, 100,
+                        param_starvation_ms=i % 2)
+
+        batch = pickle.loads(pickle.dumps(buffer.swap()))
+
+        self.assertEqual(10, len(batch))
+        self.assertFalse(batch.empty)
+        aggregates = batch.aggregates
+        self.assertEqual(100, len(aggregates))
+        latency = aggregates.histogram_for("index", metrics.SampleType.Normal, "latency")
+        self.assertEqual(90, latency.count)
+        self.assertEqual(11, latency.min)
+        self.assertEqual(10, aggregates.histogram_for("index", metrics.SampleType.Warmup, "service_time").count)
+        param_starvation = aggregates.histogram_for("index", metrics.SampleType.Normal, "param_starvation")
+        self.assertEqual(90, param_starvation.count)
+        self.assertEqual(1, param_starvation.max)
+        self.assertEqual(100, aggregates.most_recent_samples[0].curr_iteration)
+        self.assertTrue(buffer.swap().empty)
+
+    def test_aggregates_request_timings(self):
+        aggregates = driver.Aggregates()
+        aggregates.add(0, 1, 1, self.op, metrics.SampleType.Normal, 10, 9, 1, "ops", 1, 1, 2)
+        aggregates.add(0, 2, 2, self.op, metrics.SampleType.Normal, 10, 9, 1, "ops", 2, 2, 2, request_timings=(0, 1, 7, 1, 2))
+
+        time_to_first_byte = aggregates.histogram_for("index", metrics.SampleType.Normal, "request_time_to_first_byte")
+        self.assertEqual(1, time_to_first_byte.count)
+        self.assertEqual(7, time_to_first_byte.max)
+        self.assertEqual(1, aggregates.histogram_for("index", metrics.SampleType.Normal, "request_decode").count)
+
+    def test_merges_aggregates_per_step(self):
+        a = driver.Aggregates()
+        b = driver.Aggregates()
+        for i in range(10):
+            a.add(0, 100 + i, i, self.op, metrics.SampleType.Normal, 10, 5, 1, "ops", i, i, 20, {"probe": 0, "target-throughput": 10})
+            b.add(1, 105 + i, i, self.op, metrics.SampleType.Normal, 30, 5, 1, "ops", i, i, 20, {"probe": 1, "target-throughput": 20})
+
+        a.merge(b)
+
+        self.assertEqual(20, len(a))
+        self.assertEqual({0, 1}, set(a.most_recent_samples.keys()))
+        self.assertEqual(20, a.histogram_for("index", metrics.SampleType.Normal, "latency").count)
+        probe_1 = a.histogram_for("index", metrics.SampleType.Normal, "latency", {"probe": 1})
+        self.assertEqual(10, probe_1.count)
+        self.assertEqual(30, probe_1.max)
+        self.assertEqual((105, 114), a.time_range_for("index", metrics.SampleType.Normal, {"probe": 1}))
+        self.assertIsNone(a.histogram_for("index", metrics.SampleType.Normal, "latency", {"probe": 2}))
+
+    def test_calculates_throughput_from_buckets(self):
+        samples = [
+            driver.Sample(0, 1470838595, 21, self.op, metrics.SampleType.Normal, -1, -1, 5000, "docs", 1, 1, 9),
+            driver.Sample(0, 1470838596, 22, self.op, metrics.SampleType.Normal, -1, -1, 5000, "docs", 2, 1, 9),
+            driver.Sample(0, 1470838597, 23, self.op, metrics.SampleType.Normal, -1, -1, 5000, "docs", 3, 1, 9),
+            driver.Sample(0, 1470838598, 24, self.op, metrics.SampleType.Normal, -1, -1, 5000, "docs", 4, 1, 9),
+            driver.Sample(1, 1470838598.5, 24.5, self.op, metrics.SampleType.Normal, -1, -1, 5000, "docs", 4.5, 1, 9)
+        ]
+        buckets = driver.ThroughputBuckets("docs")
+        other = driver.ThroughputBuckets("docs")
+        for sample in samples:
+            target = buckets if sample.client_id == 0 else other
+            target.add(sample.absolute_time, sample.relative_time, sample.sample_type, sample.total_ops, sample.time_period)
+        buckets.merge(other)
+
+        throughput = buckets.throughput()
+
+        self.assertEqual(driver.calculate_global_throughput(samples)[self.op], throughput)
+        self.assertEqual((1470838598.5, 24.5, metrics.SampleType.Normal, 25000 / 4.5, "docs/s"), throughput[3])
+
+    def test_calculates_throughput_in_sliding_window(self):
+        buckets = driver.ThroughputBuckets("docs", bucket_interval_secs=2)
+        for i in range(6):
+            buckets.add(100 + i, i, metrics.SampleType.Normal, 1000 * (i + 1), 1)
+
+        self.assertEqual([(101, 1, metrics.SampleType.Normal, 1500, "docs/s"),
+                          (103, 3, metrics.SampleType.Normal, 3500, "docs/s"),
+                          (105, 5, metrics.SampleType.Normal, 5500, "docs/s")], buckets.throughput(window_secs=2))
+
+
+class ThroughputCalculatorTests(TestCase):
+    def setUp(self):
+        self.index = track.Operation("index", track.OperationType.Index)
+        self.search = track.Operation("search", track.OperationType.Search)
+
+    def batches(self):
+        for client_id in range(3):
+            batch = driver.SampleBatch()
+            for i in range(100):
+                sample_type = metrics.SampleType.Warmup if i < 20 else metrics.SampleType.Normal
+                batch.add(client_id, 1000 + i / 10 + client_id / 100, i / 10, self.index, sample_type, 1, 1, 500, "docs", 0.1, i, 100)
+                batch.add(client_id, 1000 + i / 5, i / 5, self.search, sample_type, 1, 1, 1, "ops", 0.2, i, 100)
+            yield pickle.loads(pickle.dumps(batch))
+
+    def expected_throughput(self, bucket_interval_secs):
+        buckets = {self.index: driver.ThroughputBuckets("docs", bucket_interval_secs),
+                   self.search: driver.ThroughputBuckets("ops", bucket_interval_secs)}
+        for batch in self.batches():
+            for s in batch:
+                buckets[s.operation].add(s.absolute_time, s.relative_time, s.sample_type, s.total_ops, s.time_period)
+        return {op: b.throughput() for op, b in buckets.items()}
+
+    def assert_throughput_equal(self, expected, actual):
+        self.assertEqual(expected.keys(), actual.keys())
+        for op in expected:
+            self.assertEqual(len(expected[op]), len(actual[op]))
+            for e, a in zip(expected[op], actual[op]):
+                self.assertEqual(e[:3], a[:3])
+                self.assertAlmostEqual(e[3], a[3])
+                self.assertEqual(e[4], a[4])
+
+    def test_calculates_throughput_incrementally(self):
+        calculator = driver.ThroughputCalculator(bucket_interval_secs=2)
+        for batch in self.batches():
+            calculator.add(batch)
+
+        self.assert_throughput_equal(self.expected_throughput(2), calculator.calculate())
+
+    def test_calculates_throughput_incrementally_without_numpy(self):
+        calculator = driver.ThroughputCalculator()
+        with mock.patch("esrally.driver.driver.numpy", None):
+            for batch in self.batches():
+                calculator.add(batch)
+
+        self.assert_throughput_equal(self.expected_throughput(1), calculator.calculate())
+
+    def test_merges_aggregates(self):
+        aggregates = driver.Aggregates()
+        for batch in self.batches():
+            for s in batch:
+                aggregates.add(s.client_id, s.absolute_time, s.relative_time, s.operation, s.sample_type, s.latency_ms, s.service_time_ms,
+                               s.total_ops, s.total_ops_unit, s.time_period, s.curr_iteration, s.total_iterations)
+        calculator = driver.ThroughputCalculator()
+        calculator.merge(pickle.loads(pickle.dumps(aggregates)))
+
+        self.assert_throughput_equal(self.expected_throughput(1), calculator.calculate())
+
+    def test_matches_batch_calculation(self):
+        samples = [s for batch in self.batches() for s in batch]
+        for bucket_interval_secs, window_secs in [(1, None), (0.5, None), (2, None), (1, 3)]:
+            calculator = driver.ThroughputCalculator(bucket_interval_secs, window_secs)
+            for batch in self.batches():
+                calculator.add(batch)
+            incremental = calculator.calculate()
+
+            self.assert_throughput_equal(driver._calculate_global_throughput(samples, bucket_interval_secs, window_secs), incremental)
+            if driver.numpy is not None:
+                self.assert_throughput_equal(driver._calculate_global_throughput_vectorized(samples, bucket_interval_secs, window_secs),
+                                             incremental)
+
+    def test_rejects_window_smaller_than_bucket_interval(self):
+        with self.assertRaises(exceptions.SystemSetupError):
+            driver.ThroughputCalculator(bucket_interval_secs=5, window_secs=1)
+
+
+class LoadDriverHostTests(TestCase):
+    def test_actors_without_requirements_run_anywhere(self):
+        self.assertTrue(driver.runs_on_load_driver_host({}, None))
+        self.assertTrue(driver.runs_on_load_driver_host({driver.LOAD_DRIVER_HOST: "10.0.0.5:1900"}, driver.load_driver_requirements(None)))
+
+    def test_actors_run_only_on_the_requested_host(self):
+        requirements = driver.load_driver_requirements("10.0.0.5:1901")
+        self.assertTrue(driver.runs_on_load_driver_host({driver.LOAD_DRIVER_HOST: "10.0.0.5:1901"}, requirements))
+        self.assertFalse(driver.runs_on_load_driver_host({driver.LOAD_DRIVER_HOST: "10.0.0.5:1902"}, requirements))
+        self.assertFalse(driver.runs_on_load_driver_host({"coordinator": True}, requirements))
+
+
+class RemoteActorSystemTests(TestCase):
+    """
+    Runs a coordinating actor system and two load driver hosts (see esrallyd) as separate actor systems on localhost.
+    """
+
+    @staticmethod
+    def free_port():
+        with socket.socket() as s:
+            s.bind(("127.0.0.1", 0))
+            return s.getsockname()[1]
+
+    def setUp(self):
+        self.actor_systems = []
+        coordinator_port = self.free_port()
+        try:
+            self.coordinator = self.start_actor_system({"Admin Port": coordinator_port, "coordinator": True})
+            self.hosts = []
+            for _ in range(2):
+                port = self.free_port()
+                self.start_actor_system(rallyd.capabilities("127.0.0.1", port, "127.0.0.1", coordinator_port))
+                self.hosts.append("127.0.0.1:%d" % port)
+        except (thespian.actors.ActorSystemException, OSError) as e:
+            self.tearDown()
+            self.skipTest("Cannot start actor systems: %s" % e)
+
+    def start_actor_system(self, capabilities):
+        actor_system = thespian.actors.ActorSystem("multiprocTCPBase", capabilities=capabilities, logDefs=False, transientUnique=True)
+        self.actor_systems.append(actor_system)
+        return actor_system
+
+    def tearDown(self):
+        for actor_system in reversed(self.actor_systems):
+            actor_system.shutdown()
+
+    def create_on(self, host):
+        # load driver hosts need a moment to join the coordinator
+        deadline = time.perf_counter() + 10
+        while True:
+            try:
+                return self.coordinator.createActor(driver.TrackPreparator, targetActorRequirements=driver.load_driver_requirements(host))
+            except thespian.actors.NoCompatibleSystemForActor:
+                if time.perf_counter() > deadline:
+                    raise
+                time.sleep(0.2)
+
+    def test_prepares_track_on_each_load_driver_host(self):
+        t = track.Track(name="unittest", short_description="unittest track", description="unittest track", source_root_url=None,
+                        challenges=[], indices=[])
+        cfg = config.Config()
+
+        for host in self.hosts:
+            response = self.coordinator.ask(self.create_on(host), driver.PrepareTrack(host, cfg, t), timeout=10)
+            self.assertIsInstance(response, driver.TrackPrepared)
+            self.assertEqual(host, response.host)
+
+    def test_cannot_create_actors_on_unknown_host(self):
+        with self.assertRaises(thespian.actors.NoCompatibleSystemForActor):
+            self.coordinator.createActor(driver.TrackPreparator, targetActorRequirements=driver.load_driver_requirements("10.0.0.5:1900"))
 
 
 class SchedulerTests(ScheduleTestCase):
@@ -234,6 +619,136 @@ class SchedulerTests(ScheduleTestCase):
         ]
         self.assert_schedule(expected_schedule, schedule)
 
+    def test_search_task_with_poisson_schedule(self):
+        task = track.Task(track.Operation("search", track.OperationType.Search.name, params={"seed": 13},
+                                          param_source="driver-test-param-source"),
+                          warmup_iterations=0, iterations=100, clients=1, target_throughput=10, schedule="poisson")
+        invocation_times = [invocation_time for invocation_time, _, _, _, _, _, _ in driver.schedule_for(self.test_track, task, 0)]
+
+        self.assertEqual(100, len(invocation_times))
+        self.assertEqual(0, invocation_times[0])
+        self.assertEqual(sorted(invocation_times), invocation_times)
+        # not evenly spaced
+        self.assertGreater(len({round(b - a, 6) for a, b in zip(invocation_times, invocation_times[1:])}), 1)
+
+    def test_clients_have_different_poisson_schedules_with_seed(self):
+        task = track.Task(track.Operation("search", track.OperationType.Search.name, params={"seed": 13},
+                                          param_source="driver-test-param-source"),
+                          warmup_iterations=0, iterations=20, clients=2, target_throughput=10, schedule="poisson")
+
+        def invocation_times(client_index):
+            return [invocation_time for invocation_time, _, _, _, _, _, _ in driver.schedule_for(self.test_track, task, client_index)]
+
+        self.assertNotEqual(invocation_times(0), invocation_times(1))
+        # but each client's schedule is reproducible
+        self.assertEqual(invocation_times(1), invocation_times(1))
+
+    def test_schedule_for_step_profile(self):
+        task = track.Task(track.Operation("search", track.OperationType.Search.name, param_source="driver-test-param-source"),
+                          clients=2, throughput_profile=track.StepProfile([(20, 1), (40, 1)]))
+        schedule = list(driver.schedule_for(self.test_track, task, 0))
+
+        # each of the two clients issues 10 ops/s in the first step and 20 ops/s in the second step
+        self.assertAlmostEqual(30, len(schedule), delta=1)
+        invocation_times = [invocation_time for invocation_time, _, _, _, _, _, _ in schedule]
+        self.assertAlmostEqual(0.1, invocation_times[1])
+        self.assertAlmostEqual(0.05, invocation_times[-1] - invocation_times[-2])
+        meta_data = [meta for _, _, _, _, _, _, meta in schedule]
+        self.assertEqual({"target-throughput": 20, "profile-step": 0}, meta_data[0])
+        self.assertEqual({"target-throughput": 40, "profile-step": 1}, meta_data[-1])
+        # the progress is based on the expected number of operations
+        self.assertEqual({30}, {total_it for _, _, _, total_it, _, _, _ in schedule})
+
+    def test_schedule_for_ramp_profile(self):
+        task = track.Task(track.Operation("search", track.OperationType.Search.name, param_source="driver-test-param-source"),
+                          clients=1, throughput_profile=track.RampProfile(start=10, end=30, duration=2, interval=1))
+        schedule = list(driver.schedule_for(self.test_track, task, 0))
+
+        invocation_times = [invocation_time for invocation_time, _, _, _, _, _, _ in schedule]
+        wait_times = [b - a for a, b in zip(invocation_times, invocation_times[1:])]
+        self.assertEqual(sorted(wait_times, reverse=True), wait_times)
+        self.assertLess(invocation_times[-1], 2)
+        self.assertAlmostEqual(40, len(schedule), delta=2)
+        self.assertEqual(0, schedule[0][6]["profile-step"])
+        self.assertEqual(1, schedule[-1][6]["profile-step"])
+
+    def test_schedule_for_saturation_search_probe(self):
+        task = track.Task(track.Operation("search", track.OperationType.Search.name, param_source="driver-test-param-source"),
+                          clients=2, saturation_search=track.SaturationSearch(latency_percentile=99, max_latency=100,
+                                                                              initial_throughput=10, probe_duration=1))
+        schedule = list(driver.schedule_for(self.test_track, task, 0, saturation.Probe(3, 40)))
+
+        # each of the two clients issues 20 ops/s for one second
+        self.assertAlmostEqual(20, len(schedule), delta=1)
+        self.assertAlmostEqual(0.05, schedule[1][0])
+        self.assertEqual({"target-throughput": 40, "profile-step": 0, "probe": 3}, schedule[0][6])
+
+    def test_schedule_for_with_prefetched_params(self):
+        task = track.Task(track.Operation("search", track.OperationType.Search.name, param_source="driver-test-param-source"),
+                          warmup_iterations=1, iterations=3, clients=1, target_throughput=10)
+        schedule = driver.schedule_for(self.test_track, task, 0, param_prefetch_size=2)
+
+        self.assert_schedule([
+            (0, metrics.SampleType.Warmup, 0, 4, None, {}),
+            (0.1, metrics.SampleType.Normal, 0, 4, None, {}),
+            (0.2, metrics.SampleType.Normal, 1, 4, None, {}),
+            (0.3, metrics.SampleType.Normal, 2, 4, None, {}),
+        ], schedule)
+
+    def test_schedule_for_with_preloaded_params(self):
+        task = track.Task(track.Operation("bulk", track.OperationType.Index.name, param_source="driver-test-param-source",
+                                          params={"size": 3, "body": ["a", "b"]}), warmup_time_period=0, clients=1)
+        preloaded = driver.preload_params(self.test_track, [task], 0, memory_budget_bytes=1024)
+        schedule = driver.schedule_for(self.test_track, task, 0, param_source=preloaded[task])
+
+        self.assert_schedule([
+            (0, metrics.SampleType.Normal, 0, 3, None, {"size": 3, "body": b"a\nb\n"}),
+            (0, metrics.SampleType.Normal, 1, 3, None, {"size": 3, "body": b"a\nb\n"}),
+            (0, metrics.SampleType.Normal, 2, 3, None, {"size": 3, "body": b"a\nb\n"}),
+        ], list(schedule))
+
+    def test_preloads_params_within_memory_budget(self):
+        first = track.Task(track.Operation("bulk-1", track.OperationType.Index.name, param_source="driver-test-param-source",
+                                           params={"size": 2, "body": ["a" * 9]}), clients=1)
+        second = track.Task(track.Operation("bulk-2", track.OperationType.Index.name, param_source="driver-test-param-source",
+                                            params={"size": 2, "body": ["b" * 9]}), clients=1)
+
+        preloaded = driver.preload_params(self.test_track, [first, second], 0, memory_budget_bytes=30)
+
+        # the second task exceeds the remaining budget and streams its parameters
+        self.assertEqual([first], list(preloaded.keys()))
+        self.assertEqual(20, preloaded[first].size_in_bytes)
+
+    def test_max_concurrent_requests(self):
+        search = track.Operation("search", track.OperationType.Search.name)
+        tasks = [track.Task(search),
+                 track.Task(search, open_loop=True, max_in_flight=8),
+                 track.Task(search, open_loop=True, max_in_flight=4)]
+
+        self.assertEqual(8, driver.max_concurrent_requests(tasks))
+        self.assertEqual(1, driver.max_concurrent_requests(tasks[:1]))
+        self.assertEqual(1, driver.max_concurrent_requests([]))
+
+    def test_tasks_of_next_step(self):
+        tasks = [driver.JoinPoint(0), "task-1", None, "task-2", driver.JoinPoint(1), "task-3", driver.JoinPoint(2)]
+
+        self.assertEqual(["task-1", "task-2"], driver.tasks_of_next_step(tasks, 1))
+        self.assertEqual(["task-3"], driver.tasks_of_next_step(tasks, 5))
+        self.assertEqual([], driver.tasks_of_next_step(tasks, 7))
+
+    def test_schedule_for_saturation_search_requires_probe(self):
+        task = track.Task(track.Operation("search", track.OperationType.Search.name, param_source="driver-test-param-source"),
+                          saturation_search=track.SaturationSearch(latency_percentile=99, max_latency=100,
+                                                                   initial_throughput=10, probe_duration=1))
+        with self.assertRaises(exceptions.RallyAssertionError):
+            driver.schedule_for(self.test_track, task, 0)
+
+    def test_continues_after_join_point(self):
+        self.assertEqual((5, 5), driver.next_step_start(step_start=1, current_task=5, repeat_step=False))
+
+    def test_repeats_previous_step(self):
+        self.assertEqual((1, 1), driver.next_step_start(step_start=1, current_task=5, repeat_step=True))
+
     def test_schedule_for_warmup_time_based(self):
         task = track.Task(track.Operation("time-based", track.OperationType.Index.name, params={"body": ["a"], "size": 11},
                                           param_source="driver-test-param-source"),
@@ -254,3 +769,92 @@ class SchedulerTests(ScheduleTestCase):
             (9.0, metrics.SampleType.Normal, 9, 11, "runner", {"body": ["a"], "size": 11}),
             (10.0, metrics.SampleType.Normal, 10, 11, "runner", {"body": ["a"], "size": 11}),
         ], list(invocations))
+
+
+class ExecuteScheduleTests(TestCase):
+    class SlowRunner:
+        def __init__(self, sleep_seconds, fail=False):
+            self.sleep_seconds = sleep_seconds
+            self.fail = fail
+
+        def __enter__(self):
+            return self
+
+        def __call__(self, es, params):
+            time.sleep(self.sleep_seconds)
+            if self.fail:
+                raise RuntimeError("simulated failure")
+            return 1, "ops"
+
+        def __exit__(self, exc_type, exc_val, exc_tb):
+            return False
+
+    @staticmethod
+    def schedule(runner, iterations, wait_time):
+        for i in range(iterations):
+            yield (wait_time * i, lambda start: metrics.SampleType.Normal, i, iterations, runner, {}, None)
+
+    def test_open_loop_does_not_wait_for_previous_responses(self):
+        sampler = driver.Sampler(0, track.Operation("test-op", track.OperationType.Search), time.perf_counter())
+
+        start = time.perf_counter()
+        driver.execute_schedule_open_loop(self.schedule(ExecuteScheduleTests.SlowRunner(0.2), 5, 0.01), None, sampler, max_in_flight=5)
+        duration = time.perf_counter() - start
+
+        samples = sampler.samples
+        self.assertEqual(5, len(samples))
+        self.assertEqual(list(range(1, 6)), sorted([s.curr_iteration for s in samples]))
+        # a closed-loop execution would need at least one second
+        self.assertLess(duration, 0.8)
+
+    def test_open_loop_latency_includes_waiting_for_a_free_slot(self):
+        sampler = driver.Sampler(0, track.Operation("test-op", track.OperationType.Search), time.perf_counter())
+
+        driver.execute_schedule_open_loop(self.schedule(ExecuteScheduleTests.SlowRunner(0.1), 3, 0.01), None, sampler, max_in_flight=1)
+
+        last = sorted(sampler.samples, key=lambda s: s.curr_iteration)[-1]
+        # the last request was scheduled at 20ms but could only be issued after the first two have finished (at ~200ms)
+        self.assertGreater(last.latency_ms, 250)
+        self.assertLess(last.service_time_ms, last.latency_ms)
+
+    def test_measures_param_starvation(self):
+        def slow_schedule():
+            for expected_scheduled_time, sample_type_calculator, it, iterations, runner, params, meta_data in \
+                    self.schedule(ExecuteScheduleTests.SlowRunner(0), 3, 0):
+                # simulates slow parameter generation
+                time.sleep(0.05)
+                yield expected_scheduled_time, sample_type_calculator, it, iterations, runner, params, meta_data
+
+        sampler = driver.Sampler(0, track.Operation("test-op", track.OperationType.Search), time.perf_counter())
+
+        driver.execute_schedule(slow_schedule(), None, sampler)
+
+        samples = list(sampler.samples)
+        self.assertEqual(3, len(samples))
+        for sample in samples:
+            self.assertGreaterEqual(sample.param_starvation_ms, 50)
+
+    def test_records_request_timings(self):
+        class TimedRunner(ExecuteScheduleTests.SlowRunner):
+            def __call__(self, es, params):
+                # simulates what the transport records for each request
+                timings = client._current_timings()
+                timings.requests += 1
+                timings.time_to_first_byte += self.sleep_seconds
+                return super().__call__(es, params)
+
+        sampler = driver.Sampler(0, track.Operation("test-op", track.OperationType.Search), time.perf_counter())
+
+        driver.execute_schedule(self.schedule(TimedRunner(0.01), 2, 0), None, sampler, request_timings=True)
+        driver.execute_schedule(self.schedule(ExecuteScheduleTests.SlowRunner(0), 1, 0), None, sampler)
+
+        samples = list(sampler.samples)
+        self.assertEqual([10, 10], [s.request_timings[2] for s in samples[:2]])
+        self.assertIsNone(samples[2].request_timings)
+
+    def test_open_loop_propagates_errors(self):
+        sampler = driver.Sampler(0, track.Operation("test-op", track.OperationType.Search), time.perf_counter())
+
+        with self.assertRaisesRegex(RuntimeError, "simulated failure"):
+            driver.execute_schedule_open_loop(self.schedule(ExecuteScheduleTests.SlowRunner(0, fail=True), 3, 0.01), None, sampler,
+                                              max_in_flight=2)
@@ -0,0 +1,37 @@
+import unittest.mock as mock
+from unittest import TestCase
+
+from esrally import exceptions
+from esrally.driver import runner
+
+
+class BulkIndexRunnerTests(TestCase):
+    @mock.patch("elasticsearch.Elasticsearch")
+    def test_bulk_index_with_list_body(self, es):
+        es.bulk.return_value = {"errors": False}
+        body = ['{"index": {"_index": "test", "_type": "doc"}}', '{"key": "value1"}',
+                '{"index": {"_index": "test", "_type": "doc"}}', '{"key": "value2"}']
+
+        self.assertEqual((2, "docs"), runner.BulkIndex()(es, {"body": body, "pipeline": "test-pipeline"}))
+
+        es.bulk.assert_called_once_with(body=body, params={"pipeline": "test-pipeline"})
+
+    @mock.patch("elasticsearch.Elasticsearch")
+    def test_bulk_index_sends_bytes_body_as_is(self, es):
+        es.transport.perform_request.return_value = (200, {"errors": False})
+        body = b'{"index": {"_index": "test", "_type": "doc"}}\n{"key": "value1"}\n' \
+               b'{"index": {"_index": "test", "_type": "doc"}}\n{"key": "value2"}\n' \
+               b'{"index": {"_index": "test", "_type": "doc"}}\n{"key": "value3"}\n'
+
+        self.assertEqual((3, "docs"), runner.BulkIndex()(es, {"body": body}))
+
+        es.transport.perform_request.assert_called_once_with("POST", "/_bulk", params={}, body=body)
+        es.bulk.assert_not_called()
+
+    @mock.patch("elasticsearch.Elasticsearch")
+    def test_bulk_index_raises_error_for_failed_items(self, es):
+        es.transport.perform_request.return_value = (200, {"errors": True, "items": [{"index": {"status": 201}},
+                                                                                     {"index": {"status": 400}}]})
+
+        with self.assertRaises(exceptions.DataError):
+            runner.BulkIndex()(es, {"body": b'{"index": {}}\n{}\n{"index": {}}\n{}\n'})
@@ -0,0 +1,96 @@
+from unittest import TestCase
+
+from esrally import metrics, track
+from esrally.driver import driver, saturation
+
+
+class ThroughputSearchTests(TestCase):
+    def setUp(self):
+        self.op = track.Operation("search", track.OperationType.Search)
+
+    def task(self, max_probes=10, precision=0.05):
+        return track.Task(self.op, clients=1, saturation_search=track.SaturationSearch(latency_percentile=50, max_latency=100,
+                                                                                      initial_throughput=10, probe_duration=10,
+                                                                                      max_probes=max_probes, precision=precision))
+
+    def samples(self, probe, latency, throughput=None, count=11):
+        if throughput is None:
+            throughput = probe.target_throughput
+        return [driver.Sample(0, 1000 + i / throughput, i / throughput, self.op, metrics.SampleType.Normal, latency, latency, 1, "ops",
+                              i / throughput, i, count, {"probe": probe.index}) for i in range(count)]
+
+    def run_search(self, search, max_sustainable_throughput):
+        samples = []
+        probes = [search.probe]
+        while True:
+            probe = search.probe
+            latency = 50 if probe.target_throughput <= max_sustainable_throughput else 500
+            samples += self.samples(probe, latency)
+            next_probe = search.next_probe(samples)
+            if next_probe is None:
+                return probes
+            probes.append(next_probe)
+
+    def test_grows_and_bisects(self):
+        search = saturation.ThroughputSearch(self.task(precision=0.1))
+
+        probes = self.run_search(search, max_sustainable_throughput=50)
+
+        self.assertEqual([10, 20, 40, 80, 60, 50, 55], [p.target_throughput for p in probes])
+        self.assertEqual(list(range(7)), [p.index for p in probes])
+        self.assertEqual(50, search.max_sustainable_throughput)
+
+    def test_shrinks_if_initial_throughput_is_unsustainable(self):
+        search = saturation.ThroughputSearch(self.task(max_probes=3))
+
+        probes = self.run_search(search, max_sustainable_throughput=3)
+
+        self.assertEqual([10, 5, 2.5], [p.target_throughput for p in probes])
+        self.assertEqual(2.5, search.max_sustainable_throughput)
+
+    def test_no_sustainable_throughput(self):
+        search = saturation.ThroughputSearch(self.task(max_probes=2))
+
+        self.run_search(search, max_sustainable_throughput=0)
+
+        self.assertIsNone(search.max_sustainable_throughput)
+
+    def test_considers_only_samples_of_current_probe(self):
+        search = saturation.ThroughputSearch(self.task())
+        # samples of a previous probe that has violated the SLO
+        samples = self.samples(saturation.Probe(7, 10), latency=500) + self.samples(search.probe, latency=20)
+
+        result = search.evaluate(samples)
+
+        self.assertEqual(20, result.latency)
+        self.assertTrue(result.sustainable)
+
+    def test_probe_is_unsustainable_if_throughput_is_not_reached(self):
+        search = saturation.ThroughputSearch(self.task())
+
+        result = search.evaluate(self.samples(search.probe, latency=20, throughput=5))
+
+        self.assertAlmostEqual(5, result.achieved_throughput)
+        self.assertFalse(result.sustainable)
+
+    def test_probe_without_samples_is_unsustainable(self):
+        search = saturation.ThroughputSearch(self.task())
+
+        result = search.evaluate([])
+
+        self.assertIsNone(result.latency)
+        self.assertFalse(result.sustainable)
+
+    def test_evaluates_aggregated_samples(self):
+        search = saturation.ThroughputSearch(self.task())
+        aggregates = driver.Aggregates()
+        for sample in self.samples(saturation.Probe(7, 10), latency=500) + self.samples(search.probe, latency=20):
+            aggregates.add(sample.client_id, sample.absolute_time, sample.relative_time, sample.operation, sample.sample_type,
+                           sample.latency_ms, sample.service_time_ms, sample.total_ops, sample.total_ops_unit, sample.time_period,
+                           sample.curr_iteration, sample.total_iterations, sample.meta_data)
+
+        result = search.evaluate([], aggregates)
+
+        self.assertEqual(20, result.latency)
+        self.assertAlmostEqual(10, result.achieved_throughput)
+        self.assertTrue(result.sustainable)
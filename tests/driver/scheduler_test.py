@@ -0,0 +1,70 @@
+from unittest import TestCase
+
+from esrally import exceptions
+from esrally.driver import scheduler
+
+
+class SchedulerRegistryTests(TestCase):
+    def test_raises_error_for_unknown_scheduler(self):
+        with self.assertRaisesRegex(exceptions.RallyError, r"No scheduler available for name \[unknown\]"):
+            scheduler.scheduler_for("unknown", {"target-throughput": 10})
+
+    def test_creates_built_in_schedulers(self):
+        self.assertIsInstance(scheduler.scheduler_for("deterministic", {"target-throughput": 10}), scheduler.DeterministicScheduler)
+        self.assertIsInstance(scheduler.scheduler_for("poisson", {"target-throughput": 10}), scheduler.PoissonScheduler)
+
+    def test_registers_scheduler_class(self):
+        class BurstScheduler(scheduler.Scheduler):
+            def next(self, current):
+                return current + 1
+
+        scheduler.register_scheduler("unit-test-burst", BurstScheduler)
+
+        s = scheduler.scheduler_for("unit-test-burst", {"target-throughput": 10})
+        self.assertEqual(3, s.next(2))
+
+    def test_registers_scheduler_function(self):
+        def double_wait_time(current, params):
+            return current + 2 / params["target-throughput"]
+
+        scheduler.register_scheduler("unit-test-double-wait", double_wait_time)
+
+        s = scheduler.scheduler_for("unit-test-double-wait", {"target-throughput": 4})
+        self.assertEqual(1.5, s.next(1))
+
+
+class DeterministicSchedulerTests(TestCase):
+    def test_schedules_at_fixed_interval(self):
+        s = scheduler.DeterministicScheduler({"target-throughput": 4})
+        self.assertEqual(0.25, s.next(0))
+        self.assertEqual(0.5, s.next(0.25))
+
+
+class PoissonSchedulerTests(TestCase):
+    def test_mean_inter_arrival_time_matches_target_throughput(self):
+        s = scheduler.PoissonScheduler({"target-throughput": 10, "seed": 42})
+        current = 0
+        inter_arrival_times = []
+        for _ in range(10000):
+            n = s.next(current)
+            inter_arrival_times.append(n - current)
+            current = n
+
+        self.assertTrue(all(t > 0 for t in inter_arrival_times))
+        # we expect a mean of 1 / 10 seconds
+        self.assertAlmostEqual(0.1, sum(inter_arrival_times) / len(inter_arrival_times), delta=0.005)
+        # in contrast to a deterministic schedule, inter-arrival times vary
+        self.assertGreater(max(inter_arrival_times), 0.3)
+
+    def test_is_reproducible_with_seed(self):
+        s1 = scheduler.PoissonScheduler({"target-throughput": 10, "seed": 7})
+        s2 = scheduler.PoissonScheduler({"target-throughput": 10, "seed": 7})
+        self.assertEqual([s1.next(i) for i in range(5)], [s2.next(i) for i in range(5)])
+
+    def test_clients_derive_different_seeds(self):
+        s1 = scheduler.PoissonScheduler({"target-throughput": 10, "seed": 7, "client-index": 0})
+        s2 = scheduler.PoissonScheduler({"target-throughput": 10, "seed": 7, "client-index": 1})
+        s3 = scheduler.PoissonScheduler({"target-throughput": 10, "seed": 7, "client-index": 1})
+        schedule2 = [s2.next(i) for i in range(5)]
+        self.assertNotEqual([s1.next(i) for i in range(5)], schedule2)
+        self.assertEqual(schedule2, [s3.next(i) for i in range(5)])
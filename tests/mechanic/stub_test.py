@@ -0,0 +1,54 @@
+from unittest import TestCase
+
+from esrally import client
+from esrally.driver import runner
+from esrally.mechanic import stub
+
+
+class StubServerTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.server = stub.StubServer().start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.stop()
+
+    def client(self, client_options=None):
+        return client.EsClientFactory(hosts=self.server.hosts, client_options=client_options or {}).create()
+
+    def test_pretends_to_be_elasticsearch(self):
+        es = self.client()
+        self.assertEqual(stub.VERSION, es.info()["version"]["number"])
+        self.assertFalse(es.indices.exists(index="test"))
+        self.assertTrue(es.indices.create(index="test")["acknowledged"])
+        self.assertEqual("yellow", es.cluster.health(wait_for_status="yellow")["status"])
+
+    def test_bulk_index(self):
+        bulk = runner.BulkIndex()
+        body = ['{"index": {"_index": "test", "_type": "docs"}}', '{"key": "value"}'] * 3
+
+        self.assertEqual((3, "docs"), bulk(self.client(), {"body": body}))
+        self.assertEqual((3, "docs"), bulk(self.client(client_options={"compressed": True}), {"body": body}))
+        self.assertEqual((3, "docs"), bulk(client.LeanClient(self.client()), {"body": ("\n".join(body) + "\n").encode("utf-8")}))
+
+    def test_search(self):
+        response = self.client().search(index="test", body={"query": {"match_all": {}}}, size=3)
+        self.assertEqual(3, response["hits"]["total"])
+        self.assertEqual(3, len(response["hits"]["hits"]))
+        self.assertNotIn("_scroll_id", response)
+
+    def test_scroll_query(self):
+        es = self.client()
+        query = runner.Query()
+        params = {
+            "index": "test",
+            "type": "docs",
+            "use_request_cache": False,
+            "body": {"query": {"match_all": {}}},
+            "pages": 5,
+            "items_per_page": 100
+        }
+        with query:
+            self.assertEqual((5, "ops"), query(es, params))
+        self.assertIsNone(query.scroll_id)
@@ -3,6 +3,7 @@ from unittest import TestCase
 import unittest.mock as mock
 
 from esrally import config, metrics, track
+from esrally.utils import histogram
 
 
 class MockClientFactory:
@@ -313,6 +314,42 @@ class InMemoryMetricsStoreTests(TestCase):
 
         self.assert_equal_percentiles("query_latency", [99, 99.9, 100], {99: 990.0, 99.9: 999.0, 100: 1000.0})
 
+    def test_get_percentile_filtered_by_meta_data(self):
+        self.metrics_store.open(EsMetricsTests.TRIAL_TIMESTAMP, "test", "append-no-conflicts", "defaults", create=True)
+        for i in range(1, 101):
+            self.metrics_store.put_value_cluster_level("latency", float(i), "ms", meta_data={"profile-step": 0})
+            self.metrics_store.put_value_cluster_level("latency", float(i * 10), "ms", meta_data={"profile-step": 1})
+
+        self.metrics_store.close()
+
+        self.metrics_store.open(EsMetricsTests.TRIAL_TIMESTAMP, "test", "append-no-conflicts", "defaults")
+
+        self.assertEqual(200, len(self.metrics_store.get("latency")))
+        self.assertEqual(100, self.metrics_store.get_count("latency", meta_data={"profile-step": 1}))
+        self.assertEqual({100: 100.0}, self.metrics_store.get_percentiles("latency", percentiles=[100], meta_data={"profile-step": 0}))
+        self.assertEqual({100: 1000.0}, self.metrics_store.get_percentiles("latency", percentiles=[100], meta_data={"profile-step": 1}))
+
+    def test_get_merged_histogram(self):
+        self.metrics_store.open(EsMetricsTests.TRIAL_TIMESTAMP, "test", "append-no-conflicts", "defaults", create=True)
+        for step in range(2):
+            h = histogram.Histogram()
+            for i in range(1, 101):
+                h.record(i * (step + 1))
+            self.metrics_store.put_histogram_cluster_level("latency_histogram", h, "ms", operation="search",
+                                                           meta_data={"profile-step": step})
+
+        self.metrics_store.close()
+
+        self.metrics_store.open(EsMetricsTests.TRIAL_TIMESTAMP, "test", "append-no-conflicts", "defaults")
+
+        merged = self.metrics_store.get_histogram("latency_histogram", operation="search", sample_type=metrics.SampleType.Normal)
+        self.assertEqual(200, merged.count)
+        self.assertEqual(200, merged.max)
+        self.assertEqual(100, self.metrics_store.get_histogram("latency_histogram", meta_data={"profile-step": 0}).max)
+        self.assertIsNone(self.metrics_store.get_histogram("latency_histogram", sample_type=metrics.SampleType.Warmup))
+        # the value of a histogram metric record is its number of values
+        self.assertEqual([100, 100], self.metrics_store.get("latency_histogram"))
+
     def assert_equal_percentiles(self, name, percentiles, expected_percentiles):
         actual_percentiles = self.metrics_store.get_percentiles(name, percentiles=percentiles)
         self.assertEqual(len(expected_percentiles), len(actual_percentiles))
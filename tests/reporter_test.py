@@ -3,6 +3,7 @@ import datetime
 from unittest import TestCase
 
 from esrally import reporter, metrics, config, track
+from esrally.utils import histogram
 
 
 class ReporterTests(TestCase):
@@ -37,3 +38,148 @@ class ReporterTests(TestCase):
         self.assertEqual((500, 1000, 2000, "docs/s"), stats.op_metrics["index"]["throughput"])
         self.assertEqual(collections.OrderedDict([(50.0, 220), (100, 225)]), stats.op_metrics["index"]["latency"])
         self.assertEqual(collections.OrderedDict([(50.0, 200), (100, 215)]), stats.op_metrics["index"]["service_time"])
+
+    def test_calculate_latency_per_profile_step(self):
+        cfg = config.Config()
+        cfg.add(config.Scope.application, "system", "env.name", "unittest")
+
+        store = metrics.InMemoryMetricsStore(config=cfg, clear=True)
+        store.open(datetime.datetime.now(), "test", "unittest", "unittest_car")
+
+        for latency, step in [(10, 0), (12, 0), (100, 1), (120, 1)]:
+            store.put_value_cluster_level("latency", latency, unit="ms", operation="search", operation_type=track.OperationType.Search,
+                                          meta_data={"target-throughput": 100 * (step + 1), "profile-step": step})
+
+        profile = track.StepProfile([(100, 60), (200, 60)])
+        search = track.Task(operation=track.Operation(name="search", operation_type=track.OperationType.Search, params=None),
+                            throughput_profile=profile)
+        challenge = track.Challenge(name="unittest", description="", index_settings=None, schedule=[search])
+
+        stats = reporter.Stats(store, challenge)
+
+        self.assertEqual(collections.OrderedDict([(50.0, 56.0), (100, 120)]), stats.op_metrics["search"]["latency"])
+        self.assertEqual([
+            ("100 ops/s", collections.OrderedDict([(50.0, 11), (100, 12)])),
+            ("200 ops/s", collections.OrderedDict([(50.0, 110), (100, 120)]))
+        ], stats.op_metrics["search"]["latency_per_step"])
+
+        lines = reporter.SummaryReporter(cfg).report_latency_per_step(stats, search.operation)
+        self.assertEqual(["100th percentile latency at 200 ops/s", "search", 120, "ms"], lines[-1])
+
+    def test_report_max_sustainable_throughput(self):
+        cfg = config.Config()
+        cfg.add(config.Scope.application, "system", "env.name", "unittest")
+
+        store = metrics.InMemoryMetricsStore(config=cfg, clear=True)
+        store.open(datetime.datetime.now(), "test", "unittest", "unittest_car")
+        store.put_value_cluster_level("max_sustainable_throughput", 375, unit="ops/s", operation="search",
+                                      operation_type=track.OperationType.Search,
+                                      meta_data={"latency-percentile": 99, "max-latency": 200})
+
+        search = track.Task(operation=track.Operation(name="search", operation_type=track.OperationType.Search, params=None),
+                            saturation_search=track.SaturationSearch(latency_percentile=99, max_latency=200, initial_throughput=100,
+                                                                     probe_duration=30))
+        challenge = track.Challenge(name="unittest", description="", index_settings=None, schedule=[search])
+
+        stats = reporter.Stats(store, challenge)
+
+        self.assertEqual(375, stats.op_metrics["search"]["max_sustainable_throughput"])
+        lines = reporter.SummaryReporter(cfg).report_max_sustainable_throughput(stats, search.operation)
+        self.assertEqual([["Max sustainable throughput", "search", 375, "ops/s"]], lines)
+
+    def test_report_new_connections(self):
+        cfg = config.Config()
+        cfg.add(config.Scope.application, "system", "env.name", "unittest")
+
+        store = metrics.InMemoryMetricsStore(config=cfg, clear=True)
+        store.open(datetime.datetime.now(), "test", "unittest", "unittest_car")
+        store.put_count_cluster_level("new_connections", 2, operation="search", operation_type=track.OperationType.Search)
+        store.put_count_cluster_level("new_connections", 3, operation="search", operation_type=track.OperationType.Search)
+
+        search = track.Task(operation=track.Operation(name="search", operation_type=track.OperationType.Search, params=None))
+        challenge = track.Challenge(name="unittest", description="", index_settings=None, schedule=[search])
+
+        stats = reporter.Stats(store, challenge)
+
+        self.assertEqual(5, stats.op_metrics["search"]["new_connections"])
+        lines = reporter.SummaryReporter(cfg).report_new_connections(stats, search.operation)
+        self.assertEqual([["New connections", "search", 5, ""]], lines)
+
+    def test_report_request_phases(self):
+        cfg = config.Config()
+        cfg.add(config.Scope.application, "system", "env.name", "unittest")
+
+        store = metrics.InMemoryMetricsStore(config=cfg, clear=True)
+        store.open(datetime.datetime.now(), "test", "unittest", "unittest_car")
+        for i in range(1, 4):
+            store.put_value_cluster_level("request_time_to_first_byte", 10 * i, unit="ms", operation="search",
+                                          operation_type=track.OperationType.Search)
+            store.put_value_cluster_level("request_decode", i, unit="ms", operation="search", operation_type=track.OperationType.Search)
+
+        search = track.Task(operation=track.Operation(name="search", operation_type=track.OperationType.Search, params=None))
+        challenge = track.Challenge(name="unittest", description="", index_settings=None, schedule=[search])
+
+        stats = reporter.Stats(store, challenge)
+
+        self.assertEqual([
+            ["50.0th percentile time to first byte", "search", 20, "ms"],
+            ["100th percentile time to first byte", "search", 30, "ms"],
+            ["50.0th percentile decode time", "search", 2, "ms"],
+            ["100th percentile decode time", "search", 3, "ms"]
+        ], reporter.SummaryReporter(cfg).report_request_phases(stats, search.operation))
+
+    def test_report_compression(self):
+        cfg = config.Config()
+        cfg.add(config.Scope.application, "system", "env.name", "unittest")
+
+        store = metrics.InMemoryMetricsStore(config=cfg, clear=True)
+        store.open(datetime.datetime.now(), "test", "unittest", "unittest_car")
+        for _ in range(2):
+            store.put_count_cluster_level("request_bytes_uncompressed", 4 * 1024 * 1024, unit="byte", operation="bulk",
+                                          operation_type=track.OperationType.Index)
+            store.put_count_cluster_level("request_bytes_compressed", 1024 * 1024, unit="byte", operation="bulk",
+                                          operation_type=track.OperationType.Index)
+            store.put_value_cluster_level("request_compression_time", 1.5, unit="s", operation="bulk",
+                                          operation_type=track.OperationType.Index)
+
+        bulk = track.Task(operation=track.Operation(name="bulk", operation_type=track.OperationType.Index, params=None))
+        search = track.Task(operation=track.Operation(name="search", operation_type=track.OperationType.Search, params=None))
+        challenge = track.Challenge(name="unittest", description="", index_settings=None, schedule=[bulk, search])
+
+        stats = reporter.Stats(store, challenge)
+        summary_reporter = reporter.SummaryReporter(cfg)
+
+        self.assertEqual([
+            ["Request bytes (uncompressed)", "bulk", 8, "MB"],
+            ["Request bytes (compressed)", "bulk", 2, "MB"],
+            ["Compression ratio", "bulk", 4, ""],
+            ["Compression time", "bulk", 3, "s"]
+        ], summary_reporter.report_compression(stats, bulk.operation))
+        self.assertEqual([], summary_reporter.report_compression(stats, search.operation))
+
+    def test_calculate_latency_from_histograms(self):
+        cfg = config.Config()
+        cfg.add(config.Scope.application, "system", "env.name", "unittest")
+
+        store = metrics.InMemoryMetricsStore(config=cfg, clear=True)
+        store.open(datetime.datetime.now(), "test", "unittest", "unittest_car")
+
+        latency = histogram.Histogram()
+        for v in range(1, 101):
+            latency.record(v)
+        store.put_histogram_cluster_level("latency_histogram", latency, unit="ms", operation="search",
+                                          operation_type=track.OperationType.Search)
+        # a raw sample that has been retained in addition to the histogram
+        store.put_value_cluster_level("latency", 1000, unit="ms", operation="search", operation_type=track.OperationType.Search)
+
+        search = track.Task(operation=track.Operation(name="search", operation_type=track.OperationType.Search, params=None))
+        challenge = track.Challenge(name="unittest", description="", index_settings=None, schedule=[search])
+
+        stats = reporter.Stats(store, challenge)
+
+        latency_percentiles = stats.op_metrics["search"]["latency"]
+        self.assertEqual([50.0, 90.0, 99.0, 100], list(latency_percentiles.keys()))
+        for percentile, value in latency_percentiles.items():
+            # histograms are precise to three significant digits
+            self.assertAlmostEqual(percentile, value, delta=0.1)
+        self.assertEqual({}, stats.op_metrics["search"]["service_time"])
@@ -1,8 +1,15 @@
+import bz2
+import os
+import tempfile
+import time
+import unittest.mock as mock
 from unittest import TestCase
 
 import jinja2
 
-from esrally.track import loader
+from esrally import config
+from esrally.track import loader, track
+from esrally.utils import fingerprint, io, archive
 
 
 class StaticClock:
@@ -104,7 +111,10 @@ class TrackSpecificationReaderTests(TestCase):
                         },
                         {
                             "clients": 1,
-                            "operation": "search"
+                            "operation": "search",
+                            "target-throughput": 10,
+                            "open-loop": True,
+                            "max-in-flight": 4
                         }
                     ]
                 }
@@ -126,3 +136,171 @@ class TrackSpecificationReaderTests(TestCase):
         self.assertEqual("secondary", resulting_track.indices[0].types[1].name)
         self.assertEqual(1, len(resulting_track.challenges))
         self.assertEqual("default-challenge", resulting_track.challenges[0].name)
+        schedule = resulting_track.challenges[0].schedule
+        self.assertFalse(schedule[0].open_loop)
+        self.assertTrue(schedule[1].open_loop)
+        self.assertEqual(4, schedule[1].max_in_flight)
+
+    def test_parse_throughput_profiles(self):
+        reader = loader.TrackSpecificationReader()
+        reader.name = "unittest"
+        ramp = reader.parse_throughput_profile({"throughput-profile": {"ramp": {"start": 100, "end": 2000, "duration": 600}}}, "search")
+        self.assertEqual(100, ramp.target_throughput_at(0))
+        self.assertEqual(1050, ramp.target_throughput_at(300))
+        self.assertEqual(10, ramp.number_of_steps)
+
+        steps = reader.parse_throughput_profile({"throughput-profile": {"steps": [
+            {"target-throughput": 100, "duration": 60},
+            {"target-throughput": 200, "duration": 30}
+        ]}}, "search")
+        self.assertEqual(90, steps.duration)
+        self.assertEqual(200, steps.target_throughput_at(75))
+
+        self.assertIsNone(reader.parse_throughput_profile({}, "search"))
+
+    def test_rejects_throughput_profile_together_with_target_throughput(self):
+        reader = loader.TrackSpecificationReader()
+        reader.name = "unittest"
+        with self.assertRaises(loader.TrackSyntaxError) as ctx:
+            reader.parse_throughput_profile({"target-throughput": 100,
+                                             "throughput-profile": {"steps": [{"target-throughput": 100, "duration": 60}]}}, "search")
+        self.assertIn("only one of them is allowed", ctx.exception.args[0])
+
+    def test_parse_saturation_search(self):
+        reader = loader.TrackSpecificationReader()
+        reader.name = "unittest"
+        search = reader.parse_saturation_search({"saturation-search": {"max-latency": 200, "initial-throughput": 50,
+                                                                       "probe-duration": 30}}, "search")
+        self.assertEqual(99, search.latency_percentile)
+        self.assertEqual(200, search.max_latency)
+        self.assertEqual(50, search.initial_throughput)
+        self.assertEqual(30, search.probe_duration)
+        self.assertEqual(10, search.max_probes)
+        self.assertEqual(0.05, search.precision)
+
+        self.assertIsNone(reader.parse_saturation_search({}, "search"))
+
+    def test_rejects_saturation_search_together_with_target_throughput(self):
+        reader = loader.TrackSpecificationReader()
+        reader.name = "unittest"
+        with self.assertRaises(loader.TrackSyntaxError) as ctx:
+            reader.parse_saturation_search({"target-throughput": 100,
+                                            "saturation-search": {"max-latency": 200, "initial-throughput": 50, "probe-duration": 30}},
+                                           "search")
+        self.assertIn("cannot be combined", ctx.exception.args[0])
+
+
+class PrepareTrackTests(TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.data = b"".join(b'{"key": "value%d"}\n' % i for i in range(100))
+        self.archive = os.path.join(self.tmp.name, "documents.json.bz2")
+        with open(self.archive, "wb") as f:
+            f.write(bz2.compress(self.data))
+        t = track.Type("docs", "mapping.json", document_file=os.path.join(self.tmp.name, "documents.json"),
+                       document_archive=self.archive, number_of_documents=100, compressed_size_in_bytes=os.path.getsize(self.archive),
+                       uncompressed_size_in_bytes=len(self.data))
+        self.track = track.Track(name="unittest", short_description="unittest track", description="unittest track",
+                                 source_root_url="http://example.org", indices=[track.Index("test", [t])], challenges=[])
+        self.cfg = config.Config()
+        self.cfg.add(config.Scope.application, "system", "offline.mode", True)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    @mock.patch("esrally.utils.io.decompress", wraps=io.decompress)
+    def test_decompresses_only_once(self, decompress):
+        loader.prepare_track(self.track, self.cfg)
+        loader.prepare_track(self.track, self.cfg)
+
+        self.assertEqual(1, decompress.call_count)
+        self.assertTrue(os.path.isfile(fingerprint.fingerprint_path(os.path.join(self.tmp.name, "documents.json"))))
+        self.assertTrue(os.path.isfile(io.offset_table_path(os.path.join(self.tmp.name, "documents.json"))))
+
+    @mock.patch("esrally.utils.io.decompress", wraps=io.decompress)
+    def test_creates_block_index_instead_of_decompressing(self, decompress):
+        self.cfg.add(config.Scope.application, "benchmarks", "index.from.archive", True)
+        loader.prepare_track(self.track, self.cfg)
+
+        self.assertEqual(0, decompress.call_count)
+        self.assertFalse(os.path.isfile(os.path.join(self.tmp.name, "documents.json")))
+        self.assertTrue(archive.has_block_index(self.archive))
+
+    @mock.patch("esrally.utils.io.decompress", wraps=io.decompress)
+    def test_decompresses_again_if_verification_fails(self, decompress):
+        data_file_path = os.path.join(self.tmp.name, "documents.json")
+        loader.prepare_track(self.track, self.cfg)
+        stat = os.stat(data_file_path)
+        with open(data_file_path, "r+b") as f:
+            f.write(b"X")
+        os.utime(data_file_path, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+
+        # the change is not detected by default...
+        loader.prepare_track(self.track, self.cfg)
+        self.assertEqual(1, decompress.call_count)
+
+        # ... but when we verify the corpus
+        self.cfg.add(config.Scope.application, "benchmarks", "corpus.verify", True)
+        loader.prepare_track(self.track, self.cfg)
+        self.assertEqual(2, decompress.call_count)
+        with open(data_file_path, "rb") as f:
+            self.assertEqual(self.data, f.read())
+
+    def create_types(self, count):
+        types = []
+        for i in range(count):
+            archive_path = os.path.join(self.tmp.name, "documents-%d.json.bz2" % i)
+            with open(archive_path, "wb") as f:
+                f.write(bz2.compress(self.data))
+            types.append(track.Type("docs-%d" % i, "mapping.json", document_file=os.path.join(self.tmp.name, "documents-%d.json" % i),
+                                    document_archive=archive_path, number_of_documents=100,
+                                    compressed_size_in_bytes=os.path.getsize(archive_path), uncompressed_size_in_bytes=len(self.data)))
+        return types
+
+    def test_prepares_all_types_concurrently(self):
+        types = self.create_types(5)
+        # two types share an archive
+        types.append(types[0])
+        self.track.indices = [track.Index("test-1", types[:3]), track.Index("test-2", types[3:])]
+        self.cfg.add(config.Scope.application, "benchmarks", "track.preparation.concurrency", 2)
+
+        loader.prepare_track(self.track, self.cfg)
+
+        for t in types:
+            with open(t.document_file, "rb") as f:
+                self.assertEqual(self.data, f.read())
+            self.assertTrue(os.path.isfile(io.offset_table_path(t.document_file)))
+
+    @mock.patch("esrally.utils.io.decompress")
+    def test_stops_preparation_on_failure(self, decompress):
+        def fail(*args):
+            time.sleep(0.1)
+            raise RuntimeError("Could not decompress")
+
+        decompress.side_effect = fail
+        self.track.indices = [track.Index("test", self.create_types(4))]
+        self.cfg.add(config.Scope.application, "benchmarks", "track.preparation.concurrency", 1)
+
+        with self.assertRaisesRegex(RuntimeError, "Could not decompress"):
+            loader.prepare_track(self.track, self.cfg)
+        # the type that is prepared when the first one fails may still finish but we don't start to prepare any others
+        self.assertLessEqual(decompress.call_count, 2)
+
+
+class PreparationProgressTests(TestCase):
+    def test_aggregates_progress_of_all_stages(self):
+        reporter = mock.Mock()
+        progress = loader.PreparationProgress(3, reporter)
+
+        with progress.stage("downloading"):
+            with progress.stage("decompressing"):
+                pass
+        progress.finish_one()
+
+        self.assertEqual([
+            mock.call("Preparing track data (downloading: 1)", "[0/3 done]"),
+            mock.call("Preparing track data (downloading: 1, decompressing: 1)", "[0/3 done]"),
+            mock.call("Preparing track data (downloading: 1)", "[0/3 done]"),
+            mock.call("Preparing track data", "[0/3 done]"),
+            mock.call("Preparing track data", "[1/3 done]")
+        ], reporter.print.call_args_list)
@@ -1,6 +1,14 @@
+import bz2
+import gzip
+import json
+import os
+import tempfile
+import time
 from unittest import TestCase
 
-from esrally.track import params
+from esrally import exceptions, client
+from esrally.track import params, track
+from esrally.utils import archive, bulkfile
 
 
 class StringAsFileSource:
@@ -106,6 +114,21 @@ class IndexDataReaderTests(TestCase):
                 self.assertEqual(expected_bulk_lengths[bulk_index], len(bulk))
                 bulk_index += 1
 
+    def test_read_bulk_cut_at_bytes(self):
+        data = [
+            '{"key": "value1"}',
+            '{"key": "value2"}',
+            '{"key": "value3"}',
+            '{"key": "value4"}',
+            '{"key": "value5"}'
+        ]
+        # each document needs 76 bytes including its meta-data line
+        reader = params.IndexDataReader(data, docs_to_index=len(data), conflicting_ids=None, index_name="test_index", type_name="test_type",
+                                        bulk_size=params.BulkSizer(size_in_bytes=160), file_source=StringAsFileSource)
+
+        with reader:
+            self.assertEqual([4, 4, 2], [len(bulk) for bulk in reader])
+
 
 class InvocationGeneratorTests(TestCase):
     class TestIndexReader:
@@ -198,6 +221,14 @@ class InvocationGeneratorTests(TestCase):
         self.assertEqual(1, self.number_of_bulks([self.idx("a", [self.t(80)])], 1, 3, 267))
         self.assertEqual(1, self.number_of_bulks([self.idx("a", [self.t(80)])], 2, 3, 267))
 
+    def test_estimate_number_of_bulks_cut_at_bytes(self):
+        # each document needs 141 bytes including its meta-data line
+        t = track.Type("t", mapping_file=None, number_of_documents=1000, uncompressed_size_in_bytes=100000)
+
+        self.assertEqual(10, self.number_of_bulks([self.idx("a", [t])], 0, 1, params.BulkSizer(size_in_bytes=14100)))
+        self.assertEqual(20, self.number_of_bulks([self.idx("a", [t])], 0, 1, params.BulkSizer(50, 14100)))
+        self.assertEqual(5, self.number_of_bulks([self.idx("a", [t])], 0, 2, params.BulkSizer(size_in_bytes=14100)))
+
     def number_of_bulks(self, indices, partition_index, total_partitions, bulk_size):
         return params.PartitionBulkIndexParamSource(indices, partition_index, total_partitions, bulk_size).number_of_bulks()
 
@@ -249,3 +280,375 @@ class ParamsRegistrationTests(TestCase):
         self.assertEqual({"class-key": 42}, source.params())
 
         params._unregister_param_source_for_name(source_name)
+
+
+class PrefetchingParamSourceTests(TestCase):
+    class CountingParamSource(params.ParamSource):
+        def __init__(self, count, fail_at=None):
+            super().__init__(None, {})
+            self.count = count
+            self.fail_at = fail_at
+            self.generated = 0
+
+        def size(self):
+            return self.count
+
+        def params(self):
+            if self.generated == self.fail_at:
+                raise RuntimeError("simulated failure")
+            if self.generated >= self.count:
+                raise StopIteration()
+            self.generated += 1
+            return {"iteration": self.generated}
+
+    def test_provides_all_parameters_in_order(self):
+        source = params.PrefetchingParamSource(PrefetchingParamSourceTests.CountingParamSource(20), buffer_size=3)
+
+        self.assertEqual(20, source.size())
+        self.assertEqual(list(range(1, 21)), [source.params()["iteration"] for _ in range(20)])
+        with self.assertRaises(StopIteration):
+            source.params()
+        # and it stays exhausted
+        with self.assertRaises(StopIteration):
+            source.params()
+
+    def test_generates_at_most_buffer_size_parameters_ahead(self):
+        delegate = PrefetchingParamSourceTests.CountingParamSource(100)
+        source = params.PrefetchingParamSource(delegate, buffer_size=5)
+        source.params()
+        time.sleep(0.2)
+
+        # one has been consumed, five are buffered and the background thread waits with one more for a free slot
+        self.assertEqual(7, delegate.generated)
+        source.close()
+
+    def test_raises_errors_of_delegate(self):
+        source = params.PrefetchingParamSource(PrefetchingParamSourceTests.CountingParamSource(10, fail_at=2), buffer_size=4)
+
+        self.assertEqual(1, source.params()["iteration"])
+        self.assertEqual(2, source.params()["iteration"])
+        with self.assertRaisesRegex(RuntimeError, "simulated failure"):
+            source.params()
+        with self.assertRaises(StopIteration):
+            source.params()
+
+    def test_stops_prefetching_when_no_longer_used(self):
+        source = params.PrefetchingParamSource(PrefetchingParamSourceTests.CountingParamSource(1000), buffer_size=2)
+        thread = source._thread
+        del source
+
+        thread.join(timeout=2)
+        self.assertFalse(thread.is_alive())
+
+    def test_rejects_invalid_buffer_size(self):
+        with self.assertRaises(exceptions.RallyAssertionError):
+            params.PrefetchingParamSource(PrefetchingParamSourceTests.CountingParamSource(1), buffer_size=0)
+
+
+class PreloadParamsTests(TestCase):
+    class BulkParamSource(params.ParamSource):
+        def __init__(self, count):
+            super().__init__(None, {})
+            self.count = count
+            self.generated = 0
+
+        def size(self):
+            return self.count
+
+        def params(self):
+            if self.generated >= self.count:
+                raise StopIteration()
+            self.generated += 1
+            return {"body": ['{"index": {}}', '{"key": %d}' % self.generated], "action_metadata_present": True}
+
+    def test_preloads_encoded_bulk_bodies(self):
+        delegate = PreloadParamsTests.BulkParamSource(3)
+        source = params.preload_params(delegate, memory_budget_bytes=1024)
+
+        self.assertEqual(3, delegate.generated)
+        self.assertEqual(3, source.size())
+        self.assertEqual(3 * 25, source.size_in_bytes)
+        self.assertEqual([b'{"index": {}}\n{"key": %d}\n' % i for i in range(1, 4)], [source.params()["body"] for _ in range(3)])
+        with self.assertRaises(StopIteration):
+            source.params()
+
+    def test_does_not_preload_when_exceeding_memory_budget(self):
+        self.assertIsNone(params.preload_params(PreloadParamsTests.BulkParamSource(3), memory_budget_bytes=3 * 25 - 1))
+
+    def test_does_not_preload_parameter_sources_without_fixed_size(self):
+        self.assertIsNone(params.preload_params(PreloadParamsTests.BulkParamSource(1), memory_budget_bytes=1024))
+
+
+class CompressingParamSourceTests(TestCase):
+    class StaticParamSource(params.ParamSource):
+        def __init__(self, *params_list):
+            super().__init__(None, {})
+            self.params_list = list(params_list)
+
+        def size(self):
+            return len(self.params_list)
+
+        def params(self):
+            if not self.params_list:
+                raise StopIteration()
+            return self.params_list.pop(0)
+
+    def test_compresses_bulk_bodies(self):
+        source = params.CompressingParamSource(CompressingParamSourceTests.StaticParamSource(
+            {"body": ['{"index": {}}', '{"key": 1}', '{"index": {}}', '{"key": 2}']},
+            {"body": b'{"index": {}}\n{"key": 3}\n', "pipeline": "p"}))
+
+        self.assertEqual(2, source.size())
+        p = source.params()
+        self.assertEqual(2, p["bulk-size"])
+        self.assertIsInstance(p["body"], client.CompressedBody)
+        self.assertEqual(b'{"index": {}}\n{"key": 1}\n{"index": {}}\n{"key": 2}\n', gzip.decompress(p["body"]))
+        self.assertEqual(50, p["body"].uncompressed_size)
+
+        p = source.params()
+        self.assertEqual(1, p["bulk-size"])
+        self.assertEqual("p", p["pipeline"])
+        self.assertEqual(b'{"index": {}}\n{"key": 3}\n', gzip.decompress(p["body"]))
+
+        with self.assertRaises(StopIteration):
+            source.params()
+
+    def test_compresses_each_distinct_query_only_once(self):
+        query = {"query": {"match_all": {}}}
+        source = params.CompressingParamSource(CompressingParamSourceTests.StaticParamSource(
+            {"index": "test", "body": query}, {"index": "test", "body": dict(query)}, {"index": "test", "body": {"query": {}}}))
+
+        first = source.params()["body"]
+        second = source.params()["body"]
+        third = source.params()["body"]
+
+        self.assertEqual(query, json.loads(gzip.decompress(first).decode("utf-8")))
+        self.assertEqual(bytes(first), bytes(second))
+        # only the first request accounts for compressing the body
+        self.assertEqual(0, second.compression_time)
+        self.assertEqual({"query": {}}, json.loads(gzip.decompress(third).decode("utf-8")))
+
+    def test_leaves_parameters_without_body_alone(self):
+        source = params.CompressingParamSource(CompressingParamSourceTests.StaticParamSource({"index": "test"}))
+        self.assertEqual({"index": "test"}, source.params())
+
+
+class MmapIndexDataReaderTests(TestCase):
+    def setUp(self):
+        self.data_file = tempfile.NamedTemporaryFile(mode="wb", suffix=".json", delete=False)
+        self.data_file.write(b"".join(b'{"key": "value%d"}\n' % i for i in range(1, 8)))
+        self.data_file.close()
+
+    def tearDown(self):
+        os.remove(self.data_file.name)
+
+    def read(self, docs_to_index, bulk_size, offset=0, conflicting_ids=None):
+        reader = params.MmapIndexDataReader(self.data_file.name, docs_to_index=docs_to_index, conflicting_ids=conflicting_ids,
+                                            index_name="test_index", type_name="test_type", bulk_size=bulk_size, offset=offset)
+        with reader:
+            return list(reader)
+
+    def test_read_bulks_as_bytes(self):
+        bulks = self.read(docs_to_index=5, bulk_size=3)
+
+        action = b'{"index": {"_index": "test_index", "_type": "test_type"}}\n'
+        self.assertEqual([
+            action + b'{"key": "value1"}\n' + action + b'{"key": "value2"}\n' + action + b'{"key": "value3"}\n',
+            action + b'{"key": "value4"}\n' + action + b'{"key": "value5"}\n'
+        ], bulks)
+
+    def test_read_bulks_with_offset(self):
+        bulks = self.read(docs_to_index=7, bulk_size=50, offset=5)
+
+        self.assertEqual(1, len(bulks))
+        self.assertEqual(b'{"index": {"_index": "test_index", "_type": "test_type"}}\n{"key": "value6"}\n'
+                         b'{"index": {"_index": "test_index", "_type": "test_type"}}\n{"key": "value7"}\n', bulks[0])
+
+    def test_read_bulks_with_conflicting_ids(self):
+        bulks = self.read(docs_to_index=3, bulk_size=50, conflicting_ids=["         0", "         1", "         2"])
+
+        lines = bulks[0].split(b"\n")
+        self.assertTrue(lines[0].startswith(b'{"index": {"_index": "test_index", "_type": "test_type", "_id": "'))
+        self.assertEqual(b'{"key": "value1"}', lines[1])
+        self.assertEqual(b'{"key": "value3"}', lines[5])
+        self.assertEqual(b"", lines[6])
+
+    def test_read_matches_line_based_reader(self):
+        with open(self.data_file.name, "rt") as f:
+            docs = [line.strip() for line in f]
+        line_reader = params.IndexDataReader(docs, docs_to_index=6, conflicting_ids=None, index_name="test_index",
+                                             type_name="test_type", bulk_size=4, offset=1, file_source=StringAsFileSource)
+        with line_reader:
+            expected = [("\n".join(bulk) + "\n").encode("utf-8") for bulk in line_reader]
+
+        self.assertEqual(expected, self.read(docs_to_index=6, bulk_size=4, offset=1))
+
+    def test_adds_missing_line_break_of_last_document(self):
+        with open(self.data_file.name, "wb") as f:
+            f.write(b'{"key": "value1"}\n{"key": "value2"}')
+
+        bulks = self.read(docs_to_index=2, bulk_size=50)
+
+        self.assertTrue(bulks[0].endswith(b'{"key": "value2"}\n'))
+        self.assertEqual(4, bulks[0].count(b"\n"))
+
+    def test_read_bulks_cut_at_bytes(self):
+        # each document needs 76 bytes including its meta-data line
+        bulks = self.read(docs_to_index=7, bulk_size=params.BulkSizer(size_in_bytes=160))
+
+        self.assertEqual([2, 2, 2, 1], [bulk.count(b"\n") // 2 for bulk in bulks])
+        self.assertTrue(bulks[-1].endswith(b'{"key": "value7"}\n'))
+
+    def test_read_bulks_cut_at_bytes_and_docs(self):
+        bulks = self.read(docs_to_index=5, bulk_size=params.BulkSizer(3, 1000))
+
+        self.assertEqual([3, 2], [bulk.count(b"\n") // 2 for bulk in bulks])
+
+
+class ArchiveIndexDataReaderTests(TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.data_file = os.path.join(self.tmp.name, "documents.json")
+        self.archive = os.path.join(self.tmp.name, "documents.json.bz2")
+        data = b"".join(b'{"key": "value%d"}\n' % i for i in range(1, 8))
+        with open(self.archive, "wb") as f:
+            # three independent streams
+            f.write(bz2.compress(data[:30]) + bz2.compress(data[30:70]) + bz2.compress(data[70:]))
+        self.type = track.Type("test_type", "mapping.json", document_file=self.data_file, document_archive=self.archive,
+                               number_of_documents=7)
+        self.index = track.Index("test_index", [self.type])
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_reads_from_archive_only_with_block_index(self):
+        self.assertFalse(params.reads_from_archive(self.type))
+        archive.prepare_block_index(self.archive)
+        self.assertTrue(params.reads_from_archive(self.type))
+
+        # decompressed data are preferred
+        with open(self.data_file, "wb") as f:
+            f.write(b"")
+        self.assertFalse(params.reads_from_archive(self.type))
+
+    def test_read_bulks_from_archive(self):
+        archive.prepare_block_index(self.archive)
+
+        for create_reader in [params.create_default_reader, params.create_mmap_reader]:
+            reader = create_reader(self.index, self.type, offset=4, num_docs=3, bulk_size=2, id_conflicts=params.IndexIdConflict.NoConflicts)
+            self.assertIsInstance(reader, params.ArchiveIndexDataReader)
+            with reader:
+                bulks = list(reader)
+
+            self.assertEqual([
+                ['{"index": {"_index": "test_index", "_type": "test_type"}}', '{"key": "value5"}',
+                 '{"index": {"_index": "test_index", "_type": "test_type"}}', '{"key": "value6"}'],
+                ['{"index": {"_index": "test_index", "_type": "test_type"}}', '{"key": "value7"}']
+            ], bulks)
+
+
+class BulkFileParamSourceTests(TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.data_file = os.path.join(self.tmp.name, "documents.json")
+        with open(self.data_file, "wb") as f:
+            f.write(b"".join(b'{"key": "value%d"}\n' % i for i in range(1, 8)))
+        self.type = track.Type("test_type", "mapping.json", document_file=self.data_file, number_of_documents=7)
+        self.index = track.Index("test_index", [self.type])
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_sends_converted_bulks(self):
+        path, bulks, docs = params.convert_to_bulk_file(self.index, self.type, bulk_size=2)
+        with params.create_mmap_reader(self.index, self.type, 0, 7, 2, None) as reader:
+            expected = list(reader)
+
+        self.assertEqual((4, 7), (bulks, docs))
+        self.assertEqual(bulkfile.bulk_file_path(self.data_file, "test_index", "test_type", 2), path)
+        source = params.BulkIndexParamSource([self.index], {"bulk-size": 2, "reader": "bulk-file", "pipeline": "test-pipeline"})
+        actual = []
+        # bulks are distributed across clients as a whole
+        for client, expected_bulks in enumerate([1, 1, 2]):
+            partition = source.partition(client, 3)
+            self.assertEqual(expected_bulks, partition.size())
+            for _ in range(partition.size()):
+                params_for_bulk = partition.params()
+                self.assertEqual("test-pipeline", params_for_bulk["pipeline"])
+                actual.append(params_for_bulk["body"])
+            with self.assertRaises(StopIteration):
+                partition.params()
+        self.assertEqual(expected, actual)
+
+    def test_requires_converted_bulks_with_the_same_bulk_size(self):
+        params.convert_to_bulk_file(self.index, self.type, bulk_size=2)
+
+        with self.assertRaisesRegex(exceptions.DataError, "convert-corpus"):
+            params.BulkIndexParamSource([self.index], {"bulk-size": 3, "reader": "bulk-file"}).partition(0, 1)
+
+    def test_rejects_id_conflicts(self):
+        with self.assertRaises(exceptions.InvalidSyntax):
+            params.BulkIndexParamSource([self.index], {"bulk-size": 2, "reader": "bulk-file", "conflicts": "random"})
+
+
+class BulkIndexParamSourceTests(TestCase):
+    def test_selects_reader(self):
+        self.assertEqual(params.create_default_reader, params.BulkIndexParamSource([], {"bulk-size": 10}).create_reader)
+        self.assertEqual(params.create_mmap_reader,
+                         params.BulkIndexParamSource([], {"bulk-size": 10, "reader": "mmap"}).create_reader)
+
+    def test_rejects_unknown_reader(self):
+        with self.assertRaises(exceptions.InvalidSyntax):
+            params.BulkIndexParamSource([], {"bulk-size": 10, "reader": "unknown"})
+
+    def test_requires_a_bulk_size(self):
+        with self.assertRaisesRegex(exceptions.InvalidSyntax, "Mandatory parameter 'bulk-size' or 'bulk-size-bytes' is missing"):
+            params.BulkIndexParamSource([], {})
+
+    def test_creates_bulk_sizer(self):
+        sizer = params.BulkIndexParamSource([], {"bulk-size-bytes": 5000000}).create_bulk_sizer()
+        self.assertIsNone(sizer.max_docs())
+        self.assertEqual(5000000, sizer.max_bytes())
+
+        sizer = params.BulkIndexParamSource([], {"bulk-size": 100, "target-bulk-service-time": 500}).create_bulk_sizer()
+        self.assertIsInstance(sizer, params.AdaptiveBulkSizer)
+        self.assertEqual(0.5, sizer.target_service_time)
+
+    def test_size_is_estimated_if_bulks_are_cut_at_bytes(self):
+        self.assertFalse(params.BulkIndexParamSource([], {"bulk-size": 100}).partition(0, 1).size_is_estimate())
+        self.assertTrue(params.BulkIndexParamSource([], {"bulk-size-bytes": 5000000}).partition(0, 1).size_is_estimate())
+        self.assertTrue(params.has_estimated_size(
+            params.BulkIndexParamSource([], {"bulk-size": 100, "target-bulk-service-time": 500}).partition(0, 1)))
+
+    def test_adaptive_bulk_size_requires_initial_bulk_size(self):
+        with self.assertRaises(exceptions.InvalidSyntax):
+            params.BulkIndexParamSource([], {"bulk-size-bytes": 5000000, "target-bulk-service-time": 500})
+
+    def test_bulk_file_reader_requires_fixed_bulk_size(self):
+        with self.assertRaises(exceptions.InvalidSyntax):
+            params.BulkIndexParamSource([], {"bulk-size": 100, "bulk-size-bytes": 5000000, "reader": "bulk-file"})
+
+
+class AdaptiveBulkSizerTests(TestCase):
+    def test_adapts_bulk_size_to_target_service_time(self):
+        sizer = params.AdaptiveBulkSizer(100, target_service_time=1.0)
+
+        sizer.record(100, 0.5)
+        self.assertEqual(200, sizer.max_docs())
+        # the moving average smoothes out the slower request
+        sizer.record(200, 4.0)
+        self.assertEqual(105, sizer.max_docs())
+
+    def test_bulk_size_changes_at_most_by_factor_two(self):
+        sizer = params.AdaptiveBulkSizer(100, target_service_time=1.0)
+
+        sizer.record(100, 100.0)
+        self.assertEqual(50, sizer.max_docs())
+
+    def test_respects_bounds(self):
+        sizer = params.AdaptiveBulkSizer(100, target_service_time=1.0, min_docs=80, max_docs=150)
+
+        sizer.record(100, 0.5)
+        self.assertEqual(150, sizer.max_docs())
+        sizer.record(150, 1000.0)
+        self.assertEqual(80, sizer.max_docs())
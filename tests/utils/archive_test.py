@@ -0,0 +1,140 @@
+import bz2
+import gzip
+import os
+import tempfile
+from unittest import TestCase, mock
+
+from esrally.utils import archive
+
+
+class ArchiveTests(TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.lines = [b'{"key": "value%d"}\n' % i for i in range(200)]
+        self.data = b"".join(self.lines)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def create_archive(self, name, compress, stream_size):
+        # streams deliberately do not end at line boundaries
+        path = os.path.join(self.tmp.name, name)
+        with open(path, "wb") as f:
+            for start in range(0, len(self.data), stream_size):
+                f.write(compress(self.data[start:start + stream_size]))
+        return path
+
+    def assert_reads_all_offsets(self, path):
+        for offset in [0, 1, 17, 99, 100, 198, 199, 200]:
+            reader = archive.ArchiveReader(path)
+            try:
+                reader.skip_lines(offset)
+                actual = []
+                while True:
+                    line = reader.readline()
+                    if len(line) == 0:
+                        break
+                    actual.append(line.encode("utf-8"))
+            finally:
+                reader.close()
+            self.assertEqual(self.lines[offset:], actual, "reading from line [%d]" % offset)
+
+    def test_block_index_of_multi_stream_bz2_archive(self):
+        path = self.create_archive("documents.json.bz2", bz2.compress, stream_size=500)
+
+        self.assertFalse(archive.has_block_index(path))
+        entries = archive.prepare_block_index(path)
+
+        self.assertTrue(archive.has_block_index(path))
+        self.assertEqual(entries, len(archive.load_block_index(path)))
+        self.assertGreater(entries, 1)
+        self.assert_reads_all_offsets(path)
+
+    @mock.patch("esrally.utils.archive._SCAN_GROUP_SIZE", 1000)
+    def test_scans_bz2_archive_in_parallel(self):
+        path = self.create_archive("documents.json.bz2", bz2.compress, stream_size=300)
+        size = os.path.getsize(path)
+
+        self.assertGreater(len(archive._scan_ranges(path, size)), 1)
+        archive.prepare_block_index(path, max_workers=2)
+
+        self.assertEqual(archive._entries(archive._scan_streams(path, "bz2", (0, size))), archive.load_block_index(path))
+        self.assert_reads_all_offsets(path)
+
+    def test_block_index_of_multi_member_gzip_archive(self):
+        path = self.create_archive("documents.json.gz", gzip.compress, stream_size=700)
+
+        self.assertGreater(archive.prepare_block_index(path), 1)
+        self.assert_reads_all_offsets(path)
+
+    def test_block_index_of_single_stream_archive(self):
+        path = self.create_archive("documents.json.bz2", bz2.compress, stream_size=len(self.data))
+
+        self.assertEqual(1, archive.prepare_block_index(path))
+        self.assertEqual([(0, 0, 0)], archive.load_block_index(path))
+        self.assert_reads_all_offsets(path)
+
+    def test_streams_that_do_not_contain_a_line_start(self):
+        # the second stream neither starts a line nor contains a line break
+        streams = [(0, 1, 5, False), (100, 0, -1, False), (200, 2, 3, True), (300, 1, 9, True)]
+
+        self.assertEqual([(0, 0, 0), (200, 2, 4), (300, 3, 0)], archive._entries(streams))
+
+    def test_unsupported_archives(self):
+        self.assertTrue(archive.is_supported("documents.json.bz2"))
+        self.assertTrue(archive.is_supported("documents.json.gz"))
+        self.assertFalse(archive.is_supported("documents.zip"))
+        self.assertFalse(archive.is_supported("documents.tar.bz2"))
+        with self.assertRaises(ValueError):
+            archive.prepare_block_index("documents.zip")
+
+
+class ParallelBz2DecompressionTests(TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        # compress with the smallest block size (100k) so the archive consists of several blocks
+        self.data = b"".join(b'{"key": "value%d", "other": %d}\n' % (i, i * 7919 % 10007) for i in range(40000))
+        self.target = os.path.join(self.tmp.name, "documents.json")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def decompress(self, compressed):
+        path = os.path.join(self.tmp.name, "documents.json.bz2")
+        with open(path, "wb") as f:
+            f.write(compressed)
+        with mock.patch("esrally.utils.archive._MIN_PARALLEL_SIZE", 0):
+            decompressed = archive.decompress_bz2_in_parallel(path, self.target, max_workers=2)
+        if decompressed:
+            with open(self.target, "rb") as f:
+                return f.read()
+        return None
+
+    def test_finds_blocks_at_any_bit_position(self):
+        path = os.path.join(self.tmp.name, "documents.json.bz2")
+        with open(path, "wb") as f:
+            f.write(bz2.compress(self.data, 1))
+        size = os.path.getsize(path)
+
+        markers = sorted(archive._find_bz2_markers(path, (0, size)))
+        # the first block starts right after the stream header
+        self.assertEqual((32, False), markers[0])
+        self.assertTrue(markers[-1][1])
+        self.assertGreater(len(markers), 3)
+        self.assertTrue(any(position % 8 != 0 for position, _ in markers))
+        # scanning in small pieces finds the same markers
+        pieces = [(start, min(start + 1000, size)) for start in range(0, size, 1000)]
+        self.assertEqual(markers, sorted(m for piece in pieces for m in archive._find_bz2_markers(path, piece)))
+
+    def test_decompress_single_stream(self):
+        for group_size in [1, 1024 * 1024]:
+            with mock.patch("esrally.utils.archive._BLOCK_GROUP_SIZE", group_size):
+                self.assertEqual(self.data, self.decompress(bz2.compress(self.data, 1)))
+
+    def test_decompress_multiple_streams(self):
+        with mock.patch("esrally.utils.archive._BLOCK_SCAN_PIECE_SIZE", 5000):
+            self.assertEqual(self.data, self.decompress(bz2.compress(self.data[:300000], 1) + bz2.compress(self.data[300000:], 9)))
+
+    def test_falls_back_for_corrupt_archives(self):
+        self.assertIsNone(self.decompress(b"BZh9 no blocks"))
+        self.assertFalse(os.path.isfile(self.target))
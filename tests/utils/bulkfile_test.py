@@ -0,0 +1,55 @@
+import os
+import tempfile
+from unittest import TestCase
+
+from esrally import exceptions
+from esrally.utils import bulkfile
+
+
+class BulkFileTests(TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = bulkfile.bulk_file_path(os.path.join(self.tmp.name, "documents.json"), "test_index", "test_type", 2)
+        self.bodies = [b'{"index": {}}\n{"key": %d}\n{"index": {}}\n{"key": %d}\n' % (i, i + 1) for i in range(0, 10, 2)]
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def write(self):
+        with bulkfile.BulkFileWriter(self.path, bulk_size=2) as writer:
+            for body in self.bodies:
+                writer.add(body, docs=2)
+
+    def read(self, offset, bodies):
+        with bulkfile.BulkFileReader(self.path, offset, bodies) as reader:
+            return list(reader)
+
+    def test_reads_bodies_from_any_offset(self):
+        self.write()
+
+        self.assertEqual(os.path.join(self.tmp.name, "documents-test_index-test_type-2.bulk"), self.path)
+        self.assertTrue(bulkfile.exists(self.path))
+        bulk_size, docs, offsets = bulkfile.load_offset_index(self.path)
+        self.assertEqual(2, bulk_size)
+        self.assertEqual(10, docs)
+        self.assertEqual(5, len(offsets))
+        self.assertEqual(self.bodies, self.read(offsets[0], 5))
+        self.assertEqual(self.bodies[3:4], self.read(offsets[3], 1))
+
+    def test_detects_truncated_bulk_file(self):
+        self.write()
+        _, _, offsets = bulkfile.load_offset_index(self.path)
+        with open(self.path, "r+b") as f:
+            f.truncate(offsets[4] + 10)
+
+        with self.assertRaises(exceptions.DataError):
+            self.read(offsets[3], 2)
+
+    def test_keeps_no_partial_bulk_file(self):
+        with self.assertRaises(RuntimeError):
+            with bulkfile.BulkFileWriter(self.path, bulk_size=2) as writer:
+                writer.add(self.bodies[0], docs=2)
+                raise RuntimeError("conversion failed")
+
+        self.assertFalse(bulkfile.exists(self.path))
+        self.assertEqual([], os.listdir(self.tmp.name))
@@ -0,0 +1,60 @@
+import os
+import tempfile
+from unittest import TestCase
+
+from esrally.utils import fingerprint
+
+
+class FingerprintTests(TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.data_file_path = os.path.join(self.tmp.name, "documents.json")
+        self.source_file_path = os.path.join(self.tmp.name, "documents.json.bz2")
+        with open(self.data_file_path, "wb") as f:
+            f.write(b"".join(b'{"key": "value%d"}\n' % i for i in range(1000)))
+        with open(self.source_file_path, "wb") as f:
+            f.write(b"compressed")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_content_hash_is_independent_of_parallelism(self):
+        self.assertEqual(fingerprint.content_hash(self.data_file_path, chunk_size=100, max_workers=1),
+                         fingerprint.content_hash(self.data_file_path, chunk_size=100, max_workers=4))
+        self.assertNotEqual(fingerprint.content_hash(self.data_file_path, chunk_size=100),
+                            fingerprint.content_hash(self.data_file_path, chunk_size=200))
+
+    def test_unchanged_after_creation(self):
+        self.assertFalse(fingerprint.is_unchanged(self.data_file_path))
+
+        fingerprint.create(self.data_file_path, self.source_file_path, chunk_size=1000)
+
+        self.assertTrue(fingerprint.is_unchanged(self.data_file_path, self.source_file_path, os.path.getsize(self.data_file_path)))
+        self.assertFalse(fingerprint.is_unchanged(self.data_file_path, self.source_file_path, expected_size=10))
+        self.assertTrue(fingerprint.verify(self.data_file_path))
+
+    def test_detects_modified_data_file(self):
+        fingerprint.create(self.data_file_path, chunk_size=1000)
+        with open(self.data_file_path, "ab") as f:
+            f.write(b'{"key": "value"}\n')
+
+        self.assertFalse(fingerprint.is_unchanged(self.data_file_path))
+        self.assertFalse(fingerprint.verify(self.data_file_path))
+
+    def test_detects_modified_source_file(self):
+        fingerprint.create(self.data_file_path, self.source_file_path)
+        stat = os.stat(self.source_file_path)
+        os.utime(self.source_file_path, (stat.st_atime, stat.st_mtime + 10))
+
+        self.assertFalse(fingerprint.is_unchanged(self.data_file_path, self.source_file_path))
+
+    def test_verification_detects_changes_with_same_size_and_modification_time(self):
+        fingerprint.create(self.data_file_path, chunk_size=1000)
+        stat = os.stat(self.data_file_path)
+        with open(self.data_file_path, "r+b") as f:
+            f.seek(5000)
+            f.write(b"X")
+        os.utime(self.data_file_path, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+
+        self.assertTrue(fingerprint.is_unchanged(self.data_file_path))
+        self.assertFalse(fingerprint.verify(self.data_file_path))
@@ -0,0 +1,69 @@
+import random
+from unittest import TestCase
+
+from esrally.utils import histogram
+
+
+class HistogramTests(TestCase):
+    def test_empty_histogram(self):
+        h = histogram.Histogram()
+
+        self.assertEqual(0, h.count)
+        self.assertIsNone(h.mean)
+        self.assertIsNone(h.value_at_percentile(99))
+
+    def test_percentiles_within_precision(self):
+        rand = random.Random(17)
+        values = [rand.expovariate(0.01) for _ in range(10000)]
+        h = histogram.Histogram(significant_digits=3)
+        for v in values:
+            h.record(v)
+
+        sorted_values = sorted(values)
+        for percentile in [50, 90, 99, 99.9]:
+            expected = sorted_values[int(percentile / 100 * len(values)) - 1]
+            self.assertAlmostEqual(expected, h.value_at_percentile(percentile), delta=expected * 0.002)
+        self.assertEqual(min(values), h.value_at_percentile(0))
+        self.assertEqual(max(values), h.value_at_percentile(100))
+        self.assertAlmostEqual(sum(values) / len(values), h.mean)
+
+    def test_small_values_are_exact(self):
+        h = histogram.Histogram(significant_digits=2, lowest_discernible_value=1)
+        for v in [1, 2, 3, 4]:
+            h.record(v)
+
+        self.assertEqual(2, h.value_at_percentile(50))
+        self.assertEqual(3, h.value_at_percentile(75))
+
+    def test_merge(self):
+        a = histogram.Histogram()
+        b = histogram.Histogram()
+        for v in range(1, 51):
+            a.record(v)
+        for v in range(51, 101):
+            b.record(v)
+
+        a.merge(b)
+
+        self.assertEqual(100, a.count)
+        self.assertEqual(1, a.min)
+        self.assertEqual(100, a.max)
+        self.assertAlmostEqual(50, a.value_at_percentile(50), delta=0.1)
+
+    def test_rejects_merging_histograms_with_different_precision(self):
+        with self.assertRaises(ValueError):
+            histogram.Histogram(significant_digits=2).merge(histogram.Histogram(significant_digits=3))
+
+    def test_encode_and_decode(self):
+        h = histogram.Histogram()
+        for v in [0.5, 12.25, 12.5, 100, 2500]:
+            h.record(v)
+
+        decoded = histogram.decode(histogram.encode(h))
+
+        self.assertEqual(h.counts, decoded.counts)
+        self.assertEqual(5, decoded.count)
+        self.assertEqual(0.5, decoded.min)
+        self.assertEqual(2500, decoded.max)
+        self.assertEqual(h.total, decoded.total)
+        self.assertEqual(h.value_at_percentile(50), decoded.value_at_percentile(50))
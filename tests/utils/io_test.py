@@ -1,4 +1,11 @@
+import bz2
+import gzip
+import io as python_io
 import os
+import shutil
+import tarfile
+import tempfile
+import unittest
 import unittest.mock as mock
 from unittest import TestCase
 
@@ -57,3 +64,118 @@ class IoTests(TestCase):
         self.assertEqual("/already/a/normalized/path", io.normalize_path("/already/a/normalized/path"))
         self.assertEqual("/not/normalized", io.normalize_path("/not/normalized/path/../"))
         self.assertEqual(os.getenv("HOME"), io.normalize_path("~/Documents/.."))
+
+    def test_line_offset_uses_offset_table(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            data_file_path = os.path.join(tmp, "data.json")
+            with open(data_file_path, "wt") as f:
+                f.write("".join("%d\n" % i for i in range(12)))
+            self.assertEqual((0, 7), io.line_offset(data_file_path, 7))
+
+            io.prepare_file_offset_table(data_file_path, stride=3)
+            # lines 0 - 9 have two bytes each
+            self.assertEqual((12, 1), io.line_offset(data_file_path, 7))
+            self.assertEqual((0, 2), io.line_offset(data_file_path, 2))
+            self.assertEqual((18, 1), io.line_offset(data_file_path, 10))
+            # beyond the last line
+            self.assertEqual((18, 4), io.line_offset(data_file_path, 13))
+
+    def test_skip_lines_to_exact_line(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            data_file_path = os.path.join(tmp, "data.json")
+            with open(data_file_path, "wt") as f:
+                f.write("".join("line %d\n" % i for i in range(2500)))
+            for stride in [1, 7, 1000]:
+                io.prepare_file_offset_table(data_file_path, stride=stride)
+                with open(data_file_path, "rt") as f:
+                    io.skip_lines(data_file_path, f, 2013)
+                    self.assertEqual("line 2013\n", f.readline())
+
+    def test_prepare_file_offset_table_in_parallel_chunks(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            data_file_path = os.path.join(tmp, "data.json")
+            lines = ["%s\n" % ("x" * (i % 37)) for i in range(3000)]
+            with open(data_file_path, "wt") as f:
+                f.write("".join(lines))
+            expected_offsets = [sum(len(line) for line in lines[:i]) for i in range(0, 3000, 10)]
+
+            for use_numpy in [True, False]:
+                with mock.patch.object(io, "OFFSET_TABLE_CHUNK_SIZE", 1000), mock.patch.object(io, "_READ_SIZE", 300):
+                    if use_numpy:
+                        io.prepare_file_offset_table(data_file_path, stride=10, max_workers=2)
+                    else:
+                        with mock.patch.object(io, "numpy", None):
+                            io.prepare_file_offset_table(data_file_path, stride=10, max_workers=2)
+                with open(io.offset_table_path(data_file_path), "rb") as f:
+                    magic, stride, number_of_lines = io.OFFSET_TABLE_HEADER.unpack(f.read(io.OFFSET_TABLE_HEADER.size))
+                    offsets = [offset for offset, in io.OFFSET_TABLE_ENTRY.iter_unpack(f.read())]
+                self.assertEqual((io.OFFSET_TABLE_MAGIC, 10, 3000), (magic, stride, number_of_lines))
+                self.assertEqual(expected_offsets, offsets)
+                os.remove(io.offset_table_path(data_file_path))
+
+    def test_reuses_valid_offset_table(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            data_file_path = os.path.join(tmp, "data.json")
+            with open(data_file_path, "wt") as f:
+                f.write("a\nb\n")
+            io.prepare_file_offset_table(data_file_path, stride=1)
+
+            with mock.patch.object(io, "_write_offset_table") as write:
+                io.prepare_file_offset_table(data_file_path, stride=1)
+                write.assert_not_called()
+                # a different stride needs a new table
+                io.prepare_file_offset_table(data_file_path, stride=2)
+                write.assert_called_once()
+
+
+class DecompressTests(TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.data = b"".join(b'{"key": "value%d"}\n' % i for i in range(1000))
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def write(self, name, content):
+        path = os.path.join(self.tmp.name, name)
+        with open(path, "wb") as f:
+            f.write(content)
+        return path
+
+    def read(self, name):
+        with open(os.path.join(self.tmp.name, name), "rb") as f:
+            return f.read()
+
+    @mock.patch("shutil.which", return_value=None)
+    def test_decompress_without_external_tools(self, which):
+        io.decompress(self.write("documents.json.bz2", bz2.compress(self.data)), self.tmp.name)
+        io.decompress(self.write("other.json.gz", gzip.compress(self.data)), self.tmp.name)
+
+        self.assertEqual(self.data, self.read("documents.json"))
+        self.assertEqual(self.data, self.read("other.json"))
+
+    @mock.patch("esrally.utils.archive._MIN_PARALLEL_SIZE", 0)
+    @mock.patch("shutil.which", return_value=None)
+    def test_decompress_bz2_in_parallel(self, which):
+        io.decompress(self.write("documents.json.bz2", bz2.compress(self.data[:10000]) + bz2.compress(self.data[10000:])),
+                      self.tmp.name)
+
+        self.assertEqual(self.data, self.read("documents.json"))
+
+    @unittest.skipUnless(shutil.which("gzip"), "requires gzip")
+    def test_decompress_with_external_tool(self):
+        path = self.write("documents.json.gz", gzip.compress(self.data))
+        tar_content = python_io.BytesIO()
+        with tarfile.open(fileobj=tar_content, mode="w") as tar:
+            info = tarfile.TarInfo("distribution/README")
+            info.size = len(self.data)
+            tar.addfile(info, python_io.BytesIO(self.data))
+        tar_path = self.write("distribution.tar.gz", gzip.compress(tar_content.getvalue()))
+
+        self.assertTrue(io._decompress_with_tool("gzip", path, os.path.join(self.tmp.name, "documents.json")))
+        self.assertTrue(io._extract_with_tool("gzip", tar_path, self.tmp.name))
+
+        self.assertEqual(self.data, self.read("documents.json"))
+        self.assertEqual(self.data, self.read("distribution/README"))
+        self.assertFalse(io._decompress_with_tool("gzip", self.write("corrupt.gz", b"corrupt"), os.path.join(self.tmp.name, "corrupt")))
+        self.assertFalse(io._decompress_with_tool("no-such-tool", path, os.path.join(self.tmp.name, "documents.json")))
@@ -0,0 +1,179 @@
+import http.server
+import os
+import re
+import socketserver
+import tempfile
+import threading
+from unittest import TestCase, mock
+
+import urllib3
+
+from esrally import exceptions
+from esrally.utils import net
+
+
+class StandInHandler(http.server.BaseHTTPRequestHandler):
+    """
+    Serves the stand-in server's payload. Supports (single) range requests unless disabled and can cut off responses after a few bytes.
+    """
+
+    def do_GET(self):
+        server = self.server
+        payload = server.payload
+        requested_range = self.headers.get("Range")
+        match = re.match(r"bytes=(\d+)-(\d*)", requested_range) if requested_range and server.supports_ranges else None
+        if match:
+            start = int(match.group(1))
+            end = int(match.group(2)) if match.group(2) else len(payload) - 1
+            if start >= len(payload):
+                self.send_response(416)
+                self.send_header("Content-Range", "bytes */%d" % len(payload))
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+            body = payload[start:end + 1]
+            self.send_response(206)
+            self.send_header("Content-Range", "bytes %d-%d/%d" % (start, start + len(body) - 1, len(payload)))
+        else:
+            body = payload
+            self.send_response(200)
+        with server.lock:
+            server.requests.append(requested_range)
+            # responses with a single byte (e.g. probes) are never cut off
+            truncate = server.truncated_responses > 0 and len(body) > 1
+            if truncate:
+                server.truncated_responses -= 1
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        if truncate:
+            # simulate a flaky connection that breaks in the middle of a response
+            self.wfile.write(body[:len(body) // 2])
+            self.wfile.flush()
+            self.close_connection = True
+        else:
+            self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class ThreadingHTTPServer(socketserver.ThreadingMixIn, http.server.HTTPServer):
+    daemon_threads = True
+
+
+class StandInServer:
+    def __init__(self, payload, supports_ranges=True):
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), StandInHandler)
+        self.httpd.payload = payload
+        self.httpd.supports_ranges = supports_ranges
+        self.httpd.truncated_responses = 0
+        self.httpd.requests = []
+        self.httpd.lock = threading.Lock()
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    @property
+    def url(self):
+        return "http://127.0.0.1:%d/documents.json.bz2" % self.httpd.server_address[1]
+
+    @property
+    def requests(self):
+        return self.httpd.requests
+
+    def truncate_next_responses(self, count):
+        self.httpd.truncated_responses = count
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+        return False
+
+
+class DownloadTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        net.init()
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.local_path = os.path.join(self.tmp.name, "documents.json.bz2")
+        self.payload = bytes(range(256)) * 40
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def downloaded(self):
+        with open(self.local_path, "rb") as f:
+            return f.read()
+
+    def test_downloads_chunks_in_parallel(self):
+        with StandInServer(self.payload) as server:
+            net.download(server.url, self.local_path, len(self.payload), chunk_size=1000, max_connections=4)
+
+        self.assertEqual(self.payload, self.downloaded())
+        # probe and one request per chunk
+        self.assertEqual(1 + 11, len(server.requests))
+        self.assertIn("bytes=10000-10239", server.requests)
+        self.assertFalse(os.path.isfile(self.local_path + ".tmp"))
+        self.assertFalse(os.path.isfile(self.local_path + ".tmp.progress"))
+
+    def test_downloads_sequentially_without_range_support(self):
+        with StandInServer(self.payload, supports_ranges=False) as server:
+            net.download(server.url, self.local_path, len(self.payload), chunk_size=1000)
+
+        self.assertEqual(self.payload, self.downloaded())
+        self.assertEqual(2, len(server.requests))
+
+    def test_resumes_interrupted_chunks(self):
+        with StandInServer(self.payload) as server:
+            server.truncate_next_responses(3)
+            net.download(server.url, self.local_path, len(self.payload), chunk_size=5000, max_connections=1)
+
+        self.assertEqual(self.payload, self.downloaded())
+        # the first chunk is resumed where the previous response has been cut off
+        self.assertEqual(["bytes=0-0", "bytes=0-4999", "bytes=2500-4999", "bytes=3750-4999", "bytes=4375-4999"], server.requests[:5])
+
+    @mock.patch("esrally.utils.net._RETRIES_PER_CHUNK", 1)
+    def test_resumes_failed_download(self):
+        chunks = ["bytes=0-1999", "bytes=2000-3999", "bytes=4000-5999", "bytes=6000-7999", "bytes=8000-9999", "bytes=10000-10239"]
+        with StandInServer(self.payload) as server:
+            # the first chunk fails twice and thus gives up
+            server.truncate_next_responses(2)
+            with self.assertRaises(urllib3.exceptions.ProtocolError):
+                net.download(server.url, self.local_path, len(self.payload), chunk_size=2000, max_connections=1)
+            # partially downloaded data are kept
+            self.assertTrue(os.path.isfile(self.local_path + ".tmp"))
+            self.assertFalse(os.path.isfile(self.local_path))
+            with open(self.local_path + ".tmp.progress", "rt") as f:
+                completed = [chunks[int(i)] for i in f.read().splitlines()[1:]]
+            self.assertNotIn("bytes=0-1999", completed)
+            requests_before_resume = len(server.requests)
+
+            net.download(server.url, self.local_path, len(self.payload), chunk_size=2000, max_connections=1)
+
+        self.assertEqual(self.payload, self.downloaded())
+        # only chunks that have not been downloaded completely before are requested again
+        self.assertEqual(sorted(["bytes=0-0"] + [c for c in chunks if c not in completed]), sorted(server.requests[requests_before_resume:]))
+
+    def test_resumes_sequential_download(self):
+        with open(self.local_path + ".tmp", "wb") as f:
+            f.write(self.payload[:3000])
+
+        with StandInServer(self.payload) as server:
+            net.download(server.url, self.local_path, len(self.payload), chunk_size=1000, max_connections=2)
+
+        self.assertEqual(self.payload, self.downloaded())
+        # the first three chunks are already there
+        self.assertNotIn("bytes=0-999", server.requests)
+        self.assertEqual(1 + 8, len(server.requests))
+
+    def test_discards_download_with_unexpected_size(self):
+        with StandInServer(self.payload) as server:
+            with self.assertRaises(exceptions.DataError):
+                net.download(server.url, self.local_path, len(self.payload) + 1, chunk_size=1000)
+
+        self.assertFalse(os.path.isfile(self.local_path))
+        self.assertFalse(os.path.isfile(self.local_path + ".tmp"))